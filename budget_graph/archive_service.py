@@ -0,0 +1,51 @@
+"""
+Archival of the old records: the records dated before the horizon ("archive_horizon_days" of the config)
+are moved from "monetary_transactions" into "monetary_transactions_archive" in batches.
+The table of the recent records and its indexes stay small, the records of both tables are read
+through the "all_transactions" view, and the monthly sums ("monthly_user_totals") are the compact summary
+of the archived months for the diagrams.
+"""
+import sys
+from datetime import date, timedelta
+
+sys.path.append('../')
+
+from budget_graph.logger import setup_logger
+from budget_graph.global_config import GlobalConfig
+
+logger_archive = setup_logger("logs/ArchiveLog.log", "archive_logger")
+
+ARCHIVE_INTERVAL: int = 86_400  # seconds, the archival is started once a day by the periodic function of the bot
+
+
+def get_archive_horizon(today: date | None = None) -> date | None:
+    """ :return: records dated before this day are archived | None if the archival is disabled """
+    horizon_days: int | None = GlobalConfig.db_archive_horizon_days
+    if not horizon_days or horizon_days < 0:
+        return None
+    return (today or date.today()) - timedelta(days=horizon_days)
+
+
+def get_archive_batch_size() -> int:
+    return GlobalConfig.db_archive_batch_size or 10_000
+
+
+def transactions_archive(db_connection, today: date | None = None) -> int:
+    """
+    Moves all records dated before the horizon, each batch in its own transaction,
+    so the locks of the records table are short and the bot keeps working during the archival
+    :param db_connection: object of the DatabaseQueries class
+    :param today: the horizon is counted from this day (default - the current day)
+    :return: number of moved records
+    """
+    horizon: date | None = get_archive_horizon(today)
+    if horizon is None:
+        return 0
+    batch_size: int = get_archive_batch_size()
+    moved: int = 0
+    while (batch := db_connection.archive_transactions(horizon, batch_size)) > 0:
+        moved += batch
+        if batch < batch_size:
+            break
+    logger_archive.info(f'[ARCHIVE] records dated before {horizon} moved into the archive: {moved}')
+    return moved
@@ -4,13 +4,15 @@ The module responsible for setting up, launching and operating the bot
 
 from sys import path as sys_path
 from asyncio import run as asyncio_run
-from os import getenv, path
-from secrets import compare_digest
+from os import getenv, path, remove
 from datetime import datetime, UTC
-from time import sleep
+from time import sleep, monotonic
 from uuid import UUID, uuid4
 from threading import Thread
+from functools import partial
+from collections.abc import Callable
 from dotenv import load_dotenv
+from psycopg2 import DatabaseError
 from telebot import TeleBot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 
@@ -22,12 +24,22 @@ from budget_graph.registration_service import user_registration
 from budget_graph.dictionary import Emoji, Stickers, receive_translation
 from budget_graph.encryption import getting_hash, get_salt, logging_hash
 from budget_graph.create_csv import CsvFileWithTable
-from budget_graph.user_cache_structure import UserLanguageCache, UserRegistrationStatusCache
-from budget_graph.db_manager import connect_defer_close_db
+from budget_graph.import_service import transactions_import, get_import_max_rows
+from budget_graph.archive_service import transactions_archive, ARCHIVE_INTERVAL
+from budget_graph.last_login_buffer import LastLoginBuffer, last_login_flush, LAST_LOGIN_FLUSH_INTERVAL
+from budget_graph.user_cache_structure import UserLanguageCache, UserContextCache, UnregisteredUserCache, \
+    configure_user_caches, get_user_caches_stats, get_cached_user_context
+from budget_graph.db_manager import connect_defer_close_db, DatabasePool, DSN
+from budget_graph.cache_invalidation import CacheInvalidationListener
+from budget_graph.query_metrics import register_dump_signal, dump_query_metrics
+from budget_graph.user_context import UserContext
+from budget_graph.group_profile import GroupProfile, GroupProfileCache, configure_group_cache
+from budget_graph.household_view import HouseholdViewCache, configure_household_view_cache, get_household_view_stats
 from budget_graph.validation import date_validation, value_validation, description_validation, username_validation, \
     password_validation, category_validation
 from budget_graph.helpers import StorageMsgIdForDeleteAfterOperation, get_category_button_labels, get_bot_commands, \
-    get_category_translate, get_timezone_buttons, get_language_buttons, get_diagram_buttons, get_premium_buttons
+    get_category_translate, get_timezone_buttons, get_language_buttons, get_diagram_buttons, get_premium_buttons, \
+    get_menu_dispatch
 
 
 load_dotenv()  # Load environment variables from .env file
@@ -39,6 +51,9 @@ logger_bot = setup_logger('logs/BotLog.log', 'bot_logger')
 logger_periodic_func = setup_logger('logs/PeriodicFuncLog.log', 'periodic_func_logger')
 
 GlobalConfig.set_config()
+configure_user_caches()
+configure_group_cache()
+configure_household_view_cache()
 
 # change the list of the bot’s commands --------------------------------------------------------------------------------
 bot.set_my_commands(get_bot_commands())
@@ -50,9 +65,8 @@ bot.set_my_commands(get_bot_commands())
 # bot.set_my_short_description('Simple and fast budget control') -------------------------------------------------------
 
 
-def reply_menu_buttons_register(message):
-    telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id)
+def reply_menu_buttons_register(message, user_language: str | None = None):
+    user_language: str = user_language or check_user_language(message.from_user.id)
     markup_1 = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     btn1 = KeyboardButton(f"{Emoji.get_emoji('money')} {receive_translation(user_language, 'table_manage')}")
     btn2 = KeyboardButton(f"💻 {receive_translation(user_language, 'group_settings')}")
@@ -62,9 +76,8 @@ def reply_menu_buttons_register(message):
     bot.send_message(message.chat.id, receive_translation(user_language, "click_need_button"), reply_markup=markup_1)
 
 
-def reply_menu_buttons_not_register(message):
-    telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id)
+def reply_menu_buttons_not_register(message, user_language: str | None = None):
+    user_language: str = user_language or check_user_language(message.from_user.id)
     markup_1 = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     btn1 = KeyboardButton(f"{Emoji.get_emoji('money_wings')} {receive_translation(user_language, 'register')}")
     btn2 = KeyboardButton(f"{Emoji.get_emoji('premium')} {receive_translation(user_language, 'premium')}")
@@ -73,9 +86,8 @@ def reply_menu_buttons_not_register(message):
     bot.send_message(message.chat.id, receive_translation(user_language, 'click_need_button'), reply_markup=markup_1)
 
 
-def table_manage_get_buttons(message):
-    telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id)
+def table_manage_get_buttons(message, user_language: str | None = None):
+    user_language: str = user_language or check_user_language(message.from_user.id)
     markup_1 = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     btn1 = KeyboardButton(f"{Emoji.get_emoji('book')} {receive_translation(user_language, "view_table")}")
     btn2 = KeyboardButton(f"{Emoji.get_emoji('income')} {receive_translation(user_language, "add_income")}")
@@ -90,9 +102,8 @@ def table_manage_get_buttons(message):
                      reply_markup=markup_1)
 
 
-def group_settings_get_buttons(message):
-    telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id)
+def group_settings_get_buttons(message, user_language: str | None = None):
+    user_language: str = user_language or check_user_language(message.from_user.id)
     markup_1 = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     btn1 = KeyboardButton(f"{Emoji.get_emoji('earth')} {receive_translation(user_language, "group_users")}")
     btn2 = KeyboardButton(f"🗑️ {receive_translation(user_language, "delete_account")}")
@@ -107,20 +118,21 @@ def group_settings_get_buttons(message):
                      reply_markup=markup_1)
 
 
-@connect_defer_close_db
-def reply_buttons(db_connection, message):
-    if db_connection.get_username_by_telegram_id(message.from_user.id):
-        reply_menu_buttons_register(message)
+def reply_buttons(message, user_context: UserContext | None = None):
+    user_context: UserContext = user_context or get_user_context(message.from_user.id)
+    if user_context.is_registered:
+        reply_menu_buttons_register(message, user_context.language)
     else:
-        reply_menu_buttons_not_register(message)
+        reply_menu_buttons_not_register(message, user_context.language)
 
 
 @bot.message_handler(commands=['start'])
 def start(message) -> None:
     telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id)
+    user_context: UserContext = get_user_context(telegram_id)
+    user_language: str = user_context.language
 
-    if user_is_registered(telegram_id):
+    if user_context.is_registered:
         # to send a sticker in .webp format no larger than 512x512 pixel
         # sticker = open("H:\telebot\stickers\stick_name.webp", "rb")
         # bot.send_sticker(message.chat.id, sticker)
@@ -130,7 +142,7 @@ def start(message) -> None:
                          f"{receive_translation(user_language, "our_user")}")
         bot.send_sticker(message.chat.id,
                          f"{Stickers.get_sticker_by_id("id_1")}")
-        reply_menu_buttons_register(message)
+        reply_menu_buttons_register(message, user_language)
         logger_bot.info(f"Bot start with registration: "
                         f"TelegramId={logging_hash(telegram_id)}")
     else:
@@ -140,7 +152,7 @@ def start(message) -> None:
                          f"{receive_translation(user_language, "unknown_user")}")
         bot.send_sticker(message.chat.id,
                          f"{Stickers.get_sticker_by_id("id_2")}")
-        reply_menu_buttons_not_register(message)
+        reply_menu_buttons_not_register(message, user_language)
         logger_bot.info(f"Bot start without registration: "
                         f"TelegramId={logging_hash(telegram_id)}")
 
@@ -163,35 +175,36 @@ def get_my_id(message) -> None:
 
 @bot.message_handler(commands=['del_msg_after_transaction'])
 def del_msg_after_transaction(message) -> None:
-    feature_switch_helper(message, 'del_msg_after_transaction')
+    feature_switch_helper(message, get_user_context(message.from_user.id), 'del_msg_after_transaction')
 
 
 @bot.message_handler(commands=['skip_input_date'])
 def skip_input_date(message) -> None:
-    feature_switch_helper(message, 'skip_input_date')
+    feature_switch_helper(message, get_user_context(message.from_user.id), 'skip_input_date')
 
 
 @bot.message_handler(commands=['skip_input_category'])
 def skip_input_category(message) -> None:
-    feature_switch_helper(message, 'skip_input_category')
+    feature_switch_helper(message, get_user_context(message.from_user.id), 'skip_input_category')
 
 
 @bot.message_handler(commands=['skip_input_description'])
 def skip_input_description(message) -> None:
-    feature_switch_helper(message, 'skip_input_description')
+    feature_switch_helper(message, get_user_context(message.from_user.id), 'skip_input_description')
 
 
 @connect_defer_close_db
-def feature_switch_helper(db_connection, message, feature: str) -> None:
+def feature_switch_helper(db_connection, message, user_context: UserContext, feature: str) -> None:
+    """ The context is loaded by the handler, so the update does not hold a second connection of the pool """
     telegram_id: int = message.from_user.id
     chat_id: int = message.chat.id
-    user_language: str = check_user_language(telegram_id)
+    user_language: str = user_context.language
 
-    if not user_is_registered(telegram_id):
+    if not user_context.is_registered:
         get_answer_for_unregistered_user(message, telegram_id, user_language, feature)
         return
 
-    old_feature_status: bool = db_connection.get_feature_status(telegram_id, feature)
+    old_feature_status: bool = user_context.get_feature_status(feature)
     res: bool = db_connection.change_feature_status(telegram_id, feature)
     if res and old_feature_status:  # the functionality was enabled
         bot.send_message(chat_id, receive_translation(user_language, f'{feature}_off'))
@@ -214,15 +227,12 @@ def project_github(message) -> None:
 
 
 @bot.message_handler(commands=['premium'])
-@connect_defer_close_db
-def premium(db_connection, message, user_language: str = None):
-    telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id) if not user_language else user_language
-    user_is_premium: bool = db_connection.check_user_is_premium_by_telegram_id(telegram_id)
+def premium(message, user_context: UserContext | None = None):
+    user_context: UserContext = user_context or get_user_context(message.from_user.id)
     bot.send_message(
         message.chat.id,
-        f"{receive_translation(user_language, 'choose_menu')}",
-        reply_markup=InlineKeyboardMarkup(get_premium_buttons(user_language, user_is_premium))
+        f"{receive_translation(user_context.language, 'choose_menu')}",
+        reply_markup=InlineKeyboardMarkup(get_premium_buttons(user_context.language, user_context.is_premium))
     )
 
 
@@ -244,9 +254,10 @@ def callback_query_premium(call):
 @bot.message_handler(commands=['change_timezone'])
 def change_timezone(message) -> None:
     telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id)
+    user_context: UserContext = get_user_context(telegram_id)
+    user_language: str = user_context.language
 
-    if not user_is_registered(telegram_id):
+    if not user_context.is_registered:
         get_answer_for_unregistered_user(message, telegram_id, user_language, 'change_timezone')
         return
 
@@ -337,13 +348,9 @@ def restart_language_after_changes(call) -> None:
                      reply_markup=markup_1)
 
 
-@connect_defer_close_db
-def get_diagram(db_connection, message, user_language: str) -> None:
-    telegram_id: int = message.from_user.id
-    group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-    user_is_owner: bool = db_connection.check_user_is_group_owner_by_telegram_id(telegram_id, group_id)
-    user_is_premium: bool = db_connection.check_user_is_premium_by_telegram_id(telegram_id)
-    markup_1 = InlineKeyboardMarkup(get_diagram_buttons(user_language, user_is_owner, user_is_premium))
+def get_diagram(message, user_context: UserContext) -> None:
+    user_language: str = user_context.language
+    markup_1 = InlineKeyboardMarkup(get_diagram_buttons(user_language, user_context.is_owner, user_context.is_premium))
     bot.send_message(message.chat.id, f"{receive_translation(user_language, 'choose_diagram_type')}",
                      reply_markup=markup_1)
 
@@ -396,12 +403,11 @@ def get_my_token(db_connection, message, user_language: str) -> None:
     bot.send_message(message.chat.id, token)
 
 
-@connect_defer_close_db
-def start_transaction(db_connection, message, user_language: str, is_negative: bool) -> None:
+def start_transaction(message, user_context: UserContext, is_negative: bool) -> None:
     text_key: str = 'enter_expense' if is_negative else 'enter_income'
-    msg = bot.send_message(message.chat.id, f"{receive_translation(user_language, text_key)}:")
-    skip_operations_status: tuple = db_connection.get_skip_operations_status(message.from_user.id)
-    feature_is_active: bool = db_connection.get_feature_status(message.from_user.id, 'del_msg_after_transaction')
+    msg = bot.send_message(message.chat.id, f"{receive_translation(user_context.language, text_key)}:")
+    skip_operations_status: tuple = user_context.get_skip_operations_status()
+    feature_is_active: bool = user_context.get_feature_status('del_msg_after_transaction')
     msg_del_obj = StorageMsgIdForDeleteAfterOperation(feature_is_active)
     msg_del_obj.append(msg.id)
     bot.register_next_step_handler(
@@ -566,13 +572,15 @@ def process_delete_record(db_connection, message, user_language: str):
                          reply_markup=markup_1)
 
 
-def registration(message, user_language: str, res: bool) -> None:
-    if not res:  # Checking whether the user is already registered and accidentally ended up in this menu.
+def registration(message, user_context: UserContext) -> None:
+    user_language: str = user_context.language
+    # Checking whether the user is already registered and accidentally ended up in this menu.
+    if not user_context.is_registered:
         bot.send_message(message.chat.id, f"{receive_translation(user_language, 'enter_username')}:")
         bot.register_next_step_handler(message, process_username, user_language)
     else:
         bot.send_message(message.chat.id, f"{receive_translation(user_language, 'already_registered')}!")
-        reply_buttons(message)
+        reply_buttons(message, user_context)
 
 
 def process_username(message, user_language: str):
@@ -635,87 +643,137 @@ def process_token(db_connection, message, username: str, psw_hash: str, psw_salt
 
 
 @connect_defer_close_db
-def view_table(db_connection, message, res: bool, user_language: str) -> None:
+def view_table(db_connection, message, user_context: UserContext) -> None:
     chat_id: int = message.chat.id
+    user_language: str = user_context.language
     # https://core.telegram.org/bots/api#sendchataction
     # https://pytba.readthedocs.io/en/latest/sync_version/index.html#telebot.TeleBot.send_chat_action
     bot.send_chat_action(chat_id, 'typing')  # returns True on success
-    telegram_id: int = message.from_user.id
-    if res:  # user authorization check
-        group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-        data: tuple = db_connection.select_data_for_household_table(group_id, 10)
+    if user_context.is_registered:  # user authorization check
+        group_id: int = user_context.group_id
+        # the rows and the text are cached until the records of the group are changed (see household_view.py)
+        version, data = db_connection.get_household_table(group_id, 10)
         if data:
-            # Generating a single message from nested lists of the 'data' tuple
-            category_data: tuple = get_category_translate(user_language)
-            bot.send_message(chat_id,
-                             '\n'.join([f"ID: {table_entry[0]}\n"
-                                        f"{category_data[0]}: {table_entry[1]}\n"
-                                        f"{category_data[1]}: {table_entry[2]}\n"
-                                        f"{category_data[2]}: {table_entry[3]}\n"
-                                        f"{category_data[3]}: {table_entry[4]}\n"
-                                        f"{category_data[4]}: {table_entry[5]}\n"
-                                        f"{category_data[5]}: {table_entry[6]}\n\n"
-                                        for table_entry in data]))
+            bot.send_message(chat_id, HouseholdViewCache.get_text(group_id, version, 10, user_language,
+                                                                  data, format_household_table))
         else:
             bot.send_message(chat_id, receive_translation(user_language, 'table_is_empty'))
 
 
+def format_household_table(data: tuple[tuple, ...], user_language: str) -> str:
+    """ Generating a single message from nested lists of the 'data' tuple """
+    category_data: tuple = get_category_translate(user_language)
+    return '\n'.join([f"ID: {table_entry[0]}\n"
+                      f"{category_data[0]}: {table_entry[1]}\n"
+                      f"{category_data[1]}: {table_entry[2]}\n"
+                      f"{category_data[2]}: {table_entry[3]}\n"
+                      f"{category_data[3]}: {table_entry[4]}\n"
+                      f"{category_data[4]}: {table_entry[5]}\n"
+                      f"{category_data[5]}: {table_entry[6]}\n\n"
+                      for table_entry in data])
+
+
 @connect_defer_close_db
-def get_csv(db_connection, message, user_language: str) -> None:
+def get_csv(db_connection, message, user_context: UserContext) -> None:
     chat_id: int = message.chat.id
+    user_language: str = user_context.language
     # https://core.telegram.org/bots/api#sendchataction
     # https://pytba.readthedocs.io/en/latest/sync_version/index.html#telebot.TeleBot.send_chat_action
     bot.send_chat_action(chat_id, 'upload_document')  # returns True on success
     telegram_id: int = message.from_user.id
-    group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
+    group_id: int = user_context.group_id
     # to be able to call a function from any file
     group_uuid: str = db_connection.get_group_transaction_uuid(group_id)
-    file_path: str = path.join(path.dirname(__file__), f'csv_tables/{group_id}_{group_uuid}.csv')
-    # 10_000 row limit
-    table_data: tuple[tuple, ...] = db_connection.select_data_for_household_table(group_id, 0)
-    csv_filename: str = f'{group_id}_{group_uuid}'
-    if table_data:
-        try:
-            csv_obj = CsvFileWithTable(file_path, table_data)
-            if not CsvFileWithTable.check_csv_is_actual(group_id, group_uuid):
+    # the table headers are in the user's language, so the group has a separate file for each language
+    file_path: str = path.join(path.dirname(__file__), f'csv_tables/{group_id}_{group_uuid}_{user_language}.csv')
+    csv_filename: str = f'{group_id}_{group_uuid}_{user_language}'
+    # the rows are streamed from the database into the file, the query is executed only if the file is created
+    csv_obj = CsvFileWithTable(file_path, db_connection.export_group_transactions(group_id), lang=user_language)
+    try:
+        # the file is created again only if the group data has changed since the last export
+        if not CsvFileWithTable.check_csv_is_actual(group_id, group_uuid, user_language):
+            if GlobalConfig.db_export_by_copy:
+                csv_obj.create_csv_file_by_copy(partial(db_connection.copy_group_transactions_to_csv, group_id))
+            else:
                 csv_obj.create_csv_file()
-            file_size: float = csv_obj.get_file_size_kb()
-            file_checksum: str = csv_obj.get_file_checksum()
-            with open(f'csv_tables/{csv_filename}.csv', 'rb') as csv_table_file:
-                caption: str = (f"{receive_translation(user_language, 'file_size')}: "
-                                f"{'{:.3f}'.format(file_size)} kB\n\n"
-                                f"{receive_translation(user_language, 'hashsum')} "
-                                f"(sha-256): {file_checksum}")
-                bot.send_document(chat_id, csv_table_file, caption=caption)
-        except FileNotFoundError as err:
-            bot.send_message(chat_id, receive_translation(user_language, 'error_connect_support'))
-            logger_bot.error(f"CSV FileNotFoundError => {err}. "
-                             f"TelegramID: {logging_hash(telegram_id)}, "
-                             f"group #{group_id}")
-        # when trying to run an operation without access rights
-        except PermissionError as err:
-            bot.send_message(chat_id, receive_translation(user_language, 'error_connect_support'))
-            logger_bot.error(f"CSV PermissionError => {err}. "
-                             f"TelegramID: {logging_hash(telegram_id)}, "
-                             f"group #{group_id}")
-        except ValueError as err:
-            bot.send_message(chat_id, receive_translation(user_language, 'invalid_data_table_for_csv'))
-            logger_bot.error(f"CSV ValueError => {err}. "
-                             f"TelegramID: {logging_hash(telegram_id)}, "
-                             f"group #{group_id}")
-        else:
-            CsvFileWithTable.actual_csv_files[group_id] = group_uuid
-            logger_bot.info(f"CSV: SUCCESS. "
-                            f"TelegramID: {logging_hash(telegram_id)}, "
-                            f"group #{group_id}. "
-                            f"File size: {'{:.3f}'.format(file_size)} kB, "
-                            f"hashsum: {file_checksum}")
+            if not csv_obj.rows_number:
+                remove(file_path)
+                bot.send_message(chat_id, receive_translation(user_language, 'table_is_empty'))
+                return
+        file_size: float = csv_obj.get_file_size_kb()
+        file_checksum: str = csv_obj.get_file_checksum()
+        with open(f'csv_tables/{csv_filename}.csv', 'rb') as csv_table_file:
+            caption: str = (f"{receive_translation(user_language, 'file_size')}: "
+                            f"{'{:.3f}'.format(file_size)} kB\n\n"
+                            f"{receive_translation(user_language, 'hashsum')} "
+                            f"(sha-256): {file_checksum}")
+            bot.send_document(chat_id, csv_table_file, caption=caption)
+    # the export has been interrupted (the incomplete file is not saved)
+    except DatabaseError as err:
+        bot.send_message(chat_id, receive_translation(user_language, 'error_connect_support'))
+        logger_bot.error(f"CSV DatabaseError => {err}. "
+                         f"TelegramID: {logging_hash(telegram_id)}, "
+                         f"group #{group_id}")
+    except FileNotFoundError as err:
+        bot.send_message(chat_id, receive_translation(user_language, 'error_connect_support'))
+        logger_bot.error(f"CSV FileNotFoundError => {err}. "
+                         f"TelegramID: {logging_hash(telegram_id)}, "
+                         f"group #{group_id}")
+    # when trying to run an operation without access rights
+    except PermissionError as err:
+        bot.send_message(chat_id, receive_translation(user_language, 'error_connect_support'))
+        logger_bot.error(f"CSV PermissionError => {err}. "
+                         f"TelegramID: {logging_hash(telegram_id)}, "
+                         f"group #{group_id}")
+    except ValueError as err:
+        bot.send_message(chat_id, receive_translation(user_language, 'invalid_data_table_for_csv'))
+        logger_bot.error(f"CSV ValueError => {err}. "
+                         f"TelegramID: {logging_hash(telegram_id)}, "
+                         f"group #{group_id}")
     else:
-        bot.send_message(message.chat.id, receive_translation(user_language, 'table_is_empty'))
+        CsvFileWithTable.actual_csv_files[group_id] = group_uuid
+        logger_bot.info(f"CSV: SUCCESS. "
+                        f"TelegramID: {logging_hash(telegram_id)}, "
+                        f"group #{group_id}. "
+                        f"File size: {'{:.3f}'.format(file_size)} kB, "
+                        f"hashsum: {file_checksum}")
 
 
 @connect_defer_close_db
-def get_group_users(db_connection, message, user_language: str):
+def import_csv(db_connection, message, user_context: UserContext) -> None:
+    """
+    Adds all records of the CSV table sent by the user to the group (see import_service.transactions_import)
+    """
+    chat_id: int = message.chat.id
+    user_language: str = user_context.language
+    telegram_id: int = message.from_user.id
+    # https://core.telegram.org/bots/api#getfile - the bot can download files up to 20 MB
+    if message.document.file_size and message.document.file_size > 20 * 1024 * 1024:
+        bot.send_message(chat_id, f"{receive_translation(user_language, 'import_invalid_file')}: "
+                                  f"{get_import_max_rows()}")
+        return
+    bot.send_chat_action(chat_id, 'typing')
+    csv_data: bytes = bot.download_file(bot.get_file(message.document.file_id).file_path)
+    imported, status, invalid_records = transactions_import(db_connection, user_context.group_id,
+                                                            user_context.username, csv_data, user_language)
+    if not status:
+        bot.send_message(chat_id, f"{receive_translation(user_language, 'import_success')}: {imported}")
+    elif status == 'import_invalid_file':
+        bot.send_message(chat_id, f"{receive_translation(user_language, status)}: {get_import_max_rows()}")
+    elif status == 'import_invalid_rows':
+        # the number of the record in the file (the header line is not counted), only the first ones are shown
+        bot.send_message(chat_id, f"{receive_translation(user_language, status)}: "
+                                  f"{', '.join(str(number) for number in invalid_records[:20])}"
+                                  f"{'...' if len(invalid_records) > 20 else ''}")
+    else:
+        bot.send_message(chat_id, receive_translation(user_language, status))
+    logger_bot.info(f"CSV import: {status or 'SUCCESS'}. "
+                    f"TelegramID: {logging_hash(telegram_id)}, "
+                    f"group #{user_context.group_id}, records: {imported}")
+
+
+@connect_defer_close_db
+def get_group_users(db_connection, message, user_context: UserContext):
     """
     Returns a list of users.
 
@@ -726,10 +784,10 @@ def get_group_users(db_connection, message, user_language: str):
         Sophia
         Ava
     """
-    telegram_id: int = message.from_user.id
-    group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-    group_owner_username: str = db_connection.get_group_owner_username_by_group_id(group_id)
-    group_users_list: tuple = db_connection.get_group_usernames(group_id)
+    user_language: str = user_context.language
+    group_profile: GroupProfile | None = db_connection.get_group_profile(user_context.group_id)
+    group_owner_username: str = group_profile.owner_username if group_profile else ''
+    group_users_list: tuple = group_profile.member_usernames if group_profile else ()
     group_users_str: str = '\n'.join(
         f"{idx+1}. {user} ({receive_translation(user_language, 'owner')})"
         if user == group_owner_username
@@ -740,21 +798,18 @@ def get_group_users(db_connection, message, user_language: str):
 
 
 @connect_defer_close_db
-def change_owner(db_connection, message, user_language: str):
-    telegram_id: int = message.from_user.id
-    group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-    group_owner_username: str = db_connection.get_group_owner_username_by_group_id(group_id)
-    username: str = db_connection.get_username_by_telegram_id(telegram_id)
-    if compare_digest(group_owner_username, username):
-        group_users_list: tuple = db_connection.get_group_usernames(group_id)
+def change_owner(db_connection, message, user_context: UserContext):
+    user_language: str = user_context.language
+    group_id: int = user_context.group_id
+    if user_context.is_owner:
+        group_profile: GroupProfile | None = db_connection.get_group_profile(group_id)
+        group_users_without_owner: tuple = group_profile.get_usernames_without_owner() if group_profile else ()
         # if there are no users in the group except the owner
-        if len(group_users_list) == 1:
+        if not group_users_without_owner:
             bot.send_message(message.chat.id, receive_translation(user_language, 'small_group_exception'))
         else:
             # List of users as a string without group owner
-            group_users_str_without_owner: str = '\n'.join(
-                f"> {user}" for user in group_users_list if user != group_owner_username
-            )
+            group_users_str_without_owner: str = '\n'.join(f"> {user}" for user in group_users_without_owner)
             bot.send_message(message.chat.id,
                              f"{receive_translation(user_language, 'username_new_owner')}:\n"
                              f"{group_users_str_without_owner}")
@@ -767,9 +822,10 @@ def change_owner(db_connection, message, user_language: str):
 def process_change_owner(db_connection, message, group_id: int, user_language: str) -> None:
     telegram_id: int = message.from_user.id
     new_owner_username: str = message.text
-    telegram_id_new_owner: int = db_connection.get_telegram_id_by_username(new_owner_username)
-    user_from_current_group: bool = db_connection.get_group_id_by_telegram_id(telegram_id_new_owner) == group_id
-    user_is_owner: bool = db_connection.check_user_is_group_owner_by_telegram_id(telegram_id_new_owner, group_id)
+    group_profile: GroupProfile | None = db_connection.get_group_profile(group_id)
+    telegram_id_new_owner: int = group_profile.get_telegram_id(new_owner_username) if group_profile else 0
+    user_from_current_group: bool = bool(telegram_id_new_owner)
+    user_is_owner: bool = user_from_current_group and group_profile.is_owner(telegram_id_new_owner)
 
     if user_is_owner:
         bot.send_message(message.chat.id, receive_translation(user_language, 'current_owner_exception'))
@@ -792,16 +848,13 @@ def process_change_owner(db_connection, message, group_id: int, user_language: s
     group_settings_get_buttons(message)
 
 
-@connect_defer_close_db
-def delete_account(db_connection, message, user_language: str):
-    telegram_id: int = message.from_user.id
+def delete_account(message, user_context: UserContext):
+    user_language: str = user_context.language
     markup_1 = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     btn1 = KeyboardButton(f"{Emoji.get_emoji('moon')} {receive_translation(user_language, 'YES')}")
     btn2 = KeyboardButton(f"{Emoji.get_emoji('sun')} {receive_translation(user_language, 'NO')}")
     markup_1.add(btn1, btn2)
-    group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-    user_is_owner: bool = db_connection.check_user_is_group_owner_by_telegram_id(telegram_id, group_id)
-    if user_is_owner:
+    if user_context.is_owner:
         bot.send_message(message.chat.id, receive_translation(user_language, 'owner_try_delete_account'))
     else:
         bot.send_message(message.chat.id, receive_translation(user_language, 'confirmation_delete'),
@@ -818,7 +871,7 @@ def process_delete_account(db_connection, message, user_language: str):
     user_choice: str = message.text
     if user_choice == f"{Emoji.get_emoji('moon')} {receive_translation(user_language, "YES")}":
         # removing a user from the cache
-        UserRegistrationStatusCache.delete_data_from_cache(telegram_id)
+        UserContextCache.delete_data_from_cache(telegram_id)
         db_connection.delete_user_from_group_by_telegram_id(telegram_id)
         bot.send_message(message.chat.id, receive_translation(user_language, 'parting'))
         bot.send_message(message.chat.id, receive_translation(user_language, 'account_is_deleted'),
@@ -838,44 +891,41 @@ def process_delete_account(db_connection, message, user_language: str):
 
 
 @connect_defer_close_db
-def delete_user(db_connection, message, user_language: str):
-    telegram_id: int = message.from_user.id
-    group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-    group_owner: str = db_connection.get_group_owner_username_by_group_id(group_id)
-    user_is_owner: bool = db_connection.check_user_is_group_owner_by_telegram_id(telegram_id, group_id)
-    if user_is_owner:
-        group_users_list: tuple = db_connection.get_group_usernames(group_id)
-        if len(group_users_list) == 1:  # If there are no users in the group except the owner
+def delete_user(db_connection, message, user_context: UserContext):
+    user_language: str = user_context.language
+    group_id: int = user_context.group_id
+    if user_context.is_owner:
+        group_profile: GroupProfile | None = db_connection.get_group_profile(group_id)
+        group_users_without_owner: tuple = group_profile.get_usernames_without_owner() if group_profile else ()
+        if not group_users_without_owner:  # If there are no users in the group except the owner
             bot.send_message(message.chat.id,
                              f"{receive_translation(user_language, 'exception_one_user_in_group')}\n"
                              f"{receive_translation(user_language, 'select_to_delete')}")
         else:
             # List of users as a string without group owner
-            group_users_str_without_owner: str = '\n'.join(f"{user}" for user in group_users_list
-                                                           if user != group_owner)
+            group_users_str_without_owner: str = '\n'.join(f"{user}" for user in group_users_without_owner)
             bot.send_message(message.chat.id, f"{receive_translation(user_language, 'select_new_owner')}\n"
                                               f"{group_users_str_without_owner}")
-            bot.register_next_step_handler(message, process_delete_user, group_id, group_users_list, user_language)
+            bot.register_next_step_handler(message, process_delete_user, group_id, user_language)
     else:
         bot.send_message(message.chat.id, receive_translation(user_language, 'owner_privileges'))
 
 
 @connect_defer_close_db
-def process_delete_user(db_connection, message, group_id: int, group_users_list: tuple, user_language: str) -> None:
+def process_delete_user(db_connection, message, group_id: int, user_language: str) -> None:
     username_user_to_delete: str = message.text
-    telegram_id_user_to_delete: int = db_connection.get_telegram_id_by_username(username_user_to_delete)
-    user_to_delete_is_owner: bool = db_connection.check_user_is_group_owner_by_telegram_id(telegram_id_user_to_delete,
-                                                                                           group_id)
+    group_profile: GroupProfile | None = db_connection.get_group_profile(group_id)
+    telegram_id_user_to_delete: int = group_profile.get_telegram_id(username_user_to_delete) if group_profile else 0
 
-    if user_to_delete_is_owner:
+    if telegram_id_user_to_delete and group_profile.is_owner(telegram_id_user_to_delete):
         bot.send_message(message.chat.id, receive_translation(user_language, 'current_owner_exception'))
-    elif username_user_to_delete not in group_users_list:
+    elif not telegram_id_user_to_delete:
         bot.send_message(message.chat.id,
                          f"{receive_translation(user_language, 'check_correct_username')}\n"
                          f"{receive_translation(user_language, 'unknown_user_in_group')}")
     else:
         # removing a user from the cache
-        UserRegistrationStatusCache.delete_data_from_cache(telegram_id_user_to_delete)
+        UserContextCache.delete_data_from_cache(telegram_id_user_to_delete)
         if db_connection.delete_user_from_group_by_telegram_id(telegram_id_user_to_delete):
             bot.send_message(message.chat.id, receive_translation(user_language, 'user_removed'))
             logger_bot.info(f"'User {logging_hash(username_user_to_delete)}' "
@@ -888,17 +938,15 @@ def process_delete_user(db_connection, message, group_id: int, group_users_list:
     group_settings_get_buttons(message)
 
 
-@connect_defer_close_db
-def delete_group(db_connection, message, user_language: str) -> None:
-    telegram_id: int = message.from_user.id
+def delete_group(message, user_context: UserContext) -> None:
+    user_language: str = user_context.language
+    group_id: int = user_context.group_id
     markup_1 = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     btn1 = KeyboardButton(f"{Emoji.get_emoji('moon')} {receive_translation(user_language, 'YES')}")
     btn2 = KeyboardButton(f"{Emoji.get_emoji('sun')} {receive_translation(user_language, 'NO')}")
     markup_1.add(btn1, btn2)
-    group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-    user_is_owner: bool = db_connection.check_user_is_group_owner_by_telegram_id(telegram_id, group_id)
 
-    if user_is_owner:
+    if user_context.is_owner:
         bot.send_message(message.chat.id,
                          f"{receive_translation(user_language, 'are_you_sure')}\n"
                          f"{receive_translation(user_language, 'delete_table')}",
@@ -916,9 +964,9 @@ def process_delete_group(db_connection, message, group_id: int, user_language: s
     if user_choice == f"{Emoji.get_emoji('moon')}️ {receive_translation(user_language, 'YES')}":
         # get a list of telegram_id for each user of the group:
         telegram_ids_of_group_users: tuple = db_connection.get_group_telegram_ids(group_id)
-        # clearing group users from the cache
-        UserRegistrationStatusCache.delete_group_trigger(telegram_ids_of_group_users)
         db_connection.delete_group_with_users(group_id)
+        # clearing group users from the cache (after the deletion: a context read before it is not cached)
+        UserContextCache.delete_group_trigger(telegram_ids_of_group_users)
         bot.send_message(message.chat.id, receive_translation(user_language, 'parting'))
         bot.send_message(message.chat.id, receive_translation(user_language, 'remove_completed'))
         logger_bot.info(f"User deleted the group. "
@@ -944,8 +992,9 @@ def process_delete_group(db_connection, message, group_id: int, user_language: s
 def get_str_with_group_users(db_connection, telegram_id: int, with_owner: bool) -> str:
     user_language: str = check_user_language(telegram_id)
     group_id: int = db_connection.get_group_id_by_telegram_id(telegram_id)
-    group_owner_username: str = db_connection.get_group_owner_username_by_group_id(group_id)
-    group_users_list: tuple = db_connection.get_group_usernames(group_id)
+    group_profile: GroupProfile | None = db_connection.get_group_profile(group_id)
+    group_owner_username: str = group_profile.owner_username if group_profile else ''
+    group_users_list: tuple = group_profile.member_usernames if group_profile else ()
 
     if with_owner:
         res: str = '\n'.join(
@@ -964,25 +1013,26 @@ def get_str_with_group_users(db_connection, telegram_id: int, with_owner: bool)
     return res
 
 
-@connect_defer_close_db
-def user_is_registered(db_connection, telegram_id: int) -> bool:
+def get_user_context(telegram_id: int) -> UserContext:
     """
-    We check whether the user is registered in the project.
-    Since the user may accidentally end up in a menu
-    intended only for registered users.
+    Loads everything about the user with one query at the beginning of the update.
+    The updates of the users who are known from the caches (registered or not) do not take a connection from the pool.
     """
-    user_in_cache: bool = UserRegistrationStatusCache.get_cache_data(telegram_id)
+    if (user_context := get_cached_user_context(telegram_id)) is not None:
+        return user_context
+    return load_user_context(telegram_id)
 
-    if user_in_cache:  # if you found data in the cache or received a response from the database
-        # update date of the last user activity in database
-        db_connection.update_user_last_login_by_telegram_id(telegram_id)
-    else:  # if the data is not found in the cache
-        if db_connection.check_telegram_id_is_exist(telegram_id):  # found user in database
-            # updating the data in the cache
-            UserRegistrationStatusCache.input_cache_data(telegram_id)
-            user_in_cache = True
 
-    return user_in_cache
+@connect_defer_close_db
+def load_user_context(db_connection, telegram_id: int) -> UserContext:
+    """
+    The language cache is kept in sync with the result,
+    so handlers that use check_user_language() do not query the database.
+    The context of the registered user is cached by DatabaseQueries.get_user_context.
+    """
+    user_context: UserContext = db_connection.get_user_context(telegram_id)
+    UserLanguageCache.input_cache_data(telegram_id, user_context.language)
+    return user_context
 
 
 @connect_defer_close_db
@@ -991,7 +1041,7 @@ def check_user_language(db_connection, telegram_id: int) -> str:
     Makes a request to the database via the get_user_language function.
     The telegram id of the user taken from the message is used.
     """
-    language: str = UserLanguageCache.get_cache_data(telegram_id)
+    language: str = UserLanguageCache.get_cache_data(telegram_id) or UnregisteredUserCache.get_cache_data(telegram_id)
     if not language:
         language: str = db_connection.get_user_language(telegram_id)
         UserLanguageCache.input_cache_data(telegram_id, language)
@@ -1005,70 +1055,97 @@ def get_answer_for_unregistered_user(message, telegram_id: int, user_language: s
     reply_menu_buttons_not_register(message)
 
 
-# pylint: disable=too-many-branches, too-many-function-args
+def menu_table_manage(message, user_context: UserContext) -> None:
+    if user_context.is_registered:
+        table_manage_get_buttons(message, user_context.language)
+    else:
+        reply_menu_buttons_not_register(message, user_context.language)
+
+
+def menu_group_settings(message, user_context: UserContext) -> None:
+    if user_context.is_registered:
+        group_settings_get_buttons(message, user_context.language)
+    else:
+        reply_menu_buttons_not_register(message, user_context.language)
+
+
+# the buttons of the reply keyboards: (prefix of the label, phrase of the dictionary, (handler, only for registered))
+# the handler is called with the message and the context of the user
+MENU_BUTTONS: tuple[tuple[str, str, tuple[Callable, bool]], ...] = (
+    (Emoji.get_emoji('money_wings'), 'register', (registration, False)),
+    (Emoji.get_emoji('premium'), 'premium', (premium, False)),
+    (Emoji.get_emoji('lock'), 'get_my_token',
+     (lambda message, user_context: get_my_token(message, user_context.language), False)),
+    (Emoji.get_emoji('money'), 'table_manage', (menu_table_manage, False)),
+    ('💻', 'group_settings', (menu_group_settings, False)),
+    (f"{Emoji.get_emoji('magic')}\ufe0f", 'back', (reply_buttons, False)),
+    (Emoji.get_emoji('back'), 'back_to_menu', (reply_buttons, False)),
+    (Emoji.get_emoji('book'), 'view_table', (view_table, True)),
+    (Emoji.get_emoji('income'), 'add_income', (partial(start_transaction, is_negative=False), True)),
+    (Emoji.get_emoji('expense'), 'add_expense', (partial(start_transaction, is_negative=True), True)),
+    (Emoji.get_emoji('delete'), 'del_record',
+     (lambda message, user_context: delete_record(message, user_context.language), True)),
+    (Emoji.get_emoji('unload'), 'get_csv', (get_csv, True)),
+    (Emoji.get_emoji('earth'), 'group_users', (get_group_users, True)),
+    (Emoji.get_emoji('diagram'), 'get_diagram', (get_diagram, True)),
+    ('🗑️', 'delete_account', (delete_account, True)),
+    (Emoji.get_emoji('stop'), 'delete_group', (delete_group, True)),
+    (Emoji.get_emoji('key'), 'change_owner', (change_owner, True)),
+    (Emoji.get_emoji('robot'), 'delete_user', (delete_user, True)),
+)
+# the label of the button in every language -> (handler, only for registered), built once at the start
+MENU_DISPATCH: dict[str, tuple[Callable, bool]] = get_menu_dispatch(MENU_BUTTONS)
+
+
 @bot.message_handler(content_types=['text'])
 def text(message) -> None:
     telegram_id: int = message.from_user.id
-    user_language: str = check_user_language(telegram_id)
-    res: bool = user_is_registered(telegram_id)
-
-    if message.text == f"{Emoji.get_emoji('money_wings')} {receive_translation(user_language, 'register')}":
-        registration(message, user_language, res)
-    elif message.text == f"{Emoji.get_emoji('premium')} {receive_translation(user_language, 'premium')}":
-        premium(message, user_language=user_language)
-    elif message.text == f"{Emoji.get_emoji('lock')} {receive_translation(user_language, 'get_my_token')}":
-        get_my_token(message, user_language)
-    elif message.text == f"{Emoji.get_emoji('money')} {receive_translation(user_language, 'table_manage')}":
-        if res:
-            table_manage_get_buttons(message)
-        else:
-            reply_menu_buttons_not_register(message)
-    elif message.text == f"💻 {receive_translation(user_language, 'group_settings')}":
-        if res:
-            group_settings_get_buttons(message)
-        else:
-            reply_menu_buttons_not_register(message)
-    elif message.text in (f"{Emoji.get_emoji('magic')}️ {receive_translation(user_language, 'back')}",
-                          f"{Emoji.get_emoji('back')} {receive_translation(user_language, 'back_to_menu')}"):
-        reply_buttons(message)
+    # one query to the database per update, the result is passed to the handlers
+    user_context: UserContext = get_user_context(telegram_id)
+
+    action: tuple[Callable, bool] | None = MENU_DISPATCH.get(message.text)
     # if an unauthorized user tries to perform an action that is only available after authorization
-    elif not res:
-        bot.send_message(message.chat.id, receive_translation(user_language, 'not_register'))
+    if not user_context.is_registered and (action is None or action[1]):
+        bot.send_message(message.chat.id, receive_translation(user_context.language, 'not_register'))
         bot.send_sticker(message.chat.id, Stickers.get_sticker_by_id('id_5'))
         logger_bot.info(f'Unregistered user interaction. TelegramID: {logging_hash(telegram_id)}')
-    elif res:
-        if message.text == f"{Emoji.get_emoji('book')} {receive_translation(user_language, 'view_table')}":
-            view_table(message, res, user_language)
-        elif message.text == f"{Emoji.get_emoji('income')} {receive_translation(user_language, 'add_income')}":
-            start_transaction(message, user_language, False)
-        elif message.text == f"{Emoji.get_emoji('expense')} {receive_translation(user_language, 'add_expense')}":
-            start_transaction(message, user_language, True)
-        elif message.text == f"{Emoji.get_emoji('delete')} {receive_translation(user_language, 'del_record')}":
-            delete_record(message, user_language)
-        elif message.text == f"{Emoji.get_emoji('unload')} {receive_translation(user_language, 'get_csv')}":
-            get_csv(message, user_language)
-        elif message.text == f"{Emoji.get_emoji('earth')} {receive_translation(user_language, 'group_users')}":
-            get_group_users(message, user_language)
-        elif message.text == f"{Emoji.get_emoji('diagram')} {receive_translation(user_language, 'get_diagram')}":
-            get_diagram(message, user_language)
-        elif message.text == f"🗑️ {receive_translation(user_language, 'delete_account')}":
-            delete_account(message, user_language)
-        elif message.text == f"{Emoji.get_emoji('stop')} {receive_translation(user_language, 'delete_group')}":
-            delete_group(message, user_language)
-        elif message.text == f"{Emoji.get_emoji('key')} {receive_translation(user_language, 'change_owner')}":
-            change_owner(message, user_language)
-        elif message.text == f"{Emoji.get_emoji('robot')} {receive_translation(user_language, 'delete_user')}":
-            delete_user(message, user_language)
-    else:
-        bot.send_message(message.chat.id, receive_translation(user_language, 'misunderstanding'))
+    elif action is not None:
+        action[0](message, user_context)
+
+
+@bot.message_handler(content_types=['document'])
+def document(message) -> None:
+    """ a CSV table sent to the bot is imported into the user's group """
+    telegram_id: int = message.from_user.id
+    user_context: UserContext = get_user_context(telegram_id)
+    if not user_context.is_registered:
+        get_answer_for_unregistered_user(message, telegram_id, user_context.language, 'import_csv')
+        return
+    import_csv(message, user_context)
+
+
+@connect_defer_close_db
+def archive_old_transactions(db_connection) -> None:
+    transactions_archive(db_connection)
+
+
+@connect_defer_close_db
+def flush_last_logins(db_connection) -> None:
+    last_login_flush(db_connection)
 
 
 def periodic_func(interval=5):
+    next_archival: float = monotonic()  # the first archival is at the start of the bot
+    next_last_login_flush: float = monotonic() + LAST_LOGIN_FLUSH_INTERVAL
     while True:
         sleep(interval)
         logger_periodic_func.info('Trigger for a periodic function')
         logger_periodic_func.info(f'Reports.await_list = {Reports.await_list}')
         logger_periodic_func.info(f'Reports.diagram_to_delete = {Reports.diagram_to_delete}')
+        logger_periodic_func.info(f'Connection pool: {DatabasePool.get_stats()}')
+        logger_periodic_func.info(f'User caches: {get_user_caches_stats()}')
+        logger_periodic_func.info(f'Group profiles cache: {GroupProfileCache.get_cache().get_stats()}')
+        logger_periodic_func.info(f'Household view caches: {get_household_view_stats()}')
         if len(Reports.await_list) > interval:
             logger_periodic_func.warning(f'Reports.await_list len = {len(Reports.await_list)}')
         if len(Reports.diagram_to_delete) > interval:
@@ -1077,8 +1154,27 @@ def periodic_func(interval=5):
         send_diagram()
         Reports.delete_unused_diagram()
         CsvFileWithTable.delete_unused_csv_files()
+        if monotonic() >= next_archival:
+            archive_old_transactions()
+            next_archival = monotonic() + ARCHIVE_INTERVAL
+        if monotonic() >= next_last_login_flush:
+            logger_periodic_func.info(f'Last login buffer: {LastLoginBuffer.get_size()} users')
+            flush_last_logins()
+            next_last_login_flush = monotonic() + LAST_LOGIN_FLUSH_INTERVAL
 
 
 if __name__ == "__main__":
     Thread(target=periodic_func, daemon=True).start()
-    bot.infinity_polling(none_stop=True)
+    register_dump_signal()  # kill -USR1 <pid> writes the query metrics to the log
+    # evicts the users changed by the web application and other instances of the bot from the caches
+    invalidation_listener = CacheInvalidationListener(DSN) if GlobalConfig.cache_invalidation_enable else None
+    if invalidation_listener:
+        invalidation_listener.start()
+    try:
+        bot.infinity_polling(none_stop=True)
+    finally:
+        if invalidation_listener:
+            invalidation_listener.stop()
+        flush_last_logins()  # the dates of the last activity are not lost at the shutdown
+        dump_query_metrics()
+        DatabasePool.close()
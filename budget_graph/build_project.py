@@ -1,16 +1,29 @@
-from os import makedirs, path
-from sys import path as sys_path
+from os import listdir, makedirs, path
+from sys import argv, path as sys_path
 
 sys_path.append('../')
+from psycopg2 import sql as pg_sql
 from budget_graph.db_manager import connect_db, close_db
+from budget_graph.sql_registry import SCHEMA_SCRIPTS, CLEANUP_SCRIPT
+
+MIGRATIONS_DIR: str = path.join(path.dirname(__file__), 'sql/migrations')
+
+# scripts of the views over the records table (they are executed again after its recreation)
+TRANSACTIONS_VIEW_SCRIPTS: tuple[str, ...] = tuple(name for name in SCHEMA_SCRIPTS if name.endswith('_view'))
+# the index created by partition_transactions(brin=True), it is kept only while the flag is passed
+BRIN_INDEX_NAME: str = 'transactions_group_id_record_date_brin'
+
+
+def read_sql_script(name: str) -> str:
+    with open(path.join(path.dirname(__file__), f'sql/{name}.sql'), 'r', encoding='utf-8') as sql_file:
+        return sql_file.read()
 
 
 def drop_tables_in_db() -> None:
     conn = connect_db()
     try:
         with conn.cursor() as cur:
-            with open(path.join(path.dirname(__file__), 'sql/db_cleanup.sql'), 'r', encoding='utf-8') as sql_file:
-                cur.execute(sql_file.read())
+            cur.execute(read_sql_script(CLEANUP_SCRIPT))
             conn.commit()
     # pylint: disable=broad-exception-caught
     except Exception as err:
@@ -34,30 +47,142 @@ def create_tables_in_db() -> None:
     Creating a Database Infrastructure
     """
     conn = connect_db()
+    try:
+        with conn.cursor() as cur:
+            for filename in SCHEMA_SCRIPTS:
+                cur.execute(read_sql_script(filename))
+            # the new database already has the latest schema
+            cur.executemany('INSERT INTO "budget_graph"."schema_migrations" ("name") VALUES (%s)',
+                            [(name,) for name in get_migration_names()])
+            conn.commit()
+    # pylint: disable=broad-exception-caught
+    except Exception as err:
+        print(f'Critical error when creating tables in the database: {err}')
+    finally:
+        close_db(conn)
+
+
+def get_migration_names() -> tuple[str, ...]:
+    return tuple(sorted(path.splitext(filename)[0] for filename in listdir(MIGRATIONS_DIR)
+                        if filename.endswith('.sql')))
 
-    # sql scripts to run before running the application
-    sql_filenames: tuple = (
-        'create_db',
-        'indexes',
-        'func_transaction_number',
-        'func_auto_count_users_of_group',
-        'update_group_uuid_after_transaction'
-    )
 
+def apply_migrations() -> None:
+    """
+    Updating the schema of an existing database without losing data.
+    Scripts from the sql/migrations directory are executed in the order of their names,
+    each in its own transaction, and only once (the names of the applied scripts are stored in the database).
+    """
+    conn = connect_db()
     try:
         with conn.cursor() as cur:
-            for filename in sql_filenames:
-                with open(path.join(path.dirname(__file__), f'sql/{filename}.sql'), 'r', encoding='utf-8') as sql_file:
+            cur.execute('CREATE TABLE IF NOT EXISTS "budget_graph"."schema_migrations" ('
+                        '"name" varchar(100) PRIMARY KEY, '
+                        '"applied_at" timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP)')
+            cur.execute('SELECT "name" FROM "budget_graph"."schema_migrations"')
+            applied: set[str] = {row[0] for row in cur.fetchall()}
+            conn.commit()
+
+            for name in get_migration_names():
+                if name in applied:
+                    continue
+                with open(path.join(MIGRATIONS_DIR, f'{name}.sql'), 'r', encoding='utf-8') as sql_file:
                     cur.execute(sql_file.read())
+                cur.execute('INSERT INTO "budget_graph"."schema_migrations" ("name") VALUES (%s)', (name,))
+                conn.commit()
+                print(f'Migration applied: {name}')
+    # pylint: disable=broad-exception-caught
+    except Exception as err:
+        conn.rollback()
+        print(f'Critical error when applying migrations: {err}')
+    finally:
+        close_db(conn)
+
+
+def get_table_definitions(cur, table: str) -> list[str]:
+    """
+    :return: CREATE statements of the indexes (except the primary key and BRIN_INDEX_NAME)
+    and of the triggers (except the internal ones of the foreign keys) of the table
+    """
+    cur.execute('SELECT pg_get_indexdef(i."indexrelid") FROM pg_index i JOIN pg_class c ON c."oid" = i."indexrelid" '
+                'WHERE i."indrelid" = %s::regclass AND NOT i."indisprimary" AND c."relname" <> %s ORDER BY c."relname"',
+                (table, BRIN_INDEX_NAME))
+    # the index of a partitioned table is shown "ON ONLY" (without the indexes of its partitions)
+    definitions: list[str] = [row[0].replace(' ON ONLY ', ' ON ', 1) for row in cur.fetchall()]
+    cur.execute('SELECT pg_get_triggerdef("oid") FROM pg_trigger '
+                'WHERE "tgrelid" = %s::regclass AND NOT "tgisinternal" ORDER BY "tgname"', (table,))
+    return definitions + [row[0] for row in cur.fetchall()]
+
+
+def partition_transactions(partitions: int, brin: bool = False) -> bool:
+    """
+    Recreates the records table "monetary_transactions" with hash partitions by "group_id"
+    (or as an ordinary table if partitions < 2) and moves the existing records into it.
+    The records of a group are in one partition, so the scans of a group and the inserts into it use
+    the indexes of one partition, which are several times smaller than the indexes of the whole table.
+    brin - an additional BRIN index ("group_id", "record_date") in each partition
+    (the records are moved in the order of the index, new records are mostly added with recent dates).
+    The triggers and indexes of the old table are read from the catalog and created again on the new table
+    (whatever script or migration added them), the views over the table are created again by their scripts.
+    Everything is done in one transaction, the table is locked until the end:
+    the sums of "daily_balances" and "monthly_user_totals" do not change, since the records are the same.
+    """
+    partitions = partitions if partitions > 1 else 0
+    conn = connect_db()
+    table = pg_sql.Identifier('budget_graph', 'monetary_transactions')
+    new_table = pg_sql.Identifier('budget_graph', 'monetary_transactions_new')
+    try:
+        with conn.cursor() as cur:
+            cur.execute(pg_sql.SQL('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE').format(table))
+            definitions: list[str] = get_table_definitions(cur, '"budget_graph"."monetary_transactions"')
+            cur.execute(pg_sql.SQL('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) {}').format(
+                new_table, table, pg_sql.SQL('PARTITION BY HASH ("group_id")' if partitions else '')
+            ))
+            for remainder in range(partitions):
+                cur.execute(pg_sql.SQL('CREATE TABLE {} PARTITION OF {} FOR VALUES WITH (MODULUS {}, REMAINDER {})')
+                            .format(pg_sql.Identifier('budget_graph', f'monetary_transactions_new_p{remainder}'),
+                                    new_table, pg_sql.Literal(partitions), pg_sql.Literal(remainder)))
+            cur.execute(pg_sql.SQL('INSERT INTO {} SELECT * FROM {} ORDER BY "group_id", "record_date"')
+                        .format(new_table, table))
+            moved: int = cur.rowcount
+
+            # the old table is deleted together with its partitions, indexes and triggers
+            # (the view of both tiers depends on it and is created again by TRANSACTIONS_VIEW_SCRIPTS)
+            cur.execute('DROP VIEW IF EXISTS "budget_graph"."all_transactions"')
+            cur.execute(pg_sql.SQL('DROP TABLE {}').format(table))
+            cur.execute(pg_sql.SQL('ALTER TABLE {} RENAME TO "monetary_transactions"').format(new_table))
+            for remainder in range(partitions):
+                cur.execute(pg_sql.SQL('ALTER TABLE {} RENAME TO {}').format(
+                    pg_sql.Identifier('budget_graph', f'monetary_transactions_new_p{remainder}'),
+                    pg_sql.Identifier(f'monetary_transactions_p{remainder}')
+                ))
+            cur.execute(pg_sql.SQL('ALTER TABLE {} ADD PRIMARY KEY ("group_id", "transaction_id")').format(table))
+            for definition in definitions:
+                cur.execute(definition)
+            for filename in TRANSACTIONS_VIEW_SCRIPTS:
+                cur.execute(read_sql_script(filename))
+            if brin:
+                cur.execute(pg_sql.SQL('CREATE INDEX {} ON {} USING brin ("group_id", "record_date")')
+                            .format(pg_sql.Identifier(BRIN_INDEX_NAME), table))
+            cur.execute(pg_sql.SQL('ANALYZE {}').format(table))
             conn.commit()
+            print(f'Records moved: {moved}, partitions: {partitions}')
+            return True
     # pylint: disable=broad-exception-caught
     except Exception as err:
-        print(f'Critical error when creating tables in the database: {err}')
+        conn.rollback()
+        print(f'Critical error when partitioning the records table: {err}')
+        return False
     finally:
         close_db(conn)
 
 
 if __name__ == '__main__':
     create_directories()
-    drop_tables_in_db()
-    create_tables_in_db()
+    if argv[1:] == ['migrate']:  # python build_project.py migrate
+        apply_migrations()
+    elif argv[1:2] == ['partition']:  # python build_project.py partition <number of partitions> [brin]
+        partition_transactions(int(argv[2]), argv[3:] == ['brin'])
+    else:
+        drop_tables_in_db()
+        create_tables_in_db()
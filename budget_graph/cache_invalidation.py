@@ -0,0 +1,170 @@
+"""
+Cross-process invalidation of the caches by PostgreSQL LISTEN/NOTIFY.
+
+The triggers of cache_invalidation_triggers.sql send a notification to CHANNEL when the data of users, languages,
+groups or memberships changes: "<kind>:<key>,<key>,...", for example "language:123456789".
+The listener of each process (a bot instance, the web application) receives the notifications of the committed
+changes made by any process and calls the handlers subscribed to this kind with the changed keys,
+so the caches can be large and long-lived: a changed entry is evicted everywhere within milliseconds.
+
+The listener uses its own connection (not from the pool), which waits for the notifications.
+The notifications sent while the listener is disconnected are lost, therefore after each (re)connection
+the handlers are called with None - all the entries of the process must be evicted (also after a disconnection).
+A silent connection (a half-open socket after a failover or a NAT timeout) is detected by the TCP keepalives
+and by "SELECT 1" after each LISTEN_TIMEOUT without notifications, so it is closed and connected again.
+While the listener is connected, InvalidationHandlers.is_listening() is True: the caches can trust their entries
+without checking them in the database for a short time (see household_view.py).
+"""
+from select import select
+from threading import Event, Lock, Thread
+from collections.abc import Callable
+from psycopg2 import connect, DatabaseError
+
+from budget_graph.logger import setup_logger
+
+logger_invalidation = setup_logger("logs/CacheInvalidationLog.log", "cache_invalidation_logger")
+
+CHANNEL: str = 'budget_graph_cache'
+LISTEN_TIMEOUT: float = 5.0  # seconds of waiting for the notifications, then the stop of the listener is checked
+LISTENER_APPLICATION_NAME: str = 'budget_graph_cache_listener'
+RECONNECT_INTERVAL: float = 5.0  # seconds between the attempts to connect to the database
+# libpq parameters of the connection of the listener: a dead connection is closed within about a minute
+KEEPALIVE_PARAMETERS: dict[str, int] = {
+    'keepalives': 1,
+    'keepalives_idle': 30,  # seconds without the traffic before the first keepalive
+    'keepalives_interval': 10,  # seconds between the keepalives without an answer
+    'keepalives_count': 3,  # keepalives without an answer, then the connection is closed
+    'tcp_user_timeout': 60_000  # milliseconds of the sent data without an acknowledgment (the ping)
+}
+
+# handler(keys): keys - the changed keys | None (all the entries must be evicted)
+InvalidationHandler = Callable[[tuple[int, ...] | None], None]
+
+
+class InvalidationHandlers:
+    """ Handlers of the notifications of the process by the kind of the data (user, language, group) """
+    __handlers: dict[str, list[InvalidationHandler]] = {}
+    __lock = Lock()
+    __listening: bool = False
+
+    @staticmethod
+    def subscribe(kind: str, handler: InvalidationHandler) -> None:
+        with InvalidationHandlers.__lock:
+            InvalidationHandlers.__handlers.setdefault(kind, []).append(handler)
+
+    @staticmethod
+    def get_kinds() -> tuple[str, ...]:
+        return tuple(InvalidationHandlers.__handlers)
+
+    @staticmethod
+    def dispatch(payload: str) -> int:
+        """
+        Calls the handlers of the notification
+        :param payload: "<kind>:<key>,<key>,..."
+        :return: number of the called handlers
+        """
+        kind, _, keys = payload.partition(':')
+        try:
+            parsed_keys: tuple[int, ...] = tuple(int(key) for key in keys.split(','))
+        except ValueError:
+            logger_invalidation.error(f'[INVALIDATION] Invalid notification: {payload[:100]}')
+            return 0
+        handlers: list[InvalidationHandler] = InvalidationHandlers.__handlers.get(kind, [])
+        for handler in handlers:
+            InvalidationHandlers.__call(handler, parsed_keys)
+        return len(handlers)
+
+    @staticmethod
+    def set_listening(listening: bool) -> None:
+        InvalidationHandlers.__listening = listening
+
+    @staticmethod
+    def is_listening() -> bool:
+        """ :return: True if the changes made by any process are delivered to the handlers """
+        return InvalidationHandlers.__listening
+
+    @staticmethod
+    def evict_all() -> None:
+        """ Calls all the handlers with None (the notifications could have been lost) """
+        for handlers in tuple(InvalidationHandlers.__handlers.values()):
+            for handler in handlers:
+                InvalidationHandlers.__call(handler, None)
+
+    @staticmethod
+    def __call(handler: InvalidationHandler, keys: tuple[int, ...] | None) -> None:
+        """
+        The error of a handler does not stop the other handlers and the listener
+        (the entries of its cache expire by their TTL)
+        """
+        try:
+            handler(keys)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger_invalidation.error(f'[INVALIDATION] Handler {getattr(handler, "__qualname__", handler)} '
+                                      f'failed: {repr(err)}')
+
+
+class CacheInvalidationListener:
+    """
+    Thread that listens to CHANNEL and dispatches the notifications (daemon, it does not delay the exit)
+    dsn - the primary database: the notifications are not sent by a replica
+    """
+    __slots__ = ('__dsn', '__timeout', '__stopped', '__thread', '__connected')
+
+    def __init__(self, dsn: str, timeout: float = LISTEN_TIMEOUT):
+        self.__dsn: str = dsn
+        self.__timeout: float = timeout
+        self.__stopped: Event = Event()
+        self.__connected: Event = Event()
+        self.__thread: Thread = Thread(target=self.__run, name='cache_invalidation', daemon=True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """ The thread is finished within the timeout of the listener """
+        self.__stopped.set()
+        self.__thread.join(self.__timeout + 1)
+
+    def wait_connected(self, timeout: float) -> bool:
+        """ :return: True if the listener is listening to the channel """
+        # telebot.util replaces "wait" of its own Event instance, so pylint takes Event.wait for a function
+        # without arguments when bot.py is checked in the same run
+        return self.__connected.wait(timeout=timeout)  # pylint: disable=unexpected-keyword-arg
+
+    def __run(self) -> None:
+        while not self.__stopped.is_set():
+            try:
+                self.__listen()
+            except (DatabaseError, OSError) as err:
+                logger_invalidation.error(f'[INVALIDATION] Listener disconnected: {str(err)}, '
+                                          f'the next attempt in {RECONNECT_INTERVAL} s')
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger_invalidation.error(f'[INVALIDATION] Listener failed: {repr(err)}, '
+                                          f'the next attempt in {RECONNECT_INTERVAL} s')
+            finally:
+                # the notifications are not received anymore: the caches cannot trust their entries
+                InvalidationHandlers.set_listening(False)
+                self.__connected.clear()
+                InvalidationHandlers.evict_all()
+            self.__stopped.wait(timeout=RECONNECT_INTERVAL)  # pylint: disable=unexpected-keyword-arg
+
+    def __listen(self) -> None:
+        conn = connect(self.__dsn, application_name=LISTENER_APPLICATION_NAME, **KEEPALIVE_PARAMETERS)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN {CHANNEL}')
+            InvalidationHandlers.evict_all()
+            InvalidationHandlers.set_listening(True)
+            self.__connected.set()
+            logger_invalidation.info(f'[INVALIDATION] Listening to {CHANNEL}: {InvalidationHandlers.get_kinds()}')
+            while not self.__stopped.is_set():
+                if select([conn], [], [], self.__timeout)[0]:
+                    conn.poll()
+                else:  # the notifications of a dead connection would be lost silently
+                    with conn.cursor() as cur:
+                        cur.execute('SELECT 1')
+                while conn.notifies:
+                    InvalidationHandlers.dispatch(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
@@ -0,0 +1,295 @@
+"""
+Pool of PostgreSQL connections shared by the bot, the web application and validators.
+
+Opening a new connection costs a TCP handshake and authentication on every request,
+so connections are opened once and then handed out again and again.
+
+Checkout rules:
+1. The most recently returned connection is handed out first (LIFO),
+   so rarely used connections stay at the bottom of the stack and are closed by the idle timeout.
+2. A connection that has been idle for longer than health_check_interval is checked with "SELECT 1".
+3. A connection older than max_lifetime is closed instead of being reused.
+4. If all max_size connections are busy, the caller waits no longer than wait_timeout and gets PoolTimeoutError.
+"""
+from time import monotonic
+from threading import Condition
+from psycopg2 import connect, DatabaseError, InterfaceError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from budget_graph.logger import setup_logger
+
+logger_pool = setup_logger('logs/PoolLog.log', 'pool_logger')
+
+
+class PoolError(Exception):
+    """ Base class for connection pool errors """
+
+
+class PoolTimeoutError(PoolError):
+    """ No connection was released during wait_timeout """
+
+
+class PoolClosedError(PoolError):
+    """ The pool has already been closed """
+
+
+class _PooledConnection:
+    """ Connection with the service information required by the pool """
+    __slots__ = ('connection', 'created_at', 'last_used_at')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at: float = monotonic()
+        self.last_used_at: float = self.created_at
+
+
+# pylint: disable=too-many-instance-attributes
+class ConnectionPool:
+    """
+    Thread-safe connection pool.
+
+    :param dsn: connection string
+    :param min_size: number of idle connections that are never closed by the idle timeout
+    :param max_size: maximum number of open connections (idle + in use)
+    :param idle_timeout: (seconds) idle connections above min_size are closed after this time
+    :param max_lifetime: (seconds) connections are recreated after this time
+    :param wait_timeout: (seconds) how long to wait for a free connection before failing
+    :param health_check_interval: (seconds) connections idle for longer are checked before being handed out
+    :param connection_factory: function that opens a new connection (psycopg2.connect by default)
+    """
+    __slots__ = ('__dsn', '__min_size', '__max_size', '__idle_timeout', '__max_lifetime', '__wait_timeout',
+                 '__health_check_interval', '__connection_factory', '__condition', '__idle', '__in_use',
+                 '__size', '__closed', '__stats')
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, dsn: str, *,
+                 min_size: int = 1,
+                 max_size: int = 10,
+                 idle_timeout: float = 300.0,
+                 max_lifetime: float = 3600.0,
+                 wait_timeout: float = 5.0,
+                 health_check_interval: float = 30.0,
+                 connection_factory=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f'Invalid pool size: min_size={min_size}, max_size={max_size}')
+        self.__dsn: str = dsn
+        self.__min_size: int = min_size
+        self.__max_size: int = max_size
+        self.__idle_timeout: float = idle_timeout
+        self.__max_lifetime: float = max_lifetime
+        self.__wait_timeout: float = wait_timeout
+        self.__health_check_interval: float = health_check_interval
+        self.__connection_factory = connection_factory or connect
+        self.__condition = Condition()
+        self.__idle: list[_PooledConnection] = []  # stack: the last element is the most recently returned
+        self.__in_use: dict[int, _PooledConnection] = {}  # id(connection) -> connection
+        self.__size: int = 0  # idle + in use + being opened right now
+        self.__closed: bool = False
+        self.__stats: dict[str, int | float] = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'failed_health_checks': 0,
+            'checkout_time_total': 0.0,  # seconds
+            'checkout_time_max': 0.0,  # seconds
+        }
+
+    def getconn(self):
+        """
+        Returns a ready-to-use connection.
+        The connection must be returned to the pool via putconn()
+
+        :raises PoolTimeoutError: if all connections are busy during wait_timeout
+        :raises PoolClosedError: if the pool has been closed
+        :raises DatabaseError: if a new connection could not be opened
+        """
+        start: float = monotonic()
+        deadline: float = start + self.__wait_timeout
+        while True:
+            record, to_close = self.__reserve(deadline)
+            self.__close_connections(to_close)
+
+            if record is None:  # the pool has a free slot - open a new connection
+                record = self.__open_connection()
+            elif not self.__check_connection(record):
+                self.__release_slot(record)
+                continue
+
+            with self.__condition:
+                self.__in_use[id(record.connection)] = record
+                checkout_time: float = monotonic() - start
+                self.__stats['checkouts'] += 1
+                self.__stats['checkout_time_total'] += checkout_time
+                self.__stats['checkout_time_max'] = max(self.__stats['checkout_time_max'], checkout_time)
+            return record.connection
+
+    def putconn(self, connection, discard: bool = False) -> None:
+        """
+        Returns the connection to the pool.
+        An unfinished transaction is rolled back; a broken or outdated connection is closed.
+        """
+        with self.__condition:
+            record: _PooledConnection | None = self.__in_use.pop(id(connection), None)
+        if record is None:
+            logger_pool.warning('[POOL] Attempt to return a connection that does not belong to the pool')
+            self.__close_connections([connection])
+            return
+
+        if not discard and not connection.closed and connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except (DatabaseError, InterfaceError) as err:
+                logger_pool.warning(f'[POOL] Rollback failed, the connection will be closed: {err}')
+                discard = True
+
+        now: float = monotonic()
+        if discard or connection.closed or now - record.created_at > self.__max_lifetime:
+            self.__release_slot(record)
+            return
+
+        with self.__condition:
+            if self.__closed:
+                self.__size -= 1
+                to_close: list = [connection]
+            else:
+                record.last_used_at = now
+                self.__idle.append(record)
+                to_close: list = []
+            self.__condition.notify()
+        self.__close_connections(to_close)
+
+    def closeall(self) -> None:
+        """ Closes idle connections; connections in use are closed when they are returned """
+        with self.__condition:
+            self.__closed = True
+            to_close: list = [record.connection for record in self.__idle]
+            self.__size -= len(self.__idle)
+            self.__idle.clear()
+            self.__condition.notify_all()
+        self.__close_connections(to_close)
+        logger_pool.info('[POOL] Connection pool closed')
+
+    def get_stats(self) -> dict[str, int | float]:
+        """
+        Pool size and checkout latency statistics.
+        Time values are given in milliseconds.
+        """
+        with self.__condition:
+            checkouts: int = self.__stats['checkouts']
+            return {
+                'size': self.__size,
+                'idle': len(self.__idle),
+                'in_use': len(self.__in_use),
+                'min_size': self.__min_size,
+                'max_size': self.__max_size,
+                'checkouts': checkouts,
+                'waits': self.__stats['waits'],
+                'timeouts': self.__stats['timeouts'],
+                'connections_opened': self.__stats['connections_opened'],
+                'connections_closed': self.__stats['connections_closed'],
+                'failed_health_checks': self.__stats['failed_health_checks'],
+                'checkout_avg_ms': round(self.__stats['checkout_time_total'] / checkouts * 1000, 3) if checkouts else 0,
+                'checkout_max_ms': round(self.__stats['checkout_time_max'] * 1000, 3),
+            }
+
+    def __reserve(self, deadline: float) -> tuple[_PooledConnection | None, list]:
+        """
+        Takes an idle connection from the stack or reserves a slot for a new one (then the record is None).
+        Also returns the list of outdated connections that must be closed outside the lock.
+        """
+        waited: bool = False
+        with self.__condition:
+            while True:
+                if self.__closed:
+                    raise PoolClosedError('Connection pool is closed')
+                to_close: list = self.__prune_idle(monotonic())
+                if self.__idle:
+                    return self.__idle.pop(), to_close
+                if self.__size < self.__max_size:
+                    self.__size += 1
+                    return None, to_close
+                remaining: float = deadline - monotonic()
+                if remaining <= 0:
+                    self.__stats['timeouts'] += 1
+                    logger_pool.error(f'[POOL] No free connection within {self.__wait_timeout} s. '
+                                      f'size: {self.__size}, in use: {len(self.__in_use)}')
+                    raise PoolTimeoutError(f'No free connection in the pool within {self.__wait_timeout} s')
+                if not waited:
+                    self.__stats['waits'] += 1
+                    waited = True
+                self.__condition.wait(remaining)
+
+    def __prune_idle(self, now: float) -> list:
+        """
+        Removes from the stack connections whose lifetime has expired
+        and connections (above min_size) that have been idle for too long.
+        It is called under the lock.
+        """
+        to_close: list = []
+        keep: list[_PooledConnection] = []
+        remaining: int = len(self.__idle)
+        # the bottom of the stack contains the connections that have been idle the longest
+        for record in self.__idle:
+            expired: bool = now - record.created_at > self.__max_lifetime
+            idle_too_long: bool = now - record.last_used_at > self.__idle_timeout and remaining > self.__min_size
+            if expired or idle_too_long or record.connection.closed:
+                to_close.append(record.connection)
+                remaining -= 1
+            else:
+                keep.append(record)
+        if to_close:
+            self.__idle = keep
+            self.__size -= len(to_close)
+            logger_pool.info(f'[POOL] Closing {len(to_close)} outdated connection(s)')
+        return to_close
+
+    def __open_connection(self) -> _PooledConnection:
+        try:
+            connection = self.__connection_factory(self.__dsn)
+        except BaseException:
+            with self.__condition:
+                self.__size -= 1
+                self.__condition.notify()
+            raise
+        with self.__condition:
+            self.__stats['connections_opened'] += 1
+        logger_pool.debug('[POOL] New connection opened')
+        return _PooledConnection(connection)
+
+    def __check_connection(self, record: _PooledConnection) -> bool:
+        """ Health check before handing the connection out """
+        connection = record.connection
+        if connection.closed:
+            return False
+        if monotonic() - record.last_used_at < self.__health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cur:
+                cur.execute('SELECT 1')
+            connection.rollback()
+            return True
+        except (DatabaseError, InterfaceError) as err:
+            with self.__condition:
+                self.__stats['failed_health_checks'] += 1
+            logger_pool.warning(f'[POOL] Health check failed, the connection will be replaced: {err}')
+            return False
+
+    def __release_slot(self, record: _PooledConnection) -> None:
+        """ Closes the connection and frees its place in the pool """
+        with self.__condition:
+            self.__size -= 1
+            self.__condition.notify()
+        self.__close_connections([record.connection])
+
+    def __close_connections(self, connections: list) -> None:
+        for connection in connections:
+            try:
+                if not connection.closed:
+                    connection.close()
+            except (DatabaseError, InterfaceError) as err:
+                logger_pool.warning(f'[POOL] Error closing connection: {err}')
+        if connections:
+            with self.__condition:
+                self.__stats['connections_closed'] += len(connections)
@@ -1,4 +1,8 @@
-from os import path as os_path, remove, listdir
+from os import path as os_path, remove, replace, listdir
+from time import time
+from io import RawIOBase, BufferedWriter, TextIOWrapper
+from typing import BinaryIO
+from collections.abc import Iterable, Callable
 from csv import writer as csv_writer, QUOTE_MINIMAL
 from hashlib import sha256
 
@@ -7,22 +11,57 @@ from budget_graph.dictionary import receive_translation
 
 logger_csv_builder = setup_logger("logs/CsvLog.log", "csv_builder_logger")
 
+WRITE_BUFFER_SIZE: int = 64 * 1024  # bytes, the data is hashed and written to the file in blocks of this size
+# seconds, a temporary file that has not been changed for this time has been left by a stopped process
+STALE_TEMP_FILE_AGE: int = 3600
+
+
+class HashingFileWriter(RawIOBase):
+    """
+    Binary file wrapper: SHA-256 and the size of the data are calculated while it is being written,
+    so the finished file does not need to be read again
+    """
+    def __init__(self, file: BinaryIO):
+        super().__init__()
+        self.__file: BinaryIO = file
+        self.sha256 = sha256()
+        self.size: int = 0  # bytes
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.__file.write(data)
+        self.sha256.update(data)
+        data_size: int = memoryview(data).nbytes
+        self.size += data_size
+        return data_size
+
 
 class CsvFileWithTable:
     """
     Class for working with *.csv files: creating, updating, obtaining the file hash, file size and validating user data
+
+    table_data can be any iterable (for example, a generator of rows from the database):
+    rows are written to the file as they are received and are not stored in memory
+
+    The file size and checksum are calculated in the same pass in which the file is written
     """
-    __slots__ = ('file_path', 'table_data', 'table_headers', 'language')
+    __slots__ = ('file_path', 'table_data', 'table_headers', 'language', 'rows_number', 'file_size', 'file_checksum')
 
     def __init__(self, file_path: str,
-                 table_data: tuple[[tuple, ...], ...],
+                 table_data: Iterable[tuple],
                  table_headers: tuple[str, ...] =
                  ('ID', 'USERNAME', 'TRANSFER', 'TOTAL', 'DATE', 'CATEGORY', 'DESCRIPTION'),
                  lang: str = 'en'):
         self.file_path: str = file_path
-        self.table_data: tuple[tuple, ...] = table_data
+        self.table_data: Iterable[tuple] = table_data
         self.table_headers: tuple[str, ...] = table_headers
         self.language: str = lang
+        self.rows_number: int = 0  # number of rows written to the file (without headers)
+        # known after the file has been created by this object, otherwise they are calculated from the file
+        self.file_size: int | None = None  # bytes
+        self.file_checksum: str | None = None
 
     actual_csv_files: dict = {}
 
@@ -30,6 +69,22 @@ class CsvFileWithTable:
         """
         The function is responsible for creating *.csv file
         """
+        self.__translate_headers()
+        # data validation to fill the table
+        self.validate_incoming_data()
+        self.__write_file(self.__write_rows)
+
+    def create_csv_file_by_copy(self, copy_data: Callable[[BinaryIO, tuple[str, ...]], int]):
+        """
+        Creates *.csv file from the data already formatted as CSV (table_data is not used):
+        copy_data(file, table_headers) writes the headers and rows to the binary file and returns the number of rows
+        (for example, DatabaseQueries.copy_group_transactions_to_csv with the group id)
+        """
+        self.__translate_headers()
+        self.validate_incoming_data()
+        self.__write_file(lambda file: copy_data(file, self.table_headers))
+
+    def __translate_headers(self):
         # translate if it matches the standard set of headers
         if (self.table_headers == ('ID', 'USERNAME', 'TRANSFER', 'TOTAL', 'DATE', 'CATEGORY', 'DESCRIPTION')
                 and self.language != 'en'):
@@ -41,20 +96,49 @@ class CsvFileWithTable:
                                   receive_translation(self.language, 'CATEGORY'),
                                   receive_translation(self.language, 'DESCRIPTION'))
 
-        # data validation to fill the table
-        self.validate_incoming_data()
-        with open(self.file_path, 'w', newline='', encoding='utf-8') as csvfile:
-            filewriter = csv_writer(csvfile, quoting=QUOTE_MINIMAL)
+    def __write_file(self, write_data: Callable[[BinaryIO], int]):
+        """
+        write_data(file) writes the table to the binary file and returns the number of rows
+        """
+        # the file is written under a temporary name, so an interrupted export does not leave an incomplete file
+        temp_file_path: str = f'{self.file_path}.tmp'
+        self.rows_number = 0
+        self.file_size = self.file_checksum = None
+        try:
+            with open(temp_file_path, 'wb', buffering=0) as raw_file:
+                hashing_file = HashingFileWriter(raw_file)
+                with BufferedWriter(hashing_file, buffer_size=WRITE_BUFFER_SIZE) as csv_file:
+                    self.rows_number = write_data(csv_file)
+            replace(temp_file_path, self.file_path)
+        finally:
+            if os_path.isfile(temp_file_path):
+                remove(temp_file_path)
+        self.file_size = hashing_file.size
+        self.file_checksum = hashing_file.sha256.hexdigest()
+
+    def __write_rows(self, csv_file: BinaryIO) -> int:
+        text_file = TextIOWrapper(csv_file, newline='', encoding='utf-8')
+        try:
+            filewriter = csv_writer(text_file, quoting=QUOTE_MINIMAL)
             filewriter.writerow(self.table_headers)
             for _data_row in self.table_data:
+                # the length of each nested tuple is equal to the number of columns in the table
+                if len(_data_row) != len(self.table_headers):
+                    raise ValueError('Data tuples have different lengths and/or their lengths do not match '
+                                     'the headers')
                 filewriter.writerow(_data_row)
+                self.rows_number += 1
+        finally:
+            # the binary file is closed by __write_file
+            text_file.detach()
+        return self.rows_number
 
     def get_file_size_kb(self) -> float:
         """
         Returns the file size in kilobytes (float), if an error occurs, return value 0 (int)
         """
         try:
-            file_size: int = os_path.getsize(self.file_path)
+            file_size: int = self.file_size if self.file_size is not None else os_path.getsize(self.file_path)
             kb_size: float = file_size / 1024
         except (FileNotFoundError, ZeroDivisionError) as err:
             logger_csv_builder.warning(f'Error calculating CSV file size: {err}')
@@ -63,6 +147,8 @@ class CsvFileWithTable:
         return kb_size
 
     def get_file_checksum(self) -> str:
+        if self.file_checksum is not None:
+            return self.file_checksum
         hash_sha256 = sha256()
         try:
             with open(self.file_path, 'rb') as csv_file:
@@ -81,24 +167,31 @@ class CsvFileWithTable:
         path_to_directory: str = '/'.join(path_lst)
         if not os_path.exists(path_to_directory):
             raise FileNotFoundError('The path specified to save the CSV file is incorrect')
-        # table_data is never empty when calling a function
         if not self.table_headers or not all(bool(header) for header in self.table_headers):
             raise ValueError('Table headers values cannot be empty')
-        # the length of each nested tuple is equal to the number of columns in the table
-        if not all(len(self.table_headers) == len(_row) for _row in self.table_data):
-            raise ValueError('Data tuples have different lengths and/or their lengths do not match the headers')
+        # the length of the rows is checked when they are written (the data can be read only once)
 
     @staticmethod
-    def delete_unused_csv_files():
-        actual_files = tuple(
-            f'{group_id}_{group_uuid}.csv' for group_id, group_uuid in CsvFileWithTable.actual_csv_files.items()
+    def delete_unused_csv_files(csv_directory: str | None = None):
+        """
+        :param csv_directory: directory of the files (None - csv_tables of the package)
+        """
+        # a group can have several actual files - one for each language of the headers
+        actual_files_prefixes = tuple(
+            f'{group_id}_{group_uuid}_' for group_id, group_uuid in CsvFileWithTable.actual_csv_files.items()
         )
-        csv_directory: str = os_path.join(os_path.dirname(__file__), 'csv_tables')
+        csv_directory = csv_directory or os_path.join(os_path.dirname(__file__), 'csv_tables')
+        stale_time: float = time() - STALE_TEMP_FILE_AGE
         csv_files_to_delete = tuple(
-            file_name for file_name in listdir(csv_directory) if file_name not in actual_files
+            file_name for file_name in listdir(csv_directory)
+            # *.tmp - the file is being created right now (it is removed by create_csv_file in case of an error),
+            # unless it has not been changed for a long time: the process that was writing it has been stopped
+            if not file_name.startswith(actual_files_prefixes) and (
+                not file_name.endswith('.tmp') or CsvFileWithTable.__get_mtime(csv_directory, file_name) < stale_time
+            )
         )
         for csv_filename in csv_files_to_delete:
-            path: str = f'csv_tables/{csv_filename}'
+            path: str = os_path.join(csv_directory, csv_filename)
             try:
                 remove(path)
             except (FileNotFoundError, PermissionError) as err:
@@ -107,11 +200,20 @@ class CsvFileWithTable:
                 logger_csv_builder.info(f'The useless csv has been removed. Path: {path};')
 
     @staticmethod
-    def check_csv_is_actual(group_id: int, group_uuid: str) -> bool:
+    def __get_mtime(csv_directory: str, file_name: str) -> float:
+        """ :return: time of the last change of the file | infinity (the file has just been renamed or removed) """
+        try:
+            return os_path.getmtime(os_path.join(csv_directory, file_name))
+        except OSError:
+            return float('inf')
+
+    @staticmethod
+    def check_csv_is_actual(group_id: int, group_uuid: str, language: str = 'en') -> bool:
         """
-        Checks for the presence of an up-to-date file, if there is one, returns True, otherwise False
+        Checks for the presence of an up-to-date file (with headers in the language), if there is one, returns True,
+        otherwise False
         If this group already has such a file, but its uuid is not up-to-date, then deletes it
         """
-        if os_path.isfile(f'csv_tables/{group_id}_{group_uuid}.csv'):
+        if os_path.isfile(f'csv_tables/{group_id}_{group_uuid}_{language}.csv'):
             return True
         return False
@@ -1,13 +1,30 @@
-from datetime import datetime
-from os import getenv, path
+# pylint: disable=too-many-lines
+from datetime import datetime, date, timedelta
+from io import StringIO
+from csv import writer as csv_writer
+from os import getenv
 from functools import wraps
+from threading import Lock
+from typing import BinaryIO
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
 from flask import g
 from dotenv import load_dotenv
-from psycopg2 import connect, DatabaseError
+from psycopg2 import connect, DatabaseError, sql as pg_sql
 
 from budget_graph.logger import setup_logger
 from budget_graph.time_checking import timeit
+from budget_graph.global_config import GlobalConfig
 from budget_graph.encryption import get_token, logging_hash
+from budget_graph.connection_pool import ConnectionPool, PoolError
+from budget_graph.sql_registry import SqlRegistry, PreparedStatementsConnection
+from budget_graph.query_metrics import query_metrics, measure_query, measure_pool_wait
+from budget_graph.replica_routing import read_your_writes
+from budget_graph.user_context import UserContext, feature_ids
+from budget_graph.group_profile import GroupProfile, GroupProfileCache
+from budget_graph.household_view import HouseholdViewCache
+from budget_graph.user_cache_structure import UnregisteredUserCache, UserContextCache, get_cached_user_context
+from budget_graph.last_login_buffer import LastLoginBuffer
 
 load_dotenv()  # Load environment variables from .env file
 db_host = getenv('POSTGRES_HOST')
@@ -15,23 +32,50 @@ db_port = getenv('POSTGRES_PORT')
 db_name = getenv('POSTGRES_NAME')
 db_user = getenv('POSTGRES_USERNAME')
 db_psw = getenv('POSTGRES_PASSWORD')
+# optional streaming replica of the same database (see replica_routing.py)
+db_replica_host = getenv('POSTGRES_REPLICA_HOST')
+db_replica_port = getenv('POSTGRES_REPLICA_PORT') or db_port
 
 DSN = f'dbname={db_name} user={db_user} password={db_psw} host={db_host} port={db_port}'
+REPLICA_DSN = f'dbname={db_name} user={db_user} password={db_psw} host={db_replica_host} port={db_replica_port}' \
+    if db_replica_host else None
 
 logger_database = setup_logger('logs/DatabaseLog.log', 'db_logger')
 
-feature_ids: dict[str, int] = {
-    'del_msg_after_transaction': 1,
-    'skip_input_date': 2,
-    'skip_input_category': 3,
-    'skip_input_description': 4,
-}
+# all queries are read from budget_graph/sql once, when the module is imported
+sql_registry = SqlRegistry()
+
+def get_plot_period_bounds(start_date: date | str | None, end_date: date | str | None) -> dict[str, date]:
+    """
+    Splits the period (both ends are included, each of them is optional) into the ranges of the diagram queries,
+    the ends of the ranges are not included:
+    months - the fully selected months (monthly sums), head and tail - the dates before and after them (records)
+    :param start_date: date or DD/MM/YYYY
+    :param end_date: date or DD/MM/YYYY
+    """
+    if isinstance(start_date, str):
+        start_date = datetime.strptime(start_date, '%d/%m/%Y').date()
+    if isinstance(end_date, str):
+        end_date = datetime.strptime(end_date, '%d/%m/%Y').date()
+    first_date: date = start_date or date.min
+    next_date: date = end_date + timedelta(days=1) if end_date else date.max
+    months_start: date = first_date if first_date.day == 1 else \
+        (first_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+    months_end: date = next_date.replace(day=1) if end_date else date.max
+    return {
+        'months_start': months_start,
+        'months_end': months_end,
+        'head_start': first_date,
+        'head_end': min(months_start, next_date),
+        'tail_start': max(months_end, months_start),
+        'tail_end': next_date if end_date else months_end
+    }
 
 
 @timeit
 def connect_db():
     try:
-        conn = connect(DSN)
+        conn = connect(DSN, connection_factory=PreparedStatementsConnection)
     except (DatabaseError, UnicodeDecodeError) as err:
         logger_database.critical(f'[DB_CONNECT] FAILED: connecting to database: {str(err)}')
         return None
@@ -46,10 +90,152 @@ def close_db(conn):
         logger_database.debug('[DB_CONNECT] SUCCESS: connection to database closed')
 
 
+def open_connection(dsn: str):
+    """ Opens a connection that can execute the prepared queries of the registry """
+    return connect(dsn, connection_factory=PreparedStatementsConnection)
+
+
+class DatabasePool:
+    """
+    Stores a single connection pool for the whole process (and one more for the replica, if it is configured).
+    The pool is created on the first request, so importing the module does not require a running database.
+    """
+    __pool: ConnectionPool | None = None
+    __replica_pool: ConnectionPool | None = None
+    __lock: Lock = Lock()
+
+    @staticmethod
+    def get_pool() -> ConnectionPool:
+        if DatabasePool.__pool is None:
+            with DatabasePool.__lock:
+                if DatabasePool.__pool is None:
+                    DatabasePool.__pool = DatabasePool.__create_pool(DSN)
+                    logger_database.info(f'[DB_POOL] Connection pool created: {DatabasePool.__pool.get_stats()}')
+        return DatabasePool.__pool
+
+    @staticmethod
+    def get_replica_pool() -> ConnectionPool | None:
+        """ :return: pool of the replica connections | None (the replica is not configured) """
+        if REPLICA_DSN is None:
+            return None
+        if DatabasePool.__replica_pool is None:
+            with DatabasePool.__lock:
+                if DatabasePool.__replica_pool is None:
+                    DatabasePool.__replica_pool = DatabasePool.__create_pool(REPLICA_DSN)
+                    logger_database.info(f'[DB_POOL] Replica connection pool created: '
+                                         f'{DatabasePool.__replica_pool.get_stats()}')
+        return DatabasePool.__replica_pool
+
+    @staticmethod
+    def __create_pool(dsn: str) -> ConnectionPool:
+        # settings that are not specified in the config keep the default values of the pool
+        pool_settings: dict = {
+            'min_size': GlobalConfig.db_pool_min_size,
+            'max_size': GlobalConfig.db_pool_max_size,
+            'idle_timeout': GlobalConfig.db_pool_idle_timeout,
+            'max_lifetime': GlobalConfig.db_pool_max_lifetime,
+            'wait_timeout': GlobalConfig.db_pool_wait_timeout,
+            'health_check_interval': GlobalConfig.db_pool_health_check_interval
+        }
+        return ConnectionPool(
+            dsn,
+            connection_factory=open_connection,
+            **{key: value for key, value in pool_settings.items() if value is not None}
+        )
+
+    @staticmethod
+    def get_stats(replica: bool = False) -> dict:
+        """ Pool size and checkout latency (empty dictionary if the pool has not been created yet) """
+        pool: ConnectionPool | None = DatabasePool.__replica_pool if replica else DatabasePool.__pool
+        return pool.get_stats() if pool is not None else {}
+
+    @staticmethod
+    def close() -> None:
+        with DatabasePool.__lock:
+            for pool in (DatabasePool.__pool, DatabasePool.__replica_pool):
+                if pool is not None:
+                    pool.closeall()
+            DatabasePool.__pool = None
+            DatabasePool.__replica_pool = None
+
+
+def get_pooled_connection(replica: bool = False):
+    """
+    :param replica: take a connection from the pool of the replica
+    :return: connection from the pool | None (if the pool is exhausted, the database is unavailable
+    or the replica is not configured)
+    """
+    pool: ConnectionPool | None = DatabasePool.get_replica_pool() if replica else DatabasePool.get_pool()
+    if pool is None:
+        return None
+    try:
+        with measure_pool_wait():
+            return pool.getconn()
+    except (PoolError, DatabaseError, UnicodeDecodeError) as err:
+        logger_database.critical(f'[DB_POOL] FAILED: getting a connection from the pool: {str(err)}')
+        return None
+
+
+def release_pooled_connection(conn, replica: bool = False) -> None:
+    if conn:
+        (DatabasePool.get_replica_pool() if replica else DatabasePool.get_pool()).putconn(conn)
+
+
+@contextmanager
+def pooled_connection(replica: bool = False):
+    """
+    Context manager: takes a connection from the pool and returns it after the block is executed.
+    If the connection could not be obtained, None is passed to the block
+    (DatabaseQueries methods handle this case and return default values,
+    without a replica connection all queries are executed on the primary server).
+    """
+    conn = get_pooled_connection(replica)
+    try:
+        yield conn
+    finally:
+        release_pooled_connection(conn, replica)
+
+
+class LazyPooledConnection:
+    """
+    Connection of the pool that is taken at the first use (get) and returned by release():
+    the functions that only write (or read only the keys written recently) do not take a replica connection
+    """
+    __slots__ = ('__replica', '__conn', '__taken')
+
+    def __init__(self, replica: bool = False):
+        self.__replica: bool = replica
+        self.__conn = None
+        self.__taken: bool = False
+
+    def get(self):
+        """ :return: connection from the pool | None (see get_pooled_connection), it is taken only once """
+        if not self.__taken:
+            self.__taken = True
+            self.__conn = get_pooled_connection(self.__replica)
+        return self.__conn
+
+    def release(self) -> None:
+        release_pooled_connection(self.__conn, self.__replica)
+        self.__conn = None
+        self.__taken = False
+
+
+@contextmanager
+def lazy_pooled_connection(replica: bool = False):
+    """ Context manager: LazyPooledConnection whose connection (if it has been taken) is returned after the block """
+    lazy_connection = LazyPooledConnection(replica)
+    try:
+        yield lazy_connection
+    finally:
+        lazy_connection.release()
+
+
 def connect_defer_close_db(func):
     """
-    This function is used as a decorator that creates a connection to the database,
-    passes a pointer and closes the connection after execution
+    This function is used as a decorator that takes a connection from the pool,
+    passes a pointer and returns the connection to the pool after execution
+    (the replica connection is taken only by the first query routed to the replica)
 
     :return: db_connection -> object of the DatabaseQueries class used to call the class functions
     """
@@ -57,45 +243,47 @@ def connect_defer_close_db(func):
     # pylint: disable=inconsistent-return-statements
     @wraps(func)
     def wrapper(*args, **kwargs):
-        connection = None
-        try:
-            res = DatabaseQueries(connect_db())
-            logger_database.debug("[DB_CONNECT][defer] SUCCESS: db query was processed using the 'defer' decorator")
-            return func(res, *args, **kwargs)
-        # pylint: disable=broad-exception-raised
-        except Exception as err:
-            # all the necessary event handlers are already contained inside the called functions
-            logger_database.debug(f'[DB_CONNECT][defer] FAILED: connecting to database: {str(err)}')
-        finally:
-            # logging is inside the function
-            close_db(connection)  # the 'if' condition is not required since it is inside the called function
+        with pooled_connection() as connection, lazy_pooled_connection(replica=True) as replica_connection:
+            try:
+                res = DatabaseQueries(connection, replica_connection)
+                logger_database.debug("[DB_CONNECT][defer] SUCCESS: db query was processed using the 'defer' decorator")
+                return func(res, *args, **kwargs)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                # all the necessary event handlers are already contained inside the called functions
+                logger_database.debug(f'[DB_CONNECT][defer] FAILED: connecting to database: {str(err)}')
     return wrapper
 
 
 def connect_db_flask_g():
     """
-    connect to a database using a Flask application object.
+    take a connection from the pool using a Flask application object.
     :return: connection
     """
     if not hasattr(g, 'link_db'):
-        g.link_db = connect_db()
+        g.link_db = get_pooled_connection()
     return g.link_db
 
 
+def connect_replica_db_flask_g():
+    """
+    take a replica connection from the pool using a Flask application object
+    (at the first query of the request routed to the replica).
+    :return: LazyPooledConnection
+    """
+    if not hasattr(g, 'link_replica_db'):
+        g.link_replica_db = LazyPooledConnection(replica=True)
+    return g.link_replica_db
+
+
 # pylint: disable=unused-argument
 def close_db_flask_g(error):  # DO NOT REMOVE the parameter  # noqa
     """
-    Closing a database connection using a Flask application object.
+    Returning database connections to the pools using a Flask application object.
     """
     if hasattr(g, 'link_db'):
-        g.link_db.close()
-
-
-def read_sql_file(request_name):
-    filename: str = path.join(path.dirname(__file__), f'sql/{request_name}.sql')
-    logger_database.info(f'[REQUEST *.SQL] File: {filename}')
-    with open(filename, 'r', encoding='utf-8') as sql_file:
-        return sql_file.read()
+        release_pooled_connection(g.pop('link_db'))
+    if hasattr(g, 'link_replica_db'):
+        g.pop('link_replica_db').release()
 
 
 # pylint: disable=too-many-public-methods
@@ -103,11 +291,28 @@ class DatabaseQueries:
     """
     The class is used to query the database.
     All details of the structure of functions are indicated in the comments to the first function
+
+    The read-only queries are executed on the replica connection (if it is passed),
+    except for the keys written during the read-your-writes window (see replica_routing.py).
+    The replica connection can be a LazyPooledConnection: it is taken from the pool by the first such query.
     """
-    __slots__ = ('__conn',)
+    __slots__ = ('__conn', '__replica_conn')
 
-    def __init__(self, connection):
+    def __init__(self, connection, replica_connection=None):
         self.__conn = connection
+        self.__replica_conn = replica_connection
+
+    def __read_connection(self, **keys):
+        """
+        :param keys: telegram_id, group_id or username read by the query
+        :return: replica connection | primary connection (there is no replica or the keys have been written recently)
+        """
+        if self.__replica_conn is None or read_your_writes.is_active(**keys):
+            return self.__conn
+        if isinstance(self.__replica_conn, LazyPooledConnection):
+            # the replica is not configured or its pool is exhausted
+            return self.__replica_conn.get() or self.__conn
+        return self.__replica_conn
 
     @timeit
     def get_username_by_telegram_id(self, telegram_id: int) -> str:
@@ -115,7 +320,7 @@ class DatabaseQueries:
         :return: username | empty string
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 # Connections can be used as context managers.
                 # Note that a context wraps a transaction:
                 # if the context exits with success the transaction is committed,
@@ -127,7 +332,7 @@ class DatabaseQueries:
                 with conn.cursor() as cur:
                     # Cursors can be used as context managers: leaving the context will close the cursor
                     # AttributeError occurs in this block if the database connection returned null
-                    cur.execute(read_sql_file('get_username_by_telegram_id'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'get_username_by_telegram_id', {'telegram_id': telegram_id})
                     return res[0] if (res := cur.fetchone()) else ''
 
         except (DatabaseError, TypeError) as err:
@@ -144,9 +349,9 @@ class DatabaseQueries:
         :return: telegram id | 0
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(username=username) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_telegram_id_by_username'), {'username': username})
+                    sql_registry.execute(cur, 'get_telegram_id_by_username', {'username': username})
                     return res[0] if (res := cur.fetchone()) else 0
 
         except (DatabaseError, TypeError) as err:
@@ -159,9 +364,9 @@ class DatabaseQueries:
         :return: group id | 0
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_id_by_token'), {'token': token})
+                    sql_registry.execute(cur, 'get_group_id_by_token', {'token': token})
                     return res[0] if (res := cur.fetchone()) else 0
 
         except (DatabaseError, TypeError) as err:
@@ -174,9 +379,9 @@ class DatabaseQueries:
         :return: group id | 0.
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_id_by_telegram_id'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'get_group_id_by_telegram_id', {'telegram_id': telegram_id})
                     return res[0] if (res := cur.fetchone()) else 0
 
         except (DatabaseError, TypeError) as err:
@@ -186,9 +391,9 @@ class DatabaseQueries:
 
     def get_group_id_token_by_username(self, username: str) -> tuple[str, int]:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(username=username) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_id_token_by_username'), {'username': username})
+                    sql_registry.execute(cur, 'get_group_id_token_by_username', {'username': username})
                     return res[0] if (res := cur.fetchall()) else ('', 0)
 
         except (DatabaseError, TypeError) as err:
@@ -201,9 +406,9 @@ class DatabaseQueries:
         :return: token | empty string
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_token_by_telegram_id'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'get_token_by_telegram_id', {'telegram_id': telegram_id})
                     return res[0] if (res := cur.fetchone()) else ''
 
         except (DatabaseError, TypeError) as err:
@@ -216,9 +421,9 @@ class DatabaseQueries:
         :return: salt | empty string (if this username is not in the database)
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(username=username) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_salt_by_username'), {'username': username})
+                    sql_registry.execute(cur, 'get_salt_by_username', {'username': username})
                     return res[0] if (res := cur.fetchone()) else ''
 
         except (DatabaseError, TypeError) as err:
@@ -231,9 +436,9 @@ class DatabaseQueries:
         Function to confirm user authorization using three parameters
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(username=username) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('auth_by_username'), {'username': username, 'psw_hash': psw_hash})
+                    sql_registry.execute(cur, 'auth_by_username', {'username': username, 'psw_hash': psw_hash})
                     return bool(cur.fetchone()[0])
 
         except (DatabaseError, TypeError) as err:
@@ -248,54 +453,19 @@ class DatabaseQueries:
         :param group_id:
         :param number_of_last_records: number of rows returned.
         :return: tuple of n elements | empty list
+
+        For the full history of the group use export_group_transactions (without a limit on the number of rows).
         """
         # add a restriction on overload protection
         # when requesting all data from the table
         number_of_last_records = 10_000 if number_of_last_records == 0 else number_of_last_records
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    # getting all records (max 10.000)
-                    if number_of_last_records == 0:
-                        # use ASC
-                        cur.execute("""SELECT
-                                         "transaction_id",
-                                         "username",
-                                         "transfer",
-                                         "total",
-                                         to_char("record_date", 'DD/MM/YYYY')::date record_date,
-                                         "category",
-                                         "description"
-                                       FROM
-                                         "budget_graph"."monetary_transactions"
-                                       WHERE
-                                         "group_id" = %s::smallint
-                                       ORDER BY
-                                         "record_date" ASC,
-                                         "transaction_id" ASC
-                                       LIMIT
-                                         %s::smallint""",
-                                    (group_id, number_of_last_records,))
-                    else:
-                        # use DESC to make it easier for the user to read
-                        cur.execute("""SELECT
-                                         "transaction_id",
-                                         "username",
-                                         "transfer",
-                                         "total",
-                                         "to_char"("record_date", 'DD/MM/YYYY')::date record_date,
-                                         "category",
-                                         "description"
-                                       FROM
-                                         "budget_graph"."monetary_transactions"
-                                       WHERE
-                                         "group_id" = %s::smallint
-                                       ORDER BY
-                                         "record_date" DESC,
-                                         "transaction_id" DESC
-                                       LIMIT
-                                         %s::smallint""",
-                                    (group_id, number_of_last_records,))
+                    sql_registry.execute(
+                        cur, 'select_data_for_household_table',
+                        {'group_id': group_id, 'limit': number_of_last_records}
+                    )
                     return tuple(tuple(row) for row in cur.fetchall())
 
         except (DatabaseError, TypeError) as err:
@@ -304,14 +474,86 @@ class DatabaseQueries:
                                   f"n: {number_of_last_records}")
             return ()
 
+    def export_group_transactions(self, group_id: int, fetch_size: int | None = None) -> Iterator[tuple]:
+        """
+        Returns all rows of the group (starting with the most recent) in the format of select_data_for_household_table.
+        The rows are read from a named (server-side) cursor in batches of fetch_size rows,
+        so the memory used does not depend on the number of records and there is no limit on their number.
+        The query is executed when the iteration starts, the transaction stays open until the generator is exhausted.
+        :param group_id:
+        :param fetch_size: number of rows received from the server at a time (by default from the config)
+        :raise DatabaseError: the export has been interrupted, the rows already received are incomplete
+        """
+        fetch_size = fetch_size or GlobalConfig.db_export_fetch_size or 2_000
+        try:
+            with self.__read_connection(group_id=group_id) as conn:
+                with conn.cursor(name=f'export_group_transactions_{group_id}') as cur:
+                    cur.itersize = fetch_size
+                    sql_registry.execute(cur, 'export_group_transactions', {'group_id': group_id})
+                    number_of_rows: int = 0
+                    for number_of_rows, row in enumerate(cur, start=1):
+                        yield tuple(row)
+                    # a named cursor returns the rows after the execution of the query
+                    query_metrics.add_rows('export_group_transactions', number_of_rows)
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"group id: {group_id}, "
+                                  f"fetch size: {fetch_size}")
+            raise DatabaseError(f'Export of group #{group_id} has been interrupted') from err
+
+    def copy_group_transactions_to_csv(self, group_id: int, file: BinaryIO, table_headers: tuple[str, ...]) -> int:
+        """
+        Writes all rows of the group (the query and order of export_group_transactions) to the binary file in CSV format
+        with a header line, using COPY ... TO STDOUT: the rows are formatted by PostgreSQL
+        and are not converted into Python objects.
+        :param group_id:
+        :param file: any object with the write(bytes) method
+        :param table_headers: names of the 7 columns in the header line (for example, localized)
+        :return: number of rows written (without the header line)
+        :raise DatabaseError: the export has been interrupted, the data already written is incomplete
+        """
+        columns: tuple[str, ...] = ('transaction_id', 'username', 'transfer', 'total', 'record_date', 'category',
+                                    'description')
+        # the values are written in the same form as csv.writer writes the rows of export_group_transactions
+        column_formats: dict[str, str] = {
+            'record_date': "to_char({column}, 'YYYY-MM-DD')",  # str(date), does not depend on DateStyle
+            'category': "NULLIF({column}, '')",  # COPY writes an empty string as ""
+            'description': "NULLIF({column}, '')"
+        }
+        if len(table_headers) != len(columns):
+            raise ValueError(f'{len(columns)} headers are expected, received: {len(table_headers)}')
+        try:
+            with self.__read_connection(group_id=group_id) as conn:
+                with conn.cursor() as cur:
+                    query = pg_sql.SQL('COPY (SELECT {columns} FROM ({export}) export_group_transactions) '
+                                       'TO STDOUT WITH (FORMAT csv, HEADER)').format(
+                        columns=pg_sql.SQL(', ').join(
+                            pg_sql.SQL(f"{column_formats.get(column, '{column}')} AS {{header}}").format(
+                                column=pg_sql.Identifier(column), header=pg_sql.Identifier(header)
+                            )
+                            for column, header in zip(columns, table_headers)
+                        ),
+                        # COPY does not accept parameters, so they are substituted on the client by mogrify
+                        export=pg_sql.SQL(sql_registry.get('export_group_transactions').text)
+                    )
+                    with measure_query('copy_group_transactions_to_csv', cur):
+                        cur.copy_expert(cur.mogrify(query, {'group_id': group_id}), file)
+                    return cur.rowcount
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"group id: {group_id}")
+            raise DatabaseError(f'Export of group #{group_id} has been interrupted') from err
+
     def get_group_usernames(self, group_id: int) -> tuple:
         """
         :return: tuple (empty or with usernames of group members)
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_usernames'), {'group_id': group_id})
+                    sql_registry.execute(cur, 'get_group_usernames', {'group_id': group_id})
                     return tuple(str(row[0]) for row in cur.fetchall())
 
         except (DatabaseError, TypeError) as err:
@@ -324,9 +566,9 @@ class DatabaseQueries:
         :return: tuple (empty or with telegram_ids of group members)
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_telegram_ids'), {'group_id': group_id})
+                    sql_registry.execute(cur, 'get_group_telegram_ids', {'group_id': group_id})
                     return tuple(row[0] for row in cur.fetchall())
 
         except (DatabaseError, TypeError) as err:
@@ -334,14 +576,50 @@ class DatabaseQueries:
                                   f"group id: {group_id}")
             return ()
 
+    def get_household_table(self, group_id: int, number_of_last_records: int) -> tuple[str, tuple[tuple, ...]]:
+        """
+        The rows of select_data_for_household_table through HouseholdViewCache (see household_view.py):
+        the version of the group is cached or read by one query, the rows are read only for a new version.
+        The version and the rows are read from the primary in one transaction, so the rows are not older than
+        the version (a version of the replica can be behind the notifications of the primary).
+        :return: (version of the group transactions | empty string, rows | empty tuple)
+        """
+        version: str = HouseholdViewCache.get_version(group_id)
+        if version and (rows := HouseholdViewCache.get_rows(group_id, version, number_of_last_records)) is not None:
+            return version, rows
+
+        generation: int = HouseholdViewCache.get_generation()
+        try:
+            with self.__conn as conn:
+                with conn.cursor() as cur:
+                    sql_registry.execute(cur, 'get_group_transaction_uuid', {'group_id': group_id})
+                    version = res[0] if (res := cur.fetchone()) else ''
+                    rows = HouseholdViewCache.get_rows(group_id, version, number_of_last_records)
+                    if rows is None:
+                        sql_registry.execute(
+                            cur, 'select_data_for_household_table',
+                            {'group_id': group_id, 'limit': number_of_last_records or 10_000}
+                        )
+                        rows = tuple(tuple(row) for row in cur.fetchall())
+                        HouseholdViewCache.input_rows(group_id, version, number_of_last_records, rows)
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"group id: {group_id}, "
+                                  f"n: {number_of_last_records}")
+            return '', ()
+
+        HouseholdViewCache.input_version(group_id, version, generation)
+        return version, rows
+
     def get_group_transaction_uuid(self, group_id: int) -> str:
         """
         :return: transaction uuid
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_transaction_uuid'), {'group_id': group_id})
+                    sql_registry.execute(cur, 'get_group_transaction_uuid', {'group_id': group_id})
                     return cur.fetchone()[0]
 
         except (DatabaseError, TypeError) as err:
@@ -354,9 +632,9 @@ class DatabaseQueries:
         :return: list (empty or with usernames of group members and last_login row)
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_users_data'), {'group_id': group_id})
+                    sql_registry.execute(cur, 'get_group_users_data', {'group_id': group_id})
                     return [list(row) for row in cur.fetchall()]
 
         except (DatabaseError, TypeError) as err:
@@ -366,10 +644,10 @@ class DatabaseQueries:
 
     def check_user_is_group_owner_by_telegram_id(self, telegram_id: int, group_id: int) -> bool:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id, group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(
-                        read_sql_file('check_user_is_group_owner_by_telegram_id'),
+                    sql_registry.execute(
+                        cur, 'check_user_is_group_owner_by_telegram_id',
                         {'owner': telegram_id, 'group_id': group_id}
                     )
                     return res[0] if (res := cur.fetchone()) else False
@@ -382,10 +660,10 @@ class DatabaseQueries:
 
     def check_user_is_premium_by_telegram_id(self, telegram_id: int) -> bool:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(
-                        read_sql_file('check_user_is_premium_by_telegram_id'),
+                    sql_registry.execute(
+                        cur, 'check_user_is_premium_by_telegram_id',
                         {'telegram_id': telegram_id}
                     )
                     return res[0] if (res := cur.fetchone()) else False
@@ -397,9 +675,9 @@ class DatabaseQueries:
 
     def get_group_owner_username_by_group_id(self, group_id: int) -> str:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_owner_username_by_group_id'), {'group_id': group_id})
+                    sql_registry.execute(cur, 'get_group_owner_username_by_group_id', {'group_id': group_id})
                     return res[0] if (res := cur.fetchone()) else ''
 
         except (DatabaseError, TypeError) as err:
@@ -407,6 +685,32 @@ class DatabaseQueries:
                                   f"group id: {group_id}")
             return ''
 
+    def get_group_profile(self, group_id: int) -> GroupProfile | None:
+        """
+        The profile is taken from GroupProfileCache, the database is queried only if it is not there
+        (the methods that change the members or the owner of the group evict it from the cache)
+        :return: snapshot of the group | None (there is no such group or the database is unavailable)
+        """
+        if (profile := GroupProfileCache.get_cache_data(group_id)) is not None:
+            return profile
+        try:
+            with self.__read_connection(group_id=group_id) as conn:
+                with conn.cursor() as cur:
+                    sql_registry.execute(cur, 'get_group_profile', {'group_id': group_id})
+                    if not (res := cur.fetchone()):
+                        return None
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"group id: {group_id}")
+            return None
+
+        owner_telegram_id, token, users_number, member_telegram_ids, member_usernames = res
+        profile = GroupProfile(group_id, owner_telegram_id, token, users_number,
+                               tuple(member_telegram_ids), tuple(member_usernames))
+        GroupProfileCache.input_cache_data(profile)
+        return profile
+
     def get_data_for_plot_builder(
             self,
             telegram_id: int,
@@ -414,16 +718,26 @@ class DatabaseQueries:
             dates: list | tuple = tuple([None, None]),
             users: list | tuple = None
     ) -> dict[str, tuple]:
+        """
+        diagram_type: 0 - the user, 1 - all members of the group, 2 - the selected members (users)
+        dates: the first and the last date of the period (both are included), each of them is optional
+        The query is chosen by the diagram type and by whether the period is set,
+        so each of them contains only the conditions of its case.
+        """
+        if diagram_type not in (0, 1, 2):
+            return {}
+        query_name: str = 'get_data_for_plot_builder_group' if diagram_type == 1 else 'get_data_for_plot_builder_users'
+        params: dict = {'telegram_id': telegram_id, 'users': [telegram_id] if diagram_type == 0 else users}
         try:
-            with self.__conn as conn:
+            if dates[0] is not None or dates[1] is not None:
+                query_name += '_period'
+                params |= get_plot_period_bounds(dates[0], dates[1])
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_data_for_plot_builder'), {
-                        'telegram_id': telegram_id, 'diagram_type': diagram_type,
-                        'start_date': dates[0], 'end_date': dates[1], 'users': users
-                    })
+                    sql_registry.execute(cur, query_name, params)
                     return {item[0]: (item[1], item[2]) for item in cur.fetchall()}
 
-        except (DatabaseError, TypeError) as err:
+        except (DatabaseError, TypeError, ValueError) as err:
             logger_database.error(f"[DB_QUERY] {str(err)}, "
                                   f"telegram_id: {telegram_id}, diagram_type: {diagram_type}, "
                                   f"dates: {dates}, start_date: {dates[0]}, end_date: {dates[1]}")
@@ -431,9 +745,9 @@ class DatabaseQueries:
 
     def get_group_owner_telegram_id_by_group_id(self, group_id: int) -> int:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_group_owner_telegram_id_by_group_id'), {'group_id': group_id})
+                    sql_registry.execute(cur, 'get_group_owner_telegram_id_by_group_id', {'group_id': group_id})
                     return res[0] if (res := cur.fetchone()) else 0
 
         except (DatabaseError, TypeError) as err:
@@ -443,9 +757,9 @@ class DatabaseQueries:
 
     def get_user_timezone_by_telegram_id(self, telegram_id: int) -> int | None:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_user_timezone_by_telegram_id'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'get_user_timezone_by_telegram_id', {'telegram_id': telegram_id})
                     return res[0] if (res := cur.fetchone()) else None
 
         except (DatabaseError, TypeError) as err:
@@ -455,10 +769,10 @@ class DatabaseQueries:
 
     def check_record_id_is_exist(self, group_id: int, transaction_id: int) -> bool:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('check_record_id_is_exist'),
-                                {'group_id': group_id, 'transaction_id': transaction_id})
+                    sql_registry.execute(cur, 'check_record_id_is_exist',
+                                         {'group_id': group_id, 'transaction_id': transaction_id})
                     return bool(res[0]) if (res := cur.fetchone()) else False
 
         except (DatabaseError, TypeError) as err:
@@ -472,9 +786,10 @@ class DatabaseQueries:
         The name is unique and case independent, i.e. you cannot create 'John' and 'john' -> only one of them
         """
         try:
+            # the name is checked before it is written, so the primary server is read (the replica may lag behind)
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('check_username_is_exist'), {'username': username})
+                    sql_registry.execute(cur, 'check_username_is_exist', {'username': username})
                     return bool(res[0]) if (res := cur.fetchone()) else False
 
         except (DatabaseError, TypeError) as err:
@@ -484,9 +799,9 @@ class DatabaseQueries:
 
     def check_telegram_id_is_exist(self, telegram_id: int) -> bool:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('check_telegram_id_is_exist'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'check_telegram_id_is_exist', {'telegram_id': telegram_id})
                     return bool(res[0]) if (res := cur.fetchone()) else False
 
         except (DatabaseError, TypeError) as err:
@@ -499,9 +814,10 @@ class DatabaseQueries:
         Checking the uniqueness of the generated token to avoid problems when inserting data into a unique column.
         """
         try:
+            # the token is checked before it is written, so the primary server is read (the replica may lag behind)
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('check_token_is_unique'), {'token': token})
+                    sql_registry.execute(cur, 'check_token_is_unique', {'token': token})
                     return not bool(res[0]) if (res := cur.fetchone()) else False
 
         except (DatabaseError, TypeError) as err:
@@ -513,13 +829,14 @@ class DatabaseQueries:
         """
         Returns: True if there are empty seats in the group.
         by token checks the group's filling limit.
+        The number of members is read from the "users_number" counter of the group (it is not recalculated).
 
         if there is no group with such a token, it will return False.
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(group_id=group_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('check_limit_users_in_group'), {'group_id': group_id})
+                    sql_registry.execute(cur, 'check_limit_users_in_group', {'group_id': group_id})
                     return bool(res[0]) if (res := cur.fetchone()) else False
 
         except (DatabaseError, TypeError) as err:
@@ -529,9 +846,9 @@ class DatabaseQueries:
 
     def get_skip_operations_status(self, telegram_id: int) -> tuple:
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_skip_operations_status'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'get_skip_operations_status', {'telegram_id': telegram_id})
                     return tuple(bool(status) for status in res[0]) if (res := cur.fetchone()) else tuple([False]*3)
 
         except (DatabaseError, TypeError) as err:
@@ -541,10 +858,10 @@ class DatabaseQueries:
 
     def get_feature_status(self, telegram_id: int, feature: str):
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(
-                        read_sql_file('get_feature_status'),
+                    sql_registry.execute(
+                        cur, 'get_feature_status',
                         {'telegram_id': telegram_id, 'feature': feature_ids.get(feature)}
                     )
                     return bool(res[0]) if (res := cur.fetchone()) else False
@@ -558,11 +875,13 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(
-                        read_sql_file('change_feature_status'),
+                    sql_registry.execute(
+                        cur, 'change_feature_status',
                         {'telegram_id': telegram_id, 'feature': feature_ids.get(feature)}
                     )
                     conn.commit()
+            read_your_writes.mark(telegram_id=telegram_id)
+            UserContextCache.delete_data_from_cache(telegram_id)
             logger_database.info(f"[{feature}] successfully changed for {logging_hash(telegram_id)}")
             return True
 
@@ -578,9 +897,9 @@ class DatabaseQueries:
         By default, the user will be offered text in English.
         """
         try:
-            with self.__conn as conn:
+            with self.__read_connection(telegram_id=telegram_id) as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('get_user_language'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'get_user_language', {'telegram_id': telegram_id})
                     # if the user did not change the default language
                     return res[0] if (res := cur.fetchone()) else 'en'
 
@@ -589,21 +908,48 @@ class DatabaseQueries:
                                   f"telegram_id: {logging_hash(telegram_id)}")
             return 'en'  # return default language
 
-    def add_user_language(self, telegram_id: int, language: str) -> bool:  # TODO - мне кажется можно проще и яснее
+    def get_user_context(self, telegram_id: int) -> UserContext:
+        """
+        Loads the language, registration status, group, owner and premium status, timezone and settings
+        of the user in one query. For a registered user, the date of the last activity is recorded
+        in LastLoginBuffer and written later (see last_login_buffer.py).
+        The context of a registered user is kept in UserContextCache and a user who is not registered
+        is kept in UnregisteredUserCache (see user_cache_structure.py): the database is queried only
+        if the user is not in the caches. The query is executed on the primary server:
+        a context read from a replica that lags behind could be cached until the next change of the user.
+        :return: UserContext (with default values if the user is not registered or an error occurred)
+        """
+        if (user_context := get_cached_user_context(telegram_id)) is not None:
+            return user_context
+        generation: int = UserContextCache.get_generation()
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute("""INSERT INTO
-                                     "budget_graph"."user_languages_telegram"
-                                     ("telegram_id", "language")
-                                   VALUES
-                                     (%s, %s)
-                                   ON CONFLICT
-                                     ("telegram_id")
-                                   DO UPDATE SET
-                                     "language" = %s::text""", (telegram_id, language, language))
+                    sql_registry.execute(cur, 'get_user_context', {'telegram_id': telegram_id})
+                    user_context: UserContext = UserContext(telegram_id, *cur.fetchone())
+            if user_context.is_registered:
+                UserContextCache.input_cache_data(user_context, generation)
+                LastLoginBuffer.touch(telegram_id)
+            else:
+                # an error of the query is not cached: the user can be registered
+                UnregisteredUserCache.input_cache_data(telegram_id, user_context.language)
+            return user_context
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"telegram_id: {logging_hash(telegram_id)}")
+            return UserContext(telegram_id)
+
+    def add_user_language(self, telegram_id: int, language: str) -> bool:
+        try:
+            with self.__conn as conn:
+                with conn.cursor() as cur:
+                    sql_registry.execute(cur, 'add_user_language', {'telegram_id': telegram_id, 'language': language})
                     conn.commit()
-                    return True
+            read_your_writes.mark(telegram_id=telegram_id)
+            UnregisteredUserCache.delete_data_from_cache(telegram_id)
+            UserContextCache.delete_data_from_cache(telegram_id)
+            return True
 
         except (DatabaseError, TypeError) as err:
             logger_database.error(f"[DB_QUERY] {str(err)}, "
@@ -615,9 +961,11 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('add_user_timezone'), {'timezone': timezone, 'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'add_user_timezone', {'timezone': timezone, 'telegram_id': telegram_id})
                     conn.commit()
-                    return True
+            read_your_writes.mark(telegram_id=telegram_id)
+            UserContextCache.delete_data_from_cache(telegram_id)
+            return True
 
         except (DatabaseError, TypeError) as err:
             logger_database.error(f"[DB_QUERY] {str(err)}, "
@@ -657,7 +1005,10 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('add_transaction_to_db'), params)
+                    sql_registry.execute(cur, 'add_transaction_to_db', params)
+                    group_id: int = cur.fetchone()[0]
+            read_your_writes.mark(telegram_id=telegram_id, username=username, group_id=group_id)
+            HouseholdViewCache.delete_data_from_cache(group_id)
             return True
 
         except (DatabaseError, TypeError) as err:
@@ -672,10 +1023,65 @@ class DatabaseQueries:
             )
             return False
 
+    def import_transactions(self, group_id: int, username: str, rows: Sequence[tuple[int, date, str, str]]) -> int:
+        """
+        Adds the validated records of the import (transactions_validation) to the group in one transaction:
+        the rows are loaded into a temporary table by COPY and inserted by one statement,
+        so the balances and the uuid of the group transactions are updated once for all rows.
+        :param group_id:
+        :param username: author of the records
+        :param rows: (transfer, record date, category, description) in the order of the file
+        :return: number of added records (0 - nothing has been added)
+        """
+        csv_rows = StringIO()
+        csv_writer(csv_rows).writerows(
+            (line_number, transfer, record_date.isoformat(), category, description)
+            for line_number, (transfer, record_date, category, description) in enumerate(rows, start=1)
+        )
+        csv_rows.seek(0)
+        try:
+            with self.__conn as conn:
+                with conn.cursor() as cur:
+                    sql_registry.execute(cur, 'create_import_staging_table')
+                    with measure_query('copy_to_import_staging_table', cur):
+                        cur.copy_expert(sql_registry.get('copy_to_import_staging_table').text, csv_rows)
+                    sql_registry.execute(cur, 'import_transactions', {'group_id': group_id, 'username': username})
+                    imported: int = cur.rowcount
+            read_your_writes.mark(group_id=group_id, username=username)
+            HouseholdViewCache.delete_data_from_cache(group_id)
+            return imported
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"group id: {group_id}, "
+                                  f"username (hash): {logging_hash(username)}, "
+                                  f"number of rows: {len(rows)}")
+            return 0
+
+    def archive_transactions(self, horizon: date, batch_size: int) -> int:
+        """
+        Moves up to batch_size records dated before the horizon into the archive table in one transaction.
+        The balances, the diagrams and the export read both tables (the "all_transactions" view),
+        so the move does not change them (see archive_transactions.sql)
+        :return: number of moved records (0 - there is nothing to move or an error)
+        """
+        try:
+            with self.__conn as conn:
+                with conn.cursor() as cur:
+                    sql_registry.execute(cur, 'archive_transactions', {'horizon': horizon, 'batch_size': batch_size})
+                    return cur.rowcount
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"horizon: {horizon}, "
+                                  f"batch size: {batch_size}")
+            return 0
+
     def process_delete_transaction_record(self, group_id: int, transaction_id: int) -> bool:
         """
-        Removes a record from the "monetary_transactions" table and then adjusts all later values in the "total" column
-        so that the deleted record does not introduce artifacts for subsequent calculations
+        Removes a record from the "monetary_transactions" table (or from its archive).
+        The balance of later records is calculated when reading (see select_data_for_household_table.sql),
+        so only the sum of the record day in "daily_balances" is changed (by a trigger)
         """
         params: dict = {
             'group_id': group_id,
@@ -684,7 +1090,9 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('delete_transaction_record'), params)
+                    sql_registry.execute(cur, 'delete_transaction_record', params)
+            read_your_writes.mark(group_id=group_id)
+            HouseholdViewCache.delete_data_from_cache(group_id)
             return True
 
         except (DatabaseError, TypeError) as err:
@@ -730,8 +1138,13 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('new_user_in_group' if group_id else 'new_user_with_group'), params)
+                    sql_registry.execute(cur, 'new_user_in_group' if group_id else 'new_user_with_group', params)
                     conn.commit()
+                    # the id of the new group is returned by the query
+                    group_id = group_id or cur.fetchone()[0]
+            read_your_writes.mark(telegram_id=telegram_id, username=username, group_id=group_id)
+            GroupProfileCache.delete_data_from_cache(group_id)
+            UnregisteredUserCache.delete_data_from_cache(telegram_id)
             return group_token if group_token else True
 
         except (DatabaseError, TypeError) as err:
@@ -752,7 +1165,7 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(read_sql_file('update_user_last_login_by_telegram_id'), {'telegram_id': telegram_id})
+                    sql_registry.execute(cur, 'update_user_last_login_by_telegram_id', {'telegram_id': telegram_id})
                     # TODO - довести до datetime возвращаемое значение и покрыть тестами
                     return res[0] if (res := cur.fetchone()) else None
         except (DatabaseError, TypeError) as err:
@@ -760,6 +1173,26 @@ class DatabaseQueries:
                                   f"telegram_id: {logging_hash(telegram_id)}")
             return None
 
+    def update_users_last_login(self, last_logins: dict[int, datetime]) -> bool:
+        """
+        Writes the dates of the last activity of the users by one query (see last_login_buffer.py)
+        :param last_logins: telegram id -> date of the last activity (UTC)
+        """
+        params: dict = {
+            'telegram_ids': list(last_logins),
+            'last_logins': list(last_logins.values())
+        }
+        try:
+            with self.__conn as conn:
+                with conn.cursor() as cur:
+                    sql_registry.execute(cur, 'update_users_last_login', params)
+            return True
+
+        except (DatabaseError, TypeError) as err:
+            logger_database.error(f"[DB_QUERY] {str(err)}, "
+                                  f"number of users: {len(last_logins)}")
+            return False
+
     def update_group_owner(self, new_owner_telegram_id: int, group_id: int) -> bool:
         """
         Changes the owner of a group to another user from that group
@@ -783,12 +1216,14 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute(
-                        read_sql_file(
-                            'update_group_owner'),
+                    sql_registry.execute(
+                        cur, 'update_group_owner',
                         {'telegram_id': new_owner_telegram_id, 'group_id': group_id}
                     )
                     conn.commit()
+            read_your_writes.mark(telegram_id=new_owner_telegram_id, group_id=group_id)
+            GroupProfileCache.delete_data_from_cache(group_id)
+            UserContextCache.delete_group_trigger((current_group_owner, new_owner_telegram_id))
             logger_database.info(f"Updated group owner: group_id = {logging_hash(group_id)},"
                                  f"telegram_id owner = {logging_hash(new_owner_telegram_id)}")
             return True
@@ -803,18 +1238,12 @@ class DatabaseQueries:
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute("""
-                                   DELETE FROM
-                                     "budget_graph"."users_groups"
-                                   WHERE
-                                     "telegram_id" = %s::bigint;
-
-                                   DELETE FROM
-                                     "budget_graph"."users"
-                                   WHERE
-                                     "telegram_id" = %s::bigint
-                                """, (telegram_id, telegram_id,))
+                    sql_registry.execute(cur, 'delete_user_from_group_by_telegram_id', {'telegram_id': telegram_id})
+                    group_id: int = res[0] if (res := cur.fetchone()) else 0
                     conn.commit()
+            read_your_writes.mark(telegram_id=telegram_id)
+            GroupProfileCache.delete_data_from_cache(group_id)
+            UserContextCache.delete_data_from_cache(telegram_id)
             logger_database.info(f"Telegram ID {logging_hash(telegram_id)} has been removed from the database")
             return True  # this is a flag of a successful operation, the user id may not exist in the database
 
@@ -823,54 +1252,19 @@ class DatabaseQueries:
                                   f"telegram ID: {logging_hash(telegram_id)}")
             return False
 
-    def delete_group_with_users(self, group_id: int) -> bool:  # TODO REFERENCES IN .sql
+    def delete_group_with_users(self, group_id: int) -> bool:
         """
         Deletes the group table along with all its members (including the owner)
         """
         try:
             with self.__conn as conn:
                 with conn.cursor() as cur:
-                    cur.execute("""
-                                    -- users
-                                    WITH
-                                    telegram_id_users AS (
-                                        SELECT
-                                         u."telegram_id"
-                                       FROM
-                                         "budget_graph"."users" u
-                                       JOIN
-                                         "budget_graph"."users_groups" u_g
-                                       ON
-                                         u."telegram_id" = u_g."telegram_id"
-                                       WHERE
-                                         u_g."group_id" = %s::smallint
-                                    )
-                                    
-                                    DELETE FROM
-                                        "budget_graph"."users"
-                                    WHERE
-                                        "telegram_id" IS NOT NULL AND "telegram_id" = ANY(ARRAY(SELECT "telegram_id" FROM telegram_id_users));
-                                    
-                                    -- groups
-                                    DELETE FROM
-                                        "budget_graph"."groups"
-                                    WHERE
-                                        "id" = %s::smallint;
-                                    
-                                    -- users_groups
-                                    DELETE FROM
-                                        "budget_graph"."users_groups"
-                                    WHERE
-                                        "group_id" = %s::smallint;
-                                    
-                                    -- monetary_transactions
-                                    DELETE FROM
-                                        "budget_graph"."monetary_transactions"
-                                    WHERE
-                                        "group_id" = %s::smallint;
-                    """, (*([group_id]*4),))
+                    sql_registry.execute(cur, 'delete_group_with_users', {'group_id': group_id})
 
                     conn.commit()
+            read_your_writes.mark(group_id=group_id)
+            GroupProfileCache.delete_data_from_cache(group_id)
+            HouseholdViewCache.delete_data_from_cache(group_id)
             logger_database.info(f'[DB_QUERY] Group #{group_id} has been completely deleted')
             return True
 
@@ -4,9 +4,27 @@ from tomllib import load as tomllib_load
 class GlobalConfig:
 	global_cache_enable: bool = None
 	redis_enable: bool = None
+	user_cache_capacity: int = None
+	user_cache_ttl: float = None
+	redis_ttl: int = None
+	unregistered_cache_ttl: float = None
+	cache_invalidation_enable: bool = None
 	timeit_enable: bool = None
 	recaptcha_enable: bool = None
 	localization_enable: bool = None
+	db_pool_min_size: int = None
+	db_pool_max_size: int = None
+	db_pool_idle_timeout: float = None
+	db_pool_max_lifetime: float = None
+	db_pool_wait_timeout: float = None
+	db_pool_health_check_interval: float = None
+	db_export_fetch_size: int = None
+	db_export_by_copy: bool = None
+	db_import_max_rows: int = None
+	db_query_metrics_enable: bool = None
+	db_read_your_writes_window: float = None
+	db_archive_horizon_days: int = None
+	db_archive_batch_size: int = None
 
 	@staticmethod
 	def set_config():
@@ -24,6 +42,21 @@ class GlobalConfig:
 				# if caching is disabled, then Redis is not connected in any case
 				if GlobalConfig.global_cache_enable else False
 			)
+			GlobalConfig.user_cache_capacity = (
+					GlobalConfig.user_cache_capacity or conf_data.get('cache').get('user_cache_capacity')
+			)
+			GlobalConfig.user_cache_ttl = (
+					GlobalConfig.user_cache_ttl or conf_data.get('cache').get('user_cache_ttl')
+			)
+			GlobalConfig.redis_ttl = (
+					GlobalConfig.redis_ttl or conf_data.get('cache').get('redis_ttl')
+			)
+			GlobalConfig.unregistered_cache_ttl = (
+					GlobalConfig.unregistered_cache_ttl or conf_data.get('cache').get('unregistered_cache_ttl')
+			)
+			GlobalConfig.cache_invalidation_enable = (
+					GlobalConfig.cache_invalidation_enable or conf_data.get('cache').get('cache_invalidation_enable')
+			)
 
 			# timeit
 			GlobalConfig.timeit_enable = (
@@ -39,3 +72,45 @@ class GlobalConfig:
 			GlobalConfig.localization_enable = (
 					GlobalConfig.localization_enable or conf_data.get('localization').get('localization_enable')
 			)
+
+			# database
+			GlobalConfig.db_pool_min_size = (
+					GlobalConfig.db_pool_min_size or conf_data.get('database').get('pool_min_size')
+			)
+			GlobalConfig.db_pool_max_size = (
+					GlobalConfig.db_pool_max_size or conf_data.get('database').get('pool_max_size')
+			)
+			GlobalConfig.db_pool_idle_timeout = (
+					GlobalConfig.db_pool_idle_timeout or conf_data.get('database').get('pool_idle_timeout')
+			)
+			GlobalConfig.db_pool_max_lifetime = (
+					GlobalConfig.db_pool_max_lifetime or conf_data.get('database').get('pool_max_lifetime')
+			)
+			GlobalConfig.db_pool_wait_timeout = (
+					GlobalConfig.db_pool_wait_timeout or conf_data.get('database').get('pool_wait_timeout')
+			)
+			GlobalConfig.db_pool_health_check_interval = (
+					GlobalConfig.db_pool_health_check_interval
+					or conf_data.get('database').get('pool_health_check_interval')
+			)
+			GlobalConfig.db_export_fetch_size = (
+					GlobalConfig.db_export_fetch_size or conf_data.get('database').get('export_fetch_size')
+			)
+			GlobalConfig.db_export_by_copy = (
+					GlobalConfig.db_export_by_copy or conf_data.get('database').get('export_by_copy')
+			)
+			GlobalConfig.db_import_max_rows = (
+					GlobalConfig.db_import_max_rows or conf_data.get('database').get('import_max_rows')
+			)
+			GlobalConfig.db_query_metrics_enable = (
+					GlobalConfig.db_query_metrics_enable or conf_data.get('database').get('query_metrics_enable')
+			)
+			GlobalConfig.db_read_your_writes_window = (
+					GlobalConfig.db_read_your_writes_window or conf_data.get('database').get('read_your_writes_window')
+			)
+			GlobalConfig.db_archive_horizon_days = (
+					GlobalConfig.db_archive_horizon_days or conf_data.get('database').get('archive_horizon_days')
+			)
+			GlobalConfig.db_archive_batch_size = (
+					GlobalConfig.db_archive_batch_size or conf_data.get('database').get('archive_batch_size')
+			)
@@ -0,0 +1,98 @@
+"""
+Everything the group management menus need to know about the group: the owner, the members and the token.
+It is loaded by a single query (get_group_profile.sql) and kept in GroupProfileCache until the group changes,
+so the menus of the group (members, change of the owner, deletion of a member) do not query the database.
+
+The cached profile is evicted by DatabaseQueries when a member is added or deleted, the owner is changed
+or the group is deleted, and by the notifications of the database about the changes made by other processes
+(cache_invalidation.py). The TTL of the entries is "user_cache_ttl" of the config (see configure_group_cache).
+"""
+from typing import NamedTuple
+
+from budget_graph.logger import setup_logger
+from budget_graph.global_config import GlobalConfig
+from budget_graph.lru_cache import LruCache
+from budget_graph.cache_invalidation import InvalidationHandlers
+
+logger_cache = setup_logger("logs/CacheLog.log", "cache_logger")
+
+DEFAULT_GROUP_CACHE_CAPACITY: int = 5_000  # groups
+
+
+class GroupProfile(NamedTuple):
+    """
+    Immutable snapshot of the group (a tuple, the members are tuples too),
+    so one cached object is shared by all the threads of the process
+    """
+    group_id: int
+    owner_telegram_id: int
+    token: str
+    users_number: int
+    member_telegram_ids: tuple[int, ...]
+    member_usernames: tuple[str, ...]  # in the same order as the telegram ids
+
+    @property
+    def owner_username(self) -> str:
+        return self.get_username(self.owner_telegram_id)
+
+    def get_username(self, telegram_id: int) -> str:
+        """ :return: username of the member | empty string (there is no such member in the group) """
+        return next((username for member, username in zip(self.member_telegram_ids, self.member_usernames)
+                     if member == telegram_id), '')
+
+    def is_member(self, telegram_id: int) -> bool:
+        return telegram_id in self.member_telegram_ids
+
+    def is_owner(self, telegram_id: int) -> bool:
+        return telegram_id == self.owner_telegram_id
+
+    def get_telegram_id(self, username: str) -> int:
+        """ :return: telegram id of the member | 0 (there is no such member in the group) """
+        return next((telegram_id for telegram_id, member in zip(self.member_telegram_ids, self.member_usernames)
+                     if member == username), 0)
+
+    def get_usernames_without_owner(self) -> tuple[str, ...]:
+        owner_username: str = self.owner_username
+        return tuple(username for username in self.member_usernames if username != owner_username)
+
+    def __repr__(self) -> str:
+        # the token, the telegram ids and the usernames are not shown so that the object can be written to the logs
+        return f'GroupProfile(group_id={self.group_id}, users_number={self.users_number})'
+
+
+class GroupProfileCache:
+    """ The profiles of the groups by group id """
+    __groups = LruCache(DEFAULT_GROUP_CACHE_CAPACITY)
+
+    @staticmethod
+    def get_cache_data(group_id: int) -> GroupProfile | None:
+        return GroupProfileCache.__groups.get(group_id)
+
+    @staticmethod
+    def input_cache_data(profile: GroupProfile) -> None:
+        GroupProfileCache.__groups.set(profile.group_id, profile)
+
+    @staticmethod
+    def delete_data_from_cache(group_id: int) -> None:
+        if GroupProfileCache.__groups.delete(group_id):
+            logger_cache.info(f"<GroupProfile> [OK] Data removed from cache (trigger): group #{group_id}")
+
+    @staticmethod
+    def get_cache() -> LruCache:
+        return GroupProfileCache.__groups
+
+
+def configure_group_cache() -> None:
+    """ Applies the TTL of the config to the cache (after GlobalConfig.set_config()) """
+    GroupProfileCache.get_cache().configure(DEFAULT_GROUP_CACHE_CAPACITY, GlobalConfig.user_cache_ttl)
+
+
+def evict_groups(group_ids: tuple[int, ...] | None) -> None:
+    """ Handler of the notifications about the changed groups (None - all the entries of the process) """
+    if group_ids is None:
+        GroupProfileCache.get_cache().clear()
+    else:
+        GroupProfileCache.get_cache().delete_many(group_ids)
+
+
+InvalidationHandlers.subscribe('group', evict_groups)
@@ -3,11 +3,12 @@ Methods for the bot to work, mainly keyboard caching
 """
 from sys import path as sys_path
 from functools import cache
+from typing import Any
 from telebot.types import InlineKeyboardButton, BotCommand
 
 sys_path.append('../')
 from budget_graph.global_config import GlobalConfig
-from budget_graph.dictionary import receive_translation
+from budget_graph.dictionary import receive_translation, get_list_languages
 
 
 class StorageMsgIdForDeleteAfterOperation:
@@ -59,6 +60,21 @@ def get_category_button_labels(user_language: str) -> tuple:
 	)
 
 
+def get_menu_dispatch(buttons: tuple[tuple[str, str, Any], ...]) -> dict[str, Any]:
+	"""
+	Index of the reply keyboard buttons: the label of the button in each language -> its value,
+	so the pressed button is found by one lookup whatever the language of the user and the number of languages
+	(it is built once, the labels are formatted as "<prefix> <translation>")
+	:param buttons: (prefix of the label (emoji), phrase of the dictionary, value)
+	"""
+	dispatch: dict[str, Any] = {}
+	for prefix, phrase, value in buttons:
+		for language in get_list_languages():
+			# the first button keeps the label if the translations of two phrases are the same
+			dispatch.setdefault(f'{prefix} {receive_translation(language, phrase)}', value)
+	return dispatch
+
+
 @cache
 def get_language_buttons() -> tuple:
 	return (
@@ -0,0 +1,128 @@
+"""
+The last records of the group (select_data_for_household_table) and their text in the languages of the users
+are cached by the version of the group transactions - "transactions_uuid" of the groups table,
+which is changed by the triggers at every change of the records (update_group_uuid_after_transaction.sql).
+
+An entry of a version is never changed: a new record or the deletion of a record gives a new version of the group,
+so the entries of the old versions are not read anymore and are evicted as the least recently used ones.
+A view checks the current version by a single query (get_group_transaction_uuid.sql) and reads the cached rows.
+While the process listens to the notifications of the database (cache_invalidation.py) the version itself is cached:
+the new versions of the group are notified by the trigger "after_update_groups_transactions_notify_cache"
+and the cached version is evicted, so a repeated view does not query the database at all.
+A cached version is trusted for at most VERSION_MAX_AGE seconds: a notification lost without an error
+(a failed handler, a dead connection that is not detected yet) delays a new version only for this time.
+The TTL of the other entries is "user_cache_ttl" of the config (see configure_household_view_cache).
+"""
+from collections.abc import Callable
+from threading import Lock
+
+from budget_graph.logger import setup_logger
+from budget_graph.global_config import GlobalConfig
+from budget_graph.lru_cache import LruCache
+from budget_graph.cache_invalidation import InvalidationHandlers
+
+logger_cache = setup_logger("logs/CacheLog.log", "cache_logger")
+
+DEFAULT_VERSION_CACHE_CAPACITY: int = 5_000  # groups
+DEFAULT_VIEW_CACHE_CAPACITY: int = 10_000  # (group, version, number of records[, language])
+VERSION_MAX_AGE: float = 10.0  # seconds, then the version is read from the database again
+
+
+class HouseholdViewCache:
+    """
+    versions: group id -> the current version (only while the notifications are received)
+    rows: (group id, version, number of records) -> rows of select_data_for_household_table
+    texts: (group id, version, number of records, language) -> rendered text of the rows
+    """
+    __versions = LruCache(DEFAULT_VERSION_CACHE_CAPACITY, VERSION_MAX_AGE)
+    __rows = LruCache(DEFAULT_VIEW_CACHE_CAPACITY)
+    __texts = LruCache(DEFAULT_VIEW_CACHE_CAPACITY)
+    # the number of the evictions of the versions: a version read from the database before an eviction
+    # may be already old, so it is not cached (see input_version)
+    __generation: int = 0
+    __lock = Lock()
+
+    @staticmethod
+    def get_version(group_id: int) -> str:
+        """ :return: the cached current version of the group | empty string (it must be read from the database) """
+        if not InvalidationHandlers.is_listening():
+            return ''
+        return HouseholdViewCache.__versions.get(group_id, '')
+
+    @staticmethod
+    def get_generation() -> int:
+        """ It is taken before the version is read from the database and passed to input_version """
+        return HouseholdViewCache.__generation
+
+    @staticmethod
+    def input_version(group_id: int, version: str, generation: int) -> None:
+        """ The version is cached if no version has been evicted since the generation was taken """
+        if not version or not InvalidationHandlers.is_listening():
+            return
+        with HouseholdViewCache.__lock:
+            if generation == HouseholdViewCache.__generation:
+                HouseholdViewCache.__versions.set(group_id, version)
+
+    @staticmethod
+    def get_rows(group_id: int, version: str, number_of_last_records: int) -> tuple[tuple, ...] | None:
+        return HouseholdViewCache.__rows.get((group_id, version, number_of_last_records))
+
+    @staticmethod
+    def input_rows(group_id: int, version: str, number_of_last_records: int, rows: tuple[tuple, ...]) -> None:
+        if version:  # the group without a version (there are no records yet) is not cached
+            HouseholdViewCache.__rows.set((group_id, version, number_of_last_records), rows)
+
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    @staticmethod
+    def get_text(group_id: int, version: str, number_of_last_records: int, language: str,
+                 rows: tuple[tuple, ...], render: Callable[[tuple[tuple, ...], str], str]) -> str:
+        """ :return: the cached text of the rows | render(rows, language), which is cached """
+        if not version:
+            return render(rows, language)
+        key: tuple = (group_id, version, number_of_last_records, language)
+        text: str | None = HouseholdViewCache.__texts.get(key)
+        if text is None:
+            text = render(rows, language)
+            HouseholdViewCache.__texts.set(key, text)
+        return text
+
+    @staticmethod
+    def delete_data_from_cache(group_id: int) -> None:
+        """ The records of the group have been changed by this process """
+        HouseholdViewCache.evict_versions((group_id,))
+
+    @staticmethod
+    def evict_versions(group_ids: tuple[int, ...] | None) -> None:
+        """ Handler of the notifications about the new versions of the groups (None - all the groups) """
+        with HouseholdViewCache.__lock:
+            HouseholdViewCache.__generation += 1
+            if group_ids is None:
+                HouseholdViewCache.__versions.clear()
+            else:
+                HouseholdViewCache.__versions.delete_many(group_ids)
+
+    @staticmethod
+    def get_caches() -> dict[str, LruCache]:
+        return {
+            'versions': HouseholdViewCache.__versions,
+            'rows': HouseholdViewCache.__rows,
+            'texts': HouseholdViewCache.__texts
+        }
+
+
+def configure_household_view_cache() -> None:
+    """ Applies the TTL of the config to the caches (after GlobalConfig.set_config()) """
+    caches: dict[str, LruCache] = HouseholdViewCache.get_caches()
+    caches['versions'].configure(None, min(GlobalConfig.user_cache_ttl or VERSION_MAX_AGE, VERSION_MAX_AGE))
+    caches['rows'].configure(None, GlobalConfig.user_cache_ttl)
+    caches['texts'].configure(None, GlobalConfig.user_cache_ttl)
+    logger_cache.info(f"Household view caches: ttl={GlobalConfig.user_cache_ttl}, "
+                      f"version max age={VERSION_MAX_AGE}")
+
+
+def get_household_view_stats() -> dict[str, dict]:
+    """ :return: counters of the caches (see LruCache.get_stats) """
+    return {name: cache.get_stats() for name, cache in HouseholdViewCache.get_caches().items()}
+
+
+InvalidationHandlers.subscribe('transactions', HouseholdViewCache.evict_versions)
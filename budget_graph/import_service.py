@@ -0,0 +1,106 @@
+import sys
+from io import StringIO
+from re import compile as re_compile
+from csv import reader as csv_reader, Error as CsvError
+
+sys.path.append('../')
+
+from budget_graph.logger import setup_logger
+from budget_graph.global_config import GlobalConfig
+from budget_graph.encryption import logging_hash
+from budget_graph.dictionary import receive_translation
+from budget_graph.validation import transactions_validation
+
+logger_import = setup_logger("logs/ImportLog.log", "import_logger")
+
+# columns of the file that are imported (the rest, for example ID and TOTAL of the exported table, are ignored)
+IMPORT_COLUMNS: tuple[str, ...] = ('TRANSFER', 'DATE', 'CATEGORY', 'DESCRIPTION')
+REQUIRED_COLUMNS: tuple[str, ...] = ('TRANSFER', 'DATE')
+ISO_DATE_PATTERN = re_compile(r'^(\d{4})-(\d{2})-(\d{2})$')  # YYYY-MM-DD (dates of the exported table)
+
+
+def get_import_max_rows() -> int:
+    return GlobalConfig.db_import_max_rows or 100_000
+
+
+def read_csv_transactions(csv_data: bytes, lang: str) -> list[tuple[str, str, str, str]] | None:
+    """
+    Reads the records from the CSV table with a header line.
+    The names of the columns can be in English or in the user's language (as in the exported table),
+    the delimiter is a comma, a semicolon or a tab, the date is DD/MM/YYYY or YYYY-MM-DD.
+    :return: (transfer, date DD/MM/YYYY, category, description) as strings or None if the file is not such a table
+    """
+    try:
+        csv_text: str = csv_data.decode('utf-8-sig')  # with or without BOM (spreadsheet editors)
+    except UnicodeDecodeError:
+        return None
+
+    header_line: str = csv_text.partition('\n')[0]
+    delimiter: str = max((',', ';', '\t'), key=header_line.count)
+    rows = csv_reader(StringIO(csv_text, newline=''), delimiter=delimiter, strict=True)
+    try:
+        indexes: dict[str, int] = get_column_indexes(next(rows, []), lang)
+        if not all(column in indexes for column in REQUIRED_COLUMNS):
+            return None
+
+        records: list[tuple[str, str, str, str]] = []
+        for row in rows:
+            if not any(value.strip() for value in row):  # empty lines (for example, at the end of the file)
+                continue
+            values: tuple[str, ...] = tuple(row[indexes[column]].strip()
+                                            if column in indexes and indexes[column] < len(row) else ''
+                                            for column in IMPORT_COLUMNS)
+            transfer, record_date, category, description = values
+            if iso_date := ISO_DATE_PATTERN.match(record_date):
+                record_date = f'{iso_date.group(3)}/{iso_date.group(2)}/{iso_date.group(1)}'
+            records.append((transfer.replace(' ', ''), record_date, category, description))
+    except CsvError:
+        return None
+    return records
+
+
+def get_column_indexes(header: list[str], lang: str) -> dict[str, int]:
+    """
+    :return: {column of IMPORT_COLUMNS: its index in the header line} for the columns found in the header
+    """
+    column_names: dict[str, str] = {}
+    for column in IMPORT_COLUMNS:
+        column_names[column] = column
+        column_names[receive_translation(lang, column).upper()] = column
+
+    indexes: dict[str, int] = {}
+    for index, name in enumerate(header):
+        column: str | None = column_names.get(name.strip().upper())
+        if column and column not in indexes:
+            indexes[column] = index
+    return indexes
+
+
+def transactions_import(db_connection, group_id: int, username: str, csv_data: bytes, lang: str) \
+        -> tuple[int, str, tuple[int, ...]]:
+    """
+    Imports all records of the CSV table into the group or none of them.
+    :return: number of added records, status and the numbers of the invalid records (starting from 1)
+    status: '' - success, 'import_invalid_file', 'import_invalid_rows', 'error_connect_support'
+    """
+    records: list[tuple[str, str, str, str]] | None = read_csv_transactions(csv_data, lang)
+    if not records or len(records) > get_import_max_rows():
+        logger_import.info(f"Invalid file: group #{group_id}, username: {logging_hash(username)}, "
+                           f"number of records: {len(records) if records else 0}")
+        return 0, 'import_invalid_file', ()
+
+    valid_records, invalid_records = transactions_validation(records, lang)
+    if invalid_records:
+        logger_import.info(f"Invalid records: group #{group_id}, username: {logging_hash(username)}, "
+                           f"invalid: {len(invalid_records)} of {len(records)}")
+        return 0, 'import_invalid_rows', tuple(invalid_records)
+
+    imported: int = db_connection.import_transactions(group_id, username, valid_records)
+    if imported != len(valid_records):
+        logger_import.error(f"Error importing records: group #{group_id}, username: {logging_hash(username)}, "
+                            f"number of records: {len(valid_records)}")
+        return 0, 'error_connect_support', ()
+
+    logger_import.info(f"Records imported: group #{group_id}, username: {logging_hash(username)}, "
+                       f"number of records: {imported}")
+    return imported, '', ()
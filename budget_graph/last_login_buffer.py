@@ -0,0 +1,69 @@
+"""
+Write-behind of the dates of the last activity of the users ("last_login" of the users table).
+
+The bot does not write the date on every update: get_user_context records it in LastLoginBuffer,
+where the updates of one user are coalesced (only the latest date is kept), and the periodic function of the bot
+writes the buffer by one statement for all users (update_users_last_login.sql) every LAST_LOGIN_FLUSH_INTERVAL
+seconds and at the shutdown. If the write fails, the dates are returned to the buffer and written next time.
+The date shown in the list of the group members (get_group_users_data) is behind by at most the interval.
+"""
+from datetime import datetime, timezone
+from threading import Lock
+
+from budget_graph.logger import setup_logger
+
+logger_last_login = setup_logger("logs/LastLoginLog.log", "last_login_logger")
+
+LAST_LOGIN_FLUSH_INTERVAL: int = 60  # seconds, the buffer is written by the periodic function of the bot
+
+
+class LastLoginBuffer:
+    """ The dates of the last activity (UTC) that have not been written yet, by telegram id """
+    __last_logins: dict[int, datetime] = {}
+    __lock = Lock()
+
+    @staticmethod
+    def touch(telegram_id: int) -> None:
+        """ The user is active now (the previous date of the user in the buffer is replaced) """
+        # naive UTC, the same as "current_timestamp AT TIME ZONE 'UTC'" of the queries
+        now: datetime = datetime.now(timezone.utc).replace(tzinfo=None)
+        with LastLoginBuffer.__lock:
+            LastLoginBuffer.__last_logins[telegram_id] = now
+
+    @staticmethod
+    def take() -> dict[int, datetime]:
+        """ :return: all buffered dates, the buffer becomes empty """
+        with LastLoginBuffer.__lock:
+            last_logins: dict[int, datetime] = LastLoginBuffer.__last_logins
+            LastLoginBuffer.__last_logins = {}
+            return last_logins
+
+    @staticmethod
+    def restore(last_logins: dict[int, datetime]) -> None:
+        """ Returns the dates that have not been written (the later dates of the buffer are kept) """
+        with LastLoginBuffer.__lock:
+            buffer: dict[int, datetime] = LastLoginBuffer.__last_logins
+            for telegram_id, last_login in last_logins.items():
+                if telegram_id not in buffer or buffer[telegram_id] < last_login:
+                    buffer[telegram_id] = last_login
+
+    @staticmethod
+    def get_size() -> int:
+        return len(LastLoginBuffer.__last_logins)
+
+
+def last_login_flush(db_connection) -> int:
+    """
+    Writes the buffered dates by one query
+    :param db_connection: object of the DatabaseQueries class
+    :return: number of written users (0 - the buffer is empty or an error, then the dates are kept in the buffer)
+    """
+    last_logins: dict[int, datetime] = LastLoginBuffer.take()
+    if not last_logins:
+        return 0
+    if not db_connection.update_users_last_login(last_logins):
+        LastLoginBuffer.restore(last_logins)
+        logger_last_login.warning(f'[LAST_LOGIN] the dates of {len(last_logins)} users are kept in the buffer')
+        return 0
+    logger_last_login.info(f'[LAST_LOGIN] the dates of the last activity written: {len(last_logins)}')
+    return len(last_logins)
@@ -0,0 +1,140 @@
+"""
+Thread-safe in-memory cache with the LRU eviction and an optional TTL of the entries.
+
+The entries are kept in an OrderedDict in the order of use: a read or a write moves the key to the end,
+so the least recently used key is always the first one and is evicted in O(1) when the cache is full.
+An expired entry is removed when it is read (there is no background cleaning), so the TTL costs nothing
+for the entries that are not read; they are evicted as the least recently used ones.
+"""
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from threading import Lock
+from time import monotonic
+from typing import Any
+
+_MISSING = object()
+
+
+class LruCache:  # pylint: disable=too-many-instance-attributes
+    """
+    capacity - maximum number of entries (the least recently used entry is evicted when a new key is added)
+    ttl - seconds after the write when the entry expires (None - the entries do not expire)
+    """
+    __slots__ = ('__lock', '__entries', '__capacity', '__ttl', '__hits', '__misses', '__evictions', '__expirations')
+
+    def __init__(self, capacity: int, ttl: float | None = None):
+        if capacity < 1:
+            raise ValueError(f'The capacity of the cache must be positive: {capacity}')
+        self.__lock = Lock()
+        # key -> (value, expiration time by monotonic() or 0.0 if the entry does not expire)
+        self.__entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self.__capacity: int = capacity
+        self.__ttl: float | None = ttl or None
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__evictions: int = 0
+        self.__expirations: int = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ :return: the value (the key becomes the most recently used one) | default if there is no such entry """
+        with self.__lock:
+            entry: tuple[Any, float] | None = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return default
+            if entry[1] and entry[1] <= monotonic():
+                del self.__entries[key]
+                self.__expirations += 1
+                self.__misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """ Adds or replaces the entry, the key becomes the most recently used one """
+        expires: float = monotonic() + self.__ttl if self.__ttl else 0.0
+        with self.__lock:
+            entries: OrderedDict[Hashable, tuple[Any, float]] = self.__entries
+            if key in entries:
+                entries.move_to_end(key)
+            elif len(entries) >= self.__capacity:
+                entries.popitem(last=False)
+                self.__evictions += 1
+            entries[key] = (value, expires)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """ :return: the value without changing its position and the counters | default (also for an expired entry) """
+        entry: tuple[Any, float] | None = self.__entries.get(key)
+        if entry is None or entry[1] and entry[1] <= monotonic():
+            return default
+        return entry[0]
+
+    def touch(self, key: Hashable) -> bool:
+        """
+        Makes the key the most recently used one without reading it (the hits and misses are not counted)
+        :return: False if there is no such entry
+        """
+        with self.__lock:
+            if key not in self.__entries:
+                return False
+            self.__entries.move_to_end(key)
+            return True
+
+    def delete(self, key: Hashable) -> bool:
+        """ :return: False if there was no such entry """
+        with self.__lock:
+            return self.__entries.pop(key, _MISSING) is not _MISSING
+
+    def delete_many(self, keys: Iterable[Hashable]) -> int:
+        """ :return: number of deleted entries """
+        with self.__lock:
+            return sum(self.__entries.pop(key, _MISSING) is not _MISSING for key in keys)
+
+    def clear(self) -> None:
+        """ Deletes all entries, the counters are kept """
+        with self.__lock:
+            self.__entries.clear()
+
+    def configure(self, capacity: int | None = None, ttl: float | None = None) -> None:
+        """
+        Changes the capacity (the least recently used entries above it are evicted) and the TTL of the new entries
+        :param capacity: None - the capacity is not changed
+        :param ttl: None or 0 - the new entries do not expire
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError(f'The capacity of the cache must be positive: {capacity}')
+        with self.__lock:
+            if capacity is not None:
+                self.__capacity = capacity
+                while len(self.__entries) > capacity:
+                    self.__entries.popitem(last=False)
+                    self.__evictions += 1
+            self.__ttl = ttl or None
+
+    def get_stats(self) -> dict[str, int | float | None]:
+        """ :return: size, capacity, ttl, hits, misses, evictions, expirations and hit ratio (0 - 1) """
+        with self.__lock:
+            requests: int = self.__hits + self.__misses
+            return {
+                'size': len(self.__entries),
+                'capacity': self.__capacity,
+                'ttl': self.__ttl,
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'expirations': self.__expirations,
+                'hit_ratio': round(self.__hits / requests, 4) if requests else 0.0
+            }
+
+    def reset_stats(self) -> None:
+        with self.__lock:
+            self.__hits = self.__misses = self.__evictions = self.__expirations = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """ Checks the entry without changing its position and the counters (an expired entry is not contained) """
+        entry: tuple[Any, float] | None = self.__entries.get(key)
+        return entry is not None and (not entry[1] or entry[1] > monotonic())
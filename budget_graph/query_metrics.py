@@ -0,0 +1,211 @@
+"""
+Metrics of the database queries collected in the process.
+
+For each query (by its name in the SQL registry) the number of calls, errors and rows
+(returned by SELECT or changed by INSERT/UPDATE/DELETE/COPY) and the histogram of the execution time are kept,
+separately - the histogram of the time of waiting for a connection from the pool.
+
+The histograms have fixed buckets whose bounds grow by 2^(1/4) (~19%) from 10 µs to ~140 s,
+so a record takes O(1) time and no memory, and p50/p95/p99 are estimated with an error of no more than one bucket.
+
+The summary is written to logs/QueryMetricsLog.log on demand:
+dump_query_metrics() or the SIGUSR1 signal (kill -USR1 <pid>) after register_dump_signal().
+Collection is enabled by "query_metrics_enable" in the [database] section of the config.
+"""
+from bisect import bisect_left
+from math import ceil
+from time import perf_counter
+from threading import RLock
+from contextlib import contextmanager
+import signal
+
+from budget_graph.logger import setup_logger
+from budget_graph.global_config import GlobalConfig
+
+logger_metrics = setup_logger('logs/QueryMetricsLog.log', 'query_metrics_logger')
+
+BUCKET_MIN: float = 0.000_01  # seconds, upper bound of the first bucket
+BUCKET_GROWTH: float = 2 ** 0.25
+BUCKETS_NUMBER: int = 96  # + 1 bucket for the values above the last bound (~140 s)
+BUCKET_BOUNDS: tuple[float, ...] = tuple(BUCKET_MIN * BUCKET_GROWTH ** i for i in range(BUCKETS_NUMBER))
+
+
+class LatencyHistogram:
+    """ Histogram of durations in seconds, not thread-safe (is used under the lock of QueryMetrics) """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts: list[int] = [0] * (BUCKETS_NUMBER + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def record(self, duration: float) -> None:
+        self.counts[bisect_left(BUCKET_BOUNDS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def percentile(self, percent: float) -> float:
+        """
+        :param percent: 0 - 100
+        :return: upper bound of the bucket containing the percentile (no more than the maximum)
+        | 0 if there are no values
+        """
+        if not self.count:
+            return 0.0
+        rank: int = max(ceil(self.count * percent / 100), 1)
+        cumulative: int = 0
+        for index, number in enumerate(self.counts):
+            cumulative += number
+            if cumulative >= rank:
+                return min(BUCKET_BOUNDS[index], self.max) if index < BUCKETS_NUMBER else self.max
+        return self.max
+
+    def get_summary(self) -> dict[str, int | float]:
+        """ :return: number of values and durations in milliseconds """
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 3) if self.count else 0,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'total_ms': round(self.total * 1000, 3)
+        }
+
+
+class QueryStats:
+    __slots__ = ('errors', 'rows', 'latency')
+
+    def __init__(self):
+        self.errors: int = 0
+        self.rows: int = 0
+        self.latency = LatencyHistogram()
+
+
+class QueryMetrics:
+    """ Thread-safe storage of the metrics of the queries and of the waiting for a pool connection """
+    __slots__ = ('__lock', '__queries', '__pool_wait', '__pool_wait_errors')
+
+    def __init__(self):
+        # reentrant: the summary can be requested by the signal handler while the main thread is recording
+        self.__lock = RLock()
+        self.__queries: dict[str, QueryStats] = {}
+        self.__pool_wait = LatencyHistogram()
+        self.__pool_wait_errors: int = 0
+
+    def record_query(self, name: str, duration: float, rows: int = 0, error: bool = False) -> None:
+        with self.__lock:
+            stats: QueryStats | None = self.__queries.get(name)
+            if stats is None:
+                stats = self.__queries[name] = QueryStats()
+            stats.latency.record(duration)
+            stats.rows += rows
+            stats.errors += error
+
+    def add_rows(self, name: str, rows: int) -> None:
+        """ Rows read after the query has been recorded (named cursors return the rows after the execution) """
+        with self.__lock:
+            if name in self.__queries:
+                self.__queries[name].rows += rows
+
+    def record_pool_wait(self, duration: float, error: bool = False) -> None:
+        with self.__lock:
+            self.__pool_wait.record(duration)
+            self.__pool_wait_errors += error
+
+    def get_summary(self) -> dict[str, dict]:
+        """
+        :return: {'queries': {name: {calls, errors, rows, avg_ms, p50_ms, p95_ms, p99_ms, max_ms, total_ms}},
+                  'pool_wait': {count, errors, avg_ms, p50_ms, p95_ms, p99_ms, max_ms, total_ms}}
+        """
+        with self.__lock:
+            queries: dict[str, dict] = {}
+            for name, stats in self.__queries.items():
+                latency: dict[str, int | float] = stats.latency.get_summary()
+                queries[name] = {'calls': latency.pop('count'), 'errors': stats.errors, 'rows': stats.rows, **latency}
+            pool_wait: dict[str, int | float] = self.__pool_wait.get_summary()
+            pool_wait['errors'] = self.__pool_wait_errors
+        return {'queries': queries, 'pool_wait': pool_wait}
+
+    def format_summary(self) -> str:
+        """ :return: summary as a table, the queries are sorted by the total time """
+        summary: dict[str, dict] = self.get_summary()
+        lines: list[str] = [f'{"query":<45}{"calls":>9}{"errors":>8}{"rows":>11}{"avg, ms":>10}{"p50, ms":>10}'
+                            f'{"p95, ms":>10}{"p99, ms":>10}{"max, ms":>10}{"total, s":>10}']
+        rows: list[tuple[str, int, int, int | str, dict]] = [
+            (name, stats['calls'], stats['errors'], stats['rows'], stats)
+            for name, stats in sorted(summary['queries'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        ]
+        pool_wait: dict = summary['pool_wait']
+        rows.append(('[pool wait]', pool_wait['count'], pool_wait['errors'], '', pool_wait))
+        for name, calls, errors, number_of_rows, stats in rows:
+            lines.append(f'{name:<45}{calls:>9}{errors:>8}{number_of_rows:>11}{stats["avg_ms"]:>10.3f}'
+                         f'{stats["p50_ms"]:>10.3f}{stats["p95_ms"]:>10.3f}{stats["p99_ms"]:>10.3f}'
+                         f'{stats["max_ms"]:>10.3f}{stats["total_ms"] / 1000:>10.3f}')
+        return '\n'.join(lines)
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__queries.clear()
+            self.__pool_wait = LatencyHistogram()
+            self.__pool_wait_errors = 0
+
+
+# metrics of all connections of the process
+query_metrics = QueryMetrics()
+
+
+@contextmanager
+def measure_query(name: str, cur):
+    """
+    Records the execution time of the block as a call of the query,
+    the number of rows is taken from cur.rowcount after the block, an exception is recorded as an error
+    """
+    if not GlobalConfig.db_query_metrics_enable:
+        yield
+        return
+    start: float = perf_counter()
+    try:
+        yield
+    except BaseException:
+        query_metrics.record_query(name, perf_counter() - start, error=True)
+        raise
+    query_metrics.record_query(name, perf_counter() - start, max(cur.rowcount, 0))
+
+
+@contextmanager
+def measure_pool_wait():
+    """ Records the execution time of the block as the waiting for a pool connection """
+    if not GlobalConfig.db_query_metrics_enable:
+        yield
+        return
+    start: float = perf_counter()
+    try:
+        yield
+    except BaseException:
+        query_metrics.record_pool_wait(perf_counter() - start, error=True)
+        raise
+    query_metrics.record_pool_wait(perf_counter() - start)
+
+
+def dump_query_metrics(*args) -> str:  # pylint: disable=unused-argument
+    """
+    Writes the summary to the log (the arguments of the signal handler are ignored)
+    :return: summary as a table
+    """
+    summary: str = query_metrics.format_summary()
+    logger_metrics.info(f'[QUERY_METRICS]\n{summary}')
+    return summary
+
+
+def register_dump_signal() -> bool:
+    """
+    The summary is written to the log when the process receives SIGUSR1 (must be called from the main thread)
+    :return: False if the platform does not support the signal (Windows)
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return False
+    signal.signal(signal.SIGUSR1, dump_query_metrics)
+    return True
@@ -0,0 +1,184 @@
+"""
+Two-level cache: the in-process LruCache (L1) and a Redis server shared by the bot and the web application (L2).
+
+A value that is not in L1 is read from Redis and put into L1, so a process that has just started (or another process)
+does not query the database for the users that are already known. The writes and deletions go to both levels.
+Redis is used if "redis_enable" is true in the [cache] section of the config, the server is set in .env:
+REDIS_HOST, REDIS_PORT (6379), REDIS_DB (0), REDIS_PASSWORD.
+
+Redis is an optional acceleration: if it is unavailable, the caches work as L1 only, the error is logged
+and the server is not requested again for REDIS_RETRY_INTERVAL seconds, so a broken connection does not slow down
+every update. The values are stored in a compact form (see the encode/decode functions of each cache)
+with the TTL of the level, the multi-key operations are one request (MGET, DEL) or one pipeline (SET).
+"""
+from os import getenv
+from time import monotonic
+from threading import Lock
+from typing import Any
+from collections.abc import Callable, Hashable, Iterable
+from dotenv import load_dotenv
+from redis import Redis
+from redis.exceptions import RedisError
+
+from budget_graph.logger import setup_logger
+from budget_graph.global_config import GlobalConfig
+from budget_graph.lru_cache import LruCache
+
+load_dotenv()  # Load environment variables from .env file
+
+logger_redis = setup_logger("logs/RedisLog.log", "redis_logger")
+
+KEY_PREFIX: str = 'budget_graph'
+REDIS_TIMEOUT: float = 0.1  # seconds, connection and response timeout: a slow server is treated as unavailable
+REDIS_RETRY_INTERVAL: float = 30.0  # seconds without requests to the server after an error
+
+_MISSING = object()
+
+
+class RedisConnection:
+    """ The client of the process (created at the first use) and the pause after an error """
+    __client = None
+    __retry_after: float = 0.0
+    __lock = Lock()
+
+    @staticmethod
+    def get_client():
+        """ :return: the client | None if Redis is disabled or the pause after an error has not passed """
+        if not GlobalConfig.redis_enable or monotonic() < RedisConnection.__retry_after:
+            return None
+        if RedisConnection.__client is None:
+            with RedisConnection.__lock:
+                if RedisConnection.__client is None:
+                    RedisConnection.__client = Redis(
+                        host=getenv('REDIS_HOST') or 'localhost',
+                        port=int(getenv('REDIS_PORT') or 6379),
+                        db=int(getenv('REDIS_DB') or 0),
+                        password=getenv('REDIS_PASSWORD') or None,
+                        socket_timeout=REDIS_TIMEOUT,
+                        socket_connect_timeout=REDIS_TIMEOUT
+                    )
+        return RedisConnection.__client
+
+    @staticmethod
+    def set_client(client) -> None:
+        """ Replaces the client (None - a new client will be created at the next use), the pause is reset """
+        with RedisConnection.__lock:
+            RedisConnection.__client = client
+            RedisConnection.__retry_after = 0.0
+
+    @staticmethod
+    def report_error(err: Exception, operation: str) -> None:
+        RedisConnection.__retry_after = monotonic() + REDIS_RETRY_INTERVAL
+        logger_redis.error(f'[REDIS] {operation}: {str(err)}, the next attempt in {REDIS_RETRY_INTERVAL} s')
+
+
+class TwoLevelCache:
+    """
+    name - part of the Redis keys ("budget_graph:<name>:<key>")
+    local - L1 cache of the process
+    ttl - seconds, the TTL of the values in Redis
+    encode, decode - conversion of a value to bytes and back
+    """
+    __slots__ = ('__prefix', '__local', '__ttl', '__encode', '__decode')
+
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    def __init__(self,
+                 name: str,
+                 local: LruCache,
+                 ttl: int,
+                 encode: Callable[[Any], bytes],
+                 decode: Callable[[bytes], Any]):
+        self.__prefix: str = f'{KEY_PREFIX}:{name}:'
+        self.__local: LruCache = local
+        self.__ttl: int = ttl
+        self.__encode: Callable[[Any], bytes] = encode
+        self.__decode: Callable[[bytes], Any] = decode
+
+    @property
+    def local(self) -> LruCache:
+        return self.__local
+
+    def set_ttl(self, ttl: int) -> None:
+        self.__ttl = ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ :return: the value from L1 or (if it is not there) from Redis | default """
+        value: Any = self.__local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if (client := RedisConnection.get_client()) is None:
+            return default
+        try:
+            data: bytes | None = client.get(f'{self.__prefix}{key}')
+        except RedisError as err:
+            RedisConnection.report_error(err, 'GET')
+            return default
+        if data is None:
+            return default
+        value = self.__decode(data)
+        self.__local.set(key, value)
+        return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        """ :return: {key: value} of the found keys, the keys that are not in L1 are read from Redis by one MGET """
+        found: dict[Hashable, Any] = {}
+        missing: list[Hashable] = []
+        for key in keys:
+            value: Any = self.__local.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if not missing or (client := RedisConnection.get_client()) is None:
+            return found
+        try:
+            values: list[bytes | None] = client.mget([f'{self.__prefix}{key}' for key in missing])
+        except RedisError as err:
+            RedisConnection.report_error(err, 'MGET')
+            return found
+        for key, data in zip(missing, values):
+            if data is not None:
+                found[key] = self.__decode(data)
+                self.__local.set(key, found[key])
+        return found
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, values: dict[Hashable, Any]) -> None:
+        """
+        Writes the values to L1 and (by one pipeline) to Redis.
+        The values that are already in L1 are not written to Redis again (the bot refreshes the caches on every update)
+        """
+        changed: dict[Hashable, Any] = {key: value for key, value in values.items()
+                                        if self.__local.peek(key, _MISSING) != value}
+        for key, value in values.items():
+            self.__local.set(key, value)
+        if not changed or (client := RedisConnection.get_client()) is None:
+            return
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for key, value in changed.items():
+                pipeline.set(f'{self.__prefix}{key}', self.__encode(value), ex=self.__ttl)
+            pipeline.execute()
+        except RedisError as err:
+            RedisConnection.report_error(err, 'SET')
+
+    def delete(self, key: Hashable) -> bool:
+        """ :return: False if there was no such entry in L1 """
+        return self.delete_many((key,)) > 0
+
+    def delete_many(self, keys: Iterable[Hashable]) -> int:
+        """
+        Deletes the keys from both levels (from Redis by one DEL)
+        :return: number of the keys deleted from L1
+        """
+        keys = tuple(keys)
+        deleted: int = self.__local.delete_many(keys)
+        if keys and (client := RedisConnection.get_client()) is not None:
+            try:
+                client.delete(*(f'{self.__prefix}{key}' for key in keys))
+            except RedisError as err:
+                # the value may be left in Redis until its TTL expires
+                RedisConnection.report_error(err, 'DEL')
+        return deleted
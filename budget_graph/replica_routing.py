@@ -0,0 +1,63 @@
+"""
+Routing of the read-only queries to a streaming replica with the read-your-writes window.
+
+The replica is optional: it is used if POSTGRES_REPLICA_HOST is set in .env
+(the database, user and password are the same as on the primary server).
+DatabaseQueries reads from the replica, except for the keys (telegram_id, group_id, username)
+that have been changed by a write of this process during the last read_your_writes_window seconds:
+the replica may not have received these changes yet, so they are read from the primary server.
+"""
+from time import monotonic
+from threading import Lock
+from collections.abc import Hashable
+
+from budget_graph.global_config import GlobalConfig
+
+DEFAULT_WINDOW: float = 5.0  # seconds, if read_your_writes_window is not specified in the config
+
+
+class ReadYourWritesWindow:
+    """
+    Thread-safe set of the keys written during the last window seconds.
+    Expired keys are removed by mark() no more often than once per window, so the set does not grow.
+    """
+    __slots__ = ('__lock', '__deadlines', '__next_prune')
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__deadlines: dict[tuple[str, Hashable], float] = {}
+        self.__next_prune: float = 0.0
+
+    @staticmethod
+    def get_window() -> float:
+        window: float | None = GlobalConfig.db_read_your_writes_window
+        return DEFAULT_WINDOW if window is None else window
+
+    def mark(self, **keys: Hashable) -> None:
+        """
+        The keys (for example, telegram_id=..., group_id=...) are read from the primary server during the window,
+        keys with the None value are skipped
+        """
+        now: float = monotonic()
+        window: float = self.get_window()
+        with self.__lock:
+            for name, value in keys.items():
+                if value is not None:
+                    self.__deadlines[(name, value)] = now + window
+            if now >= self.__next_prune:
+                self.__deadlines = {key: deadline for key, deadline in self.__deadlines.items() if deadline > now}
+                self.__next_prune = now + window
+
+    def is_active(self, **keys: Hashable) -> bool:
+        """ :return: True if any of the keys has been written during the window """
+        now: float = monotonic()
+        deadlines: dict[tuple[str, Hashable], float] = self.__deadlines
+        return any(deadlines.get((name, value), 0.0) > now for name, value in keys.items() if value is not None)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__deadlines = {}
+
+
+# keys written by all connections of the process
+read_your_writes = ReadYourWritesWindow()
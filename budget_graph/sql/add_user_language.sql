@@ -0,0 +1,9 @@
+INSERT INTO
+  "budget_graph"."user_languages_telegram"
+  ("telegram_id", "language")
+VALUES
+  (%(telegram_id)s::bigint, %(language)s::text)
+ON CONFLICT
+  ("telegram_id")
+DO UPDATE SET
+  "language" = EXCLUDED."language"
\ No newline at end of file
@@ -0,0 +1,13 @@
+-- Records of both tiers: the recent ones ("monetary_transactions") and the archived ones (archive_transactions.sql).
+-- The conditions of a query are applied to each table separately, so each of them is read by its own index,
+-- and the ordered reads (the last records of the group) are merged without reading the whole archive.
+CREATE OR REPLACE VIEW "budget_graph"."all_transactions" AS
+SELECT
+  "group_id", "transaction_id", "username", "transfer", "record_date", "category", "description"
+FROM
+  "budget_graph"."monetary_transactions"
+UNION ALL
+SELECT
+  "group_id", "transaction_id", "username", "transfer", "record_date", "category", "description"
+FROM
+  "budget_graph"."monetary_transactions_archive"
\ No newline at end of file
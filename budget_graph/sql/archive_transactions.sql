@@ -0,0 +1,29 @@
+-- Moves a batch of the records dated before the horizon from "monetary_transactions" into the archive table.
+-- The deletion and the insertion are one statement: the triggers of the first table subtract the records
+-- from "daily_balances" and "monthly_user_totals", the triggers of the archive add them back,
+-- so the balances and the diagrams do not change. The uuid of the group transactions is changed by the deletion.
+WITH
+moved AS (
+  DELETE FROM
+    "budget_graph"."monetary_transactions"
+  WHERE
+    ("group_id", "transaction_id") IN (
+      SELECT
+        "group_id", "transaction_id"
+      FROM
+        "budget_graph"."monetary_transactions"
+      WHERE
+        "record_date" < %(horizon)s::date
+      LIMIT
+        %(batch_size)s::integer
+    )
+  RETURNING
+    "group_id", "transaction_id", "username", "transfer", "record_date", "category", "description"
+)
+INSERT INTO
+  "budget_graph"."monetary_transactions_archive"
+  ("group_id", "transaction_id", "username", "transfer", "record_date", "category", "description")
+SELECT
+  "group_id", "transaction_id", "username", "transfer", "record_date", "category", "description"
+FROM
+  moved
\ No newline at end of file
@@ -0,0 +1,53 @@
+-- The sums of "daily_balances" and "monthly_user_totals" and the uuid of the group transactions
+-- include the archived records: they are kept up to date by the same functions as for "monetary_transactions".
+-- Moving a record into the archive subtracts it by the trigger of one table and adds it by the trigger of the other,
+-- so the sums do not change (archive_transactions.sql). The archived records are not updated.
+CREATE OR REPLACE TRIGGER
+    "after_insert_transactions_archive_daily_balances"
+  AFTER
+  INSERT
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_daily_balances();
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_transactions_archive_daily_balances"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_daily_balances();
+
+CREATE OR REPLACE TRIGGER
+    "after_insert_transactions_archive_monthly_user_totals"
+  AFTER
+  INSERT
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_monthly_user_totals();
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_transactions_archive_monthly_user_totals"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_monthly_user_totals();
+
+CREATE OR REPLACE TRIGGER
+    "trigger_update_transaction_uuid_archive_after_delete"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_transaction_uuid();
\ No newline at end of file
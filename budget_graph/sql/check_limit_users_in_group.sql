@@ -1,5 +1,5 @@
 SELECT
- "users_number" IS NOT NULL AND "users_number" <> 20
+ "users_number" < 20
 FROM
  "budget_graph"."groups"
 WHERE
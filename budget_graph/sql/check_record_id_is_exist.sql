@@ -3,7 +3,7 @@ SELECT
     SELECT
       1
     FROM
-      "budget_graph"."monetary_transactions"
+      "budget_graph"."all_transactions"
     WHERE
       "group_id" = %(group_id)s::smallint
       AND "transaction_id" = %(transaction_id)s::integer
@@ -0,0 +1,4 @@
+-- an empty category or description is loaded as an empty string, not NULL (as in add_transaction_to_db.sql)
+COPY pg_temp."import_transactions" ("line_number", "transfer", "record_date", "category", "description")
+FROM STDIN
+WITH (FORMAT csv, FORCE_NOT_NULL ("category", "description"))
\ No newline at end of file
@@ -34,14 +34,17 @@ CREATE TABLE IF NOT EXISTS "budget_graph"."users" (
                                 NULL::bool, NULL::bool]       CHECK(array_length("settings", 1) = 10)
 );
 CREATE TABLE IF NOT EXISTS "budget_graph"."groups" (
-    "id"                smallserial PRIMARY KEY, -- It makes sense to add a UNIQUE or PRIMARY KEY constraint on this
-                                                 -- column to protect against erroneously adding duplicate values,
-                                                 -- but this does not happen automatically
-    "owner"             bigint      NOT NULL UNIQUE    CHECK("owner" BETWEEN 1 AND POWER(10, 12) - 1),
-    "token"             varchar(32) NOT NULL UNIQUE    CHECK(LENGTH("token") = 32),
+    "id"                  smallserial PRIMARY KEY, -- It makes sense to add a UNIQUE or PRIMARY KEY constraint on this
+                                                   -- column to protect against erroneously adding duplicate values,
+                                                   -- but this does not happen automatically
+    "owner"               bigint      NOT NULL UNIQUE    CHECK("owner" BETWEEN 1 AND POWER(10, 12) - 1),
+    "token"               varchar(32) NOT NULL UNIQUE    CHECK(LENGTH("token") = 32),
     -- number of participants in the group (auto filling and counting)
-    "users_number"      smallint    NOT NULL DEFAULT 1 CHECK(("users_number" BETWEEN 1 AND 20) OR "users_number" IS NULL),
-    "transactions_uuid" uuid            NULL
+    -- (the new group gets its owner as the first member in the same statement in which it is created)
+    "users_number"        smallint    NOT NULL DEFAULT 0 CHECK("users_number" BETWEEN 0 AND 20),
+    "transactions_uuid"   uuid            NULL,
+    -- number of the last transaction of the group (auto filling, see func_transaction_number.sql)
+    "last_transaction_id" integer     NOT NULL DEFAULT 0 CHECK("last_transaction_id" >= 0)
 );
 CREATE TABLE IF NOT EXISTS "budget_graph"."users_groups" (
     "telegram_id" bigint          PRIMARY KEY CHECK("telegram_id" BETWEEN 1 AND POWER(10, 12) - 1),
@@ -51,13 +54,45 @@ CREATE TABLE IF NOT EXISTS "budget_graph"."monetary_transactions" (
     "group_id"       smallint    NOT NULL CHECK("group_id" > 0),
     "transaction_id" integer     NOT NULL CHECK("transaction_id" > 0),
     "username"       varchar(20) NOT NULL CHECK(LENGTH("username") BETWEEN 3 AND 20),
-    "total"          integer     NOT NULL,
     "transfer"       integer     NOT NULL CHECK("transfer" <> 0),
     "record_date"    date        NOT NULL,
     "category"       varchar(25)     NULL,
     "description"    varchar(50)     NULL,
     PRIMARY KEY      ("group_id", "transaction_id")
 );
+-- records dated before the archive horizon are moved here by the archival job (archive_transactions.sql),
+-- so "monetary_transactions" and its indexes contain only the recent records;
+-- the records of both tables are read through the "all_transactions" view (all_transactions_view.sql)
+CREATE TABLE IF NOT EXISTS "budget_graph"."monetary_transactions_archive" (
+    "group_id"       smallint    NOT NULL CHECK("group_id" > 0),
+    "transaction_id" integer     NOT NULL CHECK("transaction_id" > 0),
+    "username"       varchar(20) NOT NULL CHECK(LENGTH("username") BETWEEN 3 AND 20),
+    "transfer"       integer     NOT NULL CHECK("transfer" <> 0),
+    "record_date"    date        NOT NULL,
+    "category"       varchar(25)     NULL,
+    "description"    varchar(50)     NULL,
+    PRIMARY KEY      ("group_id", "transaction_id")
+);
+-- sum of the group transactions for each day (auto filling, see func_daily_balances.sql)
+-- the balance after a transaction is calculated when reading: the sum of the previous days + the sum within the day
+CREATE TABLE IF NOT EXISTS "budget_graph"."daily_balances" (
+    "group_id"    smallint NOT NULL CHECK("group_id" > 0),
+    "record_date" date     NOT NULL,
+    "day_sum"     bigint   NOT NULL DEFAULT 0,
+    PRIMARY KEY   ("group_id", "record_date")
+);
+-- income and expense of each group member for each month (auto filling, see func_monthly_user_totals.sql)
+-- the diagrams are built from these sums, only the records of partially selected months are read
+-- (there are no CHECK constraints on the sums: the triggers add negative changes with INSERT ... ON CONFLICT)
+CREATE TABLE IF NOT EXISTS "budget_graph"."monthly_user_totals" (
+    "group_id"       smallint    NOT NULL CHECK("group_id" > 0),
+    "username"       varchar(20) NOT NULL,
+    "record_month"   date        NOT NULL, -- the first day of the month
+    "income_sum"     bigint      NOT NULL DEFAULT 0,
+    "expense_sum"    bigint      NOT NULL DEFAULT 0, -- negative
+    "records_number" integer     NOT NULL DEFAULT 0,
+    PRIMARY KEY      ("group_id", "username", "record_month")
+);
 CREATE TABLE IF NOT EXISTS "budget_graph"."user_languages_telegram" (
     "telegram_id"  bigint     NOT NULL UNIQUE CHECK("telegram_id" BETWEEN 1 AND POWER(10, 12) - 1),
     "language"     varchar(2) NOT NULL        CHECK("language" IN ('en', 'ru', 'de', 'fr', 'es', 'is', 'kk', 'pt')),
@@ -68,4 +103,9 @@ CREATE TABLE IF NOT EXISTS "budget_graph"."premium_users" (
     "paid_until"     date    NOT NULL,
     "premium_status" boolean NOT NULL DEFAULT False, -- auto fill depending on "paid_until"
     PRIMARY KEY      ("telegram_id")
+);
+-- names of the applied scripts from the sql/migrations directory
+CREATE TABLE IF NOT EXISTS "budget_graph"."schema_migrations" (
+    "name"       varchar(100)             PRIMARY KEY,
+    "applied_at" timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
\ No newline at end of file
@@ -0,0 +1,10 @@
+-- The rows of the import are loaded here by COPY (copy_to_import_staging_table.sql)
+-- and then added to the group by one statement (import_transactions.sql).
+-- The table exists only in the session of the import and is dropped at the end of its transaction
+CREATE TEMPORARY TABLE "import_transactions" (
+    "line_number" integer     NOT NULL PRIMARY KEY,
+    "transfer"    integer     NOT NULL,
+    "record_date" date        NOT NULL,
+    "category"    varchar(25) NOT NULL,
+    "description" varchar(50) NOT NULL
+) ON COMMIT DROP
\ No newline at end of file
@@ -10,7 +10,8 @@ BEGIN
              schemaname = 'budget_graph'
            ) LOOP
    EXECUTE
-   'DROP TABLE
+   -- IF EXISTS: the partitions are deleted together with the partitioned table
+   'DROP TABLE IF EXISTS
    "budget_graph".'
    ||
    quote_ident(r.tablename)
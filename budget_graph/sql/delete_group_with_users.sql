@@ -0,0 +1,39 @@
+-- users
+WITH
+telegram_id_users AS (
+  SELECT
+    u."telegram_id"
+  FROM
+    "budget_graph"."users" u
+    JOIN "budget_graph"."users_groups" u_g ON u."telegram_id" = u_g."telegram_id"
+  WHERE
+    u_g."group_id" = %(group_id)s::smallint
+)
+DELETE FROM
+  "budget_graph"."users"
+WHERE
+  "telegram_id" IS NOT NULL AND "telegram_id" = ANY(ARRAY(SELECT "telegram_id" FROM telegram_id_users));
+
+-- groups
+DELETE FROM
+  "budget_graph"."groups"
+WHERE
+  "id" = %(group_id)s::smallint;
+
+-- users_groups
+DELETE FROM
+  "budget_graph"."users_groups"
+WHERE
+  "group_id" = %(group_id)s::smallint;
+
+-- monetary_transactions
+DELETE FROM
+  "budget_graph"."monetary_transactions"
+WHERE
+  "group_id" = %(group_id)s::smallint;
+
+-- monetary_transactions_archive
+DELETE FROM
+  "budget_graph"."monetary_transactions_archive"
+WHERE
+  "group_id" = %(group_id)s::smallint
\ No newline at end of file
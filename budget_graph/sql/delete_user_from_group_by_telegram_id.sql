@@ -0,0 +1,12 @@
+-- the membership is deleted last: the group of the user is returned
+DELETE FROM
+  "budget_graph"."users"
+WHERE
+  "telegram_id" = %(telegram_id)s::bigint;
+
+DELETE FROM
+  "budget_graph"."users_groups"
+WHERE
+  "telegram_id" = %(telegram_id)s::bigint
+RETURNING
+  "group_id"
\ No newline at end of file
@@ -0,0 +1,30 @@
+-- All records of the group, starting with the most recent (the format of select_data_for_household_table).
+-- "total" = the current balance of the group - the sum of the later records:
+-- the window is calculated in the order in which the rows are read,
+-- so the query returns the first rows without sorting or buffering the whole group history
+SELECT
+  "transaction_id",
+  "username",
+  "transfer",
+  (
+    (
+      SELECT
+        COALESCE(SUM("day_sum"), 0)
+      FROM
+        "budget_graph"."daily_balances"
+      WHERE
+        "group_id" = %(group_id)s::smallint
+    )
+    - SUM("transfer") OVER (ORDER BY "record_date" DESC, "transaction_id" DESC) + "transfer"
+  )::integer "total",
+  to_char("record_date", 'DD/MM/YYYY')::date "record_date",
+  "category",
+  "description"
+FROM
+  "budget_graph"."all_transactions" m_t
+WHERE
+  m_t."group_id" = %(group_id)s::smallint
+-- the table column, not the output "record_date" (to_char), otherwise all rows are sorted before the first one is returned
+ORDER BY
+  m_t."record_date" DESC,
+  m_t."transaction_id" DESC
\ No newline at end of file
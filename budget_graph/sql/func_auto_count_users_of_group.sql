@@ -1,18 +1,23 @@
 -- Create a function with a trigger for automatically counting the number of participants in a group:
+-- the counter is changed by the number of added / deleted members instead of counting all members of the group.
+-- The triggers are executed once per statement, so deleting all members of a group updates its row once.
+-- The row of the group stays locked until the end of the transaction, so concurrent changes do not lose updates,
+-- and the CHECK of "users_number" rejects a member who exceeds the group limit.
 -- Functions to update the number of group members (INSERT)
 CREATE OR REPLACE FUNCTION
   update_number_of_group_users()
 RETURNS
   TRIGGER AS $update_number_of_group_users$
 BEGIN
-    UPDATE "budget_graph"."groups"
-    SET "users_number" = (
-        SELECT COUNT(*)
-        FROM "budget_graph"."users_groups"
-        WHERE "group_id" = NEW."group_id"
-    )
-    WHERE "id" = NEW."group_id";
-    RETURN NEW;
+    UPDATE "budget_graph"."groups" g
+    SET "users_number" = g."users_number" + added."number"
+    FROM (
+        SELECT "group_id", COUNT(*) "number"
+        FROM new_rows
+        GROUP BY "group_id"
+    ) added
+    WHERE g."id" = added."group_id";
+    RETURN NULL;
 END;
   $update_number_of_group_users$
   LANGUAGE plpgsql;
@@ -23,7 +28,8 @@ CREATE TRIGGER
   AFTER
   INSERT
     ON "budget_graph"."users_groups"
-  FOR EACH ROW
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
   EXECUTE FUNCTION
     update_number_of_group_users();
 
@@ -33,14 +39,15 @@ CREATE OR REPLACE FUNCTION
 RETURNS
   TRIGGER AS $update_number_of_group_users_after_delete$
 BEGIN
-    UPDATE "budget_graph"."groups"
-    SET "users_number" = (
-        SELECT COUNT(*)
-        FROM "budget_graph"."users_groups"
-        WHERE "group_id" = OLD."group_id"
-    )
-    WHERE "id" = OLD."group_id";
-    RETURN OLD;
+    UPDATE "budget_graph"."groups" g
+    SET "users_number" = g."users_number" - deleted."number"
+    FROM (
+        SELECT "group_id", COUNT(*) "number"
+        FROM old_rows
+        GROUP BY "group_id"
+    ) deleted
+    WHERE g."id" = deleted."group_id";
+    RETURN NULL;
 END;
   $update_number_of_group_users_after_delete$
   LANGUAGE plpgsql;
@@ -51,6 +58,7 @@ CREATE TRIGGER
   AFTER
   DELETE
   ON "budget_graph"."users_groups"
-  FOR EACH ROW
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
   EXECUTE FUNCTION
     update_number_of_group_users_after_delete();
\ No newline at end of file
@@ -1,14 +1,18 @@
--- Create a function with a trigger that will itself generate a transaction number within one group:
+-- Create a function with a trigger that will itself generate a transaction number within one group
+-- (rows inserted with a number are not processed: the import reserves the numbers for all its rows at once,
+-- see import_transactions.sql):
 CREATE OR REPLACE FUNCTION
   set_transaction_id()
 RETURNS
   TRIGGER AS $set_transaction_id$
 BEGIN
-    -- Determine the number of the last entry in the group
-    SELECT COALESCE(MAX("transaction_id"), 0) + 1  -- COALESCE is required if the table is still empty
-    INTO NEW."transaction_id"
-    FROM "budget_graph"."monetary_transactions"
-    WHERE "group_id" = NEW."group_id";
+    -- The number is taken from the group counter: the row of the group stays locked until the end of the transaction,
+    -- so concurrent inserts into one group get different numbers (the numbers of deleted records are not reused)
+    UPDATE "budget_graph"."groups"
+    SET "last_transaction_id" = "last_transaction_id" + 1
+    WHERE "id" = NEW."group_id"
+    RETURNING "last_transaction_id"
+    INTO NEW."transaction_id";
 
     RETURN NEW;
 END;
@@ -21,5 +25,7 @@ CREATE TRIGGER
   INSERT
     ON "budget_graph"."monetary_transactions"
   FOR EACH ROW
+  WHEN
+    (NEW."transaction_id" IS NULL)
   EXECUTE FUNCTION
     set_transaction_id();
\ No newline at end of file
@@ -0,0 +1,43 @@
+-- Income and expense of all members of the group (diagram type 1) for the whole history: only the monthly sums are read
+-- (the query is chosen by DatabaseQueries.get_data_for_plot_builder)
+WITH
+
+user_group AS (
+  SELECT
+    "group_id"
+  FROM
+    "budget_graph"."users_groups"
+  WHERE
+    "telegram_id" = %(telegram_id)s::bigint
+),
+
+-- the members of the group of the user
+usernames AS (
+  SELECT
+    users."username"
+  FROM
+    "budget_graph"."users_groups" users_groups
+    JOIN "budget_graph"."users" users ON users."telegram_id" = users_groups."telegram_id"
+  WHERE
+    users_groups."group_id" = (SELECT "group_id" FROM user_group)
+),
+
+totals AS (
+  SELECT
+    m_u_t."username",
+    m_u_t."income_sum",
+    m_u_t."expense_sum"
+  FROM
+    "budget_graph"."monthly_user_totals" m_u_t
+  WHERE
+    m_u_t."group_id" = (SELECT "group_id" FROM user_group)
+    AND m_u_t."username" = ANY(SELECT "username" FROM usernames)
+)
+
+SELECT
+  "username",
+  SUM("income_sum")::bigint "incomeSum",
+  SUM("expense_sum")::bigint "expenseSum"
+FROM
+  totals
+GROUP BY "username"
\ No newline at end of file
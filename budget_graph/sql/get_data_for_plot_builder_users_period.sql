@@ -0,0 +1,79 @@
+-- Income and expense of the selected members of the group (diagram types 0 and 2) for the period.
+-- The fully selected months are taken from "monthly_user_totals" (func_monthly_user_totals.sql),
+-- the records are read only for the partially selected months at the ends of the period.
+-- The bounds are calculated by DatabaseQueries.get_data_for_plot_builder (the ends are not included),
+-- every range is a range of the index ("group_id", "record_date")
+WITH
+
+user_group AS (
+  SELECT
+    "group_id"
+  FROM
+    "budget_graph"."users_groups"
+  WHERE
+    "telegram_id" = %(telegram_id)s::bigint
+),
+
+-- the selected members of the group of the user
+usernames AS (
+  SELECT
+    users."username"
+  FROM
+    "budget_graph"."users_groups" users_groups
+    JOIN "budget_graph"."users" users ON users."telegram_id" = users_groups."telegram_id"
+  WHERE
+    users_groups."group_id" = (SELECT "group_id" FROM user_group)
+    AND users_groups."telegram_id" = ANY(%(users)s::bigint[])
+),
+
+totals AS (
+  SELECT
+    m_u_t."username",
+    m_u_t."income_sum",
+    m_u_t."expense_sum"
+  FROM
+    "budget_graph"."monthly_user_totals" m_u_t
+  WHERE
+    m_u_t."group_id" = (SELECT "group_id" FROM user_group)
+    AND m_u_t."username" = ANY(SELECT "username" FROM usernames)
+    AND m_u_t."record_month" >= %(months_start)s::date
+    AND m_u_t."record_month" < %(months_end)s::date
+
+  UNION ALL
+
+  -- the records before the first fully selected month
+  SELECT
+    m_t."username",
+    GREATEST(m_t."transfer", 0),
+    LEAST(m_t."transfer", 0)
+  FROM
+    "budget_graph"."all_transactions" m_t
+  WHERE
+    m_t."group_id" = (SELECT "group_id" FROM user_group)
+    AND m_t."record_date" >= %(head_start)s::date
+    AND m_t."record_date" < %(head_end)s::date
+    AND m_t."username" = ANY(SELECT "username" FROM usernames)
+
+  UNION ALL
+
+  -- the records after the last fully selected month
+  SELECT
+    m_t."username",
+    GREATEST(m_t."transfer", 0),
+    LEAST(m_t."transfer", 0)
+  FROM
+    "budget_graph"."all_transactions" m_t
+  WHERE
+    m_t."group_id" = (SELECT "group_id" FROM user_group)
+    AND m_t."record_date" >= %(tail_start)s::date
+    AND m_t."record_date" < %(tail_end)s::date
+    AND m_t."username" = ANY(SELECT "username" FROM usernames)
+)
+
+SELECT
+  "username",
+  SUM("income_sum")::bigint "incomeSum",
+  SUM("expense_sum")::bigint "expenseSum"
+FROM
+  totals
+GROUP BY "username"
\ No newline at end of file
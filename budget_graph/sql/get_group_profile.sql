@@ -0,0 +1,15 @@
+-- Everything the group management menus need (see group_profile.py), the members are ordered by the username
+SELECT
+  g."owner",
+  g."token",
+  g."users_number",
+  array_agg(u."telegram_id" ORDER BY u."username"),
+  array_agg(u."username" ORDER BY u."username")
+FROM
+  "budget_graph"."groups" g
+  JOIN "budget_graph"."users_groups" u_g ON u_g."group_id" = g."id"
+  JOIN "budget_graph"."users" u ON u."telegram_id" = u_g."telegram_id"
+WHERE
+  g."id" = %(group_id)s::smallint
+GROUP BY
+  g."id"
\ No newline at end of file
@@ -0,0 +1,19 @@
+-- Everything the bot needs to process one update (see user_context.py).
+-- The query only reads, so it can be executed on the replica:
+-- the date of the last activity is written by the bot in batches (update_users_last_login.sql).
+SELECT
+  COALESCE(l."language", 'en'),
+  u."telegram_id" IS NOT NULL,
+  u."username",
+  u_g."group_id",
+  COALESCE(g."owner" = %(telegram_id)s::bigint, FALSE),
+  COALESCE(p."premium_status", FALSE),
+  u."timezone",
+  u."settings"
+FROM
+  (SELECT %(telegram_id)s::bigint AS "telegram_id") t
+  LEFT JOIN "budget_graph"."users" u ON u."telegram_id" = t."telegram_id"
+  LEFT JOIN "budget_graph"."user_languages_telegram" l ON l."telegram_id" = t."telegram_id"
+  LEFT JOIN "budget_graph"."users_groups" u_g ON u_g."telegram_id" = t."telegram_id"
+  LEFT JOIN "budget_graph"."groups" g ON g."id" = u_g."group_id"
+  LEFT JOIN "budget_graph"."premium_users" p ON p."telegram_id" = t."telegram_id"
\ No newline at end of file
@@ -0,0 +1,34 @@
+-- All rows of the import (create_import_staging_table.sql) are added to the group by one statement:
+-- the numbers are reserved in the group counter at once (the row trigger does not number rows with a number),
+-- "daily_balances" and the uuid of the group transactions are updated once by the statement-level triggers
+WITH
+import_size AS (
+  SELECT
+    COUNT(*)::integer "rows_number"
+  FROM
+    pg_temp."import_transactions"
+),
+group_counter AS (
+  UPDATE
+    "budget_graph"."groups"
+  SET
+    "last_transaction_id" = "last_transaction_id" + (SELECT "rows_number" FROM import_size)
+  WHERE
+    "id" = %(group_id)s::smallint
+  RETURNING
+    "last_transaction_id" - (SELECT "rows_number" FROM import_size) "first_transaction_id"
+)
+INSERT INTO
+  "budget_graph"."monetary_transactions"
+  ("group_id", "transaction_id", "username", "transfer", "record_date", "category", "description")
+SELECT
+  %(group_id)s::smallint,
+  g_c."first_transaction_id" + ROW_NUMBER() OVER (ORDER BY i_t."line_number"),
+  %(username)s::text,
+  i_t."transfer",
+  i_t."record_date",
+  i_t."category",
+  i_t."description"
+FROM
+  pg_temp."import_transactions" i_t
+  CROSS JOIN group_counter g_c
\ No newline at end of file
@@ -0,0 +1,119 @@
+-- The running balance is no longer stored in each record ("total" column),
+-- instead the sum of the group transactions for each day is stored in "daily_balances".
+
+-- new records must not be added while the existing ones are being moved
+LOCK TABLE "budget_graph"."monetary_transactions" IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS "budget_graph"."daily_balances" (
+    "group_id"    smallint NOT NULL CHECK("group_id" > 0),
+    "record_date" date     NOT NULL,
+    "day_sum"     bigint   NOT NULL DEFAULT 0,
+    PRIMARY KEY   ("group_id", "record_date")
+);
+
+INSERT INTO "budget_graph"."daily_balances" ("group_id", "record_date", "day_sum")
+SELECT "group_id", "record_date", SUM("transfer")
+FROM "budget_graph"."monetary_transactions"
+GROUP BY "group_id", "record_date"
+HAVING SUM("transfer") <> 0
+ON CONFLICT ("group_id", "record_date") DO UPDATE SET "day_sum" = EXCLUDED."day_sum";
+
+ALTER TABLE "budget_graph"."monetary_transactions" DROP COLUMN IF EXISTS "total";
+
+-- deleting a record also changes the version of the group transactions
+CREATE OR REPLACE FUNCTION update_transaction_uuid()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE "budget_graph"."groups"
+    SET transactions_uuid = gen_random_uuid()
+    WHERE id = COALESCE(NEW.group_id, OLD.group_id); -- NEW is NULL for DELETE
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trigger_update_transaction_uuid
+AFTER INSERT OR UPDATE OR DELETE ON "budget_graph"."monetary_transactions"
+FOR EACH ROW
+EXECUTE FUNCTION update_transaction_uuid();
+
+-- Create a function with triggers that keeps the sum of the group transactions for each day up to date.
+-- Adding or deleting a record (including a back-dated one) changes only one row of "daily_balances",
+-- the balance of the following records is not stored and therefore does not need to be corrected.
+-- The triggers are executed once per statement, so a bulk insert or delete updates each day only once.
+CREATE OR REPLACE FUNCTION
+  update_daily_balances()
+RETURNS
+  TRIGGER AS $update_daily_balances$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO "budget_graph"."daily_balances" ("group_id", "record_date", "day_sum")
+        SELECT "group_id", "record_date", SUM("transfer")
+        FROM new_rows
+        GROUP BY "group_id", "record_date"
+        ON CONFLICT ("group_id", "record_date")
+        DO UPDATE SET "day_sum" = "daily_balances"."day_sum" + EXCLUDED."day_sum";
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO "budget_graph"."daily_balances" ("group_id", "record_date", "day_sum")
+        SELECT "group_id", "record_date", -SUM("transfer")
+        FROM old_rows
+        GROUP BY "group_id", "record_date"
+        ON CONFLICT ("group_id", "record_date")
+        DO UPDATE SET "day_sum" = "daily_balances"."day_sum" + EXCLUDED."day_sum";
+    ELSE -- UPDATE: the old values are subtracted, the new ones are added
+        INSERT INTO "budget_graph"."daily_balances" ("group_id", "record_date", "day_sum")
+        SELECT "group_id", "record_date", SUM("transfer")
+        FROM (
+            SELECT "group_id", "record_date", "transfer" FROM new_rows
+            UNION ALL
+            SELECT "group_id", "record_date", -"transfer" FROM old_rows
+        ) changes
+        GROUP BY "group_id", "record_date"
+        ON CONFLICT ("group_id", "record_date")
+        DO UPDATE SET "day_sum" = "daily_balances"."day_sum" + EXCLUDED."day_sum";
+    END IF;
+
+    IF TG_OP <> 'INSERT' THEN
+        -- days without transactions are not stored (a zero sum does not change the balance anyway)
+        DELETE FROM "budget_graph"."daily_balances" d_b
+        USING (SELECT DISTINCT "group_id", "record_date" FROM old_rows) changed
+        WHERE
+          d_b."group_id" = changed."group_id" AND
+          d_b."record_date" = changed."record_date" AND
+          d_b."day_sum" = 0;
+    END IF;
+
+    RETURN NULL;
+END;
+  $update_daily_balances$
+  LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER
+    "after_insert_transactions_daily_balances"
+  AFTER
+  INSERT
+    ON "budget_graph"."monetary_transactions"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_daily_balances();
+
+CREATE OR REPLACE TRIGGER
+    "after_update_transactions_daily_balances"
+  AFTER
+  UPDATE
+    ON "budget_graph"."monetary_transactions"
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_daily_balances();
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_transactions_daily_balances"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_daily_balances();
\ No newline at end of file
@@ -0,0 +1,34 @@
+-- The transaction number is taken from the counter of the group instead of MAX("transaction_id") + 1.
+
+-- new records must not be added while the counters are being filled
+LOCK TABLE "budget_graph"."monetary_transactions" IN SHARE ROW EXCLUSIVE MODE;
+
+ALTER TABLE "budget_graph"."groups"
+ADD COLUMN IF NOT EXISTS "last_transaction_id" integer NOT NULL DEFAULT 0 CHECK("last_transaction_id" >= 0);
+
+UPDATE "budget_graph"."groups" g
+SET "last_transaction_id" = m_t."last_transaction_id"
+FROM (
+    SELECT "group_id", MAX("transaction_id") "last_transaction_id"
+    FROM "budget_graph"."monetary_transactions"
+    GROUP BY "group_id"
+) m_t
+WHERE g."id" = m_t."group_id";
+
+CREATE OR REPLACE FUNCTION
+  set_transaction_id()
+RETURNS
+  TRIGGER AS $set_transaction_id$
+BEGIN
+    -- The number is taken from the group counter: the row of the group stays locked until the end of the transaction,
+    -- so concurrent inserts into one group get different numbers (the numbers of deleted records are not reused)
+    UPDATE "budget_graph"."groups"
+    SET "last_transaction_id" = "last_transaction_id" + 1
+    WHERE "id" = NEW."group_id"
+    RETURNING "last_transaction_id"
+    INTO NEW."transaction_id";
+
+    RETURN NEW;
+END;
+  $set_transaction_id$
+  LANGUAGE plpgsql;
\ No newline at end of file
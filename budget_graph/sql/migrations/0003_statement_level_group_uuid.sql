@@ -0,0 +1,42 @@
+-- The uuid of the group transactions is updated once per statement instead of once per record.
+
+DROP TRIGGER IF EXISTS trigger_update_transaction_uuid ON "budget_graph"."monetary_transactions";
+
+CREATE OR REPLACE FUNCTION update_transaction_uuid()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE "budget_graph"."groups"
+        SET transactions_uuid = gen_random_uuid()
+        WHERE id IN (SELECT group_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE "budget_graph"."groups"
+        SET transactions_uuid = gen_random_uuid()
+        WHERE id IN (SELECT group_id FROM old_rows);
+    ELSE
+        UPDATE "budget_graph"."groups"
+        SET transactions_uuid = gen_random_uuid()
+        WHERE id IN (SELECT group_id FROM new_rows UNION SELECT group_id FROM old_rows);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trigger_update_transaction_uuid_after_insert
+AFTER INSERT ON "budget_graph"."monetary_transactions"
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_transaction_uuid();
+
+CREATE OR REPLACE TRIGGER trigger_update_transaction_uuid_after_update
+AFTER UPDATE ON "budget_graph"."monetary_transactions"
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_transaction_uuid();
+
+CREATE OR REPLACE TRIGGER trigger_update_transaction_uuid_after_delete
+AFTER DELETE ON "budget_graph"."monetary_transactions"
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_transaction_uuid();
\ No newline at end of file
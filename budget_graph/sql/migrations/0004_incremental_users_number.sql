@@ -0,0 +1,80 @@
+-- The number of group members is changed incrementally (+n / -n) by statement-level triggers
+-- instead of counting all members of the group after each added or deleted member.
+
+-- members must not be added or deleted while the counters are being recalculated
+LOCK TABLE "budget_graph"."users_groups" IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS after_add_user ON "budget_graph"."users_groups";
+DROP TRIGGER IF EXISTS after_delete_user ON "budget_graph"."users_groups";
+
+ALTER TABLE "budget_graph"."groups" DROP CONSTRAINT IF EXISTS "groups_users_number_check";
+ALTER TABLE "budget_graph"."groups" ALTER COLUMN "users_number" SET DEFAULT 0;
+
+UPDATE "budget_graph"."groups" g
+SET "users_number" = (
+    SELECT COUNT(*)
+    FROM "budget_graph"."users_groups" u_g
+    WHERE u_g."group_id" = g."id"
+);
+
+ALTER TABLE "budget_graph"."groups"
+ADD CONSTRAINT "groups_users_number_check" CHECK("users_number" BETWEEN 0 AND 20);
+
+CREATE OR REPLACE FUNCTION
+  update_number_of_group_users()
+RETURNS
+  TRIGGER AS $update_number_of_group_users$
+BEGIN
+    UPDATE "budget_graph"."groups" g
+    SET "users_number" = g."users_number" + added."number"
+    FROM (
+        SELECT "group_id", COUNT(*) "number"
+        FROM new_rows
+        GROUP BY "group_id"
+    ) added
+    WHERE g."id" = added."group_id";
+    RETURN NULL;
+END;
+  $update_number_of_group_users$
+  LANGUAGE plpgsql;
+
+-- Trigger for adding users
+CREATE TRIGGER
+    after_add_user
+  AFTER
+  INSERT
+    ON "budget_graph"."users_groups"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_number_of_group_users();
+
+-- Functions to update the number of group members (DELETE)
+CREATE OR REPLACE FUNCTION
+  update_number_of_group_users_after_delete()
+RETURNS
+  TRIGGER AS $update_number_of_group_users_after_delete$
+BEGIN
+    UPDATE "budget_graph"."groups" g
+    SET "users_number" = g."users_number" - deleted."number"
+    FROM (
+        SELECT "group_id", COUNT(*) "number"
+        FROM old_rows
+        GROUP BY "group_id"
+    ) deleted
+    WHERE g."id" = deleted."group_id";
+    RETURN NULL;
+END;
+  $update_number_of_group_users_after_delete$
+  LANGUAGE plpgsql;
+
+-- Trigger for deleting users
+CREATE TRIGGER
+    after_delete_user
+  AFTER
+  DELETE
+  ON "budget_graph"."users_groups"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_number_of_group_users_after_delete()
\ No newline at end of file
@@ -0,0 +1,13 @@
+-- Records inserted with a number (the import reserves the numbers in the group counter for all its rows at once)
+-- are not numbered again by the "before_insert_new_transaction" trigger.
+
+CREATE OR REPLACE TRIGGER
+    "before_insert_new_transaction"
+  BEFORE
+  INSERT
+    ON "budget_graph"."monetary_transactions"
+  FOR EACH ROW
+  WHEN
+    (NEW."transaction_id" IS NULL)
+  EXECUTE FUNCTION
+    set_transaction_id();
\ No newline at end of file
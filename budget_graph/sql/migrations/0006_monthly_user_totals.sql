@@ -0,0 +1,134 @@
+-- Income and expense of each group member for each month are stored in "monthly_user_totals"
+-- and kept up to date by statement-level triggers, the diagrams are built from these sums.
+
+-- new records must not be added while the sums are being calculated
+LOCK TABLE "budget_graph"."monetary_transactions" IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS "budget_graph"."monthly_user_totals" (
+    "group_id"       smallint    NOT NULL CHECK("group_id" > 0),
+    "username"       varchar(20) NOT NULL,
+    "record_month"   date        NOT NULL, -- the first day of the month
+    "income_sum"     bigint      NOT NULL DEFAULT 0,
+    "expense_sum"    bigint      NOT NULL DEFAULT 0, -- negative
+    "records_number" integer     NOT NULL DEFAULT 0,
+    PRIMARY KEY      ("group_id", "username", "record_month")
+);
+
+INSERT INTO "budget_graph"."monthly_user_totals"
+  ("group_id", "username", "record_month", "income_sum", "expense_sum", "records_number")
+SELECT
+  "group_id", "username", date_trunc('month', "record_date")::date,
+  SUM(GREATEST("transfer", 0)), SUM(LEAST("transfer", 0)), COUNT(*)
+FROM "budget_graph"."monetary_transactions"
+GROUP BY "group_id", "username", date_trunc('month', "record_date")::date
+ON CONFLICT ("group_id", "username", "record_month") DO UPDATE SET
+  "income_sum" = EXCLUDED."income_sum",
+  "expense_sum" = EXCLUDED."expense_sum",
+  "records_number" = EXCLUDED."records_number";
+
+-- Create a function with triggers that keeps the income and expense of each group member for each month up to date,
+-- so the diagrams do not need to read all records of the group.
+-- The triggers are executed once per statement, so a bulk insert or delete updates each month only once.
+CREATE OR REPLACE FUNCTION
+  update_monthly_user_totals()
+RETURNS
+  TRIGGER AS $update_monthly_user_totals$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO "budget_graph"."monthly_user_totals"
+          ("group_id", "username", "record_month", "income_sum", "expense_sum", "records_number")
+        SELECT
+          "group_id", "username", date_trunc('month', "record_date")::date,
+          SUM(GREATEST("transfer", 0)), SUM(LEAST("transfer", 0)), COUNT(*)
+        FROM new_rows
+        GROUP BY "group_id", "username", date_trunc('month', "record_date")::date
+        ON CONFLICT ("group_id", "username", "record_month")
+        DO UPDATE SET
+          "income_sum" = "monthly_user_totals"."income_sum" + EXCLUDED."income_sum",
+          "expense_sum" = "monthly_user_totals"."expense_sum" + EXCLUDED."expense_sum",
+          "records_number" = "monthly_user_totals"."records_number" + EXCLUDED."records_number";
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO "budget_graph"."monthly_user_totals"
+          ("group_id", "username", "record_month", "income_sum", "expense_sum", "records_number")
+        SELECT
+          "group_id", "username", date_trunc('month', "record_date")::date,
+          -SUM(GREATEST("transfer", 0)), -SUM(LEAST("transfer", 0)), -COUNT(*)
+        FROM old_rows
+        GROUP BY "group_id", "username", date_trunc('month', "record_date")::date
+        ON CONFLICT ("group_id", "username", "record_month")
+        DO UPDATE SET
+          "income_sum" = "monthly_user_totals"."income_sum" + EXCLUDED."income_sum",
+          "expense_sum" = "monthly_user_totals"."expense_sum" + EXCLUDED."expense_sum",
+          "records_number" = "monthly_user_totals"."records_number" + EXCLUDED."records_number";
+    ELSE -- UPDATE: the old values are subtracted, the new ones are added
+        INSERT INTO "budget_graph"."monthly_user_totals"
+          ("group_id", "username", "record_month", "income_sum", "expense_sum", "records_number")
+        SELECT
+          "group_id", "username", "record_month", SUM("income_sum"), SUM("expense_sum"), SUM("records_number")
+        FROM (
+            SELECT
+              "group_id", "username", date_trunc('month', "record_date")::date "record_month",
+              GREATEST("transfer", 0) "income_sum", LEAST("transfer", 0) "expense_sum", 1 "records_number"
+            FROM new_rows
+            UNION ALL
+            SELECT
+              "group_id", "username", date_trunc('month', "record_date")::date "record_month",
+              -GREATEST("transfer", 0) "income_sum", -LEAST("transfer", 0) "expense_sum", -1 "records_number"
+            FROM old_rows
+        ) changes
+        GROUP BY "group_id", "username", "record_month"
+        ON CONFLICT ("group_id", "username", "record_month")
+        DO UPDATE SET
+          "income_sum" = "monthly_user_totals"."income_sum" + EXCLUDED."income_sum",
+          "expense_sum" = "monthly_user_totals"."expense_sum" + EXCLUDED."expense_sum",
+          "records_number" = "monthly_user_totals"."records_number" + EXCLUDED."records_number";
+    END IF;
+
+    IF TG_OP <> 'INSERT' THEN
+        -- months without records are not stored
+        DELETE FROM "budget_graph"."monthly_user_totals" m_u_t
+        USING (
+          SELECT DISTINCT "group_id", "username", date_trunc('month', "record_date")::date "record_month"
+          FROM old_rows
+        ) changed
+        WHERE
+          m_u_t."group_id" = changed."group_id" AND
+          m_u_t."username" = changed."username" AND
+          m_u_t."record_month" = changed."record_month" AND
+          m_u_t."records_number" = 0;
+    END IF;
+
+    RETURN NULL;
+END;
+  $update_monthly_user_totals$
+  LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER
+    "after_insert_transactions_monthly_user_totals"
+  AFTER
+  INSERT
+    ON "budget_graph"."monetary_transactions"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_monthly_user_totals();
+
+CREATE OR REPLACE TRIGGER
+    "after_update_transactions_monthly_user_totals"
+  AFTER
+  UPDATE
+    ON "budget_graph"."monetary_transactions"
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_monthly_user_totals();
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_transactions_monthly_user_totals"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_monthly_user_totals();
\ No newline at end of file
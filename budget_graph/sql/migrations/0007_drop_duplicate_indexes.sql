@@ -0,0 +1,11 @@
+-- Indexes of the records table that repeated other indexes or were not used by any query (see tests/test_query_plans.py):
+-- "transactions_group_id_record_date" and "transactions_last_records_index" - ("group_id", "record_date" DESC),
+-- the same as "transactions_group_id" read backwards;
+-- "transactions_transaction_id_group_id" - the same uniqueness as the primary key ("group_id", "transaction_id");
+-- "transactions_username" and "transactions_username_record_date" - the records are always read by group.
+
+DROP INDEX IF EXISTS "budget_graph"."transactions_group_id_record_date";
+DROP INDEX IF EXISTS "budget_graph"."transactions_last_records_index";
+DROP INDEX IF EXISTS "budget_graph"."transactions_transaction_id_group_id";
+DROP INDEX IF EXISTS "budget_graph"."transactions_username";
+DROP INDEX IF EXISTS "budget_graph"."transactions_username_record_date";
\ No newline at end of file
@@ -0,0 +1,85 @@
+-- Archive tier of the records (see create_db.sql, archive_triggers.sql and all_transactions_view.sql):
+-- the readers of the records use the "all_transactions" view, the archival job moves the old records
+-- out of "monetary_transactions" (archive_transactions.sql).
+
+CREATE TABLE IF NOT EXISTS "budget_graph"."monetary_transactions_archive" (
+    "group_id"       smallint    NOT NULL CHECK("group_id" > 0),
+    "transaction_id" integer     NOT NULL CHECK("transaction_id" > 0),
+    "username"       varchar(20) NOT NULL CHECK(LENGTH("username") BETWEEN 3 AND 20),
+    "transfer"       integer     NOT NULL CHECK("transfer" <> 0),
+    "record_date"    date        NOT NULL,
+    "category"       varchar(25)     NULL,
+    "description"    varchar(50)     NULL,
+    PRIMARY KEY      ("group_id", "transaction_id")
+);
+
+CREATE INDEX IF NOT EXISTS "transactions_archive_group_id"
+  ON "budget_graph"."monetary_transactions_archive" USING btree ("group_id", "record_date" ASC);
+
+-- The sums of "daily_balances" and "monthly_user_totals" and the uuid of the group transactions
+-- include the archived records: they are kept up to date by the same functions as for "monetary_transactions".
+-- Moving a record into the archive subtracts it by the trigger of one table and adds it by the trigger of the other,
+-- so the sums do not change (archive_transactions.sql). The archived records are not updated.
+CREATE OR REPLACE TRIGGER
+    "after_insert_transactions_archive_daily_balances"
+  AFTER
+  INSERT
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_daily_balances();
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_transactions_archive_daily_balances"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_daily_balances();
+
+CREATE OR REPLACE TRIGGER
+    "after_insert_transactions_archive_monthly_user_totals"
+  AFTER
+  INSERT
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_monthly_user_totals();
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_transactions_archive_monthly_user_totals"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_monthly_user_totals();
+
+CREATE OR REPLACE TRIGGER
+    "trigger_update_transaction_uuid_archive_after_delete"
+  AFTER
+  DELETE
+    ON "budget_graph"."monetary_transactions_archive"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    update_transaction_uuid();
+
+-- Records of both tiers: the recent ones ("monetary_transactions") and the archived ones (archive_transactions.sql).
+-- The conditions of a query are applied to each table separately, so each of them is read by its own index,
+-- and the ordered reads (the last records of the group) are merged without reading the whole archive.
+CREATE OR REPLACE VIEW "budget_graph"."all_transactions" AS
+SELECT
+  "group_id", "transaction_id", "username", "transfer", "record_date", "category", "description"
+FROM
+  "budget_graph"."monetary_transactions"
+UNION ALL
+SELECT
+  "group_id", "transaction_id", "username", "transfer", "record_date", "category", "description"
+FROM
+  "budget_graph"."monetary_transactions_archive";
\ No newline at end of file
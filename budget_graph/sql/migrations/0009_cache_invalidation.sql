@@ -0,0 +1,189 @@
+-- Notifications for the caches of the processes (see cache_invalidation_triggers.sql and cache_invalidation.py)
+
+-- Notifications for the caches of the processes (see cache_invalidation.py): when the data of users, languages,
+-- groups or memberships changes, the keys of the changed rows are sent to the "budget_graph_cache" channel
+-- as "<kind>:<key>,<key>,...", every process that listens to the channel evicts these keys from its caches.
+-- The notifications are delivered at the commit of the transaction (the same notifications of one transaction
+-- are delivered once), nothing is sent for a rolled back change.
+-- TG_ARGV[0] - kind of the cached data, TG_ARGV[1] - key column of the table.
+-- INSERT and DELETE triggers are executed once per statement, the keys of a bulk change are sent
+-- by at most 500 in one notification (the payload is limited to 8000 bytes).
+-- UPDATE triggers are executed for each row and only if the cached columns have been changed
+-- (for example, updating "last_login" of a user or the counters of a group does not send anything).
+CREATE OR REPLACE FUNCTION
+  notify_cache_invalidation()
+RETURNS
+  TRIGGER AS $notify_cache_invalidation$
+DECLARE
+    keys text;
+BEGIN
+    IF TG_LEVEL = 'ROW' THEN
+        PERFORM pg_notify('budget_graph_cache', TG_ARGV[0] || ':' || (to_jsonb(OLD) ->> TG_ARGV[1]));
+    ELSE
+        FOR keys IN EXECUTE format(
+            'SELECT string_agg("key"::text, '','') FROM (SELECT DISTINCT %I "key" FROM %I) changed GROUP BY "key" / 500',
+            TG_ARGV[1],
+            CASE TG_OP WHEN 'INSERT' THEN 'new_rows' ELSE 'old_rows' END
+        ) LOOP
+            PERFORM pg_notify('budget_graph_cache', TG_ARGV[0] || ':' || keys);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+  $notify_cache_invalidation$
+  LANGUAGE plpgsql;
+
+-- users: the registration status and the profile of the user
+CREATE OR REPLACE TRIGGER
+    "after_insert_users_notify_cache"
+  AFTER
+  INSERT
+    ON "budget_graph"."users"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_users_notify_cache"
+  AFTER
+  DELETE
+    ON "budget_graph"."users"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_update_users_notify_cache"
+  AFTER
+  UPDATE OF "username", "timezone", "settings"
+    ON "budget_graph"."users"
+  FOR EACH ROW
+  WHEN ((OLD."username", OLD."timezone", OLD."settings") IS DISTINCT FROM (NEW."username", NEW."timezone", NEW."settings"))
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
+
+-- languages
+CREATE OR REPLACE TRIGGER
+    "after_insert_languages_notify_cache"
+  AFTER
+  INSERT
+    ON "budget_graph"."user_languages_telegram"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('language', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_languages_notify_cache"
+  AFTER
+  DELETE
+    ON "budget_graph"."user_languages_telegram"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('language', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_update_languages_notify_cache"
+  AFTER
+  UPDATE OF "language"
+    ON "budget_graph"."user_languages_telegram"
+  FOR EACH ROW
+  WHEN (OLD."language" IS DISTINCT FROM NEW."language")
+  EXECUTE FUNCTION
+    notify_cache_invalidation('language', 'telegram_id');
+
+-- memberships: the user and the group are changed (the memberships are only added and deleted)
+CREATE OR REPLACE TRIGGER
+    "after_insert_users_groups_notify_cache_user"
+  AFTER
+  INSERT
+    ON "budget_graph"."users_groups"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_users_groups_notify_cache_user"
+  AFTER
+  DELETE
+    ON "budget_graph"."users_groups"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_insert_users_groups_notify_cache_group"
+  AFTER
+  INSERT
+    ON "budget_graph"."users_groups"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('group', 'group_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_users_groups_notify_cache_group"
+  AFTER
+  DELETE
+    ON "budget_graph"."users_groups"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('group', 'group_id');
+
+-- groups (a new group has no members yet, its owner is added to "users_groups")
+CREATE OR REPLACE TRIGGER
+    "after_delete_groups_notify_cache"
+  AFTER
+  DELETE
+    ON "budget_graph"."groups"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('group', 'id');
+
+CREATE OR REPLACE TRIGGER
+    "after_update_groups_notify_cache"
+  AFTER
+  UPDATE OF "owner", "token"
+    ON "budget_graph"."groups"
+  FOR EACH ROW
+  WHEN ((OLD."owner", OLD."token") IS DISTINCT FROM (NEW."owner", NEW."token"))
+  EXECUTE FUNCTION
+    notify_cache_invalidation('group', 'id');
+
+-- premium status of the user
+CREATE OR REPLACE TRIGGER
+    "after_insert_premium_users_notify_cache"
+  AFTER
+  INSERT
+    ON "budget_graph"."premium_users"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_delete_premium_users_notify_cache"
+  AFTER
+  DELETE
+    ON "budget_graph"."premium_users"
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
+
+CREATE OR REPLACE TRIGGER
+    "after_update_premium_users_notify_cache"
+  AFTER
+  UPDATE OF "premium_status"
+    ON "budget_graph"."premium_users"
+  FOR EACH ROW
+  WHEN (OLD."premium_status" IS DISTINCT FROM NEW."premium_status")
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'telegram_id');
\ No newline at end of file
@@ -0,0 +1,11 @@
+-- Notifications about the new versions of the group transactions (see household_view.py)
+
+CREATE OR REPLACE TRIGGER
+    "after_update_groups_transactions_notify_cache"
+  AFTER
+  UPDATE OF "transactions_uuid"
+    ON "budget_graph"."groups"
+  FOR EACH ROW
+  WHEN (OLD."transactions_uuid" IS DISTINCT FROM NEW."transactions_uuid")
+  EXECUTE FUNCTION
+    notify_cache_invalidation('transactions', 'id');
\ No newline at end of file
@@ -0,0 +1,40 @@
+-- Notifications for the cached contexts of the users (see user_cache_structure.py):
+-- the UPDATE triggers send the keys of the old and the new row, the change of the owner of a group
+-- is sent for both owners
+
+CREATE OR REPLACE FUNCTION
+  notify_cache_invalidation()
+RETURNS
+  TRIGGER AS $notify_cache_invalidation$
+DECLARE
+    keys text;
+BEGIN
+    IF TG_LEVEL = 'ROW' THEN
+        -- the old and the new key differ only for a changed reference (the owner of a group)
+        PERFORM pg_notify('budget_graph_cache', TG_ARGV[0] || ':' || "key")
+        FROM (SELECT DISTINCT unnest(ARRAY[to_jsonb(OLD) ->> TG_ARGV[1], to_jsonb(NEW) ->> TG_ARGV[1]]) "key") changed
+        WHERE "key" IS NOT NULL;
+    ELSE
+        FOR keys IN EXECUTE format(
+            'SELECT string_agg("key"::text, '','') FROM (SELECT DISTINCT %I "key" FROM %I) changed GROUP BY "key" / 500',
+            TG_ARGV[1],
+            CASE TG_OP WHEN 'INSERT' THEN 'new_rows' ELSE 'old_rows' END
+        ) LOOP
+            PERFORM pg_notify('budget_graph_cache', TG_ARGV[0] || ':' || keys);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+  $notify_cache_invalidation$
+  LANGUAGE plpgsql;
+
+-- the owner status of the old and the new owner (the context of the user, see user_cache_structure.py)
+CREATE OR REPLACE TRIGGER
+    "after_update_groups_owner_notify_cache_user"
+  AFTER
+  UPDATE OF "owner"
+    ON "budget_graph"."groups"
+  FOR EACH ROW
+  WHEN (OLD."owner" IS DISTINCT FROM NEW."owner")
+  EXECUTE FUNCTION
+    notify_cache_invalidation('user', 'owner');
@@ -35,4 +35,6 @@ VALUES
 (
   (SELECT "telegram_id" FROM "user_telegram_id"),
   (SELECT "group_id" FROM "user_group_id")
-)
\ No newline at end of file
+)
+RETURNING
+  "group_id"
\ No newline at end of file
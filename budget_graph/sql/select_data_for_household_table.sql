@@ -0,0 +1,72 @@
+-- DESC makes it easier for the user to read
+-- "total" is the balance after the transaction: the sum of the days before the first selected date
+-- (from "daily_balances") + the earlier records of that date which were not selected + the running sum of the selection
+WITH
+last_records AS (
+  SELECT
+    "transaction_id",
+    "username",
+    "transfer",
+    "record_date",
+    "category",
+    "description"
+  FROM
+    "budget_graph"."all_transactions"
+  WHERE
+    "group_id" = %(group_id)s::smallint
+  ORDER BY
+    "record_date" DESC,
+    "transaction_id" DESC
+  LIMIT
+    %(limit)s::smallint
+),
+first_record AS (
+  SELECT
+    "record_date",
+    "transaction_id"
+  FROM
+    last_records
+  ORDER BY
+    "record_date",
+    "transaction_id"
+  LIMIT 1
+),
+opening_balance AS (
+  SELECT
+    COALESCE(
+      (
+        SELECT
+          SUM("day_sum")
+        FROM
+          "budget_graph"."daily_balances"
+        WHERE
+          "group_id" = %(group_id)s::smallint AND
+          "record_date" < (SELECT "record_date" FROM first_record)
+      ), 0)
+    +
+    COALESCE(
+      (
+        SELECT
+          SUM("transfer")
+        FROM
+          "budget_graph"."all_transactions"
+        WHERE
+          "group_id" = %(group_id)s::smallint AND
+          "record_date" = (SELECT "record_date" FROM first_record) AND
+          "transaction_id" < (SELECT "transaction_id" FROM first_record)
+      ), 0) AS "balance"
+)
+SELECT
+  "transaction_id",
+  "username",
+  "transfer",
+  ((SELECT "balance" FROM opening_balance) +
+    SUM("transfer") OVER (ORDER BY "record_date", "transaction_id"))::integer "total",
+  to_char("record_date", 'DD/MM/YYYY')::date "record_date",
+  "category",
+  "description"
+FROM
+  last_records
+ORDER BY
+  "record_date" DESC,
+  "transaction_id" DESC
\ No newline at end of file
@@ -1,15 +1,41 @@
+-- The uuid of the group transactions is the version of its data (for example, the name of the current CSV file).
+-- The triggers are executed once per statement, so the groups row is updated once
+-- for each group affected by the statement, and not for each added or deleted record.
 CREATE OR REPLACE FUNCTION update_transaction_uuid()
 RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE "budget_graph"."groups"
-    SET transactions_uuid = gen_random_uuid()
-    WHERE id = NEW.group_id;
+    IF TG_OP = 'INSERT' THEN
+        UPDATE "budget_graph"."groups"
+        SET transactions_uuid = gen_random_uuid()
+        WHERE id IN (SELECT group_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE "budget_graph"."groups"
+        SET transactions_uuid = gen_random_uuid()
+        WHERE id IN (SELECT group_id FROM old_rows);
+    ELSE
+        UPDATE "budget_graph"."groups"
+        SET transactions_uuid = gen_random_uuid()
+        WHERE id IN (SELECT group_id FROM new_rows UNION SELECT group_id FROM old_rows);
+    END IF;
 
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER trigger_update_transaction_uuid
-AFTER INSERT OR UPDATE ON "budget_graph"."monetary_transactions"
-FOR EACH ROW
+CREATE TRIGGER trigger_update_transaction_uuid_after_insert
+AFTER INSERT ON "budget_graph"."monetary_transactions"
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
 EXECUTE FUNCTION update_transaction_uuid();
+
+CREATE TRIGGER trigger_update_transaction_uuid_after_update
+AFTER UPDATE ON "budget_graph"."monetary_transactions"
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_transaction_uuid();
+
+CREATE TRIGGER trigger_update_transaction_uuid_after_delete
+AFTER DELETE ON "budget_graph"."monetary_transactions"
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_transaction_uuid();
\ No newline at end of file
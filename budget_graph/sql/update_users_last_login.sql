@@ -0,0 +1,12 @@
+-- The dates of the last activity of the users buffered by the bot (see last_login_buffer.py) are written
+-- by one statement for all users: the arrays are the rows of the VALUES list (the same order of the elements).
+-- A date does not overwrite a later one (for example, the login to the web application).
+UPDATE
+  "budget_graph"."users" u
+SET
+  "last_login" = v."last_login"
+FROM
+  unnest(%(telegram_ids)s::bigint[], %(last_logins)s::timestamp[]) AS v("telegram_id", "last_login")
+WHERE
+  u."telegram_id" = v."telegram_id" AND
+  (u."last_login" IS NULL OR u."last_login" < v."last_login")
\ No newline at end of file
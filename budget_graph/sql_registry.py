@@ -0,0 +1,163 @@
+"""
+Registry of SQL queries from the budget_graph/sql directory.
+
+All query files are read and checked once when the application starts,
+so a query call no longer opens a file.
+
+Frequently executed queries (PREPARED_QUERIES) are prepared on the server (PREPARE) once per connection
+and then executed by name (EXECUTE), so PostgreSQL does not parse and plan them again on every request.
+This works for connections created with PreparedStatementsConnection;
+for other connections the query text is executed as usual.
+"""
+from os import listdir, path
+from re import compile as re_compile
+from psycopg2.extensions import connection as pg_connection
+
+from budget_graph.logger import setup_logger
+from budget_graph.query_metrics import measure_query
+
+logger_sql_registry = setup_logger('logs/DatabaseLog.log', 'db_logger')
+
+SQL_DIR: str = path.join(path.dirname(__file__), 'sql')
+
+# scripts that build the database infrastructure in the order of their execution (only by build_project.py)
+SCHEMA_SCRIPTS: tuple[str, ...] = (
+    'create_db',
+    'indexes',
+    'func_transaction_number',
+    'func_auto_count_users_of_group',
+    'update_group_uuid_after_transaction',
+    'func_daily_balances',
+    'func_monthly_user_totals',
+    'archive_triggers',
+    'all_transactions_view',
+    'cache_invalidation_triggers'
+)
+# script that deletes the database infrastructure (only by build_project.py)
+CLEANUP_SCRIPT: str = 'db_cleanup'
+
+# queries that are executed on almost every bot update
+PREPARED_QUERIES: frozenset[str] = frozenset({
+    'add_transaction_to_db',
+    'add_user_language',
+    'check_record_id_is_exist',
+    'check_telegram_id_is_exist',
+    'check_user_is_group_owner_by_telegram_id',
+    'delete_transaction_record',
+    'get_feature_status',
+    'get_group_id_by_telegram_id',
+    'get_group_profile',
+    'get_group_transaction_uuid',
+    'get_skip_operations_status',
+    'get_user_context',
+    'get_user_language',
+    'get_user_timezone_by_telegram_id',
+    'get_username_by_telegram_id',
+    'select_data_for_household_table',
+    'update_user_last_login_by_telegram_id'
+})
+
+# %(name)s - named query parameter (psycopg2 syntax), %% - escaped percent sign
+PLACEHOLDER_PATTERN = re_compile(r'%\((\w+)\)s')
+PERCENT_PATTERN = re_compile(r'%\(\w+\)s|%%')
+
+
+class SqlRegistryError(Exception):
+    """ The query file is missing or contains an error """
+
+
+class PreparedStatementsConnection(pg_connection):
+    """
+    psycopg2 connection that remembers which statements have already been prepared in its session.
+    Prepared statements live as long as the session and are not affected by ROLLBACK.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements: set[str] = set()
+
+
+class SqlQuery:
+    """ Query text with everything needed to prepare and execute it on the server """
+    __slots__ = ('name', 'text', 'params', 'prepare_text', 'execute_text')
+
+    def __init__(self, name: str, text: str, prepare: bool):
+        self.name: str = name
+        self.text: str = text
+        # parameter names in the order of their first appearance - this is the order of $1, $2, ...
+        self.params: tuple[str, ...] = tuple(dict.fromkeys(PLACEHOLDER_PATTERN.findall(text)))
+        self.prepare_text: str | None = None
+        self.execute_text: str | None = None
+        if prepare:
+            statement_name: str = f'budget_graph_{name}'
+            numbers: dict[str, int] = {param: number for number, param in enumerate(self.params, start=1)}
+            server_text: str = PLACEHOLDER_PATTERN.sub(lambda match: f'${numbers[match.group(1)]}', text)
+            # the text of PREPARE is sent as is, so the escaped percent sign is restored
+            self.prepare_text = f'PREPARE "{statement_name}" AS {server_text.replace("%%", "%")}'
+            arguments: str = ', '.join(f'%({param})s' for param in self.params)
+            self.execute_text = f'EXECUTE "{statement_name}"({arguments})' if arguments \
+                else f'EXECUTE "{statement_name}"'
+
+
+class SqlRegistry:
+    """
+    Reads all *.sql files of the directory (except SCHEMA_SCRIPTS and CLEANUP_SCRIPT) and checks them:
+    - the query is not empty
+    - the percent sign is used only in parameters (%(name)s) or escaped (%%)
+    - a prepared query consists of a single statement
+    """
+    __slots__ = ('__queries',)
+
+    def __init__(self, sql_dir: str = SQL_DIR, prepared: frozenset[str] = PREPARED_QUERIES):
+        self.__queries: dict[str, SqlQuery] = {}
+        for filename in sorted(listdir(sql_dir)):
+            name, extension = path.splitext(filename)
+            if extension != '.sql' or name in SCHEMA_SCRIPTS or name == CLEANUP_SCRIPT:
+                continue
+            with open(path.join(sql_dir, filename), 'r', encoding='utf-8') as sql_file:
+                text: str = sql_file.read().strip()
+            self.__check_query(name, text, name in prepared)
+            self.__queries[name] = SqlQuery(name, text, name in prepared)
+
+        if missing := prepared - self.__queries.keys():
+            raise SqlRegistryError(f'Prepared queries without .sql file: {sorted(missing)}')
+        logger_sql_registry.info(f'[SQL_REGISTRY] Loaded {len(self.__queries)} queries '
+                                 f'({len(prepared)} of them are prepared on the server)')
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__queries
+
+    def get(self, name: str) -> SqlQuery:
+        try:
+            return self.__queries[name]
+        except KeyError as err:
+            raise SqlRegistryError(f'Unknown query: {name}') from err
+
+    def names(self) -> tuple[str, ...]:
+        return tuple(self.__queries)
+
+    def execute(self, cur, name: str, params: dict | None = None) -> None:
+        """
+        Executes the query by name on the cursor.
+        On a PreparedStatementsConnection the prepared queries are prepared at the first call in the session.
+        The execution time, rows and errors are recorded under the name of the query (see query_metrics.py).
+        """
+        query: SqlQuery = self.get(name)
+        conn = cur.connection
+        with measure_query(name, cur):
+            if query.prepare_text is None or not isinstance(conn, PreparedStatementsConnection):
+                cur.execute(query.text, params)
+                return
+
+            if name not in conn.prepared_statements:
+                cur.execute(query.prepare_text)
+                conn.prepared_statements.add(name)
+            cur.execute(query.execute_text, params)
+
+    @staticmethod
+    def __check_query(name: str, text: str, prepare: bool) -> None:
+        if not text:
+            raise SqlRegistryError(f'Empty query: {name}')
+        if '%' in PERCENT_PATTERN.sub('', text):
+            raise SqlRegistryError(f'Unescaped percent sign in the query: {name}')
+        if prepare and ';' in text.rstrip(';'):
+            raise SqlRegistryError(f'A prepared query must contain a single statement: {name}')
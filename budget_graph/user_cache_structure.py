@@ -1,134 +1,239 @@
 """
 This module is designed to save us from unnecessary queries to the database,
 since it will store information about the current user authorization status and the language used.
-It is assumed that dictionaries will be stored for the last 50-100 users who performed actions.
 If the user deletes the account or changes the language, the trigger will be called and the cache value will change.
 
-Caching is based on the LRU algorithm:
-New dictionary keys are always placed "at the end",
-so to clear out the old values we will remove the "at the beginning" values.
-To update the value: remove it from the current position and insert “at the end”.
-
-Starting from version 3.7, the keys in the dictionary maintain order, so we will use a key-value implementation.
+UserContextCache keeps the whole context of the registered users (user_context.py), so the updates
+of the known users do not take a connection from the pool at all (see get_cached_user_context).
+
+The caches are LruCache objects (lru_cache.py): a read and a write take O(1) time,
+the least recently used user is evicted when the cache is full.
+The capacity and the TTL of the entries are set by "user_cache_capacity" and "user_cache_ttl"
+in the [cache] section of the config (see configure_user_caches),
+the TTL limits the time for which the changes made by another process (the web application) are not seen.
+With "redis_enable" the caches are shared by the processes through Redis (redis_cache.py, TTL "redis_ttl").
+The changes made by other processes are evicted by the notifications of the database (cache_invalidation.py).
+
+The users who are not registered are kept in UnregisteredUserCache with their language, so the messages
+of unknown users (for example, a flood of /start) do not query the database. Its TTL is short
+("unregistered_cache_ttl"): the entry is evicted when the user registers or changes the language,
+but a registration in another process without the notifications is seen only after the TTL.
 """
+from json import dumps, loads
+from functools import partial
+from threading import Lock
+
 from budget_graph.logger import setup_logger
 from budget_graph.encryption import logging_hash
+from budget_graph.global_config import GlobalConfig
+from budget_graph.lru_cache import LruCache
+from budget_graph.redis_cache import TwoLevelCache
+from budget_graph.cache_invalidation import InvalidationHandlers
+from budget_graph.user_context import UserContext
+from budget_graph.last_login_buffer import LastLoginBuffer
 
 logger_cache = setup_logger("logs/CacheLog.log", "cache_logger")
 
+DEFAULT_USER_CACHE_CAPACITY: int = 10_000  # users, if user_cache_capacity is not specified in the config
+DEFAULT_REDIS_TTL: int = 86_400  # seconds, if redis_ttl is not specified in the config
+DEFAULT_UNREGISTERED_CACHE_TTL: int = 60  # seconds, if unregistered_cache_ttl is not specified in the config
+
 
 class UserLanguageCache:
     """ This class caches the user's language value """
-    __telegram_language_cache: dict = {}
-    __maximum_dict_size: int = 50
+    # the language code is stored in Redis as it is: b'en'
+    __telegram_language_cache = TwoLevelCache('language', LruCache(DEFAULT_USER_CACHE_CAPACITY), DEFAULT_REDIS_TTL,
+                                              str.encode, bytes.decode)
 
     @staticmethod
     def get_cache_data(telegram_id: int) -> str:
-        """ Getting a value from the dictionary, if it is not there, then we give a negative answer """
-        if telegram_id in UserLanguageCache.__telegram_language_cache:
-            UserLanguageCache.update_data_position(telegram_id)
-            logger_cache.info(f"<Language> Data from cache (SUCCESS): telegram_id={logging_hash(telegram_id)}")
-            return (UserLanguageCache.__telegram_language_cache[telegram_id]).decode('utf-8')
-        logger_cache.info(f"<Language> There is no data in the cache: telegram_id={logging_hash(telegram_id)}")
-        return ''
+        """ Getting a value from the cache, if it is not there, then we give a negative answer """
+        return UserLanguageCache.__telegram_language_cache.get(telegram_id, '')
 
     @staticmethod
     def input_cache_data(telegram_id: int, user_language: str) -> None:
-        """ Adding a new key to the dictionary """
-        _len_dict: int = len(UserLanguageCache.__telegram_language_cache)
-        if _len_dict > UserLanguageCache.__maximum_dict_size:
-            # If the dictionary is full, then we clear 10% of its space, removing the "oldest" values.
-            i: int = 0  # counter to avoid calculating dictionary keys at each iteration
-            _dict_keys: tuple = tuple(UserLanguageCache.__telegram_language_cache.keys())
-            # Adjusting the hysteresis width to clear the dictionary
-            _limit: int = UserLanguageCache.__maximum_dict_size - (UserLanguageCache.__maximum_dict_size // 10)  # 10%
-            while _len_dict > _limit:
-                UserLanguageCache.__telegram_language_cache.pop(_dict_keys[i])
-                i += 1
-                _len_dict -= 1
-            logger_cache.info(f"<Language> Removed {i} keys from cache")
-        UserLanguageCache.__telegram_language_cache[telegram_id] = user_language.encode('utf-8')
-        logger_cache.info(f"<Language> New cache entry: telegram_id={logging_hash(telegram_id)}")
+        """ Adding a new key to the cache (or updating the value of an existing one) """
+        UserLanguageCache.__telegram_language_cache.set(telegram_id, user_language)
 
     @staticmethod
     def update_data_position(telegram_id: int) -> None:
-        """ Move the key to the "end" of the dictionary """
-        _data = UserLanguageCache.__telegram_language_cache.pop(telegram_id)
-        UserLanguageCache.__telegram_language_cache[telegram_id] = _data
-        logger_cache.info(f"<Language> New cache priority set: telegram_id={logging_hash(telegram_id)}")
+        """ The key becomes the most recently used one """
+        UserLanguageCache.__telegram_language_cache.local.touch(telegram_id)
 
     @staticmethod
     def delete_data_from_cache(telegram_id: int) -> None:
         """ Removing a key from the cache """
-        if telegram_id in UserLanguageCache.__telegram_language_cache:
-            UserLanguageCache.__telegram_language_cache.pop(telegram_id)
+        if UserLanguageCache.__telegram_language_cache.delete(telegram_id):
             logger_cache.info(f"<Language> [OK] Data removed from cache (trigger): "
                               f"telegram_id={logging_hash(telegram_id)}")
         else:
             logger_cache.info(f"<Language> [No data] (trigger): telegram_id={logging_hash(telegram_id)}")
 
+    @staticmethod
+    def get_cache() -> TwoLevelCache:
+        return UserLanguageCache.__telegram_language_cache
+
 
 # When deleting a group or user, a bulk cache deletion is not triggered,
 # since there is no system at all for deleting data from the table that stores user languages.
 
 
-class UserRegistrationStatusCache:
-    """
-    This class contains a list of telegram_ids whose status has been confirmed as registered.
-    The principle of operation is similar to the user language caching class, but only based on a list.
+def encode_user_context(user_context: UserContext) -> bytes:
+    """ The context is stored in Redis as JSON: [telegram_id, language, username, group_id, is_owner, ...] """
+    return dumps([user_context.telegram_id, user_context.language, user_context.username, user_context.group_id,
+                  user_context.is_owner, user_context.is_premium, user_context.timezone, user_context.settings],
+                 separators=(',', ':')).encode()
 
-    “Old data” will be at the beginning of the list, and current data at the very end.
+
+def decode_user_context(data: bytes) -> UserContext:
+    telegram_id, language, *profile = loads(data)
+    return UserContext(telegram_id, language, True, *profile)
+
+
+class UserContextCache:
     """
-    __users: list = []
-    __maximum_list_size: int = 50
+    This class contains the contexts of the registered users (user_context.py): the user is registered
+    if the context is in the cache, so get_user_context does not query the database for the known users.
+    The contexts read from the database before an eviction may be already old and are not cached (see get_generation)
+    """
+    __users = TwoLevelCache('context', LruCache(DEFAULT_USER_CACHE_CAPACITY), DEFAULT_REDIS_TTL,
+                            encode_user_context, decode_user_context)
+    # the number of the evictions: it is taken before the context is read from the database
+    __generation: int = 0
+    __lock = Lock()
 
     @staticmethod
-    def get_cache_data(telegram_id: int) -> bool:
-        if telegram_id in UserRegistrationStatusCache.__users:
-            UserRegistrationStatusCache.update_data_position(telegram_id)
-            logger_cache.info(f"<RegistrationStatus> Data from cache (SUCCESS): "
-                              f"telegram_id={logging_hash(telegram_id)}")
-            return True
-        logger_cache.info(f"<RegistrationStatus> There is no data in the cache: "
-                          f"telegram_id={logging_hash(telegram_id)}")
-        return False  # either the user is not in the cache or he is not registered
-
-    @staticmethod
-    def input_cache_data(telegram_id: int) -> None:
-        _len_list: int = len(UserRegistrationStatusCache.__users)
-        # if the list is full
-        if _len_list > UserRegistrationStatusCache.__maximum_list_size:
-            _del_limit: int = UserRegistrationStatusCache.__maximum_list_size // 10  # 10%
-            del UserRegistrationStatusCache.__users[0:_del_limit + 1]
-            logger_cache.info(f"<RegistrationStatus> Removed {_del_limit} keys from cache")
-
-        # checking that the user is not yet in the cache
-        if telegram_id not in UserRegistrationStatusCache.__users:
-            UserRegistrationStatusCache.__users.append(telegram_id)
-            logger_cache.info(f"<RegistrationStatus> New cache entry: telegram_id={logging_hash(telegram_id)}")
-        else:
-            logger_cache.warning(f"<RegistrationStatus> Trying to add data that is already in the cache: "
-                                 f"telegram_id={logging_hash(telegram_id)}")
+    def get_cache_data(telegram_id: int) -> UserContext | None:
+        """ :return: the context of the registered user | None if the user is not in the cache """
+        return UserContextCache.__users.get(telegram_id)
+
+    @staticmethod
+    def get_generation() -> int:
+        return UserContextCache.__generation
+
+    @staticmethod
+    def input_cache_data(user_context: UserContext, generation: int) -> None:
+        """ The context of the registered user is cached if no user has been evicted since the generation was taken """
+        if not user_context.is_registered:
+            return
+        with UserContextCache.__lock:
+            if generation == UserContextCache.__generation:
+                UserContextCache.__users.set(user_context.telegram_id, user_context)
 
     @staticmethod
     def update_data_position(telegram_id: int) -> None:
-        UserRegistrationStatusCache.__users.remove(telegram_id)  # delete from current position
-        UserRegistrationStatusCache.__users.append(telegram_id)  # put it at the “beginning” of the cache list
-        logger_cache.info(f"<RegistrationStatus> New cache priority set: telegram_id={logging_hash(telegram_id)}")
+        UserContextCache.__users.local.touch(telegram_id)
 
     @staticmethod
     def delete_data_from_cache(telegram_id: int) -> None:
-        if telegram_id in UserRegistrationStatusCache.__users:
-            UserRegistrationStatusCache.__users.remove(telegram_id)
-            logger_cache.info(f"<RegistrationStatus> [OK] Data removed from cache (trigger): "
+        if UserContextCache.evict((telegram_id,)):
+            logger_cache.info(f"<UserContext> [OK] Data removed from cache (trigger): "
                               f"telegram_id={logging_hash(telegram_id)}")
         else:
-            logger_cache.info(f"<RegistrationStatus> [No data] (trigger): telegram_id={logging_hash(telegram_id)}")
+            logger_cache.info(f"<UserContext> [No data] (trigger): telegram_id={logging_hash(telegram_id)}")
 
     @staticmethod
     def delete_group_trigger(telegram_ids: tuple) -> None:
         """ The function is called when an entire group is deleted to avoid cache read errors """
-        for telegram_id in telegram_ids:
-            UserRegistrationStatusCache.delete_data_from_cache(telegram_id)
-        logger_cache.info(f"<RegistrationStatus> Trigger - SUCCESS. "
-                          f"Number of items removed from cache: {len(telegram_ids)}")
+        removed: int = UserContextCache.evict(telegram_ids)
+        logger_cache.info(f"<UserContext> Trigger - SUCCESS. "
+                          f"Number of items removed from cache: {removed}")
+
+    @staticmethod
+    def evict(telegram_ids: tuple[int, ...] | None) -> int:
+        """
+        Handler of the notifications about the changed users (None - all the entries of the process)
+        :return: number of the users removed from the cache of the process
+        """
+        with UserContextCache.__lock:
+            UserContextCache.__generation += 1
+            if telegram_ids is None:
+                removed: int = len(UserContextCache.__users.local)
+                UserContextCache.__users.local.clear()
+                return removed
+            return UserContextCache.__users.delete_many(telegram_ids)
+
+    @staticmethod
+    def get_cache() -> TwoLevelCache:
+        return UserContextCache.__users
+
+
+class UnregisteredUserCache:
+    """ This class contains the telegram_ids whose status has been confirmed as not registered (with the language) """
+    # only in the memory of the process: the entries are short-lived and are not shared through Redis
+    __users = LruCache(DEFAULT_USER_CACHE_CAPACITY, DEFAULT_UNREGISTERED_CACHE_TTL)
+
+    @staticmethod
+    def get_cache_data(telegram_id: int) -> str:
+        """ :return: language of the unregistered user | empty string (the status of the user is unknown) """
+        return UnregisteredUserCache.__users.get(telegram_id, '')
+
+    @staticmethod
+    def input_cache_data(telegram_id: int, user_language: str) -> None:
+        UnregisteredUserCache.__users.set(telegram_id, user_language)
+
+    @staticmethod
+    def delete_data_from_cache(telegram_id: int) -> None:
+        """ The user has been registered or has changed the language """
+        if UnregisteredUserCache.__users.delete(telegram_id):
+            logger_cache.info(f"<Unregistered> [OK] Data removed from cache (trigger): "
+                              f"telegram_id={logging_hash(telegram_id)}")
+
+    @staticmethod
+    def get_cache() -> LruCache:
+        return UnregisteredUserCache.__users
+
+
+def get_cached_user_context(telegram_id: int) -> UserContext | None:
+    """
+    :return: the context of the user known from the caches (the registered user is marked as active,
+    see last_login_buffer.py) | None if the database must be queried
+    """
+    if language := UnregisteredUserCache.get_cache_data(telegram_id):
+        return UserContext(telegram_id, language)
+    if (user_context := UserContextCache.get_cache_data(telegram_id)) is not None:
+        LastLoginBuffer.touch(telegram_id)
+    return user_context
+
+
+def configure_user_caches() -> None:
+    """
+    Applies the capacity and the TTLs of the config to the language, context and unregistered caches
+    (after GlobalConfig.set_config())
+    """
+    capacity: int = GlobalConfig.user_cache_capacity or DEFAULT_USER_CACHE_CAPACITY
+    redis_ttl: int = GlobalConfig.redis_ttl or DEFAULT_REDIS_TTL
+    for cache in (UserLanguageCache.get_cache(), UserContextCache.get_cache()):
+        cache.local.configure(capacity, GlobalConfig.user_cache_ttl)
+        cache.set_ttl(redis_ttl)
+    unregistered_ttl: int = GlobalConfig.unregistered_cache_ttl or DEFAULT_UNREGISTERED_CACHE_TTL
+    UnregisteredUserCache.get_cache().configure(capacity, unregistered_ttl)
+    logger_cache.info(f"User caches: capacity={capacity}, ttl={GlobalConfig.user_cache_ttl}, "
+                      f"redis={GlobalConfig.redis_enable}, redis ttl={redis_ttl}, "
+                      f"unregistered ttl={unregistered_ttl}")
+
+
+def get_user_caches_stats() -> dict[str, dict]:
+    """ :return: counters of the caches (see LruCache.get_stats) """
+    return {
+        'language': UserLanguageCache.get_cache().local.get_stats(),
+        'context': UserContextCache.get_cache().local.get_stats(),
+        'unregistered': UnregisteredUserCache.get_cache().get_stats()
+    }
+
+
+def evict_users(cache: TwoLevelCache | LruCache, telegram_ids: tuple[int, ...] | None) -> None:
+    """ Handler of the notifications about the changed users (None - all the entries of the process) """
+    if telegram_ids is None:
+        (cache.local if isinstance(cache, TwoLevelCache) else cache).clear()
+    else:
+        cache.delete_many(telegram_ids)
+
+
+InvalidationHandlers.subscribe('language', partial(evict_users, UserLanguageCache.get_cache()))
+# the context includes the language, the profile, the group, the owner and the premium status of the user
+InvalidationHandlers.subscribe('user', UserContextCache.evict)
+InvalidationHandlers.subscribe('language', UserContextCache.evict)
+# a registered user is inserted into "users", the language of the unregistered user is stored in its entry
+InvalidationHandlers.subscribe('user', partial(evict_users, UnregisteredUserCache.get_cache()))
+InvalidationHandlers.subscribe('language', partial(evict_users, UnregisteredUserCache.get_cache()))
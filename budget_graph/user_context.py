@@ -0,0 +1,59 @@
+"""
+Everything the bot needs to know about the user to process one update.
+It is loaded by a single query (get_user_context.sql) at the beginning of the update
+and then passed to the handlers instead of separate queries for the language, group, owner status, etc.
+"""
+
+# indexes in the "settings" array of the users table (arrays in PostgreSQL start from 1)
+feature_ids: dict[str, int] = {
+    'del_msg_after_transaction': 1,
+    'skip_input_date': 2,
+    'skip_input_category': 3,
+    'skip_input_description': 4,
+}
+
+
+# pylint: disable=too-many-instance-attributes
+class UserContext:
+    """
+    Read-only snapshot of the user's data at the time the update was received.
+    For an unregistered user (or if the database is unavailable) the default values are used.
+    """
+    __slots__ = ('telegram_id', 'language', 'is_registered', 'username', 'group_id', 'is_owner', 'is_premium',
+                 'timezone', 'settings')
+
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    def __init__(self,
+                 telegram_id: int,
+                 language: str = 'en',
+                 is_registered: bool = False,
+                 username: str = '',
+                 group_id: int = 0,
+                 is_owner: bool = False,
+                 is_premium: bool = False,
+                 timezone: int | None = None,
+                 settings: tuple | list | None = None):
+        self.telegram_id: int = telegram_id
+        self.language: str = language or 'en'
+        self.is_registered: bool = bool(is_registered)
+        self.username: str = username or ''
+        self.group_id: int = group_id or 0
+        self.is_owner: bool = bool(is_owner)
+        self.is_premium: bool = bool(is_premium)
+        self.timezone: int | None = timezone
+        self.settings: tuple[bool, ...] = tuple(bool(status) for status in settings) if settings else ()
+
+    def get_feature_status(self, feature: str) -> bool:
+        """ Analogue of DatabaseQueries.get_feature_status() """
+        index: int | None = feature_ids.get(feature)
+        return bool(index) and len(self.settings) >= index and self.settings[index - 1]
+
+    def get_skip_operations_status(self) -> tuple[bool, bool, bool]:
+        """ Analogue of DatabaseQueries.get_skip_operations_status(): skip date, category and description input """
+        return tuple(self.get_feature_status(feature) for feature in
+                     ('skip_input_date', 'skip_input_category', 'skip_input_description'))
+
+    def __repr__(self) -> str:
+        # telegram_id and username are not shown so that the object can be written to the logs
+        return (f'UserContext(language={self.language}, is_registered={self.is_registered}, '
+                f'group_id={self.group_id}, is_owner={self.is_owner}, is_premium={self.is_premium})')
@@ -1,14 +1,17 @@
 from sys import path as sys_path
 import re
 from functools import cache
-from datetime import datetime, timezone
+from collections.abc import Iterable
+from datetime import datetime, date, timezone
 
 sys_path.append('../')
 
-from budget_graph.db_manager import DatabaseQueries, connect_db, close_db  # noqa
+from budget_graph.db_manager import DatabaseQueries, pooled_connection  # noqa
 from budget_graph.dictionary import receive_translation  # noqa
 from budget_graph.time_checking import timeit  # noqa
 
+DATE_PATTERN = re.compile(r'^(0[1-9]|[1-2]\d|3[0-1])/(0[1-9]|1[0-2])/20[1-3]\d$')  # DD/MM/YYYY
+
 
 @timeit
 async def registration_validation(username: str, psw: str, telegram_id: str) -> tuple[bool, int]:
@@ -28,10 +31,8 @@ async def registration_validation(username: str, psw: str, telegram_id: str) ->
 
 
 async def username_validation(username: str) -> bool:
-    connection = connect_db()
-    dbase = DatabaseQueries(connection)
-    username_is_exist: bool = dbase.check_username_is_exist(username)
-    close_db(connection)
+    with pooled_connection() as connection:
+        username_is_exist: bool = DatabaseQueries(connection).check_username_is_exist(username)
 
     if 3 <= len(username) <= 20 and re.match(r'^[a-zA-Z0-9]+$', username) and not username_is_exist:
         return True
@@ -50,10 +51,8 @@ async def telegram_id_validation(telegram_id: str) -> bool:
     else:
         return False
 
-    connection = connect_db()
-    dbase = DatabaseQueries(connection)
-    telegram_id_is_exist: bool = dbase.check_telegram_id_is_exist(telegram_id)
-    close_db(connection)
+    with pooled_connection() as connection:
+        telegram_id_is_exist: bool = DatabaseQueries(connection).check_telegram_id_is_exist(telegram_id)
 
     if not telegram_id_is_exist:
         return True
@@ -89,21 +88,28 @@ async def comparison_dates_unix_format(entered_date: str) -> bool:
     Time 1 day ahead is necessary due to the difference in time zones
     (since the user enters the date independently in the DD/MM/YYYY format)
     """
-    twelve_hours_in_seconds: int = 43_200  # 12 hours in seconds (time zone accounting)
-    ten_years_in_seconds: int = 315_360_000  # 3650 days in seconds (10 years)
-    time_diff: int = ten_years_in_seconds + twelve_hours_in_seconds
-    current_time: int = int(datetime.now(timezone.utc).timestamp())  # unix format
+    min_date_unix, max_date_unix = get_dates_range_unix()
     entered_date_unix: int = int(datetime.strptime(entered_date, '%d/%m/%Y').timestamp())
 
-    if current_time - time_diff <= entered_date_unix <= current_time + twelve_hours_in_seconds:
+    if min_date_unix <= entered_date_unix <= max_date_unix:
         return True
     return False
 
 
+def get_dates_range_unix() -> tuple[int, int]:
+    """
+    :return: the earliest and latest allowed dates of a record (unix format), see comparison_dates_unix_format
+    """
+    twelve_hours_in_seconds: int = 43_200  # 12 hours in seconds (time zone accounting)
+    ten_years_in_seconds: int = 315_360_000  # 3650 days in seconds (10 years)
+    time_diff: int = ten_years_in_seconds + twelve_hours_in_seconds
+    current_time: int = int(datetime.now(timezone.utc).timestamp())  # unix format
+    return current_time - time_diff, current_time + twelve_hours_in_seconds
+
+
 async def check_date_in_correct_format(entered_date: str) -> bool:  # DD/MM/YYYY
-    reg_exp = r'^(0[1-9]|[1-2]\d|3[0-1])/(0[1-9]|1[0-2])/20[1-3]\d$'
     # month validation is not needed, inside the regular expression it is checked that the month is in the range 01-12.
-    if re.match(reg_exp, entered_date):
+    if DATE_PATTERN.match(entered_date):
         return True
     return False
 
@@ -147,6 +153,39 @@ def value_validation(value: str) -> int:
     return 0
 
 
+def transactions_validation(rows: Iterable[tuple[str, str, str, str]], lang: str) \
+        -> tuple[list[tuple[int, date, str, str]], list[int]]:
+    """
+    Checks the records of the import with the same rules as the dialog of adding a record
+    (value_validation, date_validation, category_validation, description_validation),
+    but without the coroutines and with the allowed dates calculated once for all rows.
+    :param rows: (transfer with the sign, date DD/MM/YYYY, category or '', description or '')
+    :param lang: language of the categories
+    :return: valid rows (transfer, date, category, description) and the numbers (from 1) of the invalid rows
+    """
+    min_date_unix, max_date_unix = get_dates_range_unix()
+    valid_rows: list[tuple[int, date, str, str]] = []
+    invalid_rows: list[int] = []
+    for number, (transfer, record_date, category, description) in enumerate(rows, start=1):
+        sign, digits = (transfer[0], transfer[1:]) if transfer[:1] in ('+', '-') else ('', transfer)
+        value: int = value_validation(digits)
+        if not value or (category and not category_validation(lang, category)) \
+                or not description_validation(description) or not DATE_PATTERN.match(record_date):
+            invalid_rows.append(number)
+            continue
+        try:  # the day is checked by strptime (check_day_is_correct)
+            record_datetime: datetime = datetime.strptime(record_date, '%d/%m/%Y')
+        except ValueError:
+            invalid_rows.append(number)
+            continue
+        if not min_date_unix <= int(record_datetime.timestamp()) <= max_date_unix:
+            invalid_rows.append(number)
+            continue
+        valid_rows.append((-value if sign == '-' else value, record_datetime.date(), category,
+                           description))
+    return valid_rows, invalid_rows
+
+
 @cache
 def category_validation(lang: str, category: str) -> bool:
     categories: tuple = get_translations_for_categories(lang)
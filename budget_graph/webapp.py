@@ -9,20 +9,25 @@ from flask import Flask, render_template, request, session, redirect, url_for, f
 sys.path.append('../')
 
 from budget_graph.logger import setup_logger
+from budget_graph.global_config import GlobalConfig
 from budget_graph.registration_service import user_registration
+from budget_graph.import_service import transactions_import, get_import_max_rows
 from budget_graph.encryption import getting_hash, get_salt, logging_hash
-from budget_graph.db_manager import connect_db_flask_g, close_db_flask_g, DatabaseQueries
+from budget_graph.db_manager import connect_db_flask_g, connect_replica_db_flask_g, close_db_flask_g, DatabaseQueries
+from budget_graph.query_metrics import register_dump_signal
 from budget_graph.validation import value_validation, description_validation, date_validation, registration_validation
 
 load_dotenv()  # Load environment variables from .env file
 
+GlobalConfig.set_config()
+
 app = Flask(__name__)
 app.config.from_object(__name__)
 
 # Get the secret key to encrypt the Flask session from an environment variable
 app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY")
 
-app.teardown_appcontext(close_db_flask_g)  # Disconnects the database connection after a query
+app.teardown_appcontext(close_db_flask_g)  # Returns the database connection to the pool after a query
 
 # session lifetime in browser cookies
 app.permanent_session_lifetime = timedelta(days=7)  # timedelta from datetime module
@@ -93,7 +98,7 @@ def login():
     session.permanent = True
 
     if "userLogged" in session:  # If the client has logged in before
-        dbase = DatabaseQueries(connect_db_flask_g())
+        dbase = DatabaseQueries(connect_db_flask_g(), connect_replica_db_flask_g())
         username = session["userLogged"]
         user_is_exist: bool = dbase.check_username_is_exist(username)
         if user_is_exist:
@@ -108,7 +113,7 @@ def login():
     if request.method == "POST":
         username: str = request.form["username"]
         psw: str = request.form["password"]
-        dbase = DatabaseQueries(connect_db_flask_g())
+        dbase = DatabaseQueries(connect_db_flask_g(), connect_replica_db_flask_g())
         psw_salt: str = dbase.get_salt_by_username(username)
 
         if psw_salt and dbase.auth_by_username(username, getting_hash(psw, psw_salt)):
@@ -134,7 +139,7 @@ def household(username):
     if "userLogged" not in session or session['userLogged'] != username:
         abort(401)
 
-    dbase = DatabaseQueries(connect_db_flask_g())
+    dbase = DatabaseQueries(connect_db_flask_g(), connect_replica_db_flask_g())
     token, group_id = dbase.get_group_id_token_by_username(username)
     if request.method == "POST":
         if "submit-button-1" in request.form or "submit-button-2" in request.form:  # Processing "Add to table" button
@@ -185,11 +190,15 @@ def household(username):
             else:
                 flash("Record successfully deleted", category="success")
 
+        elif "import-csv-submit-button" in request.form:
+            import_process(dbase, group_id, username)
+
     category_list: tuple[str, ...] = ("Supermarkets", "Restaurants", "Clothes", "Medicine", "Transport", "Devices",
                                       "Education", "Services", "Travel", "Housing", "Transfers", "Investments",
                                       "Hobby", "Jewelry", "Sale", "Salary", "Other")
     headers: tuple[str, ...] = ("№", "Username", "Transfer", "Total", "Date", "Category", "Description")
-    data: tuple = dbase.select_data_for_household_table(group_id, 15)  # In case of error group_id == 0 -> data = []
+    # the rows are cached until the records of the group are changed (see household_view.py)
+    data: tuple = dbase.get_household_table(group_id, 15)[1]  # In case of error group_id == 0 -> data = []
 
     return render_template("household.html",
                            title=f"Budget Graph - {username}",
@@ -200,6 +209,31 @@ def household(username):
                            category_list=category_list)
 
 
+def import_process(dbase: DatabaseQueries, group_id: int, username: str) -> None:
+    """
+    adds all records of the uploaded CSV table to the group (see import_service.transactions_import)
+    """
+    csv_file = request.files.get("csv-file")
+    csv_data: bytes = csv_file.read() if csv_file else b''
+    imported, status, invalid_records = transactions_import(dbase, group_id, username, csv_data, 'en')
+
+    if status == 'import_invalid_file':
+        flash(f"The file must be a CSV table with a header line and the columns TRANSFER and DATE (DD/MM/YYYY), "
+              f"CATEGORY and DESCRIPTION are optional. Maximum number of records: {get_import_max_rows()}",
+              category="error")
+
+    elif status == 'import_invalid_rows':
+        flash(f"Nothing has been imported, invalid data in the records: "
+              f"{', '.join(str(number) for number in invalid_records[:20])}"
+              f"{'...' if len(invalid_records) > 20 else ''}", category="error")
+
+    elif status:
+        flash("Error adding data to database", category="error")
+
+    else:
+        flash(f"Records imported: {imported}", category="success")
+
+
 @app.route('/settings/<username>')
 def settings(username):
     """
@@ -208,7 +242,7 @@ def settings(username):
     if 'userLogged' not in session or session['userLogged'] != username:
         abort(401)
 
-    dbase = DatabaseQueries(connect_db_flask_g())
+    dbase = DatabaseQueries(connect_db_flask_g(), connect_replica_db_flask_g())
     token, group_id = dbase.get_group_id_token_by_username(username)
     group_owner: str = dbase.get_group_owner_username_by_group_id(group_id)
     group_users_data: list = dbase.get_group_users_data(group_id)
@@ -259,4 +293,5 @@ def page_not_found_404(error):  # DO NOT REMOVE the parameter  # noqa
     return render_template("error404.html", title="PAGE NOT FOUND"), 404
 
 
+register_dump_signal()  # kill -USR1 <pid> writes the query metrics to the log
 app.run(debug=True, host='0.0.0.0')  # change on False before upload on server
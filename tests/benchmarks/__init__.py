@@ -0,0 +1,7 @@
+"""
+Benchmarks are not part of the test suite (pytest does not collect them).
+They require a running PostgreSQL from budget_graph/.env and are started from the tests directory:
+
+cd tests
+python -m benchmarks.<module name>
+"""
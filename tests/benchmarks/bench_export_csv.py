@@ -0,0 +1,125 @@
+"""
+Memory used by the export of the full group history to CSV (1M records).
+
+1. stream: rows are read by a named (server-side) cursor in batches of fetch_size and written to the file at once,
+   the process memory (RSS) does not depend on the number of records
+2. copy: the file is written from COPY (SELECT ...) TO STDOUT, the rows are formatted by PostgreSQL
+   and are not converted into Python objects (RSS is sampled only before and after the export)
+3. fetchall: all rows are received by a client-side cursor before writing (the behavior before the streaming export),
+   the memory grows with the number of records
+
+In all cases the checksum and size of the file are calculated while it is written.
+
+WARNING: the benchmark recreates the tables of the test database
+"""
+from os import sysconf, path
+from sys import path as sys_path
+from random import randint
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from functools import partial
+sys_path.append('../')
+
+from budget_graph.db_manager import DatabaseQueries, sql_registry
+from budget_graph.create_csv import CsvFileWithTable
+from budget_graph.encryption import getting_hash, get_salt
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+
+NUMBER_OF_TRANSACTIONS: int = 1_000_000
+RSS_SAMPLE_STEP: int = 100_000  # rows
+
+
+def get_rss_mb() -> float:
+    """ resident set size of the current process (Linux) """
+    with open('/proc/self/statm', 'r', encoding='utf-8') as statm:
+        resident_pages: int = int(statm.read().split()[1])
+    return resident_pages * sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def prepare_data() -> int:
+    telegram_id: int = randint(1, 10_000_000)
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+    psw_salt: str = get_salt()
+    db.registration_new_user(telegram_id, 'benchmark', psw_salt, getting_hash(psw_salt, 'password'))
+    group_id: int = db.get_group_id_by_telegram_id(telegram_id)
+    with connection as conn:
+        with conn.cursor() as cur:
+            # the numbers are assigned here and the group counter is set once (as the import does):
+            # the trigger numbers only the records without a number
+            cur.execute(
+                'INSERT INTO "budget_graph"."monetary_transactions" '
+                '("group_id", "transaction_id", "username", "transfer", "record_date", "category", "description") '
+                'SELECT %(group_id)s, i, \'benchmark\', (1 + (random() * 999)::integer) * (1 - 2 * (i %% 2)), '
+                '\'2000-01-01\'::date + (i %% 9000), \'Other\', md5(i::text) '
+                'FROM generate_series(1, %(number)s) i',
+                {'group_id': group_id, 'number': NUMBER_OF_TRANSACTIONS}
+            )
+            cur.execute('UPDATE "budget_graph"."groups" SET "last_transaction_id" = %s WHERE "id" = %s',
+                        (NUMBER_OF_TRANSACTIONS, group_id))
+            cur.execute('ANALYZE "budget_graph"."monetary_transactions", "budget_graph"."daily_balances"')
+    close_test_db(connection)
+    return group_id
+
+
+def sample_rss(rows, samples: list[float]):
+    """ passes the rows through and remembers the RSS every RSS_SAMPLE_STEP rows """
+    for number, row in enumerate(rows, start=1):
+        if number % RSS_SAMPLE_STEP == 0:
+            samples.append(get_rss_mb())
+        yield row
+
+
+def fetch_all_rows(connection, group_id: int) -> tuple[tuple, ...]:
+    with connection as conn:
+        with conn.cursor() as cur:
+            sql_registry.execute(cur, 'export_group_transactions', {'group_id': group_id})
+            return tuple(tuple(row) for row in cur.fetchall())
+
+
+def export(name: str, file_path: str, get_rows) -> None:
+    """ :param get_rows: function that returns an iterator of rows (it is called inside the measurement) """
+    samples: list[float] = [get_rss_mb()]
+    start: float = perf_counter()
+    csv_obj = CsvFileWithTable(file_path, sample_rss(get_rows(), samples))
+    csv_obj.create_csv_file()
+    duration: float = perf_counter() - start
+    print(f'{name:<25}{csv_obj.rows_number:>10}{duration:>10.1f}'
+          f'{samples[0]:>12.1f}{max(samples):>12.1f}{samples[-1]:>12.1f}'
+          f'    {" ".join(f"{sample:.0f}" for sample in samples)}')
+
+
+def export_by_copy(name: str, file_path: str, db: DatabaseQueries, group_id: int) -> None:
+    samples: list[float] = [get_rss_mb()]
+    start: float = perf_counter()
+    csv_obj = CsvFileWithTable(file_path, ())
+    csv_obj.create_csv_file_by_copy(partial(db.copy_group_transactions_to_csv, group_id))
+    duration: float = perf_counter() - start
+    samples.append(get_rss_mb())
+    print(f'{name:<25}{csv_obj.rows_number:>10}{duration:>10.1f}'
+          f'{samples[0]:>12.1f}{max(samples):>12.1f}{samples[-1]:>12.1f}'
+          f'    {" ".join(f"{sample:.0f}" for sample in samples)}')
+
+
+def main() -> None:
+    prepare_db_tables_for_tests()
+    group_id: int = prepare_data()
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+
+    print(f'\nExport of {NUMBER_OF_TRANSACTIONS} records to CSV (RSS is sampled every {RSS_SAMPLE_STEP} rows)')
+    print(f'{"":<25}{"rows":>10}{"time, s":>10}{"RSS0, MB":>12}{"RSSmax, MB":>12}{"RSSend, MB":>12}    RSS samples, MB')
+    with TemporaryDirectory() as csv_dir:
+        file_path: str = path.join(csv_dir, 'export.csv')
+        for fetch_size in (500, 2_000, 20_000):
+            export(f'stream (fetch {fetch_size})', file_path,
+                   lambda: db.export_group_transactions(group_id, fetch_size))  # pylint: disable=cell-var-from-loop
+        export_by_copy('copy', file_path, db, group_id)
+        # the last one: the memory of the process is not returned to the system after it
+        export('fetchall', file_path, lambda: iter(fetch_all_rows(connection, group_id)))
+    close_test_db(connection)
+
+
+if __name__ == '__main__':
+    main()
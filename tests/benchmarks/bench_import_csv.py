@@ -0,0 +1,61 @@
+"""
+Import of records from a CSV file into a group.
+
+1. import: the file is validated in bulk, loaded into a temporary table by COPY and inserted by one statement
+   (one update of the group counter, of "daily_balances" and of the uuid of the group transactions)
+2. one by one: add_transaction_to_db for each record (the dialog of adding a record),
+   the time is measured for a part of the records and extrapolated to the size of the file
+
+WARNING: the benchmark recreates the tables of the test database
+"""
+from sys import path as sys_path
+from random import randint
+from time import perf_counter
+from datetime import datetime, timedelta, timezone
+sys_path.append('../')
+
+from budget_graph.db_manager import DatabaseQueries
+from budget_graph.encryption import getting_hash, get_salt
+from budget_graph.import_service import transactions_import
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+
+NUMBER_OF_RECORDS: tuple[int, ...] = (1_000, 10_000, 50_000, 100_000)
+ONE_BY_ONE_SAMPLE: int = 2_000  # records added one by one to estimate the time of the whole file
+
+
+def get_csv_data(number: int) -> bytes:
+    today = datetime.now(timezone.utc).date()
+    lines: list[str] = ['DATE,TRANSFER,CATEGORY,DESCRIPTION']
+    lines.extend(f'{(today - timedelta(days=i % 3_000)).strftime("%d/%m/%Y")},{(i % 900 + 1) * (-1) ** i},,'
+                 f'record {i}' for i in range(number))
+    return '\n'.join(lines).encode('utf-8')
+
+
+def main() -> None:
+    prepare_db_tables_for_tests()
+    telegram_id: int = randint(1, 10_000_000)
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+    psw_salt: str = get_salt()
+    db.registration_new_user(telegram_id, 'benchmark', psw_salt, getting_hash(psw_salt, 'password'))
+    group_id: int = db.get_group_id_by_telegram_id(telegram_id)
+
+    print(f'\n{"records":>10}{"import, s":>12}{"one by one, s":>16}')
+    for number in NUMBER_OF_RECORDS:
+        csv_data: bytes = get_csv_data(number)
+        start: float = perf_counter()
+        imported, status, _ = transactions_import(db, group_id, 'benchmark', csv_data, 'en')
+        import_duration: float = perf_counter() - start
+        assert imported == number, status
+
+        start = perf_counter()
+        for transfer in range(1, ONE_BY_ONE_SAMPLE + 1):
+            db.add_transaction_to_db(transfer, '01/02/2024', '', f'record {transfer}', telegram_id=telegram_id)
+        one_by_one_duration: float = (perf_counter() - start) / ONE_BY_ONE_SAMPLE * number
+        print(f'{number:>10}{import_duration:>12.2f}{one_by_one_duration:>16.1f}')
+    close_test_db(connection)
+
+
+if __name__ == '__main__':
+    main()
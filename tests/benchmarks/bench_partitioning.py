@@ -0,0 +1,110 @@
+"""
+Records table "monetary_transactions" as an ordinary table and with hash partitions by "group_id"
+(build_project.py partition <number of partitions> [brin]) with 10 000 000 records in 200 groups.
+
+For each layout: adding a record to a random group, reading the last records of a group,
+reading the records of a group for one month, the diagram of a group for a period and the size of the indexes.
+The time of moving the records into the new layout is printed too.
+
+WARNING: the benchmark recreates the tables of the test database
+"""
+from sys import path as sys_path
+from random import choice, randint
+from time import perf_counter
+sys_path.append('../')
+
+from budget_graph.db_manager import DatabaseQueries
+from budget_graph.encryption import getting_hash, get_salt
+from budget_graph.build_project import partition_transactions
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+from tests.benchmarks.bench_tools import measure, print_table
+
+NUMBER_OF_RECORDS: int = 10_000_000
+NUMBER_OF_GROUPS: int = 200
+NUMBER_OF_DAYS: int = 3_650  # records are evenly distributed over 10 years (2015 - 2024)
+CHUNK_SIZE: int = 1_000_000  # records inserted by one statement
+LAYOUTS: tuple[tuple[str, int, bool], ...] = (('ordinary', 0, False), ('hash 16', 16, False),
+                                               ('hash 16 + BRIN', 16, True))
+REPEAT: int = 500
+
+
+def prepare_data() -> list[tuple[int, int]]:
+    """ :return: (telegram_id, group_id) of the owners of the groups """
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+    psw_salt: str = get_salt()
+    owners: list[tuple[int, int]] = []
+    for number in range(NUMBER_OF_GROUPS):
+        telegram_id: int = randint(1, 10_000_000) * 1_000 + number
+        db.registration_new_user(telegram_id, f'benchmark{number}', psw_salt, getting_hash(psw_salt, 'password'))
+        owners.append((telegram_id, db.get_group_id_by_telegram_id(telegram_id)))
+
+    with connection as conn:
+        with conn.cursor() as cur:
+            for first_record in range(0, NUMBER_OF_RECORDS, CHUNK_SIZE):
+                # the numbers are set explicitly, so the row trigger of the group counter is not fired
+                cur.execute(
+                    'INSERT INTO "budget_graph"."monetary_transactions" '
+                    '("group_id", "transaction_id", "username", "transfer", "record_date") '
+                    'SELECT (%(groups)s::smallint[])[i %% %(number)s + 1], i / %(number)s + 1, '
+                    '\'benchmark\' || (i %% %(number)s), (i / 7 %% 1000 + 1) * (1 - 2 * (i %% 2)), '
+                    '\'2015-01-01\'::date + (i / %(number)s %% %(days)s) '
+                    'FROM generate_series(%(first)s, %(last)s) i',
+                    {'groups': [group_id for _, group_id in owners], 'number': NUMBER_OF_GROUPS,
+                     'days': NUMBER_OF_DAYS, 'first': first_record, 'last': first_record + CHUNK_SIZE - 1}
+                )
+            cur.execute('UPDATE "budget_graph"."groups" SET "last_transaction_id" = %s',
+                        (NUMBER_OF_RECORDS // NUMBER_OF_GROUPS,))
+    connection.autocommit = True
+    with connection.cursor() as cur:
+        cur.execute('ANALYZE "budget_graph"."monetary_transactions", "budget_graph"."monthly_user_totals"')
+    close_test_db(connection)
+    return owners
+
+
+def get_indexes_size_mb(connection) -> float:
+    with connection as conn:
+        with conn.cursor() as cur:
+            # pg_partition_tree is empty for an ordinary table
+            cur.execute('SELECT COALESCE(SUM(pg_indexes_size("relid")), '
+                        'pg_indexes_size(\'"budget_graph"."monetary_transactions"\'::regclass)) FROM '
+                        'pg_partition_tree(\'"budget_graph"."monetary_transactions"\'::regclass)')
+            return cur.fetchone()[0] / 1024 / 1024
+
+
+def read_month(connection, group_id: int) -> list[tuple]:
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT * FROM "budget_graph"."monetary_transactions" WHERE "group_id" = %s '
+                        'AND "record_date" >= \'2020-03-01\' AND "record_date" < \'2020-04-01\'', (group_id,))
+            return cur.fetchall()
+
+
+def main() -> None:
+    prepare_db_tables_for_tests()
+    owners: list[tuple[int, int]] = prepare_data()
+    for name, partitions, brin in LAYOUTS:
+        start: float = perf_counter()
+        assert partition_transactions(partitions, brin)
+        print(f'{name}: records moved in {perf_counter() - start:.1f} s')
+
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        telegram_id, group_id = owners[0]
+        # pylint: disable=cell-var-from-loop
+        print_table(f'{name}, {NUMBER_OF_RECORDS} records, indexes: {get_indexes_size_mb(connection):.0f} MB', [
+            ('add a record to a random group',
+             measure(lambda: db.add_transaction_to_db(100, '01/01/2024', '', '', telegram_id=choice(owners)[0]),
+                     REPEAT)),
+            ('last 50 records of a group', measure(lambda: db.select_data_for_household_table(group_id, 50), REPEAT)),
+            ('records of a group for one month', measure(lambda: read_month(connection, group_id), REPEAT)),
+            ('diagram of a group for a period',
+             measure(lambda: db.get_data_for_plot_builder(telegram_id, 1, ('15/03/2018', '20/09/2022')), REPEAT))
+        ])
+        close_test_db(connection)
+    partition_transactions(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Data of the diagrams (get_data_for_plot_builder) for groups with a different length of the history.
+
+1. rollup: the fully selected months are read from "monthly_user_totals", the records only at the ends of the period
+2. records: the sums are calculated from all records of the period (the query before the rollup table)
+
+WARNING: the benchmark recreates the tables of the test database
+"""
+from sys import path as sys_path
+from random import randint
+from datetime import date, timedelta
+sys_path.append('../')
+
+from budget_graph.db_manager import DatabaseQueries
+from budget_graph.encryption import getting_hash, get_salt
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+from tests.benchmarks.bench_tools import measure, print_table
+
+NUMBER_OF_RECORDS: tuple[int, ...] = (10_000, 100_000, 1_000_000)
+PERIOD: tuple[str, str] = ('15/03/2021', '20/09/2023')  # partially selected months at both ends
+REPEAT: int = 200
+
+RECORDS_QUERY: str = """
+SELECT
+  m_t."username",
+  SUM(GREATEST(m_t."transfer", 0))::bigint,
+  SUM(LEAST(m_t."transfer", 0))::bigint
+FROM
+  "budget_graph"."monetary_transactions" m_t
+WHERE
+  m_t."group_id" = %(group_id)s::smallint
+  AND m_t."record_date" >= COALESCE(%(start_date)s::date, '-infinity'::date)
+  AND m_t."record_date" <= COALESCE(%(end_date)s::date, 'infinity'::date)
+GROUP BY m_t."username"
+"""
+
+
+def add_history(db: DatabaseQueries, group_id: int, username: str, number: int) -> None:
+    first_date: date = date(2017, 1, 1)
+    records: list[tuple[int, date, str, str]] = [
+        ((i * 7919 % 1000 + 1) * (-1) ** i, first_date + timedelta(days=i % 3_000), '', '') for i in range(number)
+    ]
+    assert db.import_transactions(group_id, username, records) == number
+
+
+def main() -> None:
+    prepare_db_tables_for_tests()
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+    rows: list[tuple[str, dict[str, float]]] = []
+    for number in NUMBER_OF_RECORDS:
+        telegram_id: int = randint(1, 10_000_000)
+        username: str = f'benchmark{number}'
+        psw_salt: str = get_salt()
+        db.registration_new_user(telegram_id, username, psw_salt, getting_hash(psw_salt, 'password'))
+        group_id: int = db.get_group_id_by_telegram_id(telegram_id)
+        add_history(db, group_id, username, number)
+        with connection.cursor() as cur:
+            cur.execute('ANALYZE "budget_graph"."monetary_transactions", "budget_graph"."monthly_user_totals"')
+        connection.commit()
+
+        for dates in ((None, None), PERIOD):
+            period: str = 'all' if dates[0] is None else 'period'
+            expected = db.get_data_for_plot_builder(telegram_id, 1, dates)
+            rows.append((f'rollup, {number} records, {period}',
+                         measure(lambda: db.get_data_for_plot_builder(telegram_id, 1, dates), REPEAT)))
+
+            def records_query():
+                with connection.cursor() as cur:
+                    cur.execute(RECORDS_QUERY, {'group_id': group_id, 'start_date': dates[0], 'end_date': dates[1]})
+                    res = {item[0]: (item[1], item[2]) for item in cur.fetchall()}
+                connection.commit()
+                return res
+
+            assert records_query() == expected
+            rows.append((f'records, {number} records, {period}', measure(records_query, max(REPEAT // 20, 5), 1)))
+
+    print_table('Data of the diagrams', rows)
+    close_test_db(connection)
+
+
+if __name__ == '__main__':
+    main()
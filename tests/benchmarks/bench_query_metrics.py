@@ -0,0 +1,47 @@
+"""
+Cost of the query metrics (query_metrics.py): recording one call of a query
+and a short query (last records of a group) with the metrics enabled and disabled.
+
+WARNING: the benchmark recreates the tables of the test database
+"""
+from sys import path as sys_path
+from random import randint
+sys_path.append('../')
+
+from budget_graph.db_manager import DatabaseQueries
+from budget_graph.global_config import GlobalConfig
+from budget_graph.query_metrics import QueryMetrics, query_metrics
+from budget_graph.encryption import getting_hash, get_salt
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+from tests.benchmarks.bench_tools import measure, print_table
+
+REPEAT: int = 5_000
+
+
+def main() -> None:
+    prepare_db_tables_for_tests()
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+    telegram_id: int = randint(1, 10_000_000)
+    psw_salt: str = get_salt()
+    db.registration_new_user(telegram_id, 'benchmark', psw_salt, getting_hash(psw_salt, 'password'))
+    group_id: int = db.get_group_id_by_telegram_id(telegram_id)
+    for transfer in range(1, 101):
+        db.add_transaction_to_db(transfer, '01/02/2024', '', '', telegram_id=telegram_id)
+
+    metrics = QueryMetrics()
+    rows: list[tuple[str, dict[str, float]]] = [
+        ('record a call of a query', measure(lambda: metrics.record_query('query', 0.001, 10), REPEAT * 10))
+    ]
+    for enable in (False, True):
+        GlobalConfig.db_query_metrics_enable = enable
+        rows.append((f'last 50 records, metrics {"enabled" if enable else "disabled"}',
+                     measure(lambda: db.select_data_for_household_table(group_id, 50), REPEAT)))
+    print_table('Query metrics', rows)
+    print(f'\n{query_metrics.format_summary()}')
+    close_test_db(connection)
+
+
+if __name__ == '__main__':
+    main()
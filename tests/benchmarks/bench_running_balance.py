@@ -0,0 +1,97 @@
+"""
+Cost of back-dated writes and of reading the household table in a group with 100k records.
+
+The balance after each record is not stored: only the sum of each day is kept up to date ("daily_balances"),
+so adding or deleting a record in the past changes one row regardless of the number of later records.
+Before this, the "total" of every later record was rewritten (the number of such records is printed for comparison).
+
+WARNING: the benchmark recreates the tables of the test database
+"""
+from sys import path as sys_path
+from random import randint
+sys_path.append('../')
+
+from budget_graph.db_manager import DatabaseQueries
+from budget_graph.encryption import getting_hash, get_salt
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+from tests.benchmarks.bench_tools import measure, print_table
+
+REPEAT: int = 500
+NUMBER_OF_TRANSACTIONS: int = 100_000
+NUMBER_OF_DAYS: int = 3_650  # records are evenly distributed over 10 years (2015 - 2024)
+
+
+def prepare_data() -> tuple[int, int]:
+    telegram_id: int = randint(1, 10_000_000)
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+    psw_salt: str = get_salt()
+    db.registration_new_user(telegram_id, 'benchmark', psw_salt, getting_hash(psw_salt, 'password'))
+    group_id: int = db.get_group_id_by_telegram_id(telegram_id)
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'INSERT INTO "budget_graph"."monetary_transactions" '
+                '("group_id", "username", "transfer", "record_date", "category", "description") '
+                'SELECT %(group_id)s, \'benchmark\', (1 + (random() * 999)::integer) * (1 - 2 * (i %% 2)), '
+                '\'2015-01-01\'::date + (i %% %(days)s), \'Other\', \'\' '
+                'FROM generate_series(1, %(number)s) i',
+                {'group_id': group_id, 'days': NUMBER_OF_DAYS, 'number': NUMBER_OF_TRANSACTIONS}
+            )
+            cur.execute('ANALYZE "budget_graph"."monetary_transactions", "budget_graph"."daily_balances"')
+    close_test_db(connection)
+    return telegram_id, group_id
+
+
+def count_later_records(connection, group_id: int, record_date: str) -> int:
+    """ the number of records whose "total" the previous model rewrote after adding a record with this date """
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT COUNT(*) FROM "budget_graph"."monetary_transactions" '
+                        'WHERE "group_id" = %s AND "record_date" > %s::date', (group_id, record_date))
+            return cur.fetchone()[0]
+
+
+def get_record_ids(connection, group_id: int, first_id: int) -> list[int]:
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT "transaction_id" FROM "budget_graph"."monetary_transactions" '
+                        'WHERE "group_id" = %s AND "transaction_id" > %s ORDER BY "transaction_id"',
+                        (group_id, first_id))
+            return [row[0] for row in cur.fetchall()]
+
+
+def main() -> None:
+    prepare_db_tables_for_tests()
+    telegram_id, group_id = prepare_data()
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+
+    rows: list[tuple[str, dict[str, float]]] = []
+    # pylint: disable=cell-var-from-loop
+    for record_date in ('02/01/2015', '01/01/2020', '31/12/2024'):
+        later_records: int = count_later_records(connection, group_id, record_date)
+        rows.append((
+            f'add {record_date} ({later_records} later records)',
+            measure(lambda: db.add_transaction_to_db(100, record_date, 'Other', '', telegram_id), REPEAT)
+        ))
+    print_table(f'add_transaction_to_db, {NUMBER_OF_TRANSACTIONS} records in the group', rows)
+
+    # all records added above are deleted (the oldest ones are deleted first - the worst case for the previous model)
+    record_ids = iter(get_record_ids(connection, group_id, NUMBER_OF_TRANSACTIONS))
+    print_table(f'process_delete_transaction_record, {NUMBER_OF_TRANSACTIONS} records in the group', [
+        ('delete a back-dated record',
+         measure(lambda: db.process_delete_transaction_record(group_id, next(record_ids)), REPEAT, warmup=0)),
+    ])
+
+    print_table(f'select_data_for_household_table, {NUMBER_OF_TRANSACTIONS} records in the group', [
+        (f'last {limit or 10_000} records',
+         measure(lambda: db.select_data_for_household_table(group_id, limit), repeat))
+        for limit, repeat in ((10, REPEAT), (50, REPEAT), (0, 20))
+    ])
+    close_test_db(connection)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency of frequently executed queries:
+1. file: the query is read from the .sql file on every call (the behavior before the query registry)
+2. text: the query text is taken from the registry, PostgreSQL parses and plans it on every call
+3. prepared: the query is prepared once per connection and executed by name
+
+WARNING: the benchmark recreates the tables of the test database
+"""
+from os import path
+from sys import path as sys_path
+from random import randint
+sys_path.append('../')
+
+from budget_graph.db_manager import DatabaseQueries, sql_registry
+from budget_graph.sql_registry import PREPARED_QUERIES
+from budget_graph.encryption import getting_hash, get_salt
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+from tests.benchmarks.bench_tools import measure, print_table
+
+REPEAT: int = 2_000
+NUMBER_OF_TRANSACTIONS: int = 1_000
+SQL_DIR: str = path.join(path.dirname(__file__), '../../budget_graph/sql')
+
+
+def prepare_data() -> tuple[int, int]:
+    telegram_id: int = randint(1, 10_000_000)
+    connection = connect_test_db()
+    db = DatabaseQueries(connection)
+    psw_salt: str = get_salt()
+    db.registration_new_user(telegram_id, 'benchmark', psw_salt, getting_hash(psw_salt, 'password'))
+    db.add_user_language(telegram_id, 'en')
+    for day in range(NUMBER_OF_TRANSACTIONS):
+        db.add_transaction_to_db(randint(-1000, 1000) or 1, f'{day % 28 + 1:02}/{day % 12 + 1:02}/2024',
+                                 'Other', '', telegram_id)
+    group_id: int = db.get_group_id_by_telegram_id(telegram_id)
+    close_test_db(connection)
+    return telegram_id, group_id
+
+
+def run_query(connection, text: str, params: dict) -> None:
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute(text, params)
+            cur.fetchall()
+
+
+def run_query_from_file(connection, name: str, params: dict) -> None:
+    with open(path.join(SQL_DIR, f'{name}.sql'), 'r', encoding='utf-8') as sql_file:
+        text: str = sql_file.read()
+    run_query(connection, text, params)
+
+
+def run_prepared_query(connection, name: str, params: dict) -> None:
+    with connection as conn:
+        with conn.cursor() as cur:
+            sql_registry.execute(cur, name, params)
+            cur.fetchall()
+
+
+def main() -> None:
+    prepare_db_tables_for_tests()
+    telegram_id, group_id = prepare_data()
+    queries: dict[str, dict] = {
+        'get_user_language': {'telegram_id': telegram_id},
+        'get_username_by_telegram_id': {'telegram_id': telegram_id},
+        'get_group_id_by_telegram_id': {'telegram_id': telegram_id},
+        'check_telegram_id_is_exist': {'telegram_id': telegram_id},
+        'get_feature_status': {'telegram_id': telegram_id, 'feature': 1},
+        'get_group_transaction_uuid': {'group_id': group_id},
+        'check_record_id_is_exist': {'group_id': group_id, 'transaction_id': NUMBER_OF_TRANSACTIONS // 2},
+        'select_data_for_household_table': {'group_id': group_id, 'limit': 10},
+    }
+    assert set(queries) <= PREPARED_QUERIES
+
+    connection = connect_test_db()
+    # pylint: disable=cell-var-from-loop
+    for name, params in queries.items():
+        print_table(name, [
+            ('file', measure(lambda: run_query_from_file(connection, name, params), REPEAT)),
+            ('text', measure(lambda: run_query(connection, sql_registry.get(name).text, params), REPEAT)),
+            ('prepared', measure(lambda: run_prepared_query(connection, name, params), REPEAT)),
+        ])
+    close_test_db(connection)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+from time import perf_counter_ns
+from statistics import median, quantiles
+
+
+def measure(func, repeat: int, warmup: int = 10) -> dict[str, float]:
+    """
+    Calls the function repeat times (after warmup calls that are not counted)
+    :return: latency statistics in microseconds
+    """
+    for _ in range(warmup):
+        func()
+    timings: list[float] = []
+    for _ in range(repeat):
+        start: int = perf_counter_ns()
+        func()
+        timings.append((perf_counter_ns() - start) / 1000)
+    percentiles: list[float] = quantiles(timings, n=100)
+    return {
+        'mean': sum(timings) / repeat,
+        'p50': median(timings),
+        'p95': percentiles[94],
+        'p99': percentiles[98]
+    }
+
+
+def print_table(title: str, rows: list[tuple[str, dict[str, float]]]) -> None:
+    """ Prints the results of measure() as a table """
+    print(f'\n{title}')
+    print(f'{"":<45}{"mean, us":>12}{"p50, us":>12}{"p95, us":>12}{"p99, us":>12}')
+    for name, stats in rows:
+        print(f'{name:<45}{stats["mean"]:>12.1f}{stats["p50"]:>12.1f}{stats["p95"]:>12.1f}{stats["p99"]:>12.1f}')
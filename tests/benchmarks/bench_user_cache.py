@@ -0,0 +1,61 @@
+"""
+User caches with 100 000 entries (lru_cache.py): a hit, a miss, an insertion with the eviction,
+and the same operations of the previous list-based registration status cache for comparison
+(the "in" check and the move of the key to the end of the list are O(n)).
+"""
+from sys import path as sys_path
+from random import randint
+sys_path.append('../')
+
+from budget_graph.lru_cache import LruCache
+from budget_graph.user_cache_structure import UserLanguageCache, UserContextCache
+from budget_graph.user_context import UserContext
+
+from tests.benchmarks.bench_tools import measure, print_table
+
+ENTRIES: int = 100_000
+REPEAT: int = 100_000
+
+
+def main() -> None:
+    cache = LruCache(ENTRIES)
+    ttl_cache = LruCache(ENTRIES, ttl=3600)
+    for key in range(ENTRIES):
+        cache.set(key, 'en')
+        ttl_cache.set(key, 'en')
+    UserLanguageCache.get_cache().local.configure(ENTRIES)
+    UserContextCache.get_cache().local.configure(ENTRIES)
+    for telegram_id in range(ENTRIES):
+        UserLanguageCache.input_cache_data(telegram_id, 'en')
+        UserContextCache.input_cache_data(UserContext(telegram_id, 'en', True), UserContextCache.get_generation())
+    new_keys = iter(range(ENTRIES, ENTRIES * 10))
+
+    rows: list[tuple[str, dict[str, float]]] = [
+        ('LruCache: hit', measure(lambda: cache.get(randint(0, ENTRIES - 1)), REPEAT)),
+        ('LruCache: miss', measure(lambda: cache.get(-randint(1, ENTRIES)), REPEAT)),
+        ('LruCache: insertion with eviction', measure(lambda: cache.set(next(new_keys), 'en'), REPEAT)),
+        ('LruCache with TTL: hit', measure(lambda: ttl_cache.get(randint(0, ENTRIES - 1)), REPEAT)),
+        ('UserLanguageCache: hit', measure(lambda: UserLanguageCache.get_cache_data(randint(0, ENTRIES - 1)), REPEAT)),
+        ('UserContextCache: hit',
+         measure(lambda: UserContextCache.get_cache_data(randint(0, ENTRIES - 1)), REPEAT)),
+    ]
+
+    # the previous implementation: a list of telegram ids, the key is moved to the end on a hit
+    users: list[int] = list(range(ENTRIES))
+
+    def list_cache_hit() -> bool:
+        telegram_id: int = randint(0, ENTRIES - 1)
+        if telegram_id in users:
+            users.remove(telegram_id)
+            users.append(telegram_id)
+            return True
+        return False
+
+    rows.append(('previous list cache: hit', measure(list_cache_hit, REPEAT // 100)))
+    rows.append(('previous list cache: miss', measure(lambda: -randint(1, ENTRIES) in users, REPEAT // 100)))
+    print_table(f'User caches, {ENTRIES} entries', rows)
+    print(f'\n{cache.get_stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 from sys import path as sys_path
 sys_path.append('../')
 from budget_graph.build_project import create_tables_in_db, drop_tables_in_db
+from budget_graph.sql_registry import PreparedStatementsConnection
 
 
 load_dotenv()  # Load environment variables from .env file
@@ -13,8 +14,12 @@ db_port = getenv('POSTGRES_PORT')
 db_name = getenv('POSTGRES_NAME')
 db_user = getenv('POSTGRES_USERNAME')
 db_psw = getenv('POSTGRES_PASSWORD')
+db_replica_host = getenv('POSTGRES_REPLICA_HOST')
+db_replica_port = getenv('POSTGRES_REPLICA_PORT') or db_port
 
 DSN = f'dbname={db_name} user={db_user} password={db_psw} host={db_host} port={db_port}'
+REPLICA_DSN = f'dbname={db_name} user={db_user} password={db_psw} host={db_replica_host} port={db_replica_port}' \
+    if db_replica_host else None
 
 
 def prepare_db_tables_for_tests() -> None:
@@ -29,12 +34,22 @@ def logs_dir_delete_and_create() -> None:
 
 def connect_test_db():
     try:
-        conn = connect(DSN)
+        conn = connect(DSN, connection_factory=PreparedStatementsConnection)
         return conn
     except Exception as err:
         print(f'Error connecting to database: {err}')
 
 
+def connect_test_replica_db():
+    """ :return: connection to the streaming replica of the test database | None (the replica is not configured) """
+    if REPLICA_DSN is None:
+        return None
+    try:
+        return connect(REPLICA_DSN, connection_factory=PreparedStatementsConnection)
+    except Exception as err:
+        print(f'Error connecting to database replica: {err}')
+
+
 def close_test_db(conn) -> None:
     if conn:
         conn.close()
@@ -0,0 +1,242 @@
+import unittest
+from time import sleep, monotonic
+from threading import Thread
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+from budget_graph.connection_pool import ConnectionPool, PoolTimeoutError, PoolClosedError
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query):
+        if self.connection.broken:
+            raise OperationalError('server closed the connection unexpectedly')
+        self.connection.executed.append(query)
+
+
+class FakeConnection:
+    """ Minimal connection object: the pool uses only these methods and attributes """
+    def __init__(self, dsn: str):
+        self.dsn: str = dsn
+        self.closed: int = 0
+        self.broken: bool = False
+        self.status: int = TRANSACTION_STATUS_IDLE
+        self.rollbacks: int = 0
+        self.executed: list = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self) -> int:
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeConnectionFactory:
+    def __init__(self):
+        self.connections: list = []
+
+    def __call__(self, dsn: str) -> FakeConnection:
+        connection = FakeConnection(dsn)
+        self.connections.append(connection)
+        return connection
+
+
+def get_test_pool(**kwargs) -> tuple[ConnectionPool, FakeConnectionFactory]:
+    factory = FakeConnectionFactory()
+    return ConnectionPool('dbname=test', connection_factory=factory, **kwargs), factory
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_pool_001(self):
+        """ the returned connection is reused instead of opening a new one """
+        pool, factory = get_test_pool()
+        conn_1 = pool.getconn()
+        pool.putconn(conn_1)
+        conn_2 = pool.getconn()
+        self.assertIs(conn_1, conn_2)
+        self.assertEqual(len(factory.connections), 1)
+        self.assertEqual(factory.connections[0].dsn, 'dbname=test')
+
+    def test_pool_002(self):
+        """ connections in use are not shared """
+        pool, factory = get_test_pool(max_size=3)
+        connections: list = [pool.getconn() for _ in range(3)]
+        self.assertEqual(len({id(conn) for conn in connections}), 3)
+        self.assertEqual(len(factory.connections), 3)
+        stats: dict = pool.get_stats()
+        self.assertEqual(stats['size'], 3)
+        self.assertEqual(stats['in_use'], 3)
+        self.assertEqual(stats['idle'], 0)
+
+    def test_pool_003(self):
+        """ fast failure when the pool is exhausted """
+        pool, _ = get_test_pool(max_size=2, wait_timeout=0.05)
+        pool.getconn()
+        pool.getconn()
+        start: float = monotonic()
+        with self.assertRaises(PoolTimeoutError):
+            pool.getconn()
+        self.assertLess(monotonic() - start, 1)
+        self.assertEqual(pool.get_stats()['timeouts'], 1)
+
+    def test_pool_004(self):
+        """ a waiting thread receives a connection as soon as it is returned """
+        pool, factory = get_test_pool(max_size=1, wait_timeout=5)
+        conn_1 = pool.getconn()
+        received: list = []
+        waiting_thread = Thread(target=lambda: received.append(pool.getconn()))
+        waiting_thread.start()
+        sleep(0.05)
+        pool.putconn(conn_1)
+        waiting_thread.join(timeout=5)
+        self.assertEqual(received, [conn_1])
+        self.assertEqual(len(factory.connections), 1)
+        self.assertEqual(pool.get_stats()['waits'], 1)
+
+    def test_pool_005(self):
+        """ an unfinished transaction is rolled back when the connection is returned """
+        pool, _ = get_test_pool()
+        conn = pool.getconn()
+        conn.status = TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertIs(pool.getconn(), conn)
+
+    def test_pool_006(self):
+        """ a closed connection is not returned to the pool """
+        pool, factory = get_test_pool()
+        conn_1 = pool.getconn()
+        conn_1.close()
+        pool.putconn(conn_1)
+        self.assertEqual(pool.get_stats()['size'], 0)
+        conn_2 = pool.getconn()
+        self.assertIsNot(conn_1, conn_2)
+        self.assertEqual(len(factory.connections), 2)
+
+    def test_pool_007(self):
+        """ health check on checkout replaces a broken connection """
+        pool, factory = get_test_pool(health_check_interval=0)
+        conn_1 = pool.getconn()
+        pool.putconn(conn_1)
+        conn_1.broken = True
+        conn_2 = pool.getconn()
+        self.assertIsNot(conn_1, conn_2)
+        self.assertTrue(conn_1.closed)
+        self.assertEqual(len(factory.connections), 2)
+        self.assertEqual(pool.get_stats()['failed_health_checks'], 1)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_pool_008(self):
+        """ the health check is skipped for recently used connections """
+        pool, _ = get_test_pool(health_check_interval=60)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        pool.getconn()
+        self.assertEqual(conn.executed, [])
+
+    def test_pool_009(self):
+        """ a connection is reopened after max_lifetime """
+        pool, factory = get_test_pool(max_lifetime=0.01)
+        conn_1 = pool.getconn()
+        sleep(0.02)
+        pool.putconn(conn_1)
+        self.assertTrue(conn_1.closed)
+        conn_2 = pool.getconn()
+        self.assertIsNot(conn_1, conn_2)
+        self.assertEqual(len(factory.connections), 2)
+
+    def test_pool_010(self):
+        """ idle connections above min_size are closed after idle_timeout """
+        pool, factory = get_test_pool(min_size=1, max_size=5, idle_timeout=0.01)
+        connections: list = [pool.getconn() for _ in range(4)]
+        for conn in connections:
+            pool.putconn(conn)
+        self.assertEqual(pool.get_stats()['idle'], 4)
+        sleep(0.02)
+        pool.getconn()
+        stats: dict = pool.get_stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['in_use'], 1)
+        self.assertEqual(sum(1 for conn in factory.connections if conn.closed), 3)
+
+    def test_pool_011(self):
+        """ failure to open a connection frees the reserved place in the pool """
+        def failing_factory(dsn: str):
+            raise OperationalError(f'could not connect: {dsn}')
+
+        pool = ConnectionPool('dbname=test', max_size=1, connection_factory=failing_factory)
+        with self.assertRaises(OperationalError):
+            pool.getconn()
+        self.assertEqual(pool.get_stats()['size'], 0)
+
+    def test_pool_012(self):
+        """ closing the pool """
+        pool, factory = get_test_pool()
+        conn_1 = pool.getconn()
+        conn_2 = pool.getconn()
+        pool.putconn(conn_1)
+        pool.closeall()
+        self.assertTrue(conn_1.closed)
+        self.assertFalse(conn_2.closed)
+        pool.putconn(conn_2)
+        self.assertTrue(conn_2.closed)
+        with self.assertRaises(PoolClosedError):
+            pool.getconn()
+        self.assertEqual(len(factory.connections), 2)
+
+    def test_pool_013(self):
+        """ a foreign connection is closed and not added to the pool """
+        pool, _ = get_test_pool()
+        foreign_connection = FakeConnection('dbname=other')
+        pool.putconn(foreign_connection)
+        self.assertTrue(foreign_connection.closed)
+        self.assertEqual(pool.get_stats()['idle'], 0)
+
+    def test_pool_014(self):
+        """ parallel checkouts never exceed max_size """
+        pool, factory = get_test_pool(max_size=4, wait_timeout=5)
+        errors: list = []
+
+        def worker():
+            try:
+                for _ in range(200):
+                    conn = pool.getconn()
+                    pool.putconn(conn)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                errors.append(err)
+
+        threads: list = [Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats: dict = pool.get_stats()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(factory.connections), 4)
+        self.assertEqual(stats['checkouts'], 16 * 200)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertGreaterEqual(stats['checkout_max_ms'], stats['checkout_avg_ms'])
+
+    def test_pool_015(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool('dbname=test', min_size=5, max_size=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,15 @@
-from os import makedirs, path
+from os import makedirs, path, listdir, utime
 from shutil import rmtree
 import unittest
 from random import randint, choice, seed
-from time import perf_counter
+from time import perf_counter, time
 from uuid import uuid4
+from datetime import date
 from string import ascii_letters, digits
 
-from budget_graph.create_csv import CsvFileWithTable
+from budget_graph.global_config import GlobalConfig
+from budget_graph.create_csv import CsvFileWithTable, STALE_TEMP_FILE_AGE
+from budget_graph.import_service import read_csv_transactions
 
 
 class TestCreateCSV(unittest.TestCase):
@@ -568,6 +571,124 @@ class TestCreateCSV(unittest.TestCase):
         keys: int = len(hash_vault)
         self.assertEqual(keys, iters, f'keys = {keys}')
 
+    def test_csv_036(self):
+        """ The data is a generator: the result is the same as for a tuple """
+        file_path: str = 'test_csv_tables/test_table_36.csv'
+        table_headers: tuple = ('column_1', 'column_2', 'column_3')
+        table_data = (('1', '2', '3') for _ in range(2))
+        create_csv_obj_36 = CsvFileWithTable(file_path, table_data, table_headers=table_headers)
+        create_csv_obj_36.create_csv_file()
+        self.assertEqual(create_csv_obj_36.rows_number, 2)
+        # the same file as in test_csv_001
+        file_checksum: str = create_csv_obj_36.get_file_checksum()
+        self.assertEqual(file_checksum, '8b443b2986f52ce0b30c6181749143024e565f0b38a8627f814af73735431d0f')
+
+    def test_csv_037(self):
+        """ The generator is interrupted by an error: neither the file nor the temporary file remains """
+        file_path: str = 'test_csv_tables/test_table_37.csv'
+
+        def table_data():
+            for i in range(1000):
+                yield tuple(range(7))
+                if i == 500:
+                    raise ConnectionError('the export has been interrupted')
+
+        create_csv_obj_37 = CsvFileWithTable(file_path, table_data())
+        with self.assertRaises(ConnectionError):
+            create_csv_obj_37.create_csv_file()
+        self.assertFalse(path.exists(file_path))
+        self.assertFalse(path.exists(f'{file_path}.tmp'))
+
+    def test_csv_038(self):
+        """ An invalid row after valid ones: the previous version of the file is not replaced """
+        file_path: str = 'test_csv_tables/test_table_38.csv'
+        create_csv_obj_38 = CsvFileWithTable(file_path, (tuple(range(7)),))
+        create_csv_obj_38.create_csv_file()
+        file_checksum: str = create_csv_obj_38.get_file_checksum()
+
+        table_data = (tuple(range(7 if i < 100 else 6)) for i in range(200))
+        with self.assertRaises(ValueError):
+            CsvFileWithTable(file_path, table_data).create_csv_file()
+        # the checksum is calculated again from the file
+        self.assertEqual(CsvFileWithTable(file_path, ()).get_file_checksum(), file_checksum)
+        self.assertFalse(path.exists(f'{file_path}.tmp'))
+
+    def test_csv_039(self):
+        """ Empty data: only the headers are written """
+        file_path: str = 'test_csv_tables/test_table_39.csv'
+        create_csv_obj_39 = CsvFileWithTable(file_path, iter(()))
+        create_csv_obj_39.create_csv_file()
+        self.assertEqual(create_csv_obj_39.rows_number, 0)
+        self.assertTrue(path.exists(file_path))
+
+
+    def test_csv_040(self):
+        """ The size and checksum calculated while writing are equal to the ones of the file """
+        file_path: str = 'test_csv_tables/test_table_40.csv'
+        create_csv_obj_40 = CsvFileWithTable(file_path, ((i, 'Иван', 'a,"b"\n', None) for i in range(50_000)),
+                                             table_headers=('1', '2', '3', '4'))
+        create_csv_obj_40.create_csv_file()
+        read_obj_40 = CsvFileWithTable(file_path, ())
+        self.assertEqual(create_csv_obj_40.get_file_checksum(), read_obj_40.get_file_checksum())
+        self.assertEqual(create_csv_obj_40.get_file_size_kb(), read_obj_40.get_file_size_kb())
+        self.assertEqual(create_csv_obj_40.file_size, path.getsize(file_path))
+
+    def test_csv_041(self):
+        """ The temporary files left by a stopped process are deleted after STALE_TEMP_FILE_AGE """
+        makedirs('test_csv_tables/cleanup', exist_ok=True)
+        for file_name in ('1_uuid_en.csv', '2_old_en.csv', '3_uuid_en.csv.tmp', '4_uuid_en.csv.tmp'):
+            with open(f'test_csv_tables/cleanup/{file_name}', 'w', encoding='utf-8') as file:
+                file.write('ID\n')
+        stale_time: float = time() - STALE_TEMP_FILE_AGE - 1
+        utime('test_csv_tables/cleanup/4_uuid_en.csv.tmp', (stale_time, stale_time))
+        actual_csv_files: dict = CsvFileWithTable.actual_csv_files
+        CsvFileWithTable.actual_csv_files = {1: 'uuid'}
+        try:
+            CsvFileWithTable.delete_unused_csv_files('test_csv_tables/cleanup')
+        finally:
+            CsvFileWithTable.actual_csv_files = actual_csv_files
+        self.assertEqual(sorted(listdir('test_csv_tables/cleanup')), ['1_uuid_en.csv', '3_uuid_en.csv.tmp'])
+
+
+class TestReadCsvTransactions(unittest.TestCase):
+    GlobalConfig.set_config()
+
+    def test_read_csv_001(self):
+        csv_data: bytes = ('TRANSFER,DATE,CATEGORY,DESCRIPTION\r\n'
+                           '-100,01/02/2024,Travel,"tickets, ""train"""\r\n'
+                           '\r\n'
+                           '2 500,2024-03-05,,\r\n').encode('utf-8')
+        self.assertEqual(read_csv_transactions(csv_data, 'en'),
+                         [('-100', '01/02/2024', 'Travel', 'tickets, "train"'), ('2500', '05/03/2024', '', '')])
+
+    def test_read_csv_002(self):
+        """ other order of the columns, semicolon, BOM and only the required columns """
+        csv_data: bytes = '\ufeffdate;Transfer;Comment\n01/02/2024;5;x\n02/02/2024;-6\n'.encode('utf-8')
+        self.assertEqual(read_csv_transactions(csv_data, 'en'),
+                         [('5', '01/02/2024', '', ''), ('-6', '02/02/2024', '', '')])
+
+    def test_read_csv_003(self):
+        """ the exported table (with the headers in the user's language) is imported back """
+        file_path: str = 'test_csv_tables/test_read_csv_003.csv'
+        makedirs('test_csv_tables', exist_ok=True)
+        table_data: tuple = ((2, 'user', -50, 50, date(2024, 2, 2), 'Other', ''),
+                             (1, 'user', 100, 100, date(2024, 2, 1), '', 'salary'))
+        CsvFileWithTable(file_path, table_data, lang='ru').create_csv_file()
+        with open(file_path, 'rb') as csv_file:
+            csv_data: bytes = csv_file.read()
+        self.assertEqual(read_csv_transactions(csv_data, 'ru'),
+                         [('-50', '02/02/2024', 'Other', ''), ('100', '01/02/2024', '', 'salary')])
+
+    def test_read_csv_004(self):
+        """ not a table of records """
+        for csv_data in (b'', b'\xff\xfe\x00', b'TRANSFER,CATEGORY\n1,Other\n', b'1,01/02/2024\n',
+                         b'TRANSFER,DATE\n1,"01/02/2024\n'):
+            with self.subTest(csv_data=csv_data):
+                self.assertIsNone(read_csv_transactions(csv_data, 'en'))
+
+    def test_read_csv_005(self):
+        self.assertEqual(read_csv_transactions(b'TRANSFER,DATE\n', 'en'), [])
+
 
 if __name__ == '__main__':
     unittest.main()
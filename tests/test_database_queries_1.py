@@ -1033,10 +1033,6 @@ class TestDbQueries(unittest.TestCase):
         """
         group_id: int = 3
         test_date: str = (datetime.now(timezone.utc) - timedelta(days=7)).strftime('%d/%m/%Y')
-        random_records_to_delete: tuple = tuple({
-            randint(1, NUMBER_OF_TRANSACTION_CYCLE_FOR_ONE_DAY)
-            for _ in range(NUMBER_OF_TRANSACTION_CYCLE_FOR_ONE_DAY // 2)
-        })
 
         # check that the group table is empty
         res_1: tuple = self.test_db.select_data_for_household_table(group_id, 0)
@@ -1051,8 +1047,16 @@ class TestDbQueries(unittest.TestCase):
             )
             self.assertTrue(res_2, f'Iteration number = {i}')
 
-        for transaction_id in range(1, NUMBER_OF_TRANSACTION_CYCLE_FOR_ONE_DAY):
-            # we have already recorded and deleted n = (NUMBER_OF_TRANSACTION_CYCLE) transactions from the table
+        # we have already recorded and deleted n = (NUMBER_OF_TRANSACTION_CYCLE) transactions from the table,
+        # numbers of deleted records are not reused, so the numbering continues from the group counter
+        first_transaction_id: int = self.test_db.select_data_for_household_table(group_id, 0)[-1][0]
+        random_records_to_delete: tuple = tuple({
+            first_transaction_id + randint(0, NUMBER_OF_TRANSACTION_CYCLE_FOR_ONE_DAY - 2)
+            for _ in range(NUMBER_OF_TRANSACTION_CYCLE_FOR_ONE_DAY // 2)
+        })
+
+        for transaction_id in range(first_transaction_id,
+                                    first_transaction_id + NUMBER_OF_TRANSACTION_CYCLE_FOR_ONE_DAY - 1):
             res_3: bool = self.test_db.check_record_id_is_exist(group_id, transaction_id)
             self.assertTrue(res_3, f'Iteration number = {transaction_id}')
 
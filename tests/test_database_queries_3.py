@@ -0,0 +1,1936 @@
+import unittest
+from os import listdir, path
+from io import BytesIO
+from hashlib import sha256
+from functools import partial
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from select import select
+from itertools import accumulate
+from random import randint, seed
+from unittest.mock import patch
+
+from psycopg2 import DatabaseError
+
+from budget_graph.db_manager import DatabaseQueries, DatabasePool, sql_registry, get_plot_period_bounds, \
+    pooled_connection, connect_defer_close_db
+from budget_graph.sql_registry import PREPARED_QUERIES
+from budget_graph.user_context import UserContext
+from budget_graph.encryption import getting_hash, get_salt
+from budget_graph.create_csv import CsvFileWithTable
+from budget_graph.dictionary import receive_translation
+from budget_graph.import_service import transactions_import
+from budget_graph.archive_service import transactions_archive, get_archive_horizon
+from budget_graph.build_project import partition_transactions
+from budget_graph.global_config import GlobalConfig
+from budget_graph.query_metrics import query_metrics
+from budget_graph.replica_routing import read_your_writes
+from budget_graph.cache_invalidation import CacheInvalidationListener, InvalidationHandlers, CHANNEL, \
+    LISTENER_APPLICATION_NAME
+from budget_graph.user_cache_structure import UserLanguageCache, UserContextCache, UnregisteredUserCache
+from budget_graph.group_profile import GroupProfile, GroupProfileCache
+from budget_graph.household_view import HouseholdViewCache, VERSION_MAX_AGE
+from budget_graph.lru_cache import LruCache
+from budget_graph.last_login_buffer import LastLoginBuffer, last_login_flush
+
+from tests.build_test_infrastructure import connect_test_db, connect_test_replica_db, close_test_db, \
+    prepare_db_tables_for_tests, DSN, REPLICA_DSN
+
+
+def get_prepared_statements(connection) -> set[str]:
+    with connection.cursor() as cur:
+        cur.execute('SELECT "name" FROM "pg_prepared_statements"')
+        names: set[str] = {row[0] for row in cur.fetchall()}
+    connection.rollback()
+    return names
+
+
+class TestPreparedStatements(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_id: int = randint(1, 10_000_000)
+        cls.username: str = f'user_{randint(100, 999)}'
+        connection = connect_test_db()
+        psw_salt: str = get_salt()
+        DatabaseQueries(connection).registration_new_user(
+            cls.telegram_id, cls.username, psw_salt, getting_hash(psw_salt, 'password')
+        )
+        cls.group_id: int = DatabaseQueries(connection).get_group_id_by_telegram_id(cls.telegram_id)
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def test_prepared_statements_001(self):
+        """ every prepared query is accepted by the server """
+        for name in sorted(PREPARED_QUERIES):
+            with self.subTest(query=name):
+                with self.connection.cursor() as cur:
+                    cur.execute(sql_registry.get(name).prepare_text)
+                self.connection.rollback()
+        self.assertEqual(
+            get_prepared_statements(self.connection),
+            {f'budget_graph_{name}' for name in PREPARED_QUERIES}
+        )
+
+    def test_prepared_statements_002(self):
+        """ the statement is prepared once per connection and then executed by name """
+        self.assertEqual(get_prepared_statements(self.connection), set())
+        for _ in range(3):
+            self.assertEqual(self.test_db.get_username_by_telegram_id(self.telegram_id), self.username)
+        self.assertEqual(get_prepared_statements(self.connection), {'budget_graph_get_username_by_telegram_id'})
+        self.assertEqual(self.connection.prepared_statements, {'get_username_by_telegram_id'})
+
+    def test_prepared_statements_003(self):
+        """ the prepared statement survives the rollback of the transaction in which it was prepared """
+        self.assertEqual(self.test_db.get_user_language(self.telegram_id), 'en')
+        self.connection.rollback()
+        self.assertTrue(self.test_db.add_user_language(self.telegram_id, 'de'))
+        self.assertEqual(self.test_db.get_user_language(self.telegram_id), 'de')
+        self.assertTrue(self.test_db.add_user_language(self.telegram_id, 'en'))
+
+    def test_prepared_statements_004(self):
+        """ prepared write queries """
+        self.assertTrue(self.test_db.add_transaction_to_db(100, '01/01/2024', 'Other', 'desc', self.telegram_id))
+        self.assertTrue(self.test_db.add_transaction_to_db(-50, '02/01/2024', 'Other', '', username=self.username))
+        data: tuple = self.test_db.select_data_for_household_table(self.group_id, 0)
+        self.assertEqual([(row[2], row[3]) for row in data], [(-50, 50), (100, 100)])
+        self.assertTrue(self.test_db.check_record_id_is_exist(self.group_id, data[0][0]))
+        self.assertTrue(self.test_db.process_delete_transaction_record(self.group_id, data[1][0]))
+        self.assertEqual(self.test_db.select_data_for_household_table(self.group_id, 1)[0][3], -50)
+        self.assertTrue(self.test_db.process_delete_transaction_record(self.group_id, data[0][0]))
+
+    def test_prepared_statements_005(self):
+        """ queries that are not prepared are executed as plain text """
+        self.assertEqual(self.test_db.get_telegram_id_by_username(self.username), self.telegram_id)
+        self.assertEqual(get_prepared_statements(self.connection), set())
+
+
+class TestUserContext(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.owner_id: int = randint(1, 10_000_000)
+        cls.member_id: int = cls.owner_id + 1
+        cls.unknown_id: int = cls.owner_id + 2
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        db.registration_new_user(cls.owner_id, 'context_owner', psw_salt, getting_hash(psw_salt, 'password'))
+        cls.group_id: int = db.get_group_id_by_telegram_id(cls.owner_id)
+        db.registration_new_user(cls.member_id, 'context_member', psw_salt, getting_hash(psw_salt, 'password'),
+                                 cls.group_id)
+        db.add_user_language(cls.member_id, 'de')
+        db.add_user_timezone(cls.member_id, 3)
+        with connection.cursor() as cur:
+            cur.execute('INSERT INTO "budget_graph"."premium_users" ("telegram_id", "paid_until", "premium_status") '
+                        'VALUES (%s, CURRENT_DATE + 30, TRUE)', (cls.member_id,))
+        connection.commit()
+        close_test_db(connection)
+
+    def setUp(self):
+        UserContextCache.get_cache().local.clear()
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def test_user_context_001(self):
+        """ group owner """
+        user_context: UserContext = self.test_db.get_user_context(self.owner_id)
+        self.assertEqual(user_context.telegram_id, self.owner_id)
+        self.assertEqual(user_context.language, 'en')
+        self.assertTrue(user_context.is_registered)
+        self.assertEqual(user_context.username, 'context_owner')
+        self.assertEqual(user_context.group_id, self.group_id)
+        self.assertTrue(user_context.is_owner)
+        self.assertFalse(user_context.is_premium)
+        self.assertEqual(user_context.timezone, 0)
+        self.assertEqual(len(user_context.settings), 10)
+
+    def test_user_context_002(self):
+        """ group member with language, timezone and premium status """
+        user_context: UserContext = self.test_db.get_user_context(self.member_id)
+        self.assertEqual(user_context.language, 'de')
+        self.assertTrue(user_context.is_registered)
+        self.assertEqual(user_context.username, 'context_member')
+        self.assertEqual(user_context.group_id, self.group_id)
+        self.assertFalse(user_context.is_owner)
+        self.assertTrue(user_context.is_premium)
+        self.assertEqual(user_context.timezone, 3)
+
+    def test_user_context_003(self):
+        """ unregistered user """
+        user_context: UserContext = self.test_db.get_user_context(self.unknown_id)
+        self.assertEqual(user_context.language, 'en')
+        self.assertFalse(user_context.is_registered)
+        self.assertEqual(user_context.username, '')
+        self.assertEqual(user_context.group_id, 0)
+        self.assertFalse(user_context.is_owner)
+        self.assertFalse(user_context.is_premium)
+        self.assertIsNone(user_context.timezone)
+        self.assertEqual(user_context.get_skip_operations_status(), (False, False, False))
+
+        self.assertTrue(self.test_db.add_user_language(self.unknown_id, 'fr'))
+        self.assertEqual(self.test_db.get_user_context(self.unknown_id).language, 'fr')
+
+    def test_user_context_004(self):
+        """ settings match the separate queries """
+        for feature in ('del_msg_after_transaction', 'skip_input_date', 'skip_input_category'):
+            self.assertTrue(self.test_db.change_feature_status(self.owner_id, feature))
+            user_context: UserContext = self.test_db.get_user_context(self.owner_id)
+            for feature_name in ('del_msg_after_transaction', 'skip_input_date',
+                                 'skip_input_category', 'skip_input_description'):
+                with self.subTest(feature=feature, feature_name=feature_name):
+                    self.assertEqual(user_context.get_feature_status(feature_name),
+                                     self.test_db.get_feature_status(self.owner_id, feature_name))
+            self.assertEqual(user_context.get_skip_operations_status(),
+                             self.test_db.get_skip_operations_status(self.owner_id))
+
+    def test_user_context_005(self):
+        """ the last activity date of a registered user is buffered and written by the flush """
+        with self.connection.cursor() as cur:
+            cur.execute('UPDATE "budget_graph"."users" SET "last_login" = NULL WHERE "telegram_id" = %s',
+                        (self.member_id,))
+        self.connection.commit()
+        LastLoginBuffer.take()
+        for _ in range(3):
+            self.test_db.get_user_context(self.member_id)
+        self.test_db.get_user_context(self.unknown_id)
+        self.assertIsNone(dict(self.test_db.get_group_users_data(self.group_id))['context_member'])
+        self.assertEqual(last_login_flush(self.test_db), 1)  # the updates of the user are coalesced
+        last_login: dict = dict(self.test_db.get_group_users_data(self.group_id))
+        self.assertIsNotNone(last_login['context_member'])
+        self.assertEqual(last_login_flush(self.test_db), 0)
+
+    def test_user_context_007(self):
+        """ a failed flush keeps the dates, an earlier date does not overwrite a later one """
+        LastLoginBuffer.take()
+        self.test_db.get_user_context(self.owner_id)
+        self.assertEqual(last_login_flush(DatabaseQueries(None)), 0)
+        self.assertEqual(LastLoginBuffer.get_size(), 1)
+        self.assertEqual(last_login_flush(self.test_db), 1)
+        last_login: datetime = dict(self.test_db.get_group_users_data(self.group_id))['context_owner']
+
+        self.assertTrue(self.test_db.update_users_last_login({self.owner_id: datetime(2020, 1, 1),
+                                                              self.unknown_id: datetime(2020, 1, 1)}))
+        self.assertEqual(dict(self.test_db.get_group_users_data(self.group_id))['context_owner'], last_login)
+
+    def test_user_context_008(self):
+        """ the context of the registered user is read once and evicted by the changes of the user """
+        user_context: UserContext = self.test_db.get_user_context(self.member_id)
+        self.assertIs(UserContextCache.get_cache_data(self.member_id), user_context)
+        self.assertIs(DatabaseQueries(None).get_user_context(self.member_id), user_context)  # without the database
+
+        self.assertTrue(self.test_db.add_user_timezone(self.member_id, 5))
+        self.assertIsNone(UserContextCache.get_cache_data(self.member_id))
+        self.assertEqual(self.test_db.get_user_context(self.member_id).timezone, 5)
+        self.assertTrue(self.test_db.add_user_timezone(self.member_id, 3))
+
+        self.assertTrue(self.test_db.change_feature_status(self.member_id, 'skip_input_date'))
+        self.assertTrue(self.test_db.get_user_context(self.member_id).get_feature_status('skip_input_date'))
+        self.assertTrue(self.test_db.change_feature_status(self.member_id, 'skip_input_date'))
+        self.assertFalse(self.test_db.get_user_context(self.member_id).get_feature_status('skip_input_date'))
+
+        self.assertTrue(self.test_db.get_user_context(self.owner_id).is_owner)
+        self.assertTrue(self.test_db.update_group_owner(self.member_id, self.group_id))
+        self.assertTrue(self.test_db.get_user_context(self.member_id).is_owner)
+        self.assertFalse(self.test_db.get_user_context(self.owner_id).is_owner)
+        self.assertTrue(self.test_db.update_group_owner(self.owner_id, self.group_id))
+        self.assertTrue(self.test_db.get_user_context(self.owner_id).is_owner)
+
+    def test_user_context_006(self):
+        """ default values if there is no connection """
+        user_context: UserContext = DatabaseQueries(None).get_user_context(self.owner_id)
+        self.assertEqual(user_context.language, 'en')
+        self.assertFalse(user_context.is_registered)
+
+
+class TestDailyBalances(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_id: int = randint(1, 10_000_000)
+        connection = connect_test_db()
+        psw_salt: str = get_salt()
+        DatabaseQueries(connection).registration_new_user(
+            cls.telegram_id, 'balance_owner', psw_salt, getting_hash(psw_salt, 'password')
+        )
+        cls.group_id: int = DatabaseQueries(connection).get_group_id_by_telegram_id(cls.telegram_id)
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def get_records(self) -> list[tuple]:
+        """ (record_date, transaction_id, transfer) of all group records in chronological order """
+        with self.connection.cursor() as cur:
+            cur.execute('SELECT "record_date", "transaction_id", "transfer" FROM "budget_graph"."monetary_transactions" '
+                        'WHERE "group_id" = %s ORDER BY "record_date", "transaction_id"', (self.group_id,))
+            records: list[tuple] = cur.fetchall()
+        self.connection.rollback()
+        return records
+
+    def get_daily_balances(self) -> dict:
+        with self.connection.cursor() as cur:
+            cur.execute('SELECT "record_date", "day_sum" FROM "budget_graph"."daily_balances" WHERE "group_id" = %s',
+                        (self.group_id,))
+            daily_balances: dict = dict(cur.fetchall())
+        self.connection.rollback()
+        return daily_balances
+
+    def assert_totals(self) -> None:
+        """ the displayed balance is equal to the running sum of all records up to and including the current one """
+        records: list[tuple] = self.get_records()
+        expected: list[tuple] = [(record[1], record[2], total)
+                                 for record, total in zip(records, accumulate(record[2] for record in records))]
+        expected.reverse()
+        for limit in (1, 2, 7, len(records), 0):
+            with self.subTest(limit=limit):
+                data: tuple = self.test_db.select_data_for_household_table(self.group_id, limit)
+                self.assertEqual([(row[0], row[2], row[3]) for row in data], expected[:limit or len(expected)])
+
+        day_sums: dict = {}
+        for record_date, _, transfer in records:
+            day_sums[record_date] = day_sums.get(record_date, 0) + transfer
+        # a day with a zero sum does not change the balance, so it may or may not be stored
+        self.assertEqual({day: value for day, value in self.get_daily_balances().items() if value},
+                         {day: value for day, value in day_sums.items() if value})
+
+    def test_daily_balances_001(self):
+        """ back-dated records are added and deleted in random order """
+        seed(self.telegram_id)
+        for _ in range(60):
+            self.assertTrue(self.test_db.add_transaction_to_db(
+                randint(-1000, 1000) or 1, f'{randint(1, 10):02}/{randint(1, 3):02}/2024', 'Other', '', self.telegram_id
+            ))
+        self.assert_totals()
+
+        for _ in range(20):
+            records: list[tuple] = self.get_records()
+            self.assertTrue(self.test_db.process_delete_transaction_record(
+                self.group_id, records[randint(0, len(records) - 1)][1]
+            ))
+        self.assert_totals()
+
+        self.assertTrue(self.test_db.add_transaction_to_db(-5, '01/01/2000', 'Other', '', self.telegram_id))
+        self.assert_totals()
+
+    def test_daily_balances_002(self):
+        """ the day is removed from "daily_balances" after deleting its last record """
+        self.assertTrue(self.test_db.add_transaction_to_db(70, '15/06/2023', 'Other', '', self.telegram_id))
+        self.assertIn('2023-06-15', {day.isoformat() for day in self.get_daily_balances()})
+        record_id: int = next(record[1] for record in self.get_records() if record[0].isoformat() == '2023-06-15')
+        self.assertTrue(self.test_db.process_delete_transaction_record(self.group_id, record_id))
+        self.assertNotIn('2023-06-15', {day.isoformat() for day in self.get_daily_balances()})
+        self.assert_totals()
+
+    def test_daily_balances_003(self):
+        """ deleting a record changes the version of the group transactions """
+        self.assertTrue(self.test_db.add_transaction_to_db(10, '01/02/2022', 'Other', '', self.telegram_id))
+        transactions_uuid: str = self.test_db.get_group_transaction_uuid(self.group_id)
+        record_id: int = self.test_db.select_data_for_household_table(self.group_id, 0)[-1][0]
+        self.assertTrue(self.test_db.process_delete_transaction_record(self.group_id, record_id))
+        self.assertNotEqual(self.test_db.get_group_transaction_uuid(self.group_id), transactions_uuid)
+        self.assert_totals()
+
+    def test_daily_balances_004(self):
+        """ the record of a non-existent user is not added """
+        self.assertFalse(self.test_db.add_transaction_to_db(10, '01/02/2022', 'Other', '', username='unknown_user'))
+        self.assert_totals()
+
+
+class TestTransactionCounter(unittest.TestCase):
+    NUMBER_OF_THREADS: int = 20
+    TRANSACTIONS_PER_THREAD: int = 15
+
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_id: int = randint(1, 10_000_000)
+        connection = connect_test_db()
+        psw_salt: str = get_salt()
+        DatabaseQueries(connection).registration_new_user(
+            cls.telegram_id, 'counter_owner', psw_salt, getting_hash(psw_salt, 'password')
+        )
+        cls.group_id: int = DatabaseQueries(connection).get_group_id_by_telegram_id(cls.telegram_id)
+        close_test_db(connection)
+
+    def get_transaction_ids(self) -> tuple[list[int], int]:
+        """ numbers of all group records and the value of the group counter """
+        connection = connect_test_db()
+        with connection.cursor() as cur:
+            cur.execute('SELECT "transaction_id" FROM "budget_graph"."monetary_transactions" WHERE "group_id" = %s '
+                        'ORDER BY "transaction_id"', (self.group_id,))
+            transaction_ids: list[int] = [row[0] for row in cur.fetchall()]
+            cur.execute('SELECT "last_transaction_id" FROM "budget_graph"."groups" WHERE "id" = %s', (self.group_id,))
+            last_transaction_id: int = cur.fetchone()[0]
+        close_test_db(connection)
+        return transaction_ids, last_transaction_id
+
+    def add_transactions(self, barrier: Barrier) -> list[bool]:
+        connection = connect_test_db()
+        test_db = DatabaseQueries(connection)
+        barrier.wait()  # all threads start inserting at the same time
+        results: list[bool] = [test_db.add_transaction_to_db(1, '01/01/2024', 'Other', '', self.telegram_id)
+                               for _ in range(self.TRANSACTIONS_PER_THREAD)]
+        close_test_db(connection)
+        return results
+
+    def test_transaction_counter_001(self):
+        """ parallel inserts into one group get different consecutive numbers """
+        transaction_ids, last_transaction_id = self.get_transaction_ids()
+        barrier = Barrier(self.NUMBER_OF_THREADS)
+        with ThreadPoolExecutor(max_workers=self.NUMBER_OF_THREADS) as executor:
+            futures = [executor.submit(self.add_transactions, barrier) for _ in range(self.NUMBER_OF_THREADS)]
+            results: list[bool] = [result for future in futures for result in future.result()]
+
+        number_of_transactions: int = self.NUMBER_OF_THREADS * self.TRANSACTIONS_PER_THREAD
+        self.assertEqual(results, [True] * number_of_transactions)
+        new_transaction_ids, new_last_transaction_id = self.get_transaction_ids()
+        self.assertEqual(new_transaction_ids,
+                         transaction_ids + list(range(last_transaction_id + 1,
+                                                      last_transaction_id + number_of_transactions + 1)))
+        self.assertEqual(new_last_transaction_id, last_transaction_id + number_of_transactions)
+
+    def test_transaction_counter_002(self):
+        """ the number of a deleted record is not reused """
+        connection = connect_test_db()
+        test_db = DatabaseQueries(connection)
+        self.assertTrue(test_db.add_transaction_to_db(1, '01/01/2024', 'Other', '', self.telegram_id))
+        transaction_ids, last_transaction_id = self.get_transaction_ids()
+        self.assertEqual(transaction_ids[-1], last_transaction_id)
+        self.assertTrue(test_db.process_delete_transaction_record(self.group_id, last_transaction_id))
+        self.assertTrue(test_db.add_transaction_to_db(1, '01/01/2024', 'Other', '', self.telegram_id))
+        self.assertEqual(self.get_transaction_ids()[0][-1], last_transaction_id + 1)
+        close_test_db(connection)
+
+
+class TestGroupTransactionUuid(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_ids: tuple[int, int] = (randint(1, 10_000_000), randint(10_000_001, 20_000_000))
+        connection = connect_test_db()
+        psw_salt: str = get_salt()
+        for number, telegram_id in enumerate(cls.telegram_ids):
+            DatabaseQueries(connection).registration_new_user(
+                telegram_id, f'uuid_owner_{number}', psw_salt, getting_hash(psw_salt, 'password')
+            )
+        cls.group_ids: tuple[int, ...] = tuple(DatabaseQueries(connection).get_group_id_by_telegram_id(telegram_id)
+                                               for telegram_id in cls.telegram_ids)
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def get_uuids(self) -> tuple[str, ...]:
+        return tuple(self.test_db.get_group_transaction_uuid(group_id) for group_id in self.group_ids)
+
+    def get_groups_updates(self, cur) -> int:
+        """ number of updated rows of the groups table in the current transaction """
+        cur.execute('SELECT "n_tup_upd" FROM "pg_stat_xact_user_tables" '
+                    'WHERE "schemaname" = \'budget_graph\' AND "relname" = \'groups\'')
+        return cur.fetchone()[0]
+
+    def test_group_transaction_uuid_001(self):
+        """ a statement with many records changes the uuid of each affected group once """
+        uuids: tuple[str, ...] = self.get_uuids()
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                updates_before: int = self.get_groups_updates(cur)
+                cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                            '("group_id", "username", "transfer", "record_date") '
+                            'SELECT %s, \'uuid_owner_0\', i, \'2024-01-01\'::date + i FROM generate_series(1, 50) i',
+                            (self.group_ids[0],))
+                # 50 updates of the transaction counter + 1 update of the uuid
+                self.assertEqual(self.get_groups_updates(cur) - updates_before, 51)
+        new_uuids: tuple[str, ...] = self.get_uuids()
+        self.assertNotEqual(new_uuids[0], uuids[0])
+        self.assertEqual(new_uuids[1], uuids[1])
+
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                updates_before: int = self.get_groups_updates(cur)
+                cur.execute('DELETE FROM "budget_graph"."monetary_transactions" WHERE "group_id" = %s',
+                            (self.group_ids[0],))
+                self.assertEqual(cur.rowcount, 50)
+                self.assertEqual(self.get_groups_updates(cur) - updates_before, 1)
+        self.assertNotEqual(self.get_uuids()[0], new_uuids[0])
+
+    def test_group_transaction_uuid_002(self):
+        """ the uuid is changed by adding and deleting a record through DatabaseQueries """
+        uuids: tuple[str, ...] = self.get_uuids()
+        self.assertTrue(self.test_db.add_transaction_to_db(1, '01/01/2024', 'Other', '', self.telegram_ids[1]))
+        new_uuids: tuple[str, ...] = self.get_uuids()
+        self.assertEqual(len(new_uuids[1]), 36)
+        self.assertNotEqual(new_uuids[1], uuids[1])
+        self.assertEqual(new_uuids[0], uuids[0])
+
+        record_id: int = self.test_db.select_data_for_household_table(self.group_ids[1], 1)[0][0]
+        self.assertTrue(self.test_db.process_delete_transaction_record(self.group_ids[1], record_id))
+        self.assertNotEqual(self.get_uuids()[1], new_uuids[1])
+
+    def test_group_transaction_uuid_003(self):
+        """ a statement that does not affect any record does not change the uuid """
+        uuids: tuple[str, ...] = self.get_uuids()
+        self.assertTrue(self.test_db.process_delete_transaction_record(self.group_ids[0], 1_000_000))
+        self.assertEqual(self.get_uuids(), uuids)
+
+
+class TestGroupUsersNumber(unittest.TestCase):
+    NUMBER_OF_THREADS: int = 12
+    CYCLES_PER_THREAD: int = 10
+
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.owner_id: int = randint(1, 10_000_000)
+        cls.psw_salt: str = get_salt()
+        cls.psw_hash: str = getting_hash(cls.psw_salt, 'password')
+        connection = connect_test_db()
+        DatabaseQueries(connection).registration_new_user(cls.owner_id, 'members_owner', cls.psw_salt, cls.psw_hash)
+        cls.group_id: int = DatabaseQueries(connection).get_group_id_by_telegram_id(cls.owner_id)
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def get_users_number(self) -> tuple[int | None, int]:
+        """ value of the group counter and the actual number of group members """
+        connection = connect_test_db()
+        with connection.cursor() as cur:
+            cur.execute('SELECT "users_number" FROM "budget_graph"."groups" WHERE "id" = %s', (self.group_id,))
+            users_number: int | None = res[0] if (res := cur.fetchone()) else None
+            cur.execute('SELECT COUNT(*) FROM "budget_graph"."users_groups" WHERE "group_id" = %s', (self.group_id,))
+            number_of_members: int = cur.fetchone()[0]
+        close_test_db(connection)
+        return users_number, number_of_members
+
+    def register_and_remove(self, barrier: Barrier, thread_number: int) -> int:
+        """ :return: number of successful registrations """
+        connection = connect_test_db()
+        test_db = DatabaseQueries(connection)
+        registered: int = 0
+        barrier.wait()
+        for cycle in range(self.CYCLES_PER_THREAD):
+            telegram_id: int = self.owner_id + 1 + thread_number * self.CYCLES_PER_THREAD + cycle
+            if test_db.registration_new_user(telegram_id, f'member_{thread_number}_{cycle}', self.psw_salt,
+                                             self.psw_hash, self.group_id):
+                registered += 1
+                self.assertTrue(test_db.delete_user_from_group_by_telegram_id(telegram_id))
+        close_test_db(connection)
+        return registered
+
+    def register(self, barrier: Barrier, telegram_id: int) -> bool:
+        connection = connect_test_db()
+        barrier.wait()
+        res: bool = DatabaseQueries(connection).registration_new_user(
+            telegram_id, f'member_{telegram_id % 1_000_000}', self.psw_salt, self.psw_hash, self.group_id
+        )
+        close_test_db(connection)
+        return res
+
+    def test_group_users_number_001(self):
+        """ the counter of the new group takes into account its owner """
+        self.assertEqual(self.get_users_number(), (1, 1))
+        self.assertTrue(self.test_db.check_limit_users_in_group(self.group_id))
+
+    def test_group_users_number_002(self):
+        """ users are registered and removed concurrently """
+        barrier = Barrier(self.NUMBER_OF_THREADS)
+        with ThreadPoolExecutor(max_workers=self.NUMBER_OF_THREADS) as executor:
+            futures = [executor.submit(self.register_and_remove, barrier, thread_number)
+                       for thread_number in range(self.NUMBER_OF_THREADS)]
+            registered: int = sum(future.result() for future in futures)
+        self.assertEqual(registered, self.NUMBER_OF_THREADS * self.CYCLES_PER_THREAD)
+        self.assertEqual(self.get_users_number(), (1, 1))
+
+    def test_group_users_number_003(self):
+        """ concurrent registrations do not exceed the group limit """
+        number_of_users: int = 30
+        barrier = Barrier(number_of_users)
+        first_telegram_id: int = self.owner_id + 1_000_000
+        with ThreadPoolExecutor(max_workers=number_of_users) as executor:
+            futures = [executor.submit(self.register, barrier, first_telegram_id + number)
+                       for number in range(number_of_users)]
+            registered: int = sum(1 for future in futures if future.result())
+        self.assertEqual(registered, 19)  # + owner
+        self.assertEqual(self.get_users_number(), (20, 20))
+        self.assertFalse(self.test_db.check_limit_users_in_group(self.group_id))
+
+        self.assertTrue(self.test_db.delete_group_with_users(self.group_id))
+        self.assertEqual(self.get_users_number(), (None, 0))
+        self.assertFalse(self.test_db.check_limit_users_in_group(self.group_id))
+
+
+class TestExportGroupTransactions(unittest.TestCase):
+    NUMBER_OF_TRANSACTIONS: int = 12_000  # more than the limit of select_data_for_household_table
+
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_id: int = randint(1, 10_000_000)
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        db.registration_new_user(cls.telegram_id, 'export_owner', psw_salt, getting_hash(psw_salt, 'password'))
+        cls.group_id: int = db.get_group_id_by_telegram_id(cls.telegram_id)
+        db.registration_new_user(cls.telegram_id + 1, 'export_empty', psw_salt, getting_hash(psw_salt, 'password'))
+        cls.empty_group_id: int = db.get_group_id_by_telegram_id(cls.telegram_id + 1)
+        with connection.cursor() as cur:
+            cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                        '("group_id", "username", "transfer", "record_date", "category", "description") '
+                        'SELECT %s, \'export_owner\', (i %% 1000 + 1) * (1 - 2 * (i %% 3 / 2)), '
+                        '\'2020-01-01\'::date + i %% 700, CASE WHEN i %% 7 > 0 THEN \'Other\' END, '
+                        'CASE i %% 5 WHEN 0 THEN \'\' WHEN 1 THEN \'say "hi", \' || i ELSE i::text END '
+                        'FROM generate_series(1, %s) i', (cls.group_id, cls.NUMBER_OF_TRANSACTIONS))
+        connection.commit()
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def test_export_group_transactions_001(self):
+        """ the same rows as select_data_for_household_table, but without the limit """
+        household_table: tuple = self.test_db.select_data_for_household_table(self.group_id, 0)
+        self.assertEqual(len(household_table), 10_000)
+        for fetch_size in (1, 999, 5_000, 100_000):
+            with self.subTest(fetch_size=fetch_size):
+                rows: list[tuple] = list(self.test_db.export_group_transactions(self.group_id, fetch_size))
+                self.assertEqual(len(rows), self.NUMBER_OF_TRANSACTIONS)
+                self.assertEqual(tuple(rows[:10_000]), household_table)
+
+        # the balance after the oldest record is equal to its amount
+        self.assertEqual(rows[-1][2], rows[-1][3])
+        for newer, older in zip(rows, rows[1:]):
+            self.assertEqual(newer[3] - newer[2], older[3])
+
+    def test_export_group_transactions_002(self):
+        """ the rows are read by a server-side cursor """
+        rows = self.test_db.export_group_transactions(self.group_id, 100)
+        self.assertEqual(len(next(rows)), 7)
+        with self.connection.cursor() as cur:
+            cur.execute('SELECT "name" FROM "pg_cursors"')
+            self.assertEqual([row[0] for row in cur.fetchall()], [f'export_group_transactions_{self.group_id}'])
+        self.assertEqual(sum(1 for _ in rows), self.NUMBER_OF_TRANSACTIONS - 1)
+        self.assertEqual(self.connection.status, 1)  # STATUS_READY: the transaction is completed
+
+    def test_export_group_transactions_003(self):
+        self.assertEqual(list(self.test_db.export_group_transactions(self.empty_group_id)), [])
+
+    def test_export_group_transactions_004(self):
+        """ the export without a connection is interrupted by an error, not by an empty result """
+        with self.assertRaises(DatabaseError):
+            list(DatabaseQueries(None).export_group_transactions(self.group_id))
+
+    def test_export_group_transactions_005(self):
+        """
+        COPY writes the same table as csv.writer (except for the line endings),
+        the checksum and size are calculated in the same pass
+        """
+        with TemporaryDirectory() as csv_directory:
+            for language in ('en', 'ru'):
+                with self.subTest(language=language):
+                    rows_file = CsvFileWithTable(path.join(csv_directory, f'rows_{language}.csv'),
+                                                 self.test_db.export_group_transactions(self.group_id), lang=language)
+                    rows_file.create_csv_file()
+                    copy_file = CsvFileWithTable(path.join(csv_directory, f'copy_{language}.csv'), (), lang=language)
+                    copy_file.create_csv_file_by_copy(
+                        partial(self.test_db.copy_group_transactions_to_csv, self.group_id)
+                    )
+                    self.assertEqual(copy_file.rows_number, self.NUMBER_OF_TRANSACTIONS)
+
+                    with open(rows_file.file_path, 'rb') as csv_file:
+                        rows_content: bytes = csv_file.read()
+                    with open(copy_file.file_path, 'rb') as csv_file:
+                        copy_content: bytes = csv_file.read()
+                    self.assertEqual(copy_content, rows_content.replace(b'\r\n', b'\n'))
+                    self.assertEqual(copy_file.get_file_checksum(), sha256(copy_content).hexdigest())
+                    self.assertEqual(copy_file.file_size, len(copy_content))
+                    self.assertEqual(copy_content.decode('utf-8').split(',', 1)[0],
+                                     receive_translation(language, 'ID'))
+
+    def test_export_group_transactions_006(self):
+        with TemporaryDirectory() as csv_directory:
+            csv_file = CsvFileWithTable(path.join(csv_directory, 'empty.csv'), ())
+            csv_file.create_csv_file_by_copy(partial(self.test_db.copy_group_transactions_to_csv, self.empty_group_id))
+            self.assertEqual(csv_file.rows_number, 0)
+            with open(csv_file.file_path, 'r', encoding='utf-8') as file:
+                self.assertEqual(file.read(), 'ID,USERNAME,TRANSFER,TOTAL,DATE,CATEGORY,DESCRIPTION\n')
+
+    def test_export_group_transactions_007(self):
+        """ the interrupted COPY does not leave a file """
+        with TemporaryDirectory() as csv_directory:
+            csv_file = CsvFileWithTable(path.join(csv_directory, 'interrupted.csv'), ())
+            with self.assertRaises(DatabaseError):
+                csv_file.create_csv_file_by_copy(partial(DatabaseQueries(None).copy_group_transactions_to_csv,
+                                                         self.group_id))
+            self.assertEqual(listdir(csv_directory), [])
+            with self.assertRaises(ValueError):
+                self.test_db.copy_group_transactions_to_csv(self.group_id, BytesIO(), ('ID', 'USERNAME'))
+
+
+    def test_export_group_transactions_008(self):
+        """ the number of the copied rows is returned by COPY (the values can contain line breaks) """
+        with self.connection.cursor() as cur:
+            cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                        '("group_id", "username", "transfer", "record_date", "description") '
+                        'SELECT %s, \'export_empty\', i, \'2024-01-01\', E\'line 1\\nline 2\' '
+                        'FROM generate_series(1, 3) i', (self.empty_group_id,))
+        self.connection.commit()
+        file = BytesIO()
+        self.assertEqual(self.test_db.copy_group_transactions_to_csv(self.empty_group_id, file, ('a',) * 7), 3)
+        self.assertEqual(file.getvalue().count(b'\n'), 1 + 3 * 2)
+        self.assertEqual(len(list(self.test_db.export_group_transactions(self.empty_group_id))), 3)
+        with self.connection.cursor() as cur:
+            cur.execute('DELETE FROM "budget_graph"."monetary_transactions" WHERE "group_id" = %s',
+                        (self.empty_group_id,))
+        self.connection.commit()
+
+class TestImportTransactions(unittest.TestCase):
+    NUMBER_OF_RECORDS: int = 50_000
+
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_id: int = randint(1, 10_000_000)
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        db.registration_new_user(cls.telegram_id, 'import_owner', psw_salt, getting_hash(psw_salt, 'password'))
+        cls.group_id: int = db.get_group_id_by_telegram_id(cls.telegram_id)
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def get_last_transaction_id(self) -> int:
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT "last_transaction_id" FROM "budget_graph"."groups" WHERE "id" = %s',
+                            (self.group_id,))
+                return cur.fetchone()[0]
+
+    def test_import_transactions_001(self):
+        """ the records get the next numbers of the group, the balance and uuid are updated """
+        self.test_db.add_transaction_to_db(1_000, '01/02/2024', '', 'before import', telegram_id=self.telegram_id)
+        last_transaction_id: int = self.get_last_transaction_id()
+        group_uuid: str = self.test_db.get_group_transaction_uuid(self.group_id)
+        today = datetime.now(timezone.utc).date()
+        lines: list[str] = ['DATE,TRANSFER,CATEGORY,DESCRIPTION']
+        lines.extend(f'{(today - timedelta(days=i % 3_000)).strftime("%d/%m/%Y")},{(i % 900 + 1) * (-1) ** i},,'
+                     f'"import, {i}"' for i in range(self.NUMBER_OF_RECORDS))
+        csv_data: bytes = '\n'.join(lines).encode('utf-8')
+
+        start: float = perf_counter()
+        imported, status, invalid_records = transactions_import(self.test_db, self.group_id, 'import_owner',
+                                                                csv_data, 'en')
+        duration: float = perf_counter() - start
+        self.assertEqual((imported, status, invalid_records), (self.NUMBER_OF_RECORDS, '', ()))
+        self.assertLess(duration, 10, 'the import of 50k records takes seconds')
+
+        self.assertEqual(self.get_last_transaction_id(), last_transaction_id + self.NUMBER_OF_RECORDS)
+        self.assertNotEqual(self.test_db.get_group_transaction_uuid(self.group_id), group_uuid)
+        rows: list[tuple] = list(self.test_db.export_group_transactions(self.group_id))
+        self.assertEqual(len(rows), self.NUMBER_OF_RECORDS + 1)
+        self.assertEqual(sorted(row[0] for row in rows),
+                         list(range(last_transaction_id, last_transaction_id + self.NUMBER_OF_RECORDS + 1)))
+        # the records are numbered in the order of the file
+        imported_rows: dict[int, tuple] = {row[0]: row for row in rows}
+        self.assertEqual(imported_rows[last_transaction_id + 1][2], 1)
+        self.assertEqual(imported_rows[last_transaction_id + 1][6], 'import, 0')
+        self.assertEqual(imported_rows[last_transaction_id + 2][2], -2)
+        self.assertEqual(imported_rows[last_transaction_id + 2][5], '')
+        # the running balance of the latest record is the sum of all records
+        self.assertEqual(rows[0][3], 1_000 + sum((i % 900 + 1) * (-1) ** i for i in range(self.NUMBER_OF_RECORDS)))
+
+        # a record added after the import gets the next number
+        self.test_db.add_transaction_to_db(5, '01/02/2024', '', 'after import', telegram_id=self.telegram_id)
+        self.assertTrue(self.test_db.check_record_id_is_exist(self.group_id,
+                                                              last_transaction_id + self.NUMBER_OF_RECORDS + 1))
+
+    def test_import_transactions_002(self):
+        """ nothing is imported if at least one record is invalid """
+        last_transaction_id: int = self.get_last_transaction_id()
+        csv_data: bytes = b'TRANSFER,DATE\n10,01/02/2024\n0,01/02/2024\n10,31/02/2024\n10,01/02/2024\n'
+        self.assertEqual(transactions_import(self.test_db, self.group_id, 'import_owner', csv_data, 'en'),
+                         (0, 'import_invalid_rows', (2, 3)))
+        self.assertEqual(transactions_import(self.test_db, self.group_id, 'import_owner', b'no table', 'en'),
+                         (0, 'import_invalid_file', ()))
+        self.assertEqual(self.get_last_transaction_id(), last_transaction_id)
+
+    def test_import_transactions_003(self):
+        """ an error of the database: the numbers are not reserved, the records are not added """
+        last_transaction_id: int = self.get_last_transaction_id()
+        csv_data: bytes = b'TRANSFER,DATE\n10,01/02/2024\n'
+        # the username does not meet the restrictions of the table
+        self.assertEqual(transactions_import(self.test_db, self.group_id, 'x', csv_data, 'en'),
+                         (0, 'error_connect_support', ()))
+        # there is no such group
+        self.assertEqual(transactions_import(self.test_db, 32_000, 'import_owner', csv_data, 'en'),
+                         (0, 'error_connect_support', ()))
+        self.assertEqual(self.get_last_transaction_id(), last_transaction_id)
+        self.assertEqual(self.connection.status, 1)  # STATUS_READY: the transaction is completed
+
+
+class TestMonthlyUserTotals(unittest.TestCase):
+    """ the diagrams are built from the monthly sums and give the same result as the sums of the records """
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_ids: tuple[int, ...] = tuple(randint(1, 10_000_000) * 10 + i for i in range(3))
+        cls.usernames: tuple[str, ...] = tuple(f'monthly_user_{i}' for i in range(3))
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        db.registration_new_user(cls.telegram_ids[0], cls.usernames[0], psw_salt, getting_hash(psw_salt, 'password'))
+        cls.group_id: int = db.get_group_id_by_telegram_id(cls.telegram_ids[0])
+        for telegram_id, username in zip(cls.telegram_ids[1:], cls.usernames[1:]):
+            db.registration_new_user(telegram_id, username, psw_salt, getting_hash(psw_salt, 'password'),
+                                     group_id=cls.group_id)
+        # another group: its records are not counted
+        db.registration_new_user(cls.telegram_ids[0] + 5, 'monthly_other', psw_salt,
+                                 getting_hash(psw_salt, 'password'))
+        other_group_id: int = db.get_group_id_by_telegram_id(cls.telegram_ids[0] + 5)
+        with connection as conn:
+            with conn.cursor() as cur:
+                cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                            '("group_id", "username", "transfer", "record_date") '
+                            'SELECT %s, (%s::text[])[i %% 3 + 1], (i * 7919 %% 1000 + 1) * (1 - 2 * (i %% 3 / 2)), '
+                            '\'2021-01-01\'::date + i * 13 %% 1100 FROM generate_series(1, 6000) i',
+                            (cls.group_id, list(cls.usernames)))
+                cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                            '("group_id", "username", "transfer", "record_date") '
+                            'SELECT %s, \'monthly_other\', 100, \'2022-01-01\'::date + i FROM generate_series(1, 100) i',
+                            (other_group_id,))
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def execute(self, query: str, params: tuple = ()) -> list[tuple]:
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall() if cur.description else []
+
+    def get_expected_data(self, usernames: tuple[str, ...], start_date, end_date) -> dict[str, tuple]:
+        """ the sums of the records (the way the query worked before the monthly sums) """
+        rows: list[tuple] = self.execute(
+            'SELECT "username", SUM(GREATEST("transfer", 0)), SUM(LEAST("transfer", 0)) '
+            'FROM "budget_graph"."monetary_transactions" '
+            'WHERE "group_id" = %s AND "username" = ANY(%s) '
+            'AND "record_date" BETWEEN COALESCE(%s, \'-infinity\'::date) AND COALESCE(%s, \'infinity\'::date) '
+            'GROUP BY "username"', (self.group_id, list(usernames), start_date, end_date)
+        )
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def assert_monthly_totals(self) -> None:
+        expected: list[tuple] = self.execute(
+            'SELECT "group_id", "username", date_trunc(\'month\', "record_date")::date, SUM(GREATEST("transfer", 0)), '
+            'SUM(LEAST("transfer", 0)), COUNT(*) FROM "budget_graph"."monetary_transactions" '
+            'GROUP BY 1, 2, 3 ORDER BY 1, 2, 3'
+        )
+        self.assertEqual(self.execute('SELECT * FROM "budget_graph"."monthly_user_totals" ORDER BY 1, 2, 3'),
+                         expected)
+
+    def test_monthly_user_totals_001(self):
+        """ the sums are kept up to date by inserts, updates and deletes (including bulk ones) """
+        self.assert_monthly_totals()
+        self.assertTrue(self.test_db.add_transaction_to_db(-50, '15/03/2022', '', '', telegram_id=self.telegram_ids[1]))
+        self.execute('UPDATE "budget_graph"."monetary_transactions" SET "record_date" = "record_date" + 40, '
+                     '"transfer" = -"transfer" WHERE "group_id" = %s AND "transaction_id" %% 5 = 0', (self.group_id,))
+        self.execute('DELETE FROM "budget_graph"."monetary_transactions" '
+                     'WHERE "group_id" = %s AND "transaction_id" %% 7 = 0', (self.group_id,))
+        self.assert_monthly_totals()
+        # the months without records are deleted
+        self.execute('DELETE FROM "budget_graph"."monetary_transactions" '
+                     'WHERE "group_id" = %s AND "record_date" < \'2021-06-01\'', (self.group_id,))
+        self.assert_monthly_totals()
+        self.assertEqual(self.execute('SELECT COUNT(*) FROM "budget_graph"."monthly_user_totals" '
+                                      'WHERE "group_id" = %s AND "record_month" < \'2021-06-01\'', (self.group_id,)),
+                         [(0,)])
+
+    def test_monthly_user_totals_002(self):
+        """ any period: whole months, parts of months at the ends, one month, without one or both ends """
+        periods: list[tuple] = [(None, None), (date(2022, 3, 1), date(2022, 5, 31)), (date(2022, 3, 2), None),
+                                (None, date(2022, 5, 30)), (date(2022, 3, 10), date(2022, 3, 20)),
+                                (date(2022, 1, 31), date(2022, 2, 1)), (date(2022, 2, 1), date(2022, 2, 28)),
+                                (date(2022, 2, 28), date(2022, 2, 28)), (date(2024, 5, 1), date(2024, 4, 1)),
+                                (date(2010, 1, 1), date(2030, 1, 1))]
+        seed(self.group_id)
+        for _ in range(30):
+            start_date = date(2021, 1, 1) + timedelta(days=randint(0, 1_100))
+            periods.append((start_date, start_date + timedelta(days=randint(0, 400))))
+
+        users_by_type: dict[int, tuple[str, ...]] = {0: self.usernames[:1], 1: self.usernames,
+                                                     2: (self.usernames[0], self.usernames[2])}
+        for start_date, end_date in periods:
+            for diagram_type, usernames in users_by_type.items():
+                with self.subTest(start_date=start_date, end_date=end_date, diagram_type=diagram_type):
+                    data: dict[str, tuple] = self.test_db.get_data_for_plot_builder(
+                        self.telegram_ids[0], diagram_type, (start_date, end_date),
+                        [self.telegram_ids[0], self.telegram_ids[2]]
+                    )
+                    self.assertEqual(data, self.get_expected_data(usernames, start_date, end_date))
+                    self.assertTrue(all(isinstance(value, int) for values in data.values() for value in values))
+
+        # the dates as they are entered by the user
+        self.assertEqual(self.test_db.get_data_for_plot_builder(self.telegram_ids[0], 1, ('02/03/2022', '30/05/2022')),
+                         self.get_expected_data(self.usernames, date(2022, 3, 2), date(2022, 5, 30)))
+        self.assertEqual(self.test_db.get_data_for_plot_builder(self.telegram_ids[0], 1, ('31/02/2022', None)), {})
+
+
+class TestPlotBuilderQueryPlans(unittest.TestCase):
+    """ the queries of the diagrams read only the ranges of the index of the group records (1 000 000 records) """
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_id: int = randint(1, 10_000_000)
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        db.registration_new_user(cls.telegram_id, 'plan_user', psw_salt, getting_hash(psw_salt, 'password'))
+        group_id: int = db.get_group_id_by_telegram_id(cls.telegram_id)
+        with connection as conn:
+            with conn.cursor() as cur:
+                # the numbers are set explicitly, so the row trigger of the group counter is not fired
+                cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                            '("group_id", "transaction_id", "username", "transfer", "record_date") '
+                            'SELECT %s, i, \'plan_user\', (i %% 1000 * 7919 %% 1000 + 1) * (1 - 2 * (i %% 3 / 2)), '
+                            '\'2000-01-01\'::date + i %% 9000 FROM generate_series(1, 1000000) i', (group_id,))
+                cur.execute('UPDATE "budget_graph"."groups" SET "last_transaction_id" = 1000000 WHERE "id" = %s',
+                            (group_id,))
+        connection.autocommit = True
+        with connection.cursor() as cur:
+            cur.execute('ANALYZE "budget_graph"."monetary_transactions", "budget_graph"."monthly_user_totals"')
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def get_plan(self, name: str, start_date: date | None, end_date: date | None, analyze: bool = False) -> list[dict]:
+        """ :return: the nodes of the plan of the query """
+        params: dict = {'telegram_id': self.telegram_id, 'users': [self.telegram_id]}
+        if start_date or end_date:
+            params |= get_plot_period_bounds(start_date, end_date)
+        options: str = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'EXPLAIN ({options}) {cur.mogrify(sql_registry.get(name).text, params).decode()}')
+                nodes: list[dict] = [cur.fetchone()[0][0]['Plan']]
+        for node in nodes:
+            nodes.extend(node.get('Plans', ()))
+        return nodes
+
+    def test_plot_builder_query_plans_001(self):
+        """ the records are read by ranges of ("group_id", "record_date"), never by a sequential scan """
+        periods: tuple = ((date(2010, 3, 15), date(2011, 9, 20)), (date(2020, 2, 10), None),
+                          (None, date(2003, 5, 17)))
+        for name in ('get_data_for_plot_builder_group_period', 'get_data_for_plot_builder_users_period'):
+            for start_date, end_date in periods:
+                with self.subTest(query=name, start_date=start_date, end_date=end_date):
+                    nodes: list[dict] = self.get_plan(name, start_date, end_date)
+                    # each range is read in both tiers (the empty range at the end of the period is not read)
+                    records_scans: list[dict] = [node for node in nodes if node.get('Relation Name') in
+                                                 ('monetary_transactions', 'monetary_transactions_archive')]
+                    self.assertIn(len(records_scans), (2, 4))
+                    for node in records_scans:
+                        self.assertIn(node['Node Type'], ('Index Scan', 'Bitmap Heap Scan'))
+                    index_conditions: list[str] = [node.get('Index Cond', '') for node in nodes
+                                                   if node['Node Type'] in ('Index Scan', 'Bitmap Index Scan')]
+                    self.assertEqual(sum('record_date' in condition and 'group_id' in condition
+                                         for condition in index_conditions), len(records_scans))
+
+    def test_plot_builder_query_plans_002(self):
+        """ only the records of the partially selected months are read, the history is taken from the monthly sums """
+        for name in ('get_data_for_plot_builder_group', 'get_data_for_plot_builder_users'):
+            with self.subTest(query=name):
+                nodes: list[dict] = self.get_plan(name, None, None, analyze=True)
+                self.assertFalse(any(node.get('Relation Name') == 'monetary_transactions' for node in nodes))
+
+        nodes = self.get_plan('get_data_for_plot_builder_group_period', date(2010, 3, 15), date(2011, 9, 20),
+                              analyze=True)
+        records_read: int = sum(node['Actual Rows'] * node['Actual Loops'] for node in nodes
+                                if node.get('Relation Name') == 'monetary_transactions')
+        # 17 + 20 days of 9000 days of the history
+        self.assertLess(records_read, 1000000 * 40 // 9000)
+        self.assertGreater(records_read, 0)
+
+
+class TestPartitionedTransactions(unittest.TestCase):
+    """ the records table can be partitioned by group (and back) without changing the data and its behavior """
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_ids: tuple[int, ...] = tuple(randint(1, 10_000_000) * 10 + i for i in range(3))
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        for i, telegram_id in enumerate(cls.telegram_ids):
+            db.registration_new_user(telegram_id, f'partition_user_{i}', psw_salt, getting_hash(psw_salt, 'password'))
+            group_id: int = db.get_group_id_by_telegram_id(telegram_id)
+            with connection as conn:
+                with conn.cursor() as cur:
+                    cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                                '("group_id", "username", "transfer", "record_date") '
+                                'SELECT %s, %s, (i * 7919 %% 1000 + 1) * (1 - 2 * (i %% 3 / 2)), '
+                                '\'2021-01-01\'::date + i * 13 %% 1100 FROM generate_series(1, 3000) i',
+                                (group_id, f'partition_user_{i}'))
+        close_test_db(connection)
+
+    @classmethod
+    def tearDownClass(cls):
+        partition_transactions(0)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def execute(self, query: str, params: tuple = ()) -> list[tuple]:
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall() if cur.description else []
+
+    def get_snapshot(self) -> tuple[list[tuple], ...]:
+        return (
+            self.execute('SELECT * FROM "budget_graph"."monetary_transactions" ORDER BY "group_id", "transaction_id"'),
+            self.execute('SELECT * FROM "budget_graph"."daily_balances" ORDER BY 1, 2'),
+            self.execute('SELECT * FROM "budget_graph"."monthly_user_totals" ORDER BY 1, 2, 3'),
+            self.execute('SELECT "indexname" FROM pg_indexes WHERE "schemaname" = \'budget_graph\' '
+                         'AND "tablename" = \'monetary_transactions\' ORDER BY 1'),
+            self.execute('SELECT DISTINCT "trigger_name" FROM information_schema.triggers '
+                         'WHERE "event_object_table" = \'monetary_transactions\' ORDER BY 1')
+        )
+
+    def get_partitions(self) -> list[tuple]:
+        return self.execute('SELECT inhrelid::regclass::text FROM pg_inherits '
+                            'WHERE inhparent = \'"budget_graph"."monetary_transactions"\'::regclass ORDER BY 1')
+
+    def test_partitioned_transactions_001(self):
+        """ the records, sums, indexes and triggers are the same in both layouts """
+        records, daily_balances, monthly_user_totals, indexes, triggers = self.get_snapshot()
+        self.assertEqual(len(records), 9000)
+
+        self.assertTrue(partition_transactions(4, brin=True))
+        self.assertEqual(len(self.get_partitions()), 4)
+        partitioned_snapshot: tuple = self.get_snapshot()
+        self.assertEqual(partitioned_snapshot[:3], (records, daily_balances, monthly_user_totals))
+        self.assertEqual(partitioned_snapshot[3], sorted(indexes + [('transactions_group_id_record_date_brin',)]))
+        self.assertEqual(partitioned_snapshot[4], triggers)
+        # each group is in one partition
+        self.assertEqual(self.execute('SELECT COUNT(DISTINCT "tableoid") FROM "budget_graph"."monetary_transactions" '
+                                      'GROUP BY "group_id"'), [(1,)] * 3)
+
+        self.assertTrue(partition_transactions(0))
+        self.assertEqual(self.get_partitions(), [])
+        self.assertEqual(self.get_snapshot(), (records, daily_balances, monthly_user_totals, indexes, triggers))
+
+    def test_partitioned_transactions_002(self):
+        """ the triggers work in the partitions: numbering, balances, monthly sums """
+        self.assertTrue(partition_transactions(3))
+        group_id: int = self.test_db.get_group_id_by_telegram_id(self.telegram_ids[1])
+        last_transaction_id: int = self.execute('SELECT MAX("transaction_id") FROM "budget_graph"."monetary_transactions" '
+                                                'WHERE "group_id" = %s', (group_id,))[0][0]
+        self.assertTrue(self.test_db.add_transaction_to_db(-70, '10/02/2022', '', '', telegram_id=self.telegram_ids[1]))
+        self.assertEqual(self.test_db.import_transactions(group_id, 'partition_user_1',
+                                                          [(15, date(2022, 2, 11), '', 'import')] * 10), 10)
+        self.assertEqual(self.execute('SELECT MAX("transaction_id") FROM "budget_graph"."monetary_transactions" '
+                                      'WHERE "group_id" = %s', (group_id,)), [(last_transaction_id + 11,)])
+        self.assertTrue(self.test_db.process_delete_transaction_record(group_id, last_transaction_id))
+
+        self.assertEqual(self.execute('SELECT SUM("day_sum") FROM "budget_graph"."daily_balances" WHERE "group_id" = %s',
+                                      (group_id,)),
+                         self.execute('SELECT SUM("transfer") FROM "budget_graph"."monetary_transactions" '
+                                      'WHERE "group_id" = %s', (group_id,)))
+        self.assertEqual(self.test_db.get_data_for_plot_builder(self.telegram_ids[1], 1, (date(2022, 2, 10), None)),
+                         {'partition_user_1': tuple(self.execute(
+                             'SELECT SUM(GREATEST("transfer", 0)), SUM(LEAST("transfer", 0)) '
+                             'FROM "budget_graph"."monetary_transactions" '
+                             'WHERE "group_id" = %s AND "record_date" >= \'2022-02-10\'', (group_id,))[0])})
+
+    def test_partitioned_transactions_003(self):
+        """ only the partition of the group is read """
+        self.assertTrue(partition_transactions(4))
+        params: dict = {'telegram_id': self.telegram_ids[0], 'users': None}
+        params |= get_plot_period_bounds(date(2021, 3, 15), date(2022, 9, 20))
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                query: str = cur.mogrify(sql_registry.get('get_data_for_plot_builder_group_period').text, params).decode()
+                cur.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {query}')
+                nodes: list[dict] = [cur.fetchone()[0][0]['Plan']]
+        for node in nodes:
+            nodes.extend(node.get('Plans', ()))
+        scanned_partitions: set[str] = {node['Relation Name'] for node in nodes if node.get('Actual Loops')
+                                        and node.get('Relation Name', '').startswith('monetary_transactions_p')}
+        self.assertEqual(len(scanned_partitions), 1)
+
+    def test_partitioned_transactions_004(self):
+        """ the triggers and indexes added outside the schema scripts are kept, the view reads the same records """
+        self.execute('CREATE FUNCTION "budget_graph"."test_partition_description"() RETURNS trigger AS $$ '
+                     'BEGIN NEW."description" := UPPER(NEW."description"); RETURN NEW; END $$ LANGUAGE plpgsql')
+        self.execute('CREATE TRIGGER "test_partition_description" BEFORE INSERT '
+                     'ON "budget_graph"."monetary_transactions" '
+                     'FOR EACH ROW EXECUTE FUNCTION "budget_graph"."test_partition_description"()')
+        self.execute('CREATE INDEX "test_partition_username" ON "budget_graph"."monetary_transactions" ("username")')
+        try:
+            _, _, _, indexes, triggers = self.get_snapshot()
+            view_records: list[tuple] = self.execute('SELECT * FROM "budget_graph"."all_transactions" ORDER BY 1, 2')
+            self.assertIn(('test_partition_description',), triggers)
+            self.assertIn(('test_partition_username',), indexes)
+
+            self.assertTrue(partition_transactions(2))
+            self.assertEqual(len(self.get_partitions()), 2)
+            self.assertEqual(self.get_snapshot()[3:], (indexes, triggers))
+            self.assertEqual(self.execute('SELECT * FROM "budget_graph"."all_transactions" ORDER BY 1, 2'),
+                             view_records)
+
+            group_id: int = self.test_db.get_group_id_by_telegram_id(self.telegram_ids[2])
+            transactions_uuid: str = self.test_db.get_group_transaction_uuid(group_id)
+            self.assertTrue(self.test_db.add_transaction_to_db(45, '03/03/2023', 'food', 'partitioned',
+                                                               telegram_id=self.telegram_ids[2]))
+            self.assertEqual(self.execute('SELECT "transaction_id", "description" FROM "budget_graph"."all_transactions" '
+                                          'WHERE "group_id" = %s ORDER BY "transaction_id" DESC LIMIT 1', (group_id,)),
+                             [(max(row[1] for row in view_records if row[0] == group_id) + 1, 'PARTITIONED')])
+            self.assertNotEqual(self.test_db.get_group_transaction_uuid(group_id), transactions_uuid)
+            self.assertEqual(self.execute('SELECT "day_sum" FROM "budget_graph"."daily_balances" '
+                                          'WHERE "group_id" = %s AND "record_date" = \'2023-03-03\'', (group_id,)),
+                             self.execute('SELECT SUM("transfer") FROM "budget_graph"."monetary_transactions" '
+                                          'WHERE "group_id" = %s AND "record_date" = \'2023-03-03\'', (group_id,)))
+        finally:
+            self.execute('DROP INDEX IF EXISTS "budget_graph"."test_partition_username"')
+            self.execute('DROP TRIGGER IF EXISTS "test_partition_description" ON "budget_graph"."monetary_transactions"')
+            self.execute('DROP FUNCTION IF EXISTS "budget_graph"."test_partition_description"()')
+
+
+class TestArchiveTransactions(unittest.TestCase):
+    """ the records before the horizon are moved into the archive, the results of the queries do not change """
+    TODAY: date = date(2024, 1, 1)
+    HORIZON_DAYS: int = 730  # the horizon is 2022-01-01
+
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_ids: tuple[int, ...] = tuple(randint(1, 10_000_000) * 10 + i for i in range(3))
+        cls.usernames: tuple[str, ...] = tuple(f'archive_user_{i}' for i in range(3))
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        db.registration_new_user(cls.telegram_ids[0], cls.usernames[0], psw_salt, getting_hash(psw_salt, 'password'))
+        cls.group_id: int = db.get_group_id_by_telegram_id(cls.telegram_ids[0])
+        db.registration_new_user(cls.telegram_ids[1], cls.usernames[1], psw_salt, getting_hash(psw_salt, 'password'),
+                                 group_id=cls.group_id)
+        db.registration_new_user(cls.telegram_ids[2], cls.usernames[2], psw_salt, getting_hash(psw_salt, 'password'))
+        cls.other_group_id: int = db.get_group_id_by_telegram_id(cls.telegram_ids[2])
+        with connection as conn:
+            with conn.cursor() as cur:
+                # the records are added not in the order of the dates, about 2/3 of them are before the horizon
+                cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                            '("group_id", "username", "transfer", "record_date", "category", "description") '
+                            'SELECT %s, (%s::text[])[i %% 2 + 1], (i * 7919 %% 1000 + 1) * (1 - 2 * (i %% 3 / 2)), '
+                            '\'2020-01-01\'::date + i * 13 %% 1096 / 2 * 2 + i %% 2, '
+                            'CASE WHEN i %% 7 > 0 THEN \'Other\' END, i::text FROM generate_series(1, 5000) i',
+                            (cls.group_id, list(cls.usernames[:2])))
+                cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                            '("group_id", "username", "transfer", "record_date") '
+                            'SELECT %s, %s, 100, \'2021-01-01\'::date + i FROM generate_series(1, 100) i',
+                            (cls.other_group_id, cls.usernames[2]))
+                cur.execute('SELECT COUNT(*) FILTER (WHERE "record_date" < \'2022-01-01\'), COUNT(*) '
+                            'FROM "budget_graph"."monetary_transactions"')
+                cls.old_records, cls.all_records = cur.fetchone()
+
+        cls.before: dict = cls.get_snapshot(db)
+        cls.horizon_days = GlobalConfig.db_archive_horizon_days
+        cls.batch_size = GlobalConfig.db_archive_batch_size
+        GlobalConfig.db_archive_horizon_days = cls.HORIZON_DAYS
+        GlobalConfig.db_archive_batch_size = 700
+        cls.moved: int = transactions_archive(db, cls.TODAY)
+        cls.after: dict = cls.get_snapshot(db)
+        close_test_db(connection)
+
+    @classmethod
+    def tearDownClass(cls):
+        GlobalConfig.db_archive_horizon_days = cls.horizon_days
+        GlobalConfig.db_archive_batch_size = cls.batch_size
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    @classmethod
+    def get_snapshot(cls, db: DatabaseQueries) -> dict:
+        """ the results of the queries that read the records """
+        copy_file = BytesIO()
+        db.copy_group_transactions_to_csv(cls.group_id, copy_file, ('ID', 'USERNAME', 'TRANSFER', 'TOTAL', 'DATE',
+                                                                    'CATEGORY', 'DESCRIPTION'))
+        periods: tuple = ((None, None), (date(2021, 6, 10), date(2022, 3, 20)), (date(2021, 12, 31), None),
+                          (None, date(2021, 2, 1)), (date(2022, 5, 2), date(2022, 5, 9)))
+        return {
+            'last_records': db.select_data_for_household_table(cls.group_id, 15),
+            'household_table': db.select_data_for_household_table(cls.group_id, 0),
+            'export': list(db.export_group_transactions(cls.group_id)),
+            'copy': copy_file.getvalue(),
+            'diagrams': [db.get_data_for_plot_builder(cls.telegram_ids[0], diagram_type, period)
+                         for period in periods for diagram_type in (0, 1)]
+        }
+
+    def execute(self, query: str, params: tuple = ()) -> list[tuple]:
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall() if cur.description else []
+
+    def assert_sums(self) -> None:
+        """ the balances and the monthly sums include the records of both tables """
+        self.assertEqual(
+            self.execute('SELECT "group_id", "record_date", SUM("transfer") FROM "budget_graph"."all_transactions" '
+                         'GROUP BY 1, 2 HAVING SUM("transfer") <> 0 ORDER BY 1, 2'),
+            self.execute('SELECT * FROM "budget_graph"."daily_balances" WHERE "day_sum" <> 0 ORDER BY 1, 2')
+        )
+        self.assertEqual(
+            self.execute('SELECT "group_id", "username", date_trunc(\'month\', "record_date")::date, '
+                         'SUM(GREATEST("transfer", 0)), SUM(LEAST("transfer", 0)), COUNT(*) '
+                         'FROM "budget_graph"."all_transactions" GROUP BY 1, 2, 3 ORDER BY 1, 2, 3'),
+            self.execute('SELECT * FROM "budget_graph"."monthly_user_totals" ORDER BY 1, 2, 3')
+        )
+
+    def test_archive_transactions_001(self):
+        """ the table, the export (both ways) and the diagrams are the same as before the archival """
+        self.assertEqual(get_archive_horizon(self.TODAY), date(2022, 1, 1))
+        self.assertGreater(self.moved, 700 * 4)  # several batches
+        self.assertEqual(self.moved, self.old_records)
+        self.assertEqual(len(self.before['household_table']), 5_000)
+        self.assertEqual(len(self.before['export']), 5_000)
+        for key, value in self.before.items():
+            with self.subTest(key=key):
+                self.assertEqual(self.after[key], value)
+
+    def test_archive_transactions_002(self):
+        """ only the old records are moved, the sums have not changed """
+        self.assertEqual(self.execute('SELECT MIN("record_date"), COUNT(*) '
+                                      'FROM "budget_graph"."monetary_transactions"'),
+                         [(date(2022, 1, 1), self.all_records - self.old_records)])
+        self.assertEqual(self.execute('SELECT MAX("record_date"), COUNT(*) '
+                                      'FROM "budget_graph"."monetary_transactions_archive"'),
+                         [(date(2021, 12, 31), self.old_records)])
+        self.assert_sums()
+        # there is nothing more to move
+        self.assertEqual(transactions_archive(self.test_db, self.TODAY), 0)
+
+    def test_archive_transactions_003(self):
+        """ an archived record can be found and deleted, the new records are added to the recent ones """
+        transaction_id: int = self.execute('SELECT MIN("transaction_id") '
+                                           'FROM "budget_graph"."monetary_transactions_archive" '
+                                           'WHERE "group_id" = %s', (self.group_id,))[0][0]
+        self.assertTrue(self.test_db.check_record_id_is_exist(self.group_id, transaction_id))
+        self.assertTrue(self.test_db.process_delete_transaction_record(self.group_id, transaction_id))
+        self.assertFalse(self.test_db.check_record_id_is_exist(self.group_id, transaction_id))
+        self.assertTrue(self.test_db.add_transaction_to_db(-25, '05/01/2021', '', 'old date',
+                                                           telegram_id=self.telegram_ids[1]))
+        self.assert_sums()
+        self.assertEqual(self.test_db.select_data_for_household_table(self.group_id, 0),
+                         tuple(self.test_db.export_group_transactions(self.group_id)))
+
+    def test_archive_transactions_004(self):
+        """ the archival is disabled """
+        GlobalConfig.db_archive_horizon_days = 0
+        try:
+            self.assertIsNone(get_archive_horizon(self.TODAY))
+            self.assertEqual(transactions_archive(self.test_db, date(2030, 1, 1)), 0)
+        finally:
+            GlobalConfig.db_archive_horizon_days = self.HORIZON_DAYS
+        self.assertEqual(DatabaseQueries(None).archive_transactions(date(2030, 1, 1), 100), 0)
+
+    def test_archive_transactions_005(self):
+        """ the archived records of the group are deleted together with the group """
+        self.assertTrue(self.test_db.delete_group_with_users(self.other_group_id))
+        self.assertEqual(self.execute('SELECT COUNT(*) FROM "budget_graph"."all_transactions" WHERE "group_id" = %s',
+                                      (self.other_group_id,)), [(0,)])
+        self.assert_sums()
+
+
+class TestQueryMetrics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_id: int = randint(1, 10_000_000)
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        db.registration_new_user(cls.telegram_id, 'metrics_owner', psw_salt, getting_hash(psw_salt, 'password'))
+        cls.group_id: int = db.get_group_id_by_telegram_id(cls.telegram_id)
+        close_test_db(connection)
+
+    def setUp(self):
+        self.metrics_enable = GlobalConfig.db_query_metrics_enable
+        GlobalConfig.db_query_metrics_enable = True
+        query_metrics.reset()
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+        GlobalConfig.db_query_metrics_enable = self.metrics_enable
+        query_metrics.reset()
+
+    @classmethod
+    def tearDownClass(cls):
+        DatabasePool.close()
+
+    def test_query_metrics_001(self):
+        """ calls and rows of the queries by their names in the registry """
+        for transfer in range(1, 6):
+            self.assertTrue(self.test_db.add_transaction_to_db(transfer, '01/02/2024', '', '',
+                                                               telegram_id=self.telegram_id))
+        self.assertEqual(len(self.test_db.select_data_for_household_table(self.group_id, 3)), 3)
+        self.assertEqual(len(self.test_db.select_data_for_household_table(self.group_id, 0)), 5)
+        queries: dict = query_metrics.get_summary()['queries']
+        self.assertEqual((queries['add_transaction_to_db']['calls'], queries['add_transaction_to_db']['rows'],
+                          queries['add_transaction_to_db']['errors']), (5, 5, 0))
+        self.assertEqual((queries['select_data_for_household_table']['calls'],
+                          queries['select_data_for_household_table']['rows']), (2, 8))
+        for stats in queries.values():
+            self.assertGreater(stats['p50_ms'], 0)
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+            self.assertLessEqual(stats['p99_ms'], stats['max_ms'])
+
+    def test_query_metrics_002(self):
+        """ the rows of the server-side cursor and of COPY are counted too """
+        self.assertTrue(self.test_db.add_transaction_to_db(1, '01/02/2024', '', '', telegram_id=self.telegram_id))
+        number_of_rows: int = len(list(self.test_db.export_group_transactions(self.group_id, 2)))
+        self.assertEqual(self.test_db.copy_group_transactions_to_csv(self.group_id, BytesIO(), ('a',) * 7),
+                         number_of_rows)
+        self.assertEqual(self.test_db.import_transactions(self.group_id, 'metrics_owner',
+                                                          [(1, date(2024, 1, 1), '', '')] * 3), 3)
+        queries: dict = query_metrics.get_summary()['queries']
+        self.assertEqual(queries['export_group_transactions']['rows'], number_of_rows)
+        self.assertEqual(queries['copy_group_transactions_to_csv']['rows'], number_of_rows)
+        self.assertEqual(queries['copy_to_import_staging_table']['rows'], 3)
+        self.assertEqual(queries['import_transactions']['rows'], 3)
+
+    def test_query_metrics_003(self):
+        """ the failed query is counted as an error (the method returns the default value) """
+        self.assertEqual(self.test_db.select_data_for_household_table(100_000, 5), ())  # smallint out of range
+        stats: dict = query_metrics.get_summary()['queries']['select_data_for_household_table']
+        self.assertEqual((stats['calls'], stats['errors'], stats['rows']), (1, 1, 0))
+
+    def test_query_metrics_004(self):
+        """ waiting for a connection from the pool """
+        for _ in range(3):
+            with pooled_connection() as connection:
+                self.assertEqual(DatabaseQueries(connection).get_group_id_by_telegram_id(self.telegram_id),
+                                 self.group_id)
+        summary: dict = query_metrics.get_summary()
+        self.assertEqual((summary['pool_wait']['count'], summary['pool_wait']['errors']), (3, 0))
+        self.assertEqual(summary['queries']['get_group_id_by_telegram_id']['calls'], 3)
+
+    def test_query_metrics_005(self):
+        """ nothing is recorded if the metrics are disabled """
+        GlobalConfig.db_query_metrics_enable = False
+        self.test_db.select_data_for_household_table(self.group_id, 3)
+        self.assertEqual(query_metrics.get_summary()['queries'], {})
+
+
+@unittest.skipIf(REPLICA_DSN is None, 'the replica is not configured (POSTGRES_REPLICA_HOST)')
+class TestReplicaRouting(unittest.TestCase):
+    """
+    The replay of WAL on the replica is paused, so the records added after the pause
+    are visible only if they are read from the primary server
+    """
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.telegram_ids: tuple[int, int] = (randint(1, 10_000_000), randint(10_000_001, 20_000_000))
+        connection = connect_test_db()
+        db = DatabaseQueries(connection)
+        psw_salt: str = get_salt()
+        for number, telegram_id in enumerate(cls.telegram_ids):
+            db.registration_new_user(telegram_id, f'replica_user_{number}', psw_salt,
+                                     getting_hash(psw_salt, 'password'))
+        cls.group_ids: tuple[int, ...] = tuple(db.get_group_id_by_telegram_id(telegram_id)
+                                               for telegram_id in cls.telegram_ids)
+        close_test_db(connection)
+
+    def setUp(self):
+        self.window = GlobalConfig.db_read_your_writes_window
+        GlobalConfig.db_read_your_writes_window = 0.5
+        self.connection = connect_test_db()
+        self.replica_connection = connect_test_replica_db()
+        self.replica_connection.autocommit = True
+        self.wait_for_replica()
+        read_your_writes.clear()
+        with self.replica_connection.cursor() as cur:
+            cur.execute('SELECT pg_wal_replay_pause()')
+        self.test_db = DatabaseQueries(self.connection, self.replica_connection)
+
+    def tearDown(self):
+        with self.replica_connection.cursor() as cur:
+            cur.execute('SELECT pg_wal_replay_resume()')
+        close_test_db(self.replica_connection)
+        close_test_db(self.connection)
+        GlobalConfig.db_read_your_writes_window = self.window
+        read_your_writes.clear()
+
+    def wait_for_replica(self) -> None:
+        """ waits until the replica has replayed all changes of the primary server """
+        with self.connection.cursor() as cur:
+            cur.execute('SELECT pg_current_wal_lsn()')
+            lsn: str = cur.fetchone()[0]
+        self.connection.commit()
+        with self.replica_connection.cursor() as cur:
+            for _ in range(500):
+                cur.execute('SELECT pg_wal_lsn_diff(pg_last_wal_replay_lsn(), %s) >= 0', (lsn,))
+                if cur.fetchone()[0]:
+                    return
+                sleep(0.01)
+        self.fail('the replica has not caught up with the primary server')
+
+    def add_record_without_routing(self, telegram_id: int) -> None:
+        """ the record is added by a connection that does not mark the keys """
+        with self.connection.cursor() as cur:
+            cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                        '("group_id", "username", "transfer", "record_date") VALUES (%s, %s, 1, \'2024-01-01\')',
+                        (self.group_ids[self.telegram_ids.index(telegram_id)],
+                         f'replica_user_{self.telegram_ids.index(telegram_id)}'))
+        self.connection.commit()
+
+    def test_replica_routing_001(self):
+        """ the reads go to the replica """
+        number_of_records: int = len(self.test_db.select_data_for_household_table(self.group_ids[1], 0))
+        self.add_record_without_routing(self.telegram_ids[1])
+        self.assertEqual(len(self.test_db.select_data_for_household_table(self.group_ids[1], 0)), number_of_records)
+        self.assertEqual(len(DatabaseQueries(self.connection).select_data_for_household_table(self.group_ids[1], 0)),
+                         number_of_records + 1)
+
+    def test_replica_routing_002(self):
+        """ read-your-writes: the group and the user of the write are read from the primary server during the window """
+        number_of_records: int = len(self.test_db.select_data_for_household_table(self.group_ids[0], 0))
+        self.assertTrue(self.test_db.add_transaction_to_db(100, '01/02/2024', '', '', telegram_id=self.telegram_ids[0]))
+        self.assertEqual(len(self.test_db.select_data_for_household_table(self.group_ids[0], 0)), number_of_records + 1)
+        self.assertEqual(self.test_db.get_data_for_plot_builder(self.telegram_ids[0], 0),
+                         DatabaseQueries(self.connection).get_data_for_plot_builder(self.telegram_ids[0], 0))
+
+        # the group of another user is still read from the replica
+        self.add_record_without_routing(self.telegram_ids[1])
+        primary_records: tuple = DatabaseQueries(self.connection).select_data_for_household_table(self.group_ids[1], 0)
+        self.assertEqual(len(self.test_db.select_data_for_household_table(self.group_ids[1], 0)),
+                         len(primary_records) - 1)
+
+        # after the window, the replica is read again (the replay is paused, so the new record is not there)
+        sleep(0.6)
+        self.assertEqual(len(self.test_db.select_data_for_household_table(self.group_ids[0], 0)), number_of_records)
+
+    def test_replica_routing_003(self):
+        """ the user settings are read from the primary server after they are changed """
+        language: str = 'ru' if self.test_db.get_user_language(self.telegram_ids[0]) != 'ru' else 'de'
+        self.assertTrue(self.test_db.add_user_language(self.telegram_ids[0], language))
+        self.assertEqual(self.test_db.get_user_language(self.telegram_ids[0]), language)
+
+    def test_replica_routing_004(self):
+        """ a new user and its group are read from the primary server right after the registration """
+        telegram_id: int = randint(20_000_001, 30_000_000)
+        psw_salt: str = get_salt()
+        self.assertTrue(self.test_db.registration_new_user(telegram_id, 'replica_new_user', psw_salt,
+                                                           getting_hash(psw_salt, 'password')))
+        group_id: int = self.test_db.get_group_id_by_telegram_id(telegram_id)
+        self.assertNotEqual(group_id, 0)
+        self.assertEqual(self.test_db.get_group_usernames(group_id), ('replica_new_user',))
+        self.assertNotEqual(self.test_db.get_salt_by_username('replica_new_user'), '')
+
+    def test_replica_routing_005(self):
+        """ without a replica connection all queries are executed on the primary server """
+        self.add_record_without_routing(self.telegram_ids[1])
+        db = DatabaseQueries(self.connection, None)
+        self.assertEqual(len(db.select_data_for_household_table(self.group_ids[1], 0)),
+                         len(DatabaseQueries(self.connection).select_data_for_household_table(self.group_ids[1], 0)))
+
+
+    def test_replica_routing_006(self):
+        """ the decorated function takes the replica connection only for the first query routed to the replica """
+        def get_replica_checkouts() -> int:
+            return DatabasePool.get_stats(replica=True).get('checkouts', 0)
+
+        @connect_defer_close_db
+        def write_and_read_written_user(db_connection, telegram_id: int) -> int:
+            db_connection.add_user_timezone(telegram_id, 0)
+            return db_connection.get_group_id_by_telegram_id(telegram_id)
+
+        @connect_defer_close_db
+        def read_user(db_connection, telegram_id: int) -> tuple[int, str]:
+            return (db_connection.get_group_id_by_telegram_id(telegram_id),
+                    db_connection.get_token_by_telegram_id(telegram_id))
+
+        checkouts: int = get_replica_checkouts()
+        self.assertEqual(write_and_read_written_user(self.telegram_ids[0]), self.group_ids[0])
+        self.assertEqual(get_replica_checkouts(), checkouts)
+        self.assertEqual(read_user(self.telegram_ids[1])[0], self.group_ids[1])
+        self.assertEqual(get_replica_checkouts(), checkouts + 1)  # one connection for both queries
+        self.assertEqual(DatabasePool.get_stats(replica=True)['in_use'], 0)
+
+
+class TestCacheInvalidation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.owner_id: int = randint(1, 10_000_000)
+        cls.member_id: int = cls.owner_id + 1
+        cls.psw_salt: str = get_salt()
+        cls.psw_hash: str = getting_hash(cls.psw_salt, 'password')
+
+    def setUp(self):
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+        self.listener_connection = connect_test_db()
+        self.listener_connection.autocommit = True
+        with self.listener_connection.cursor() as cur:
+            cur.execute(f'LISTEN {CHANNEL}')
+
+    def tearDown(self):
+        close_test_db(self.connection)
+        close_test_db(self.listener_connection)
+
+    def receive_notifications(self) -> set[str]:
+        payloads: set[str] = set()
+        while select([self.listener_connection], [], [], 0.2)[0]:
+            self.listener_connection.poll()
+            payloads.update(notify.payload for notify in self.listener_connection.notifies)
+            self.listener_connection.notifies.clear()
+        return payloads
+
+    @staticmethod
+    def wait_for(condition, timeout: float = 5.0) -> bool:
+        deadline: float = perf_counter() + timeout
+        while not condition():
+            if perf_counter() > deadline:
+                return False
+            sleep(0.02)
+        return True
+
+    def test_cache_invalidation_001(self):
+        """ notifications about the changes of users, languages, groups and memberships """
+        self.test_db.registration_new_user(self.owner_id, 'invalidation_owner', self.psw_salt, self.psw_hash)
+        group_id: int = self.test_db.get_group_id_by_telegram_id(self.owner_id)
+        self.assertEqual(self.receive_notifications(), {f'user:{self.owner_id}', f'group:{group_id}'})
+
+        self.test_db.registration_new_user(self.member_id, 'invalidation_member', self.psw_salt, self.psw_hash,
+                                           group_id)
+        self.assertEqual(self.receive_notifications(), {f'user:{self.member_id}', f'group:{group_id}'})
+
+        self.assertTrue(self.test_db.add_user_language(self.member_id, 'de'))
+        self.assertTrue(self.test_db.add_user_language(self.member_id, 'es'))
+        self.assertEqual(self.receive_notifications(), {f'language:{self.member_id}'})
+
+        self.assertTrue(self.test_db.add_user_timezone(self.member_id, 3))
+        self.assertEqual(self.receive_notifications(), {f'user:{self.member_id}'})
+
+        self.assertTrue(self.test_db.update_group_owner(self.member_id, group_id))
+        self.assertEqual(self.receive_notifications(),
+                         {f'group:{group_id}', f'user:{self.owner_id}', f'user:{self.member_id}'})
+
+    def test_cache_invalidation_002(self):
+        """ the changes of the columns that are not cached and the rolled back changes are not sent """
+        self.test_db.registration_new_user(self.owner_id + 10, 'invalidation_silent', self.psw_salt, self.psw_hash)
+        self.receive_notifications()
+        self.assertTrue(self.test_db.get_user_context(self.owner_id + 10).is_registered)
+        last_login_flush(self.test_db)
+        self.assertTrue(self.test_db.add_user_timezone(self.owner_id + 10, 0))  # the same value
+        with self.connection.cursor() as cur:
+            cur.execute('DELETE FROM "budget_graph"."users" WHERE "telegram_id" = %s', (self.owner_id + 10,))
+        self.connection.rollback()
+        self.assertEqual(self.receive_notifications(), set())
+
+    def test_cache_invalidation_003(self):
+        """ the keys of a bulk change are sent in several notifications """
+        with self.connection.cursor() as cur:
+            cur.execute('INSERT INTO "budget_graph"."user_languages_telegram" ("telegram_id", "language") '
+                        'SELECT "id", \'en\' FROM generate_series(%s, %s) "id"', (20_000_001, 20_001_200))
+            cur.execute('DELETE FROM "budget_graph"."user_languages_telegram" WHERE "telegram_id" > 20000000')
+        self.connection.commit()
+        payloads: set[str] = self.receive_notifications()
+        self.assertTrue(all(len(payload) < 8000 for payload in payloads))
+        telegram_ids: list[int] = [int(key) for payload in payloads for key in payload.split(':')[1].split(',')]
+        self.assertEqual(sorted(telegram_ids), list(range(20_000_001, 20_001_201)))
+
+    def test_cache_invalidation_004(self):
+        """ the listener evicts the users changed by another process from the caches """
+        telegram_id: int = self.owner_id + 20
+        UserLanguageCache.input_cache_data(telegram_id, 'ru')  # evicted at the connection of the listener
+        listener = CacheInvalidationListener(DSN, timeout=0.1)
+        listener.start()
+        try:
+            self.assertTrue(listener.wait_connected(5))
+            self.assertEqual(UserLanguageCache.get_cache_data(telegram_id), '')
+
+            UserLanguageCache.input_cache_data(telegram_id, 'ru')
+            self.assertTrue(self.test_db.add_user_language(telegram_id, 'is'))
+            self.assertTrue(self.wait_for(lambda: UserLanguageCache.get_cache_data(telegram_id) == ''))
+
+            generation: int = UserContextCache.get_generation()
+            self.test_db.registration_new_user(telegram_id, 'invalidation_cached', self.psw_salt, self.psw_hash)
+            self.assertTrue(self.wait_for(lambda: UserContextCache.get_generation() > generation))  # notified
+            self.assertTrue(self.test_db.get_user_context(telegram_id).is_registered)
+            self.assertIsNotNone(UserContextCache.get_cache_data(telegram_id))
+            self.assertTrue(self.test_db.delete_group_with_users(self.test_db.get_group_id_by_telegram_id(telegram_id)))
+            self.assertTrue(self.wait_for(lambda: UserContextCache.get_cache_data(telegram_id) is None))
+        finally:
+            listener.stop()
+
+    def test_cache_invalidation_006(self):
+        """ the group profile is evicted when another process adds a member to the group """
+        owner_id: int = self.owner_id + 30
+        self.test_db.registration_new_user(owner_id, 'invalidation_group', self.psw_salt, self.psw_hash)
+        group_id: int = self.test_db.get_group_id_by_telegram_id(owner_id)
+        listener = CacheInvalidationListener(DSN, timeout=0.1)
+        listener.start()
+        try:
+            self.assertTrue(listener.wait_connected(5))
+            self.assertEqual(self.test_db.get_group_profile(group_id).users_number, 1)
+            with self.connection.cursor() as cur:
+                cur.execute('INSERT INTO "budget_graph"."users_groups" ("telegram_id", "group_id") VALUES (%s, %s)',
+                            (owner_id + 1, group_id))
+            self.connection.commit()
+            self.assertTrue(self.wait_for(lambda: group_id not in GroupProfileCache.get_cache()))
+            self.assertEqual(self.test_db.get_group_profile(group_id).users_number, 2)
+        finally:
+            listener.stop()
+
+    def test_cache_invalidation_005(self):
+        """ dispatching of the notifications """
+        evicted: list = []
+        InvalidationHandlers.subscribe('test_kind', evicted.append)
+        self.assertEqual(InvalidationHandlers.dispatch('test_kind:1,2,3'), 1)
+        self.assertEqual(InvalidationHandlers.dispatch('test_kind:4'), 1)
+        self.assertEqual(InvalidationHandlers.dispatch('test_kind:'), 0)  # invalid
+        self.assertEqual(InvalidationHandlers.dispatch('unknown_kind:1'), 0)
+        InvalidationHandlers.evict_all()
+        self.assertEqual(evicted, [(1, 2, 3), (4,), None])
+
+    def test_cache_invalidation_007(self):
+        """ the unregistered user is not queried again until the registration or the change of the language """
+        telegram_id: int = self.owner_id + 40
+        UnregisteredUserCache.get_cache().clear()
+        self.assertFalse(self.test_db.get_user_context(telegram_id).is_registered)
+        self.assertTrue(self.test_db.add_user_language(telegram_id, 'de'))
+        self.assertEqual(UnregisteredUserCache.get_cache_data(telegram_id), '')
+        self.assertEqual(self.test_db.get_user_context(telegram_id).language, 'de')
+        user_context: UserContext = DatabaseQueries(None).get_user_context(telegram_id)  # without the database
+        self.assertEqual((user_context.is_registered, user_context.language), (False, 'de'))
+
+        self.test_db.registration_new_user(telegram_id, 'invalidation_new', self.psw_salt, self.psw_hash)
+        self.assertEqual(UnregisteredUserCache.get_cache_data(telegram_id), '')
+        self.assertTrue(self.test_db.get_user_context(telegram_id).is_registered)
+        self.assertEqual(UnregisteredUserCache.get_cache_data(telegram_id), '')
+        UserContextCache.delete_data_from_cache(telegram_id)
+        self.assertFalse(DatabaseQueries(None).get_user_context(telegram_id).is_registered)  # an error is not cached
+        self.assertEqual(UnregisteredUserCache.get_cache_data(telegram_id), '')
+
+    def test_cache_invalidation_008(self):
+        """ the error of a handler does not stop the other handlers and the listener """
+        evicted: list = []
+
+        def failing_handler(keys: tuple[int, ...] | None) -> None:
+            raise RuntimeError(f'failing handler: {keys}')
+
+        InvalidationHandlers.subscribe('test_failing_kind', failing_handler)
+        InvalidationHandlers.subscribe('test_failing_kind', evicted.append)
+        self.assertEqual(InvalidationHandlers.dispatch('test_failing_kind:1'), 2)
+        self.assertEqual(evicted, [(1,)])
+
+        telegram_id: int = self.owner_id + 50
+        listener = CacheInvalidationListener(DSN, timeout=0.1)
+        listener.start()
+        try:
+            self.assertTrue(listener.wait_connected(5))
+            self.assertEqual(evicted, [(1,), None])
+            with self.connection.cursor() as cur:
+                cur.execute('SELECT pg_notify(%s, %s)', (CHANNEL, 'test_failing_kind:2'))
+            self.connection.commit()
+            self.assertTrue(self.wait_for(lambda: evicted[-1] == (2,)))
+            UserLanguageCache.input_cache_data(telegram_id, 'ru')
+            self.assertTrue(self.test_db.add_user_language(telegram_id, 'de'))
+            self.assertTrue(self.wait_for(lambda: UserLanguageCache.get_cache_data(telegram_id) == ''))
+            self.assertTrue(InvalidationHandlers.is_listening())
+        finally:
+            listener.stop()
+
+    def test_cache_invalidation_009(self):
+        """ the lost connection of the listener is detected, the caches are evicted and the listener reconnects """
+        evicted: list = []
+        InvalidationHandlers.subscribe('test_reconnect_kind', evicted.append)
+        listener = CacheInvalidationListener(DSN, timeout=0.1)
+        listener.start()
+        try:
+            self.assertTrue(listener.wait_connected(5))
+            self.assertEqual(evicted, [None])
+            with self.connection.cursor() as cur:
+                cur.execute('SELECT pg_terminate_backend("pid") FROM "pg_stat_activity" '
+                            'WHERE "application_name" = %s', (LISTENER_APPLICATION_NAME,))
+            self.connection.commit()
+            self.assertTrue(self.wait_for(lambda: len(evicted) == 2))  # evicted at the disconnection
+            self.assertFalse(InvalidationHandlers.is_listening())
+            self.assertTrue(self.wait_for(InvalidationHandlers.is_listening, 10))
+            self.assertEqual(evicted, [None, None, None])
+        finally:
+            listener.stop()
+        self.assertFalse(InvalidationHandlers.is_listening())
+
+
+class TestGroupProfile(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.owner_id: int = randint(1, 10_000_000)
+        cls.psw_salt: str = get_salt()
+        cls.psw_hash: str = getting_hash(cls.psw_salt, 'password')
+        connection = connect_test_db()
+        DatabaseQueries(connection).registration_new_user(cls.owner_id, 'profile_owner', cls.psw_salt, cls.psw_hash)
+        cls.group_id: int = DatabaseQueries(connection).get_group_id_by_telegram_id(cls.owner_id)
+        close_test_db(connection)
+
+    def setUp(self):
+        GroupProfileCache.get_cache().clear()
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def test_group_profile_001(self):
+        """ the profile is read once and then taken from the cache """
+        profile: GroupProfile = self.test_db.get_group_profile(self.group_id)
+        self.assertEqual((profile.group_id, profile.owner_telegram_id, profile.owner_username, profile.users_number),
+                         (self.group_id, self.owner_id, 'profile_owner', 1))
+        self.assertEqual(profile.token, self.test_db.get_token_by_telegram_id(self.owner_id))
+        self.assertEqual((profile.member_telegram_ids, profile.member_usernames), ((self.owner_id,), ('profile_owner',)))
+        self.assertEqual(profile.get_usernames_without_owner(), ())
+
+        hits: int = GroupProfileCache.get_cache().get_stats()['hits']
+        self.assertIs(self.test_db.get_group_profile(self.group_id), profile)
+        self.assertIs(DatabaseQueries(None).get_group_profile(self.group_id), profile)  # without the database
+        self.assertEqual(GroupProfileCache.get_cache().get_stats()['hits'], hits + 2)
+
+        self.assertIsNone(self.test_db.get_group_profile(10_000))
+        self.assertNotIn(10_000, GroupProfileCache.get_cache())
+
+    def test_group_profile_002(self):
+        """ the snapshot cannot be changed """
+        profile: GroupProfile = self.test_db.get_group_profile(self.group_id)
+        with self.assertRaises(AttributeError):
+            profile.owner_telegram_id = 1
+        with self.assertRaises(AttributeError):
+            del profile.token
+        self.assertNotIn(profile.token, repr(profile))
+
+    def test_group_profile_003(self):
+        """ the profile is evicted when the members or the owner of the group change """
+        member_ids: list[int] = [self.owner_id + number for number in range(1, 4)]
+        for number, telegram_id in enumerate(member_ids):
+            self.test_db.get_group_profile(self.group_id)
+            self.assertTrue(self.test_db.registration_new_user(telegram_id, f'profile_member_{number}',
+                                                               self.psw_salt, self.psw_hash, self.group_id))
+        profile: GroupProfile = self.test_db.get_group_profile(self.group_id)
+        self.assertEqual(profile.users_number, 4)
+        self.assertEqual(profile.member_usernames,
+                         ('profile_member_0', 'profile_member_1', 'profile_member_2', 'profile_owner'))
+        self.assertEqual(profile.get_telegram_id('profile_member_1'), member_ids[1])
+        self.assertEqual(profile.get_telegram_id('profile_member_9'), 0)
+        self.assertTrue(profile.is_member(member_ids[2]))
+
+        self.assertTrue(self.test_db.update_group_owner(member_ids[0], self.group_id))
+        profile = self.test_db.get_group_profile(self.group_id)
+        self.assertTrue(profile.is_owner(member_ids[0]))
+        self.assertEqual(profile.owner_username, 'profile_member_0')
+        self.assertEqual(profile.get_usernames_without_owner(), ('profile_member_1', 'profile_member_2', 'profile_owner'))
+
+        self.assertTrue(self.test_db.delete_user_from_group_by_telegram_id(member_ids[2]))
+        profile = self.test_db.get_group_profile(self.group_id)
+        self.assertFalse(profile.is_member(member_ids[2]))
+        self.assertEqual(profile.users_number, 3)
+
+        self.assertTrue(self.test_db.delete_group_with_users(self.group_id))
+        self.assertIsNone(self.test_db.get_group_profile(self.group_id))
+
+
+class TestHouseholdViewCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        cls.owner_id: int = randint(1, 10_000_000)
+        psw_salt: str = get_salt()
+        connection = connect_test_db()
+        DatabaseQueries(connection).registration_new_user(cls.owner_id, 'household_view', psw_salt,
+                                                          getting_hash(psw_salt, 'password'))
+        cls.group_id: int = DatabaseQueries(connection).get_group_id_by_telegram_id(cls.owner_id)
+        close_test_db(connection)
+
+    def setUp(self):
+        for cache in HouseholdViewCache.get_caches().values():
+            cache.clear()
+        self.connection = connect_test_db()
+        self.test_db = DatabaseQueries(self.connection)
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def add_transaction_by_another_process(self, transfer: int) -> None:
+        """ the record is added without the local eviction of the version (only by the notification) """
+        with self.connection.cursor() as cur:
+            sql_registry.execute(cur, 'add_transaction_to_db', {
+                'transaction_amount': transfer, 'record_date': '01/02/2024', 'category': 'Other',
+                'description': '', 'telegram_id': self.owner_id, 'username': None
+            })
+        self.connection.commit()
+
+    @staticmethod
+    def render(rows: tuple[tuple, ...], language: str) -> str:
+        return f'{language}:{len(rows)}'
+
+    def test_household_view_001(self):
+        """ the rows are read once for each version, the version is checked by a query """
+        self.assertEqual(self.test_db.get_household_table(10_000, 10), ('', ()))  # there is no such group
+        self.assertTrue(self.test_db.add_transaction_to_db(100, '01/01/2024', 'Other', '', self.owner_id))
+        version, rows = self.test_db.get_household_table(self.group_id, 10)
+        self.assertEqual(version, self.test_db.get_group_transaction_uuid(self.group_id))
+        self.assertEqual(rows, self.test_db.select_data_for_household_table(self.group_id, 10))
+
+        rows_cache = HouseholdViewCache.get_caches()['rows']
+        hits: int = rows_cache.get_stats()['hits']
+        self.assertIs(self.test_db.get_household_table(self.group_id, 10)[1], rows)
+        self.assertEqual(rows_cache.get_stats()['hits'], hits + 1)
+        self.assertEqual(len(self.test_db.get_household_table(self.group_id, 0)[1]), len(rows))
+        # without the notifications the version is not cached
+        self.assertEqual(len(HouseholdViewCache.get_caches()['versions']), 0)
+        self.assertEqual(DatabaseQueries(None).get_household_table(self.group_id, 10), ('', ()))
+
+        self.assertTrue(self.test_db.add_transaction_to_db(-30, '02/01/2024', 'Other', '', self.owner_id))
+        new_version, new_rows = self.test_db.get_household_table(self.group_id, 10)
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(len(new_rows), len(rows) + 1)
+        self.assertEqual(new_rows[0][2:4], (-30, 70))
+
+    def test_household_view_002(self):
+        """ the text is rendered once for each version and language """
+        self.assertEqual(HouseholdViewCache.get_text(self.group_id, '', 10, 'en', (), self.render), 'en:0')
+        self.assertEqual(len(HouseholdViewCache.get_caches()['texts']), 0)  # the group without a version
+
+        rendered: list = []
+
+        def render(rows: tuple[tuple, ...], language: str) -> str:
+            rendered.append(language)
+            return self.render(rows, language)
+
+        for language in ('en', 'ru', 'en', 'ru', 'en'):
+            HouseholdViewCache.get_text(self.group_id, 'version_1', 10, language, ((1,),), render)
+        self.assertEqual(HouseholdViewCache.get_text(self.group_id, 'version_1', 10, 'ru', (), render), 'ru:1')
+        self.assertEqual(HouseholdViewCache.get_text(self.group_id, 'version_2', 10, 'ru', (), render), 'ru:0')
+        self.assertEqual(rendered, ['en', 'ru', 'ru'])
+
+    def test_household_view_003(self):
+        """ with the notifications the version is cached and evicted when another process adds a record """
+        self.assertTrue(self.test_db.add_transaction_to_db(10, '03/01/2024', 'Other', '', self.owner_id))
+        listener = CacheInvalidationListener(DSN, timeout=0.1)
+        listener.start()
+        try:
+            self.assertTrue(listener.wait_connected(5))
+            version, rows = self.test_db.get_household_table(self.group_id, 5)
+            self.assertEqual(DatabaseQueries(None).get_household_table(self.group_id, 5), (version, rows))
+
+            self.add_transaction_by_another_process(20)
+            self.assertTrue(self.wait_for_version_eviction())
+            new_version, new_rows = self.test_db.get_household_table(self.group_id, 5)
+            self.assertNotEqual(new_version, version)
+            self.assertEqual(new_rows[0][2], 20)
+
+            # a version read before an eviction is not cached
+            generation: int = HouseholdViewCache.get_generation()
+            HouseholdViewCache.delete_data_from_cache(self.group_id)
+            HouseholdViewCache.input_version(self.group_id, version, generation)
+            self.assertEqual(HouseholdViewCache.get_version(self.group_id), '')
+        finally:
+            listener.stop()
+        HouseholdViewCache.input_version(self.group_id, new_version, HouseholdViewCache.get_generation())
+        self.assertEqual(HouseholdViewCache.get_version(self.group_id), '')  # the listener has been stopped
+
+    def test_household_view_004(self):
+        """ a lost notification (the handler has failed) delays the new version only for the maximum age """
+        versions_cache: LruCache = HouseholdViewCache.get_caches()['versions']
+        versions_cache.configure(None, 1.0)
+        self.assertTrue(self.test_db.add_transaction_to_db(10, '04/01/2024', 'Other', '', self.owner_id))
+        listener = CacheInvalidationListener(DSN, timeout=0.1)
+        listener.start()
+        try:
+            self.assertTrue(listener.wait_connected(5))
+            version, rows = self.test_db.get_household_table(self.group_id, 5)
+            with patch.object(LruCache, 'delete_many', side_effect=RuntimeError('handler failed')) as delete_many:
+                self.add_transaction_by_another_process(40)
+                deadline: float = perf_counter() + 5
+                while not delete_many.called and perf_counter() < deadline:
+                    sleep(0.02)
+                self.assertTrue(delete_many.called)
+            self.assertTrue(InvalidationHandlers.is_listening())
+            self.assertEqual(HouseholdViewCache.get_version(self.group_id), version)  # the old version is trusted
+            sleep(1.0)
+            new_version, new_rows = self.test_db.get_household_table(self.group_id, 5)
+            self.assertNotEqual(new_version, version)
+            self.assertEqual(new_rows[0][2], 40)
+            self.assertEqual(len(new_rows), min(len(rows) + 1, 5))
+        finally:
+            listener.stop()
+            versions_cache.configure(None, VERSION_MAX_AGE)
+
+    def wait_for_version_eviction(self, timeout: float = 5.0) -> bool:
+        deadline: float = perf_counter() + timeout
+        while HouseholdViewCache.get_version(self.group_id):
+            if perf_counter() > deadline:
+                return False
+            sleep(0.02)
+        return True
+
+
+if __name__ == '__main__':
+    unittest.main()
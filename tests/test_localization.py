@@ -1,7 +1,8 @@
 import unittest
 from json import load as json_load
 from time import time
-from budget_graph.dictionary import receive_translation, get_list_languages
+from budget_graph.dictionary import receive_translation, get_list_languages, Emoji
+from budget_graph.helpers import get_menu_dispatch
 from budget_graph.global_config import GlobalConfig
 
 
@@ -190,5 +191,42 @@ class TestLanguages(unittest.TestCase):
         self.assertTrue(all(len(lang) == 2 for lang in languages))
 
 
+class TestMenuDispatch(unittest.TestCase):
+    buttons: tuple = (
+        (Emoji.get_emoji('book'), 'view_table', 'view_table'),
+        (Emoji.get_emoji('income'), 'add_income', 'add_income'),
+        (f"{Emoji.get_emoji('magic')}\ufe0f", 'back', 'back'),
+        (Emoji.get_emoji('back'), 'back_to_menu', 'back'),
+    )
+
+    def test_menu_dispatch_001(self):
+        """ the label of each button in each language is found """
+        dispatch: dict = get_menu_dispatch(self.buttons)
+        for language in get_list_languages():
+            for prefix, phrase, value in self.buttons:
+                with self.subTest(language=language, phrase=phrase):
+                    self.assertEqual(dispatch[f"{prefix} {receive_translation(language, phrase)}"], value)
+        self.assertEqual(dispatch[f"{Emoji.get_emoji('book')} Ver tabela"], 'view_table')
+        self.assertNotIn(f"{Emoji.get_emoji('income')} Ver tabela", dispatch)
+
+    def test_menu_dispatch_002(self):
+        """ the labels of the different menu buttons of the bot (bot.MENU_BUTTONS) do not match in any languages """
+        phrases: tuple[str, ...] = ('register', 'premium', 'get_my_token', 'table_manage', 'group_settings', 'back',
+                                    'back_to_menu', 'view_table', 'add_income', 'add_expense', 'del_record', 'get_csv',
+                                    'group_users', 'get_diagram', 'delete_account', 'delete_group', 'change_owner',
+                                    'delete_user')
+        dispatch: dict = get_menu_dispatch(tuple(('', phrase, phrase) for phrase in phrases))
+        for language in get_list_languages():
+            for phrase in phrases:
+                with self.subTest(language=language, phrase=phrase):
+                    self.assertEqual(dispatch[f" {receive_translation(language, phrase)}"], phrase)
+
+    def test_menu_dispatch_003(self):
+        """ the same label of two buttons is kept by the first one """
+        dispatch: dict = get_menu_dispatch(((Emoji.get_emoji('book'), 'view_table', 1),
+                                            (Emoji.get_emoji('book'), 'view_table', 2)))
+        self.assertEqual(set(dispatch.values()), {1})
+
+
 if __name__ == '__main__':
     unittest.main()
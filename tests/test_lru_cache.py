@@ -0,0 +1,129 @@
+import unittest
+from time import sleep
+from threading import Thread
+
+from budget_graph.lru_cache import LruCache
+
+
+class TestLruCache(unittest.TestCase):
+    def test_lru_cache_001(self):
+        """ get, set, replace, default """
+        cache = LruCache(10)
+        cache.set(1, 'en')
+        cache.set(2, 'ru')
+        cache.set(1, 'de')
+        self.assertEqual(cache.get(1), 'de')
+        self.assertEqual(cache.get(2), 'ru')
+        self.assertIsNone(cache.get(3))
+        self.assertEqual(cache.get(3, ''), '')
+        self.assertEqual(len(cache), 2)
+        # the stored falsy values are not confused with a miss
+        cache.set(4, False)
+        self.assertIs(cache.get(4, True), False)
+
+    def test_lru_cache_002(self):
+        """ the least recently used entry is evicted, a read and a write make the key the most recently used one """
+        cache = LruCache(3)
+        for key in (1, 2, 3):
+            cache.set(key, key)
+        cache.get(1)
+        cache.set(4, 4)  # 2 is evicted
+        self.assertNotIn(2, cache)
+        cache.set(3, 30)
+        cache.set(5, 5)  # 1 is evicted
+        self.assertEqual([key for key in (1, 2, 3, 4, 5) if key in cache], [3, 4, 5])
+        self.assertTrue(cache.touch(3))
+        self.assertFalse(cache.touch(1))
+        cache.set(6, 6)  # 4 is evicted
+        self.assertEqual([key for key in (3, 4, 5, 6) if key in cache], [3, 5, 6])
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.get_stats()['evictions'], 3)
+
+    def test_lru_cache_003(self):
+        """ counters """
+        cache = LruCache(2)
+        cache.set(1, 1)
+        cache.get(1)
+        cache.get(1)
+        cache.get(2)
+        cache.set(2, 2)
+        cache.set(3, 3)
+        self.assertEqual(cache.get_stats(), {'size': 2, 'capacity': 2, 'ttl': None, 'hits': 2, 'misses': 1,
+                                             'evictions': 1, 'expirations': 0, 'hit_ratio': 0.6667})
+        cache.reset_stats()
+        self.assertEqual(cache.get_stats()['hits'] + cache.get_stats()['misses'], 0)
+        self.assertEqual(cache.get_stats()['hit_ratio'], 0)
+        self.assertEqual(cache.get_stats()['size'], 2)
+
+    def test_lru_cache_004(self):
+        """ the entries expire after the TTL """
+        cache = LruCache(10, ttl=0.1)
+        cache.set(1, 1)
+        sleep(0.06)
+        cache.set(2, 2)
+        self.assertEqual(cache.get(1), 1)
+        sleep(0.06)
+        self.assertIsNone(cache.get(1))
+        self.assertNotIn(1, cache)
+        self.assertIn(2, cache)
+        self.assertEqual(cache.get(2), 2)
+        self.assertEqual(cache.get_stats()['expirations'], 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_lru_cache_005(self):
+        """ delete, delete_many, clear """
+        cache = LruCache(10)
+        for key in range(5):
+            cache.set(key, key)
+        self.assertTrue(cache.delete(0))
+        self.assertFalse(cache.delete(0))
+        self.assertEqual(cache.delete_many((1, 2, 10)), 2)
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_cache_006(self):
+        """ a smaller capacity evicts the least recently used entries, the new TTL applies to the new entries """
+        cache = LruCache(10)
+        for key in range(10):
+            cache.set(key, key)
+        cache.get(0)
+        cache.configure(3, ttl=0.05)
+        self.assertEqual([key for key in range(10) if key in cache], [0, 8, 9])
+        cache.set(10, 10)
+        self.assertEqual(len(cache), 3)
+        sleep(0.06)
+        self.assertIn(9, cache)
+        self.assertNotIn(10, cache)
+        cache.configure(ttl=0)
+        self.assertEqual(cache.get_stats()['capacity'], 3)
+        self.assertIsNone(cache.get_stats()['ttl'])
+
+    def test_lru_cache_007(self):
+        with self.assertRaises(ValueError):
+            LruCache(0)
+        with self.assertRaises(ValueError):
+            LruCache(1).configure(-1)
+
+    def test_lru_cache_008(self):
+        """ the capacity is kept and the counters are not lost with several threads """
+        cache = LruCache(100)
+
+        def use_cache(thread_number: int):
+            for i in range(10_000):
+                key: int = (thread_number * 7 + i) % 300
+                if cache.get(key) is None:
+                    cache.set(key, i)
+
+        threads: list[Thread] = [Thread(target=use_cache, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats: dict = cache.get_stats()
+        self.assertEqual(stats['size'], 100)
+        self.assertEqual(stats['hits'] + stats['misses'], 80_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
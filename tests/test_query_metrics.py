@@ -0,0 +1,183 @@
+import unittest
+from random import shuffle
+from threading import Thread
+
+from budget_graph.global_config import GlobalConfig
+from budget_graph.query_metrics import LatencyHistogram, QueryMetrics, BUCKET_BOUNDS, BUCKET_GROWTH, query_metrics, \
+    measure_query, measure_pool_wait, dump_query_metrics
+
+
+class FakeCursor:
+    def __init__(self, rowcount: int):
+        self.rowcount: int = rowcount
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_latency_histogram_001(self):
+        """ empty histogram """
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(50), 0)
+        self.assertEqual(histogram.get_summary(), {'count': 0, 'avg_ms': 0, 'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0,
+                                                   'max_ms': 0, 'total_ms': 0})
+
+    def test_latency_histogram_002(self):
+        """ the percentiles are estimated with an error of no more than one bucket """
+        histogram = LatencyHistogram()
+        values: list[float] = [i / 100_000 for i in range(1, 10_001)]  # 10 µs - 100 ms
+        shuffle(values)
+        for value in values:
+            histogram.record(value)
+        values.sort()
+        for percent in (1, 50, 95, 99, 100):
+            exact: float = values[len(values) * percent // 100 - 1]
+            with self.subTest(percent=percent):
+                self.assertGreaterEqual(histogram.percentile(percent), exact)
+                self.assertLessEqual(histogram.percentile(percent), exact * BUCKET_GROWTH)
+        self.assertEqual(histogram.count, 10_000)
+        self.assertAlmostEqual(histogram.total, sum(values))
+        self.assertEqual(histogram.max, 0.1)
+
+    def test_latency_histogram_003(self):
+        """ values outside the bounds of the buckets """
+        histogram = LatencyHistogram()
+        histogram.record(0)
+        self.assertEqual(histogram.percentile(100), 0)
+        histogram.record(BUCKET_BOUNDS[-1] * 10)
+        self.assertEqual(histogram.percentile(50), BUCKET_BOUNDS[0])
+        self.assertEqual(histogram.percentile(100), BUCKET_BOUNDS[-1] * 10)
+
+    def test_latency_histogram_004(self):
+        """ the percentile is not greater than the maximum value """
+        histogram = LatencyHistogram()
+        for _ in range(10):
+            histogram.record(0.0011)
+        self.assertEqual(histogram.percentile(50), 0.0011)
+        self.assertEqual(histogram.get_summary()['p99_ms'], 1.1)
+
+
+class TestQueryMetrics(unittest.TestCase):
+    def test_query_metrics_001(self):
+        """ calls, rows and errors by the name of the query """
+        metrics = QueryMetrics()
+        metrics.record_query('select_a', 0.001, 10)
+        metrics.record_query('select_a', 0.003, 5)
+        metrics.record_query('select_a', 0.002, error=True)
+        metrics.record_query('update_b', 0.0005, 1)
+        summary: dict = metrics.get_summary()['queries']
+        self.assertEqual(set(summary), {'select_a', 'update_b'})
+        self.assertEqual((summary['select_a']['calls'], summary['select_a']['rows'], summary['select_a']['errors']),
+                         (3, 15, 1))
+        self.assertEqual(summary['select_a']['avg_ms'], 2)
+        self.assertEqual(summary['select_a']['max_ms'], 3)
+        self.assertEqual(summary['select_a']['total_ms'], 6)
+        self.assertEqual((summary['update_b']['calls'], summary['update_b']['rows'], summary['update_b']['errors']),
+                         (1, 1, 0))
+
+        metrics.add_rows('select_a', 100)
+        metrics.add_rows('unknown', 100)
+        self.assertEqual(metrics.get_summary()['queries']['select_a']['rows'], 115)
+        self.assertNotIn('unknown', metrics.get_summary()['queries'])
+
+    def test_query_metrics_002(self):
+        """ pool wait time """
+        metrics = QueryMetrics()
+        metrics.record_pool_wait(0.0001)
+        metrics.record_pool_wait(5, error=True)
+        pool_wait: dict = metrics.get_summary()['pool_wait']
+        self.assertEqual((pool_wait['count'], pool_wait['errors'], pool_wait['max_ms']), (2, 1, 5000))
+
+    def test_query_metrics_003(self):
+        """ reset """
+        metrics = QueryMetrics()
+        metrics.record_query('select_a', 0.001, 10)
+        metrics.record_pool_wait(0.001)
+        metrics.reset()
+        self.assertEqual(metrics.get_summary()['queries'], {})
+        self.assertEqual(metrics.get_summary()['pool_wait']['count'], 0)
+
+    def test_query_metrics_004(self):
+        """ records from several threads are not lost """
+        metrics = QueryMetrics()
+
+        def record():
+            for i in range(10_000):
+                metrics.record_query(f'query_{i % 3}', 0.001, 1)
+                metrics.record_pool_wait(0.0001)
+
+        threads: list[Thread] = [Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary: dict = metrics.get_summary()
+        self.assertEqual(sum(stats['calls'] for stats in summary['queries'].values()), 80_000)
+        self.assertEqual(sum(stats['rows'] for stats in summary['queries'].values()), 80_000)
+        self.assertEqual(summary['pool_wait']['count'], 80_000)
+
+    def test_query_metrics_005(self):
+        """ the table is sorted by the total time, the pool wait is the last line """
+        metrics = QueryMetrics()
+        metrics.record_query('fast_query', 0.001, 1)
+        metrics.record_query('slow_query', 0.5, 1)
+        lines: list[str] = metrics.format_summary().split('\n')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('query'))
+        self.assertTrue(lines[1].startswith('slow_query'))
+        self.assertTrue(lines[2].startswith('fast_query'))
+        self.assertTrue(lines[3].startswith('[pool wait]'))
+
+
+class TestMeasure(unittest.TestCase):
+    def setUp(self):
+        self.metrics_enable = GlobalConfig.db_query_metrics_enable
+        GlobalConfig.db_query_metrics_enable = True
+        query_metrics.reset()
+
+    def tearDown(self):
+        GlobalConfig.db_query_metrics_enable = self.metrics_enable
+        query_metrics.reset()
+
+    def test_measure_001(self):
+        """ rows are taken from the cursor after the block, -1 (no rows) is counted as 0 """
+        cur = FakeCursor(-1)
+        with measure_query('select_a', cur):
+            cur.rowcount = 7
+        with measure_query('select_a', FakeCursor(-1)):
+            pass
+        stats: dict = query_metrics.get_summary()['queries']['select_a']
+        self.assertEqual((stats['calls'], stats['rows'], stats['errors']), (2, 7, 0))
+
+    def test_measure_002(self):
+        """ the exception is recorded as an error and raised again """
+        with self.assertRaises(ValueError):
+            with measure_query('select_a', FakeCursor(5)):
+                raise ValueError
+        with self.assertRaises(ValueError):
+            with measure_pool_wait():
+                raise ValueError
+        summary: dict = query_metrics.get_summary()
+        self.assertEqual((summary['queries']['select_a']['calls'], summary['queries']['select_a']['rows'],
+                          summary['queries']['select_a']['errors']), (1, 0, 1))
+        self.assertEqual((summary['pool_wait']['count'], summary['pool_wait']['errors']), (1, 1))
+
+    def test_measure_003(self):
+        """ nothing is recorded if the metrics are disabled """
+        GlobalConfig.db_query_metrics_enable = False
+        with measure_query('select_a', FakeCursor(1)):
+            pass
+        with measure_pool_wait():
+            pass
+        self.assertEqual(query_metrics.get_summary()['queries'], {})
+        self.assertEqual(query_metrics.get_summary()['pool_wait']['count'], 0)
+
+    def test_measure_004(self):
+        """ dump """
+        with measure_query('select_a', FakeCursor(1)):
+            pass
+        summary: str = dump_query_metrics()
+        self.assertIn('select_a', summary)
+        self.assertIn('[pool wait]', summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
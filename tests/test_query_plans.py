@@ -0,0 +1,337 @@
+import unittest
+from re import split as re_split
+from datetime import date, datetime
+
+from budget_graph.db_manager import sql_registry, get_plot_period_bounds
+
+from tests.build_test_infrastructure import connect_test_db, close_test_db, prepare_db_tables_for_tests
+
+NUMBER_OF_GROUPS: int = 4_000
+USERS_IN_GROUP: int = 5
+RECORDS_IN_GROUP: int = 50
+FIRST_TELEGRAM_ID: int = 1_000_000
+
+GROUP_ID: int = 1_234  # the group of the queries
+OWNER: int = FIRST_TELEGRAM_ID + (GROUP_ID - 1) * USERS_IN_GROUP + 1
+MEMBER: int = OWNER + 1
+NEW_USER: int = FIRST_TELEGRAM_ID * 10
+ARCHIVE_HORIZON: date = date(2021, 8, 23)  # the first 30 records of each group are archived
+
+# the queries that cannot be explained, they are executed before import_transactions
+NOT_EXPLAINABLE: frozenset[str] = frozenset({'create_import_staging_table', 'copy_to_import_staging_table'})
+
+# the daily archival job looks for the old records in the whole table of the recent records (one scan a day)
+SEQUENTIAL_SCANS: dict[str, str] = {'archive_transactions': 'monetary_transactions'}
+
+# the index that each query must use (the key lookups)
+EXPECTED_INDEXES: dict[str, str] = {
+    'auth_by_username': 'users_username_key',
+    'check_record_id_is_exist': 'monetary_transactions_pkey',
+    'check_token_is_unique': 'groups_token_key',
+    'check_username_is_exist': 'users_lower_username',
+    'delete_transaction_record': 'monetary_transactions_pkey',
+    'export_group_transactions': 'transactions_group_id',
+    'get_data_for_plot_builder_group': 'monthly_user_totals_pkey',
+    'get_data_for_plot_builder_group_period': 'transactions_group_id',
+    'get_data_for_plot_builder_users': 'monthly_user_totals_pkey',
+    'get_data_for_plot_builder_users_period': 'transactions_group_id',
+    'get_group_id_by_token': 'groups_token_key',
+    'get_group_id_token_by_username': 'users_username_key',
+    'get_group_profile': 'users_group_id',
+    'get_group_telegram_ids': 'users_group_id',
+    'get_group_usernames': 'users_group_id',
+    'get_group_users_data': 'users_group_id',
+    'get_salt_by_username': 'users_username_key',
+    'get_telegram_id_by_username': 'users_username_key',
+    'select_data_for_household_table': 'transactions_group_id',
+}
+
+# the maximum number of buffers (8 kB pages) read by the query from the cache or from the disk
+# (about twice the number on the dataset of the suite), the rest of the queries read a few rows by a key
+DEFAULT_BUFFER_BUDGET: int = 50
+BUFFER_BUDGETS: dict[str, int] = {
+    'add_transaction_to_db': 150,
+    'archive_transactions': 15_000,  # 1 000 records are moved: the deletion, the insertion and its two indexes
+    'delete_group_with_users': 500,
+    'export_group_transactions': 200,
+    'get_data_for_plot_builder_group': 250,
+    'get_data_for_plot_builder_group_period': 200,
+    'get_data_for_plot_builder_users': 120,
+    'get_data_for_plot_builder_users_period': 100,
+    'import_transactions': 1_200,
+    'select_data_for_household_table': 120,
+}
+
+
+def get_plan_nodes(plan: dict) -> list[dict]:
+    nodes: list[dict] = [plan]
+    for node in nodes:
+        nodes.extend(node.get('Plans', ()))
+    return nodes
+
+
+def find_duplicate_indexes(connection) -> list[tuple[str, str]]:
+    """
+    :return: (index, the index that makes it unnecessary) for the indexes of the "budget_graph" schema:
+    - the same columns (in any direction, a B-tree is read in both directions)
+    - a non-unique index whose columns are the first columns of another index
+    - a unique index with the same set of columns as another unique index (one of them is enough for uniqueness)
+    """
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT c."relname", i."indrelid", i."indkey"::text, i."indisunique", i."indisprimary", '
+                        'i."indclass"::text, am."amname", i."indexprs" IS NULL AND i."indpred" IS NULL '
+                        'FROM pg_index i '
+                        'JOIN pg_class c ON c."oid" = i."indexrelid" '
+                        'JOIN pg_am am ON am."oid" = c."relam" '
+                        'JOIN pg_namespace n ON n."oid" = c."relnamespace" '
+                        'WHERE n."nspname" = \'budget_graph\' ORDER BY c."relname"')
+            indexes: list[tuple] = cur.fetchall()
+
+    duplicates: list[tuple[str, str]] = []
+    for name, table, keys, unique, primary, classes, method, plain in indexes:
+        for other_name, other_table, other_keys, other_unique, other_primary, other_classes, other_method, \
+                other_plain in indexes:
+            if name == other_name or table != other_table or method != other_method or not plain or not other_plain:
+                continue
+            key_list, other_key_list = keys.split(), other_keys.split()
+            same_keys: bool = key_list == other_key_list and classes == other_classes
+            prefix: bool = not unique and len(key_list) < len(other_key_list) and \
+                other_key_list[:len(key_list)] == key_list and other_classes.startswith(classes)
+            same_unique_keys: bool = unique and other_unique and set(key_list) == set(other_key_list)
+            # of two equal indexes the constraint (or the first by name) is kept
+            keep_this: bool = (primary, unique, other_name) > (other_primary, other_unique, name)
+            if (same_keys or same_unique_keys) and not keep_this or prefix:
+                duplicates.append((name, other_name))
+                break
+    return duplicates
+
+
+class TestQueryPlans(unittest.TestCase):
+    """
+    Every query of budget_graph/sql is executed with EXPLAIN (ANALYZE, BUFFERS) on a synthetic dataset
+    (4 000 groups, 20 000 users, 200 000 records, 120 000 of them in the archive), the changes are rolled back.
+    The plans are checked: no sequential scans of the tables, the expected index, the number of buffers.
+    """
+    plans: dict[str, list[dict]] = {}
+    index_scans: dict[str, int] = {}
+
+    @classmethod
+    def setUpClass(cls):
+        prepare_db_tables_for_tests()
+        connection = connect_test_db()
+        create_dataset(connection)
+        before: dict[str, int] = get_index_scans(connection)
+        cls.plans = {name: explain_query(connection, name, params) for name, params in get_query_params().items()}
+        after: dict[str, int] = get_index_scans(connection)
+        cls.index_scans = {name: after[name] - before.get(name, 0) for name in after}
+        close_test_db(connection)
+
+    def setUp(self):
+        self.connection = connect_test_db()
+
+    def tearDown(self):
+        close_test_db(self.connection)
+
+    def test_query_plans_001(self):
+        """ every query of the registry has parameters in the suite """
+        self.assertEqual(set(sql_registry.names()) - NOT_EXPLAINABLE, set(self.plans))
+
+    def test_query_plans_002(self):
+        """ the tables are not read sequentially (except the temporary table of the import and the archival) """
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT "tablename" FROM pg_tables WHERE "schemaname" = \'budget_graph\'')
+                tables: set[str] = {row[0] for row in cur.fetchall()}
+        for name, plans in self.plans.items():
+            with self.subTest(query=name):
+                sequential_scans: list[str] = [node['Relation Name'] for plan in plans for node in get_plan_nodes(plan)
+                                               if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in tables
+                                               and node['Relation Name'] != SEQUENTIAL_SCANS.get(name)]
+                self.assertEqual(sequential_scans, [])
+
+    def test_query_plans_003(self):
+        for name, index_name in EXPECTED_INDEXES.items():
+            with self.subTest(query=name):
+                used_indexes: set[str] = {node.get('Index Name') for plan in self.plans[name]
+                                          for node in get_plan_nodes(plan)}
+                self.assertIn(index_name, used_indexes)
+
+    def test_query_plans_004(self):
+        """ the number of buffers (including the buffers of the subqueries) is within the budget of the query """
+        for name, plans in self.plans.items():
+            with self.subTest(query=name):
+                buffers: int = sum(plan['Shared Hit Blocks'] + plan['Shared Read Blocks'] for plan in plans)
+                self.assertLessEqual(buffers, BUFFER_BUDGETS.get(name, DEFAULT_BUFFER_BUDGET))
+
+    def test_query_plans_005(self):
+        """ there are no indexes that repeat other indexes """
+        self.assertEqual(find_duplicate_indexes(self.connection), [])
+
+    def test_query_plans_006(self):
+        """ every index that is not a constraint is used by at least one query """
+        with self.connection as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT c."relname" FROM pg_index i JOIN pg_class c ON c."oid" = i."indexrelid" '
+                            'JOIN pg_namespace n ON n."oid" = c."relnamespace" '
+                            'WHERE n."nspname" = \'budget_graph\' AND NOT i."indisunique"')
+                indexes: list[str] = [row[0] for row in cur.fetchall()]
+        self.assertTrue(indexes)
+        self.assertEqual([name for name in indexes if not self.index_scans.get(name)], [])
+
+    def test_query_plans_007(self):
+        """ the duplicates are found """
+        duplicates: dict[str, str] = {
+            'duplicate_1': '"budget_graph"."monetary_transactions" ("group_id", "record_date" DESC)',
+            'duplicate_2': '"budget_graph"."users_groups" ("group_id", "telegram_id")',
+            'duplicate_3': '"budget_graph"."groups" ("owner")'
+        }
+        try:
+            with self.connection as conn:
+                with conn.cursor() as cur:
+                    for name, definition in duplicates.items():
+                        cur.execute(f'CREATE INDEX "{name}" ON {definition}')
+            self.assertEqual(find_duplicate_indexes(self.connection), [('duplicate_3', 'groups_owner_key'),
+                                                                       ('transactions_group_id', 'duplicate_1'),
+                                                                       ('users_group_id', 'duplicate_2')])
+        finally:
+            with self.connection as conn:
+                with conn.cursor() as cur:
+                    for name in duplicates:
+                        cur.execute(f'DROP INDEX IF EXISTS "budget_graph"."{name}"')
+
+
+def create_dataset(connection) -> None:
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute('INSERT INTO "budget_graph"."users" ("telegram_id", "username", "psw_salt", "psw_hash") '
+                        'SELECT %(first)s + i, \'plan_user_\' || i, md5(i::text), md5(i::text) || md5(i::text) '
+                        'FROM generate_series(1, %(users)s) i',
+                        {'first': FIRST_TELEGRAM_ID, 'users': NUMBER_OF_GROUPS * USERS_IN_GROUP})
+            cur.execute('INSERT INTO "budget_graph"."groups" ("id", "owner", "token") '
+                        'SELECT i, %(first)s + (i - 1) * %(size)s + 1, md5(i::text) '
+                        'FROM generate_series(1, %(groups)s) i',
+                        {'first': FIRST_TELEGRAM_ID, 'size': USERS_IN_GROUP, 'groups': NUMBER_OF_GROUPS})
+            cur.execute('SELECT setval(pg_get_serial_sequence(\'"budget_graph"."groups"\', \'id\'), %s)',
+                        (NUMBER_OF_GROUPS,))
+            cur.execute('INSERT INTO "budget_graph"."users_groups" ("telegram_id", "group_id") '
+                        'SELECT %(first)s + i, (i - 1) / %(size)s + 1 FROM generate_series(1, %(users)s) i',
+                        {'first': FIRST_TELEGRAM_ID, 'size': USERS_IN_GROUP,
+                         'users': NUMBER_OF_GROUPS * USERS_IN_GROUP})
+            cur.execute('INSERT INTO "budget_graph"."user_languages_telegram" ("telegram_id", "language") '
+                        'SELECT %(first)s + i, \'en\' FROM generate_series(1, %(users)s) i',
+                        {'first': FIRST_TELEGRAM_ID, 'users': NUMBER_OF_GROUPS * USERS_IN_GROUP})
+            cur.execute('INSERT INTO "budget_graph"."premium_users" ("telegram_id", "paid_until") '
+                        'SELECT %(first)s + i, CURRENT_DATE + 30 FROM generate_series(1, %(users)s, 10) i',
+                        {'first': FIRST_TELEGRAM_ID, 'users': NUMBER_OF_GROUPS * USERS_IN_GROUP})
+            # the numbers are set explicitly, so the row trigger of the group counter is not fired
+            cur.execute('INSERT INTO "budget_graph"."monetary_transactions" '
+                        '("group_id", "transaction_id", "username", "transfer", "record_date") '
+                        'SELECT i %% %(groups)s + 1, i / %(groups)s + 1, '
+                        '\'plan_user_\' || (i %% %(groups)s * %(size)s + i / %(groups)s %% %(size)s + 1), '
+                        '(i %% 1000 + 1) * (1 - 2 * (i %% 2)), \'2020-01-01\'::date + i / %(groups)s * 20 '
+                        'FROM generate_series(0, %(records)s - 1) i',
+                        {'groups': NUMBER_OF_GROUPS, 'size': USERS_IN_GROUP,
+                         'records': NUMBER_OF_GROUPS * RECORDS_IN_GROUP})
+            cur.execute('UPDATE "budget_graph"."groups" SET "last_transaction_id" = %s', (RECORDS_IN_GROUP,))
+            sql_registry.execute(cur, 'archive_transactions', {'horizon': ARCHIVE_HORIZON,
+                                                               'batch_size': NUMBER_OF_GROUPS * RECORDS_IN_GROUP})
+    connection.autocommit = True
+    with connection.cursor() as cur:
+        cur.execute('VACUUM ANALYZE')
+    connection.autocommit = False
+
+
+def get_query_params() -> dict[str, dict]:
+    """ the parameters of the queries: the group GROUP_ID, its owner and member, a new user """
+    username: str = f'plan_user_{MEMBER - FIRST_TELEGRAM_ID}'
+    period: dict[str, date] = get_plot_period_bounds(date(2020, 3, 15), date(2021, 9, 20))
+    new_user: dict = {'telegram_id': NEW_USER, 'username': 'plan_new_user', 'psw_salt': 's' * 32,
+                      'psw_hash': 'h' * 64}
+    return {
+        'add_transaction_to_db': {'telegram_id': MEMBER, 'username': None, 'transaction_amount': 100,
+                                  'record_date': '01/02/2024', 'category': '', 'description': ''},
+        'add_user_language': {'telegram_id': MEMBER, 'language': 'de'},
+        'add_user_timezone': {'timezone': 3, 'telegram_id': MEMBER},
+        'archive_transactions': {'horizon': date(2021, 10, 1), 'batch_size': 1_000},
+        'auth_by_username': {'username': username, 'psw_hash': 'h' * 64},
+        'change_feature_status': {'feature': 1, 'telegram_id': MEMBER},
+        'check_limit_users_in_group': {'group_id': GROUP_ID},
+        'check_record_id_is_exist': {'group_id': GROUP_ID, 'transaction_id': 10},
+        'check_telegram_id_is_exist': {'telegram_id': MEMBER},
+        'check_token_is_unique': {'token': 'a' * 32},
+        'check_user_is_group_owner_by_telegram_id': {'owner': OWNER, 'group_id': GROUP_ID},
+        'check_user_is_premium_by_telegram_id': {'telegram_id': OWNER},
+        'check_username_is_exist': {'username': username.upper()},
+        'delete_group_with_users': {'group_id': GROUP_ID},
+        'delete_transaction_record': {'group_id': GROUP_ID, 'transaction_id': 10},
+        'delete_user_from_group_by_telegram_id': {'telegram_id': MEMBER},
+        'export_group_transactions': {'group_id': GROUP_ID},
+        'get_data_for_plot_builder_group': {'telegram_id': MEMBER},
+        'get_data_for_plot_builder_group_period': {'telegram_id': MEMBER} | period,
+        'get_data_for_plot_builder_users': {'telegram_id': MEMBER, 'users': [OWNER, MEMBER]},
+        'get_data_for_plot_builder_users_period': {'telegram_id': MEMBER, 'users': [OWNER, MEMBER]} | period,
+        'get_feature_status': {'feature': 1, 'telegram_id': MEMBER},
+        'get_group_id_by_telegram_id': {'telegram_id': MEMBER},
+        'get_group_id_by_token': {'token': 'a' * 32},
+        'get_group_id_token_by_username': {'username': username},
+        'get_group_owner_telegram_id_by_group_id': {'group_id': GROUP_ID},
+        'get_group_owner_username_by_group_id': {'group_id': GROUP_ID},
+        'get_group_profile': {'group_id': GROUP_ID},
+        'get_group_telegram_ids': {'group_id': GROUP_ID},
+        'get_group_transaction_uuid': {'group_id': GROUP_ID},
+        'get_group_usernames': {'group_id': GROUP_ID},
+        'get_group_users_data': {'group_id': GROUP_ID},
+        'get_salt_by_username': {'username': username},
+        'get_skip_operations_status': {'telegram_id': MEMBER},
+        'get_telegram_id_by_username': {'username': username},
+        'get_token_by_telegram_id': {'telegram_id': OWNER},
+        'get_user_context': {'telegram_id': MEMBER},
+        'get_user_language': {'telegram_id': MEMBER},
+        'get_user_timezone_by_telegram_id': {'telegram_id': MEMBER},
+        'get_username_by_telegram_id': {'telegram_id': MEMBER},
+        'import_transactions': {'group_id': GROUP_ID, 'username': username},
+        'new_user_in_group': new_user | {'group_id': GROUP_ID},
+        'new_user_with_group': new_user | {'token': 'b' * 32},
+        'select_data_for_household_table': {'group_id': GROUP_ID, 'limit': 10},
+        'update_group_owner': {'telegram_id': MEMBER, 'group_id': GROUP_ID},
+        'update_user_last_login_by_telegram_id': {'telegram_id': MEMBER},
+        'update_users_last_login': {'telegram_ids': [OWNER, MEMBER],
+                                    'last_logins': [datetime(2024, 1, 1), datetime(2024, 1, 2)]},
+    }
+
+
+def explain_query(connection, name: str, params: dict) -> list[dict]:
+    """
+    :return: the plans of the statements of the query (the changes are rolled back)
+    """
+    plans: list[dict] = []
+    try:
+        with connection.cursor() as cur:
+            if name == 'import_transactions':
+                sql_registry.execute(cur, 'create_import_staging_table')
+                cur.execute('INSERT INTO pg_temp."import_transactions" '
+                            'SELECT i, 100, \'2024-01-01\', \'\', \'\' FROM generate_series(1, 100) i')
+            for statement in re_split(r';\s*\n', sql_registry.get(name).text):
+                cur.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}', params)
+                plans.append(cur.fetchone()[0][0]['Plan'])
+    finally:
+        connection.rollback()
+    return plans
+
+
+def get_index_scans(connection) -> dict[str, int]:
+    """ the number of scans of each index of the "budget_graph" schema (the statistics of all sessions) """
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_stat_force_next_flush()')
+    with connection as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_stat_clear_snapshot()')
+            cur.execute('SELECT "indexrelname", "idx_scan" FROM pg_stat_user_indexes '
+                        'WHERE "schemaname" = \'budget_graph\'')
+            return dict(cur.fetchall())
+
+
+if __name__ == '__main__':
+    unittest.main()
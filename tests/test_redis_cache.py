@@ -0,0 +1,192 @@
+import unittest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from budget_graph.global_config import GlobalConfig
+from budget_graph.lru_cache import LruCache
+from budget_graph.redis_cache import RedisConnection, TwoLevelCache
+from budget_graph.user_cache_structure import UserLanguageCache, UserContextCache
+from budget_graph.user_context import UserContext
+
+
+class FakeRedis:
+    """
+    In-process stand-in for the Redis server with the commands used by TwoLevelCache
+    (the TTL is recorded, but the values do not expire); broken=True - every command raises ConnectionError
+    """
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+        self.ttl: dict[str, int] = {}
+        self.commands: list[str] = []
+        self.broken: bool = False
+
+    def __command(self, name: str) -> None:
+        self.commands.append(name)
+        if self.broken:
+            raise RedisConnectionError('Connection refused')
+
+    def get(self, key: str) -> bytes | None:
+        self.__command('GET')
+        return self.data.get(key)
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        self.__command('MGET')
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ex: int | None = None) -> bool:
+        self.data[key] = value
+        self.ttl[key] = ex
+        return True
+
+    def delete(self, *keys: str) -> int:
+        self.__command('DEL')
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction: bool = True):
+        return FakePipeline(self, transaction)
+
+
+class FakePipeline:
+    def __init__(self, server: FakeRedis, transaction: bool):
+        self.server: FakeRedis = server
+        self.transaction: bool = transaction
+        self.queue: list[tuple] = []
+
+    def set(self, key: str, value: bytes, ex: int | None = None) -> None:
+        self.queue.append((key, value, ex))
+
+    def execute(self) -> list[bool]:
+        self.server.commands.append(f'PIPELINE:{len(self.queue)}')
+        if self.server.broken:
+            raise RedisConnectionError('Connection refused')
+        return [self.server.set(*args) for args in self.queue]
+
+
+class TestTwoLevelCache(unittest.TestCase):
+    def setUp(self):
+        self.redis_enable = GlobalConfig.redis_enable
+        GlobalConfig.redis_enable = True
+        self.server = FakeRedis()
+        RedisConnection.set_client(self.server)
+
+    def tearDown(self):
+        GlobalConfig.redis_enable = self.redis_enable
+        RedisConnection.set_client(None)
+
+    @staticmethod
+    def new_cache(ttl: int = 600) -> TwoLevelCache:
+        """ a cache of a new process: an empty L1 and the same Redis """
+        return TwoLevelCache('test', LruCache(100), ttl, str.encode, bytes.decode)
+
+    def test_two_level_cache_001(self):
+        """ a value is written to both levels, an L1 hit does not request Redis """
+        cache = self.new_cache()
+        cache.set(1, 'en')
+        self.assertEqual(self.server.data, {'budget_graph:test:1': b'en'})
+        self.assertEqual(self.server.ttl, {'budget_graph:test:1': 600})
+        self.server.commands.clear()
+        self.assertEqual(cache.get(1), 'en')
+        self.assertEqual(self.server.commands, [])
+
+    def test_two_level_cache_002(self):
+        """ another process reads the value from Redis once and then from its L1 """
+        self.new_cache().set(1, 'en')
+        cache = self.new_cache()
+        self.server.commands.clear()
+        self.assertEqual(cache.get(1), 'en')
+        self.assertEqual(cache.get(1), 'en')
+        self.assertEqual(cache.get(2, ''), '')
+        self.assertEqual(self.server.commands, ['GET', 'GET'])
+        self.assertIn(1, cache.local)
+        self.assertNotIn(2, cache.local)
+
+    def test_two_level_cache_003(self):
+        """ get_many: the keys missing in L1 are read by one MGET """
+        self.new_cache().set_many({key: 'de' for key in range(10)})
+        cache = self.new_cache()
+        cache.set(0, 'en')
+        self.server.commands.clear()
+        self.assertEqual(cache.get_many(range(12)), {0: 'en', **{key: 'de' for key in range(1, 10)}})
+        self.assertEqual(self.server.commands, ['MGET'])
+        self.server.commands.clear()
+        self.assertEqual(len(cache.get_many(range(10))), 10)
+        self.assertEqual(self.server.commands, [])
+
+    def test_two_level_cache_004(self):
+        """ set_many: one pipeline without a transaction, the unchanged values are not written again """
+        cache = self.new_cache()
+        cache.set_many({1: 'en', 2: 'ru', 3: 'es'})
+        self.assertEqual(self.server.commands, ['PIPELINE:3'])
+        cache.set(1, 'en')
+        cache.set_many({1: 'en', 2: 'de'})
+        self.assertEqual(self.server.commands, ['PIPELINE:3', 'PIPELINE:1'])
+        self.assertEqual(self.server.data['budget_graph:test:2'], b'de')
+
+    def test_two_level_cache_005(self):
+        """ the deletion removes the keys from both levels by one DEL """
+        cache = self.new_cache()
+        cache.set_many({1: 'en', 2: 'ru', 3: 'es'})
+        self.assertTrue(cache.delete(1))
+        self.assertEqual(cache.delete_many((2, 3, 4)), 2)
+        self.assertFalse(cache.delete(1))
+        self.assertEqual(self.server.data, {})
+        self.assertEqual(self.server.commands.count('DEL'), 3)
+        # the key that is only in Redis (written by another process) is deleted as well
+        self.new_cache().set(5, 'en')
+        self.assertFalse(cache.delete(5))
+        self.assertIsNone(cache.get(5))
+
+    def test_two_level_cache_006(self):
+        """ an unavailable server: L1 keeps working, Redis is not requested until the pause passes """
+        cache = self.new_cache()
+        cache.set(1, 'en')
+        self.server.broken = True
+        self.assertEqual(cache.get(2, ''), '')
+        self.server.commands.clear()
+        cache.set(3, 'ru')
+        self.assertEqual(cache.get(1), 'en')
+        self.assertEqual(cache.get(3), 'ru')
+        self.assertEqual(cache.get(4, ''), '')
+        self.assertEqual(cache.get_many((1, 5)), {1: 'en'})
+        self.assertTrue(cache.delete(3))
+        self.assertEqual(self.server.commands, [])
+        # the pause is reset (the same as after REDIS_RETRY_INTERVAL)
+        self.server.broken = False
+        RedisConnection.set_client(self.server)
+        self.assertEqual(self.new_cache().get(1), 'en')
+
+    def test_two_level_cache_007(self):
+        """ Redis is disabled in the config: only L1 """
+        GlobalConfig.redis_enable = False
+        cache = self.new_cache()
+        cache.set(1, 'en')
+        self.assertEqual(cache.get(1), 'en')
+        self.assertIsNone(self.new_cache().get(1))
+        self.assertTrue(cache.delete(1))
+        self.assertEqual((self.server.data, self.server.commands), ({}, []))
+
+    def test_two_level_cache_008(self):
+        """ the user caches: the compact values and the shared contexts of the registered users """
+        language_cache, context_cache = UserLanguageCache.get_cache(), UserContextCache.get_cache()
+        language_cache.local.clear()
+        context_cache.local.clear()
+        UserLanguageCache.input_cache_data(123, 'is')
+        UserContextCache.input_cache_data(UserContext(123, 'is', True, 'redis_user', 5, True),
+                                          UserContextCache.get_generation())
+        self.assertEqual(self.server.data, {'budget_graph:language:123': b'is',
+                                            'budget_graph:context:123': b'[123,"is","redis_user",5,true,false,null,[]]'})
+
+        # a restarted process
+        language_cache.local.clear()
+        context_cache.local.clear()
+        self.assertEqual(UserLanguageCache.get_cache_data(123), 'is')
+        user_context: UserContext = UserContextCache.get_cache_data(123)
+        self.assertEqual((user_context.is_registered, user_context.username, user_context.group_id,
+                          user_context.is_owner), (True, 'redis_user', 5, True))
+        self.assertIsNone(UserContextCache.get_cache_data(124))
+
+        UserContextCache.delete_group_trigger((123, 124))
+        UserLanguageCache.delete_data_from_cache(123)
+        self.assertEqual(self.server.data, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from time import sleep
+
+from budget_graph.global_config import GlobalConfig
+from budget_graph.replica_routing import ReadYourWritesWindow, DEFAULT_WINDOW
+
+
+class TestReadYourWritesWindow(unittest.TestCase):
+    def setUp(self):
+        self.window = GlobalConfig.db_read_your_writes_window
+        GlobalConfig.db_read_your_writes_window = 0.2
+
+    def tearDown(self):
+        GlobalConfig.db_read_your_writes_window = self.window
+
+    def test_read_your_writes_001(self):
+        """ the written keys are active during the window """
+        window = ReadYourWritesWindow()
+        window.mark(telegram_id=1, group_id=10, username=None)
+        self.assertTrue(window.is_active(telegram_id=1))
+        self.assertTrue(window.is_active(group_id=10))
+        self.assertTrue(window.is_active(telegram_id=2, group_id=10))
+        self.assertFalse(window.is_active(telegram_id=2, group_id=11))
+        self.assertFalse(window.is_active(username=None))
+        self.assertFalse(window.is_active())
+
+    def test_read_your_writes_002(self):
+        """ the key name is a part of the key: telegram_id 10 and group_id 10 are different keys """
+        window = ReadYourWritesWindow()
+        window.mark(group_id=10)
+        self.assertFalse(window.is_active(telegram_id=10))
+
+    def test_read_your_writes_003(self):
+        """ the window expires and is extended by a new write """
+        window = ReadYourWritesWindow()
+        window.mark(telegram_id=1, group_id=10)
+        sleep(0.1)
+        window.mark(group_id=10)
+        sleep(0.15)
+        self.assertFalse(window.is_active(telegram_id=1))
+        self.assertTrue(window.is_active(group_id=10))
+        sleep(0.1)
+        self.assertFalse(window.is_active(group_id=10))
+
+    def test_read_your_writes_004(self):
+        """ expired keys are removed by the next write """
+        window = ReadYourWritesWindow()
+        for telegram_id in range(1_000):
+            window.mark(telegram_id=telegram_id)
+        sleep(0.25)
+        window.mark(telegram_id=1_000)
+        self.assertEqual(len(window._ReadYourWritesWindow__deadlines), 1)  # noqa
+
+    def test_read_your_writes_005(self):
+        window = ReadYourWritesWindow()
+        window.mark(telegram_id=1)
+        window.clear()
+        self.assertFalse(window.is_active(telegram_id=1))
+
+    def test_read_your_writes_006(self):
+        """ zero window: the replica is always read """
+        GlobalConfig.db_read_your_writes_window = 0
+        window = ReadYourWritesWindow()
+        window.mark(telegram_id=1)
+        self.assertFalse(window.is_active(telegram_id=1))
+
+        GlobalConfig.db_read_your_writes_window = None
+        self.assertEqual(window.get_window(), DEFAULT_WINDOW)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from os import path
+from re import findall
+from tempfile import TemporaryDirectory
+
+from budget_graph.db_manager import sql_registry
+from budget_graph.sql_registry import SqlRegistry, SqlRegistryError, SCHEMA_SCRIPTS, CLEANUP_SCRIPT, PREPARED_QUERIES
+
+
+def write_sql_files(sql_dir: str, files: dict[str, str]) -> None:
+    for name, text in files.items():
+        with open(path.join(sql_dir, f'{name}.sql'), 'w', encoding='utf-8') as sql_file:
+            sql_file.write(text)
+
+
+class TestSqlRegistry(unittest.TestCase):
+    def test_sql_registry_001(self):
+        """ all queries used by DatabaseQueries are in the registry """
+        with open(path.join(path.dirname(__file__), '../budget_graph/db_manager.py'), 'r', encoding='utf-8') as file:
+            used_queries: set[str] = set(findall(r"sql_registry\.execute\(\s*cur,\s*'([a-z_]+)'", file.read()))
+        # the name is chosen by a condition
+        used_queries |= {'new_user_in_group', 'new_user_with_group',
+                         'get_data_for_plot_builder_group', 'get_data_for_plot_builder_group_period',
+                         'get_data_for_plot_builder_users', 'get_data_for_plot_builder_users_period'}
+        self.assertTrue(used_queries)
+        for name in used_queries:
+            with self.subTest(query=name):
+                self.assertIn(name, sql_registry)
+
+    def test_sql_registry_002(self):
+        """ schema scripts are not loaded as queries """
+        for name in SCHEMA_SCRIPTS + (CLEANUP_SCRIPT,):
+            with self.subTest(script=name):
+                self.assertNotIn(name, sql_registry)
+
+    def test_sql_registry_003(self):
+        for name in PREPARED_QUERIES:
+            with self.subTest(query=name):
+                query = sql_registry.get(name)
+                self.assertTrue(query.prepare_text.startswith(f'PREPARE "budget_graph_{name}" AS '))
+                self.assertNotIn('%(', query.prepare_text)
+                self.assertTrue(query.execute_text.startswith(f'EXECUTE "budget_graph_{name}"'))
+
+    def test_sql_registry_004(self):
+        with TemporaryDirectory() as sql_dir:
+            write_sql_files(sql_dir, {
+                'query_1': 'SELECT %(b)s::int, %(a)s::text, %(b)s::int, \'%%\'',
+                'query_2': 'SELECT 1',
+                'create_db': 'CREATE TABLE t (%)'
+            })
+            registry = SqlRegistry(sql_dir, frozenset({'query_1'}))
+            self.assertEqual(registry.names(), ('query_1', 'query_2'))
+
+            query_1 = registry.get('query_1')
+            self.assertEqual(query_1.params, ('b', 'a'))
+            self.assertEqual(query_1.prepare_text, 'PREPARE "budget_graph_query_1" AS SELECT $1::int, $2::text, $1::int, \'%\'')
+            self.assertEqual(query_1.execute_text, 'EXECUTE "budget_graph_query_1"(%(b)s, %(a)s)')
+
+            query_2 = registry.get('query_2')
+            self.assertEqual(query_2.text, 'SELECT 1')
+            self.assertIsNone(query_2.prepare_text)
+
+    def test_sql_registry_005(self):
+        with self.assertRaises(SqlRegistryError):
+            sql_registry.get('unknown_query')
+
+    def test_sql_registry_006(self):
+        """ invalid files are rejected when the registry is loaded """
+        invalid_files: tuple = (
+            ({'query': '  \n'}, frozenset()),
+            ({'query': "SELECT 'a' LIKE '%b'"}, frozenset()),
+            ({'query': 'SELECT 1; SELECT 2'}, frozenset({'query'})),
+            ({'query': 'SELECT 1'}, frozenset({'query', 'missing_query'})),
+        )
+        for files, prepared in invalid_files:
+            with self.subTest(files=files, prepared=prepared):
+                with TemporaryDirectory() as sql_dir:
+                    write_sql_files(sql_dir, files)
+                    with self.assertRaises(SqlRegistryError):
+                        SqlRegistry(sql_dir, prepared)
+
+    def test_sql_registry_007(self):
+        """ several statements are allowed for queries that are not prepared """
+        with TemporaryDirectory() as sql_dir:
+            write_sql_files(sql_dir, {'query': 'SELECT 1; SELECT 2;'})
+            self.assertEqual(SqlRegistry(sql_dir, frozenset()).get('query').text, 'SELECT 1; SELECT 2;')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,11 @@
 import unittest
-from budget_graph.user_cache_structure import UserLanguageCache, UserRegistrationStatusCache
+from budget_graph.user_cache_structure import UserLanguageCache, UserContextCache, UnregisteredUserCache, \
+    configure_user_caches, get_user_caches_stats, get_cached_user_context, encode_user_context, decode_user_context, \
+    DEFAULT_USER_CACHE_CAPACITY, DEFAULT_UNREGISTERED_CACHE_TTL
+from budget_graph.user_context import UserContext
+from budget_graph.last_login_buffer import LastLoginBuffer
+from budget_graph.cache_invalidation import InvalidationHandlers
+from budget_graph.global_config import GlobalConfig
 from budget_graph.dictionary import get_list_languages
 
 
@@ -7,101 +13,67 @@ class TestUserLanguageCache(unittest.TestCase):
     lang: tuple = get_list_languages()
     lang_len: int = len(lang)
 
-    def test_language_cache_1(self):
-        # getting access to a private attribute of a class
-        obj_1 = UserLanguageCache()
-        # clear the cache after the last test
-        obj_1._UserLanguageCache__telegram_language_cache.clear()  # noqa
+    def setUp(self):
         """
-        since the class attribute is not bound to the object, it will have a common state in different objects;
-        this is done on purpose - since in this case the cache will be consistent between different modules.
-
-        therefore, for our tests, it should be cleared, because we would try to test its initial state.
+        since the cache is a class attribute, it will have a common state in different modules;
+        this is done on purpose - therefore, for our tests, it should be cleared and set to a small capacity
         """
+        UserLanguageCache.get_cache().local.clear()
+        UserLanguageCache.get_cache().local.configure(50)
+
+    def tearDown(self):
+        UserLanguageCache.get_cache().local.configure(DEFAULT_USER_CACHE_CAPACITY)
+
+    def test_language_cache_1(self):
         for i in range(50):
             UserLanguageCache.input_cache_data(i + 1, TestUserLanguageCache.lang[i % TestUserLanguageCache.lang_len])
-        res = len(obj_1._UserLanguageCache__telegram_language_cache)  # noqa
-        self.assertEqual(res, 50)
+        self.assertEqual(len(UserLanguageCache.get_cache().local), 50)
 
     def test_language_cache_2(self):
-        obj_2 = UserLanguageCache()
-        obj_2._UserLanguageCache__telegram_language_cache.clear()  # noqa
+        """ the values of the existing keys are replaced """
         for i in range(50):
             UserLanguageCache.input_cache_data(i + 1, TestUserLanguageCache.lang[i % TestUserLanguageCache.lang_len])
         UserLanguageCache.input_cache_data(1, 'de')
         UserLanguageCache.input_cache_data(2, 'fr')
         UserLanguageCache.input_cache_data(3, 'is')
-        res = len(obj_2._UserLanguageCache__telegram_language_cache)  # noqa
-        self.assertEqual(res, 50)
+        self.assertEqual(len(UserLanguageCache.get_cache().local), 50)
+        self.assertEqual(UserLanguageCache.get_cache_data(2), 'fr')
 
     def test_language_cache_3(self):
-        obj_3 = UserLanguageCache()
-        obj_3._UserLanguageCache__telegram_language_cache.clear()  # noqa
-        for i in range(51):
-            UserLanguageCache.input_cache_data(i + 1, TestUserLanguageCache.lang[i % TestUserLanguageCache.lang_len])
-        res = len(obj_3._UserLanguageCache__telegram_language_cache)  # noqa
-        self.assertEqual(res, 51)
-
-    def test_language_cache_4(self):
-        obj_4 = UserLanguageCache()
-        obj_4._UserLanguageCache__telegram_language_cache.clear()  # noqa
+        """ the cache does not grow above the capacity, the oldest keys are evicted one by one """
         for i in range(52):
             UserLanguageCache.input_cache_data(i + 1, TestUserLanguageCache.lang[i % TestUserLanguageCache.lang_len])
-        res = len(obj_4._UserLanguageCache__telegram_language_cache)  # noqa
-        self.assertEqual(res, 46)
-
-    def test_language_cache_5(self):
-        obj_5 = UserLanguageCache()
-        obj_5._UserLanguageCache__telegram_language_cache.clear()  # noqa
-        for i in range(52):
-            UserLanguageCache.input_cache_data(i + 1, TestUserLanguageCache.lang[i % TestUserLanguageCache.lang_len])
-        for i in range(52, 54):
-            UserLanguageCache.input_cache_data(i + 1, TestUserLanguageCache.lang[i % TestUserLanguageCache.lang_len])
-        res = len(obj_5._UserLanguageCache__telegram_language_cache)  # noqa
-        self.assertEqual(res, 48)
-
-    def test_language_cache_6(self):
-        obj_6 = UserLanguageCache()
-        obj_6._UserLanguageCache__telegram_language_cache.clear()  # noqa
+        self.assertEqual(len(UserLanguageCache.get_cache().local), 50)
+        self.assertEqual(UserLanguageCache.get_cache_data(1), '')
+        self.assertEqual(UserLanguageCache.get_cache_data(2), '')
+        self.assertEqual(UserLanguageCache.get_cache_data(3), TestUserLanguageCache.lang[2])
 
+    def test_language_cache_4(self):
         UserLanguageCache.input_cache_data(12345, 'en')
         UserLanguageCache.input_cache_data(54321, 'is')
         UserLanguageCache.input_cache_data(10000, 'es')
 
-        res_1 = UserLanguageCache.get_cache_data(12345)
-        res_2 = UserLanguageCache.get_cache_data(54321)
-        res_3 = UserLanguageCache.get_cache_data(10000)
-        res_4 = UserLanguageCache.get_cache_data(0)
-        res_5 = UserLanguageCache.get_cache_data(12346)
-
-        self.assertEqual(res_1, 'en')
-        self.assertEqual(res_2, 'is')
-        self.assertEqual(res_3, 'es')
-        self.assertEqual(res_4, '')
-        self.assertEqual(res_5, '')
-
-    def test_language_cache_7(self):
-        obj_7 = UserLanguageCache()
-        obj_7._UserLanguageCache__telegram_language_cache.clear()  # noqa
+        self.assertEqual(UserLanguageCache.get_cache_data(12345), 'en')
+        self.assertEqual(UserLanguageCache.get_cache_data(54321), 'is')
+        self.assertEqual(UserLanguageCache.get_cache_data(10000), 'es')
+        self.assertEqual(UserLanguageCache.get_cache_data(0), '')
+        self.assertEqual(UserLanguageCache.get_cache_data(12346), '')
+
+    def test_language_cache_5(self):
         UserLanguageCache.input_cache_data(12345, 'en')
         UserLanguageCache.input_cache_data(54321, 'is')
         UserLanguageCache.input_cache_data(10000, 'es')
 
         UserLanguageCache.delete_data_from_cache(10000)
         UserLanguageCache.delete_data_from_cache(12345)
+        UserLanguageCache.delete_data_from_cache(12345)
 
-        res_1 = UserLanguageCache.get_cache_data(12345)
-        res_2 = UserLanguageCache.get_cache_data(54321)
-        res_3 = UserLanguageCache.get_cache_data(10000)
-
-        self.assertEqual(res_1, '')
-        self.assertEqual(res_2, 'is')
-        self.assertEqual(res_3, '')
+        self.assertEqual(UserLanguageCache.get_cache_data(12345), '')
+        self.assertEqual(UserLanguageCache.get_cache_data(54321), 'is')
+        self.assertEqual(UserLanguageCache.get_cache_data(10000), '')
 
     # test to check if the relevant and required data is retained in the cache when it is constantly refreshed
-    def test_language_cache_8(self):
-        obj_8 = UserLanguageCache()
-        obj_8._UserLanguageCache__telegram_language_cache.clear()  # noqa
+    def test_language_cache_6(self):
         for i in range(1, 10_000):
             UserLanguageCache.input_cache_data(i * 10, TestUserLanguageCache.lang[i % TestUserLanguageCache.lang_len])
             if i % 5 == 0:
@@ -111,92 +83,144 @@ class TestUserLanguageCache(unittest.TestCase):
             if i % 25 == 0:
                 UserLanguageCache.update_data_position(50)
 
-        res_1: str = UserLanguageCache.get_cache_data(10)
-        self.assertEqual(res_1, TestUserLanguageCache.lang[1])  # 10/10 -> language
-        res_2: str = UserLanguageCache.get_cache_data(20)
-        self.assertEqual(res_2, TestUserLanguageCache.lang[2])  # 20/10 -> language
-        res_3: str = UserLanguageCache.get_cache_data(50)
-        self.assertEqual(res_3, TestUserLanguageCache.lang[5])  # 50/10 -> language
+        self.assertEqual(UserLanguageCache.get_cache_data(10), TestUserLanguageCache.lang[1])  # 10/10 -> language
+        self.assertEqual(UserLanguageCache.get_cache_data(20), TestUserLanguageCache.lang[2])  # 20/10 -> language
+        self.assertEqual(UserLanguageCache.get_cache_data(50), TestUserLanguageCache.lang[5])  # 50/10 -> language
 
         # and additionally check that the old data has been deleted
-        res_4: str = UserLanguageCache.get_cache_data(30)
-        self.assertEqual(res_4, '')
-        res_5: str = UserLanguageCache.get_cache_data(1_500)
-        self.assertEqual(res_5, '')
-        res_6: str = UserLanguageCache.get_cache_data(3_000)
-        self.assertEqual(res_6, '')
-
-
-class TestUserRegistrationStatusCache(unittest.TestCase):
-    def test_user_registration_cache_1(self):
-        # getting access to a private attribute of a class
-        obj_1 = UserRegistrationStatusCache()
-        # clear the cache after the last test
-        obj_1._UserRegistrationStatusCache__users.clear()  # noqa
-        """
-        since the class attribute is not bound to the object, it will have a common state in different objects;
-        this is done on purpose - since in this case the cache will be consistent between different modules.
+        self.assertEqual(UserLanguageCache.get_cache_data(30), '')
+        self.assertEqual(UserLanguageCache.get_cache_data(1_500), '')
+        self.assertEqual(UserLanguageCache.get_cache_data(3_000), '')
 
-        therefore, for our tests, it should be cleared, because we would try to test its initial state.
-        """
-        for i in range(1024):
-            UserRegistrationStatusCache.input_cache_data(i + 1)
-        res = len(obj_1._UserRegistrationStatusCache__users)  # noqa
-        self.assertEqual(res, 46)
-
-    def test_user_registration_cache_2(self):
-        obj_2 = UserRegistrationStatusCache()
-        obj_2._UserRegistrationStatusCache__users.clear()  # noqa
-        for i in range(1025):
-            UserRegistrationStatusCache.input_cache_data(i + 10)
-        res = len(obj_2._UserRegistrationStatusCache__users)  # noqa
-        self.assertEqual(res, 47)
-
-    def test_user_registration_cache_3(self):
-        obj_3 = UserRegistrationStatusCache()
-        obj_3._UserRegistrationStatusCache__users.clear()  # noqa
-        for i in range(1027):
-            UserRegistrationStatusCache.input_cache_data(i + 15)
-        res = len(obj_3._UserRegistrationStatusCache__users)  # noqa
-        self.assertEqual(res, 49)
-
-    def test_user_registration_cache_4(self):
-        obj_4 = UserRegistrationStatusCache()
-        obj_4._UserRegistrationStatusCache__users.clear()  # noqa
-        for i in range(50):
-            UserRegistrationStatusCache.input_cache_data(i + 15)
-        res = len(obj_4._UserRegistrationStatusCache__users)  # noqa
-        self.assertEqual(res, 50)
-
-    def test_user_registration_cache_5(self):
-        obj_5 = UserRegistrationStatusCache()
-        obj_5._UserRegistrationStatusCache__users.clear()  # noqa
-        for i in range(51):
-            UserRegistrationStatusCache.input_cache_data(i + 999)
-        res = len(obj_5._UserRegistrationStatusCache__users)  # noqa
-        self.assertEqual(res, 51)
-
-    def test_user_registration_cache_6(self):
-        obj_6 = UserRegistrationStatusCache()
-        obj_6._UserRegistrationStatusCache__users.clear()  # noqa
-        for i in range(52):
-            UserRegistrationStatusCache.input_cache_data(i + 123)
-        res = len(obj_6._UserRegistrationStatusCache__users)  # noqa
-        self.assertEqual(res, 46)
 
-    # test to check if the relevant and required data is retained in the cache when it is constantly refreshed
-    def test_user_registration_cache_7(self):
-        obj_7 = UserRegistrationStatusCache()
-        obj_7._UserRegistrationStatusCache__users.clear()  # noqa
-        for i in range(1, 10_000):
-            UserRegistrationStatusCache.input_cache_data(i + 10_000)
-            if i % 25 == 0:
-                UserRegistrationStatusCache.update_data_position(10_005)
-        res_1 = UserRegistrationStatusCache.get_cache_data(10_005)
-        self.assertTrue(res_1)
-        # and additionally check that the old data has been deleted
-        res_2 = UserRegistrationStatusCache.get_cache_data(10_006)
-        self.assertFalse(res_2)
+class TestUserContextCache(unittest.TestCase):
+    def setUp(self):
+        UserContextCache.get_cache().local.clear()
+        UserContextCache.get_cache().local.configure(50)
+
+    def tearDown(self):
+        UserContextCache.get_cache().local.configure(DEFAULT_USER_CACHE_CAPACITY)
+
+    @staticmethod
+    def input_user(telegram_id: int) -> UserContext:
+        user_context = UserContext(telegram_id, 'de', True, f'user_{telegram_id}', 3, True, False, 2, (True, False))
+        UserContextCache.input_cache_data(user_context, UserContextCache.get_generation())
+        return user_context
+
+    def test_user_context_cache_1(self):
+        for i in range(1024):
+            self.input_user(i + 1)
+        self.assertEqual(len(UserContextCache.get_cache().local), 50)
+        self.assertIsNotNone(UserContextCache.get_cache_data(1024))
+        self.assertIsNotNone(UserContextCache.get_cache_data(975))
+        self.assertIsNone(UserContextCache.get_cache_data(974))
+
+    def test_user_context_cache_2(self):
+        """ only the registered users are cached, a repeated input does not add a second entry """
+        for _ in range(3):
+            user_context: UserContext = self.input_user(15)
+        self.assertEqual(len(UserContextCache.get_cache().local), 1)
+        self.assertIs(UserContextCache.get_cache_data(15), user_context)
+        UserContextCache.input_cache_data(UserContext(16, 'de'), UserContextCache.get_generation())
+        self.assertIsNone(UserContextCache.get_cache_data(16))
+
+    def test_user_context_cache_3(self):
+        for i in range(10):
+            self.input_user(i + 100)
+        UserContextCache.delete_data_from_cache(100)
+        UserContextCache.delete_group_trigger((101, 102, 103, 1))
+        InvalidationHandlers.dispatch('user:104')
+        InvalidationHandlers.dispatch('language:105')
+        self.assertEqual([i + 100 for i in range(10) if UserContextCache.get_cache_data(i + 100)],
+                         [106, 107, 108, 109])
+
+    def test_user_context_cache_4(self):
+        """ a context read before an eviction is not cached, the cached user is marked as active """
+        generation: int = UserContextCache.get_generation()
+        UserContextCache.delete_data_from_cache(200)
+        UserContextCache.input_cache_data(UserContext(201, 'en', True), generation)
+        self.assertIsNone(UserContextCache.get_cache_data(201))
+
+        user_context: UserContext = self.input_user(202)
+        LastLoginBuffer.take()
+        self.assertIs(get_cached_user_context(202), user_context)
+        self.assertEqual(set(LastLoginBuffer.take()), {202})
+        self.assertIsNone(get_cached_user_context(203))
+        UnregisteredUserCache.input_cache_data(203, 'es')
+        self.assertEqual((get_cached_user_context(203).is_registered, get_cached_user_context(203).language),
+                         (False, 'es'))
+        self.assertEqual(LastLoginBuffer.take(), {})
+        UnregisteredUserCache.get_cache().clear()
+
+    def test_user_context_cache_5(self):
+        """ the compact form of the context in Redis """
+        user_context: UserContext = UserContext(300, 'is', True, 'user_300', 7, False, True, -3, (False, True))
+        data: bytes = encode_user_context(user_context)
+        self.assertEqual(data, b'[300,"is","user_300",7,false,true,-3,[false,true]]')
+        decoded: UserContext = decode_user_context(data)
+        self.assertEqual([getattr(decoded, name) for name in UserContext.__slots__],
+                         [getattr(user_context, name) for name in UserContext.__slots__])
+
+
+class TestUnregisteredUserCache(unittest.TestCase):
+    def setUp(self):
+        UnregisteredUserCache.get_cache().clear()
+
+    def test_unregistered_user_cache_1(self):
+        """ the language of the unregistered user is kept, an unknown user gives an empty string """
+        UnregisteredUserCache.input_cache_data(500, 'de')
+        self.assertEqual(UnregisteredUserCache.get_cache_data(500), 'de')
+        self.assertEqual(UnregisteredUserCache.get_cache_data(501), '')
+        UnregisteredUserCache.delete_data_from_cache(500)
+        UnregisteredUserCache.delete_data_from_cache(501)
+        self.assertEqual(UnregisteredUserCache.get_cache_data(500), '')
+
+    def test_unregistered_user_cache_2(self):
+        """ the registration and the change of the language in another process evict the entry """
+        for telegram_id in range(600, 605):
+            UnregisteredUserCache.input_cache_data(telegram_id, 'en')
+        InvalidationHandlers.dispatch('user:600,601')
+        InvalidationHandlers.dispatch('language:602')
+        self.assertEqual([telegram_id for telegram_id in range(600, 605)
+                          if UnregisteredUserCache.get_cache_data(telegram_id)], [603, 604])
+        InvalidationHandlers.evict_all()
+        self.assertEqual(len(UnregisteredUserCache.get_cache()), 0)
+
+
+class TestUserCachesConfig(unittest.TestCase):
+    def setUp(self):
+        self.capacity, self.ttl = GlobalConfig.user_cache_capacity, GlobalConfig.user_cache_ttl
+
+    def tearDown(self):
+        GlobalConfig.user_cache_capacity, GlobalConfig.user_cache_ttl = self.capacity, self.ttl
+        configure_user_caches()
+
+    def test_user_caches_config_1(self):
+        GlobalConfig.user_cache_capacity, GlobalConfig.user_cache_ttl = 200, 60
+        configure_user_caches()
+        stats: dict[str, dict] = get_user_caches_stats()
+        self.assertEqual(set(stats), {'language', 'context', 'unregistered'})
+        for name in ('language', 'context'):
+            self.assertEqual((stats[name]['capacity'], stats[name]['ttl']), (200, 60))
+        self.assertEqual(stats['unregistered']['capacity'], 200)
+
+        GlobalConfig.user_cache_capacity, GlobalConfig.user_cache_ttl = None, None
+        configure_user_caches()
+        self.assertEqual(get_user_caches_stats()['language']['capacity'], DEFAULT_USER_CACHE_CAPACITY)
+        self.assertIsNone(get_user_caches_stats()['language']['ttl'])
+
+    def test_user_caches_config_2(self):
+        """ the entries of the unregistered users always expire """
+        unregistered_ttl: float | None = GlobalConfig.unregistered_cache_ttl
+        try:
+            GlobalConfig.unregistered_cache_ttl = 15
+            configure_user_caches()
+            self.assertEqual(get_user_caches_stats()['unregistered']['ttl'], 15)
+            GlobalConfig.unregistered_cache_ttl = None
+            configure_user_caches()
+            self.assertEqual(get_user_caches_stats()['unregistered']['ttl'], DEFAULT_UNREGISTERED_CACHE_TTL)
+        finally:
+            GlobalConfig.unregistered_cache_ttl = unregistered_ttl
 
 
 if __name__ == '__main__':
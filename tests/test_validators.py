@@ -1,4 +1,5 @@
 import unittest
+from asyncio import run as asyncio_run
 from os import listdir
 from string import ascii_letters
 from random import choice
@@ -16,7 +17,8 @@ from budget_graph.validation import (check_day_is_correct,
                                      telegram_id_validation,
                                      password_validation,
                                      username_validation,
-                                     registration_validation)
+                                     registration_validation,
+                                     transactions_validation)
 
 
 class TestDateValidation(unittest.IsolatedAsyncioTestCase):
@@ -600,5 +602,52 @@ class TestCategoryValidation(unittest.TestCase):
             self.assertFalse(res, lang)
 
 
+class TestTransactionsValidation(unittest.TestCase):
+    """ the rules are the same as in the validators of the separate values """
+    today: str = datetime.now(timezone.utc).strftime('%d/%m/%Y')
+
+    def test_transactions_validation_001(self):
+        rows: tuple = (
+            ('100', self.today, receive_translation('en', 'travel'), 'tickets'),
+            ('-2500', '01/02/2024', '', ''),
+            ('+7', self.today, receive_translation('en', 'other'), 'a' * 50),
+        )
+        valid_rows, invalid_rows = transactions_validation(rows, 'en')
+        self.assertEqual(invalid_rows, [])
+        self.assertEqual([row[0] for row in valid_rows], [100, -2500, 7])
+        self.assertEqual(valid_rows[1][1], datetime(2024, 2, 1).date())
+        self.assertEqual(valid_rows[0][2:], (receive_translation('en', 'travel'), 'tickets'))
+
+    def test_transactions_validation_002(self):
+        future_date: str = (datetime.now(timezone.utc) + timedelta(days=3)).strftime('%d/%m/%Y')
+        rows: tuple = (
+            ('0', self.today, '', ''),  # zero value
+            ('12a', self.today, '', ''),
+            ('100000000', self.today, '', ''),  # too large value
+            ('100', '31/02/2024', '', ''),  # there is no such day
+            ('100', '2024-02-01', '', ''),  # format
+            ('100', future_date, '', ''),
+            ('100', '01/01/2010', '', ''),  # more than 10 years ago
+            ('100', self.today, 'Viajar', ''),  # category of another language
+            ('100', self.today, '', 'a' * 51),
+            ('--100', self.today, '', ''),
+            ('-+100', self.today, '', ''),
+            ('100', self.today, '', ''),
+        )
+        valid_rows, invalid_rows = transactions_validation(rows, 'en')
+        self.assertEqual(invalid_rows, list(range(1, 12)))
+        self.assertEqual(len(valid_rows), 1)
+
+    def test_transactions_validation_003(self):
+        """ the same result as date_validation() for every day of the allowed range and around it """
+        start_date = datetime.now(timezone.utc) - timedelta(days=3_660)
+        dates: tuple = tuple((start_date + timedelta(days=day)).strftime('%d/%m/%Y') for day in range(3_665))
+        valid_rows, invalid_rows = transactions_validation((('1', date, '', '') for date in dates), 'en')
+        expected_invalid: list = [number for number, date in enumerate(dates, start=1)
+                                  if not asyncio_run(date_validation(date))]
+        self.assertEqual(invalid_rows, expected_invalid)
+        self.assertEqual(len(valid_rows), len(dates) - len(expected_invalid))
+
+
 if __name__ == '__main__':
     unittest.main()